@@ -211,6 +211,9 @@ EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 # collapsed during that interval
 CHANGE_NOTIFICATIONS_MIN_INTERVAL = 0  # seconds
 SEND_BULK_EMAILS_WITH_CELERY = True
+# Notifications selected by a sender in every batch, each one is claimed
+# (with SKIP LOCKED) and sent in its own transaction
+CHANGE_NOTIFICATIONS_BATCH_SIZE = 20
 
 DJMAIL_REAL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 DJMAIL_SEND_ASYNC = True
@@ -221,6 +224,18 @@ DJMAIL_TEMPLATE_EXTENSION = "jinja"
 EVENTS_PUSH_BACKEND = "taiga.events.backends.postgresql.EventsPushBackend"
 # EVENTS_PUSH_BACKEND = "taiga.events.backends.rabbitmq.EventsPushBackend"
 # EVENTS_PUSH_BACKEND_OPTIONS = {"url": "//guest:guest@127.0.0.1/"}
+# The rabbitmq backend accepts also "pool_size" (idle connections kept open
+# by process, 2 by default), "confirm_publish" and "confirm_timeout"
+# The outbox backend writes the events in the database, in the transaction that
+# emits them, and the relay_events command sends them with the relay backend:
+# EVENTS_PUSH_BACKEND = "taiga.events.backends.outbox.EventsPushBackend"
+# EVENTS_PUSH_BACKEND_OPTIONS = {
+#     "relay_backend": "taiga.events.backends.rabbitmq.EventsPushBackend",
+#     "relay_backend_options": {"url": "//guest:guest@127.0.0.1/"},
+# }
+# Send a live notification to all its recipients in one event (it requires
+# a version of taiga-events that supports the "live_notifications" events)
+EVENTS_MULTI_RECIPIENT_LIVE_NOTIFICATIONS = False
 
 # Message System
 MESSAGE_STORAGE = "django.contrib.messages.storage.session.SessionStorage"
@@ -296,6 +311,8 @@ TEMPLATES = [
 MIDDLEWARE = [
     "taiga.base.middleware.cors.CorsMiddleware",
     "taiga.events.middleware.SessionIDMiddleware",
+    "taiga.events.middleware.EventsBufferMiddleware",
+    "taiga.projects.history.middleware.HistoryValuesCacheMiddleware",
 
     # Common middlewares
     "django.middleware.common.CommonMiddleware",
@@ -516,6 +533,7 @@ USER_EMAIL_ALLOWED_DOMAINS = None
 PRIVATE_USER_PROFILES = False
 
 SEARCHES_MAX_RESULTS = 150
+SEARCHES_TYPEAHEAD_MAX_RESULTS = 20
 
 SOUTH_MIGRATION_MODULES = {
     'easy_thumbnails': 'easy_thumbnails.south_migrations',
@@ -656,6 +674,53 @@ MDRENDER_CACHE_ENABLE = True
 MDRENDER_CACHE_MIN_SIZE = 40
 MDRENDER_CACHE_TIMEOUT = 86400
 
+# HISTORY
+# The names of the users are kept during every request and the project
+# catalogs are cached under generations stored in the cache. The catalogs
+# are only cached when the default cache is shared by all the processes
+# (memcached, redis...), never with the local memory cache.
+HISTORY_VALUES_CACHE_ENABLE = True
+HISTORY_VALUES_CACHE_TIMEOUT = 60 * 60  # seconds
+# The values_diff of the history entries (with the diffs of the html fields)
+# is computed in background after creating them (in the celery workers if
+# CELERY_ENABLED), over HTML_DIFF_MAX_SIZE characters the html diffs are not
+# computed and over HTML_DIFF_TIMEOUT seconds they are coarser.
+HISTORY_HTML_DIFF_MAX_SIZE = 100000
+HISTORY_HTML_DIFF_TIMEOUT = 1.0  # seconds
+# The old hidden history entries are compacted by the compact_history command
+# or, if HISTORY_COMPACTION_WITH_CELERY, periodically by celery. With
+# HISTORY_COMPACTION_COLD_STORAGE the hidden history of the blocked projects
+# is moved to a cold table, and restored once they are unblocked.
+HISTORY_COMPACTION_WITH_CELERY = False
+HISTORY_COMPACTION_MIN_AGE = 90  # days
+HISTORY_COMPACTION_BATCH_SIZE = 500  # keys
+HISTORY_COMPACTION_MAX_BATCHES = 20  # per periodic run
+HISTORY_COMPACTION_COLD_STORAGE = False
+
+# PROJECTS TOTALS
+# The activity and fans totals of the projects are incremented on every new
+# event. The last week/month/year totals roll every day and the totals are
+# reconciled with the timeline and the likes by the reconcile_project_totals
+# command or, if PROJECTS_TOTALS_WITH_CELERY, periodically by celery.
+PROJECTS_TOTALS_WITH_CELERY = False
+PROJECTS_TOTALS_RECONCILE_BATCH_SIZE = 500  # projects
+
+# FILTERS DATA
+# The filters data of the lists are cached by project, filters and user
+# permissions under a per project generation renewed when the project data
+# change, only if the cache is shared by all the processes (memcached,
+# redis...), never with the local memory cache.
+FILTERS_DATA_CACHE_ENABLE = True
+FILTERS_DATA_CACHE_TIMEOUT = 10 * 60  # seconds
+
+# TIMELINE
+# The content types of the timeline entries visible by every user in the
+# projects are stored in the cache, only if it is shared by all the processes
+# (memcached, redis...), with the local memory cache they are computed on
+# every request.
+TIMELINE_VISIBILITY_CACHE_ENABLE = True
+TIMELINE_VISIBILITY_CACHE_TIMEOUT = 3600  # seconds
+
 # TELEMETRY
 
 ENABLE_TELEMETRY = True
@@ -29,6 +29,8 @@ from .settings import api_settings
 
 from urllib import parse as urlparse
 
+import base64
+import json
 import warnings
 
 
@@ -140,6 +142,102 @@ class LazyPaginator(Paginator):
     page_range = property(_get_page_range)
 
 
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class CursorPage(object):
+    """A page of a CursorPaginator."""
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(object):
+    """
+    Implement keyset pagination.
+
+    The pages are read from the position of the cursor in the `ordering`
+    (a unique ordering, like `("-created", "-id")`), so they never need a
+    COUNT nor an OFFSET and reading a page does not depend on its depth.
+    The cursors are opaque strings with the position and direction.
+    """
+
+    def __init__(self, object_list, per_page, ordering):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.ordering = ordering
+
+        model = object_list.model
+        self.fields = [model._meta.get_field(name.lstrip("-")) for name in ordering]
+        self.descending = ordering[0].startswith("-")
+        self.columns = ", ".join('"{}"."{}"'.format(model._meta.db_table, field.column)
+                                 for field in self.fields)
+
+    def encode_cursor(self, obj, previous=False):
+        values = [getattr(obj, field.attname) for field in self.fields]
+        # Keep the microseconds of the datetimes (DjangoJSONEncoder drops them)
+        data = json.dumps(["p" if previous else "n"] + values, default=lambda value: value.isoformat())
+        return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii")
+
+    def decode_cursor(self, cursor):
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+            direction, values = data[0], data[1:]
+            if direction not in ("n", "p") or len(values) != len(self.fields):
+                raise ValueError()
+            values = [field.to_python(value) for field, value in zip(self.fields, values)]
+        except Exception:
+            raise InvalidCursor(_("Invalid cursor"))
+
+        return direction == "p", values
+
+    def page(self, cursor=None):
+        qs = self.object_list
+        ordering = self.ordering
+        previous = False
+
+        if cursor:
+            previous, values = self.decode_cursor(cursor)
+            operator = "<" if self.descending != previous else ">"
+            where = "({}) {} ({})".format(self.columns, operator, ", ".join(["%s"] * len(values)))
+            qs = qs.extra(where=[where], params=values)
+
+        if previous:
+            ordering = [name[1:] if name.startswith("-") else "-" + name for name in ordering]
+
+        # Retrieve one more object to check if there is another page.
+        objects = list(qs.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+
+        if previous:
+            objects.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, bool(cursor)
+
+        next_cursor, previous_cursor = None, None
+        if objects and has_next:
+            next_cursor = self.encode_cursor(objects[-1])
+        if objects and has_previous:
+            previous_cursor = self.encode_cursor(objects[0], previous=True)
+
+        return CursorPage(objects, self, next_cursor, previous_cursor)
+
+
 class PaginationMixin(object):
     # Pagination settings
     paginate_by = api_settings.PAGINATE_BY
@@ -148,6 +246,18 @@ class PaginationMixin(object):
     page_kwarg = 'page'
     paginator_class = Paginator
 
+    # Unique ordering of the querysets paginated with the (opt-in) cursor
+    # pagination, requested with the x-cursor-pagination header or the
+    # cursor query param.
+    cursor_ordering = None
+    cursor_kwarg = 'cursor'
+
+    def is_cursor_paginated(self):
+        if self.cursor_ordering is None or "HTTP_X_DISABLE_PAGINATION" in self.request.META:
+            return False
+        return ("HTTP_X_CURSOR_PAGINATION" in self.request.META or
+                self.cursor_kwarg in self.request.QUERY_PARAMS)
+
     def get_paginate_by(self, queryset=None, **kwargs):
         """
         Return the size of pages to use with pagination.
@@ -203,6 +313,9 @@ class PaginationMixin(object):
             if not page_size:
                 return None
 
+        if self.is_cursor_paginated():
+            return self.paginate_queryset_by_cursor(queryset, page_size)
+
         if not self.allow_empty:
             warnings.warn(
                 'The `allow_empty` parameter is due to be deprecated. '
@@ -256,5 +369,27 @@ class PaginationMixin(object):
 
         return page
 
+    def paginate_queryset_by_cursor(self, queryset, page_size):
+        paginator = CursorPaginator(queryset, page_size, self.cursor_ordering)
+        try:
+            page = paginator.page(self.request.QUERY_PARAMS.get(self.cursor_kwarg))
+        except InvalidCursor as e:
+            raise Http404(str(e))
+
+        self.headers["x-paginated"] = "true"
+        self.headers["x-paginated-by"] = paginator.per_page
+
+        if page.has_next():
+            url = self.request.build_absolute_uri()
+            url = replace_query_param(url, self.cursor_kwarg, page.next_cursor)
+            self.headers["X-Pagination-Next"] = url
+
+        if page.has_previous():
+            url = self.request.build_absolute_uri()
+            url = replace_query_param(url, self.cursor_kwarg, page.previous_cursor)
+            self.headers["X-Pagination-Prev"] = url
+
+        return page
+
     def get_pagination_serializer(self, page):
         return self.get_serializer(page.object_list, many=True)
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def is_shared_cache(alias: str="default") -> bool:
+    """
+    Return whether a cache is shared by all the processes (memcached,
+    redis, database...), so the invalidations made by one process are
+    seen by the others, instead of being local to every process.
+    """
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
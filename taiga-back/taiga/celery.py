@@ -46,3 +46,22 @@ if settings.SEND_BULK_EMAILS_WITH_CELERY and settings.CHANGE_NOTIFICATIONS_MIN_I
         'schedule': settings.CHANGE_NOTIFICATIONS_MIN_INTERVAL,
         'args': (),
     }
+
+if settings.HISTORY_COMPACTION_WITH_CELERY:
+    app.conf.beat_schedule['compact-history-once-a-day'] = {
+        'task': 'taiga.projects.history.tasks.compact_history',
+        'schedule': crontab(minute=0, hour=3),
+        'args': (),
+    }
+
+if settings.PROJECTS_TOTALS_WITH_CELERY:
+    app.conf.beat_schedule['refresh-projects-totals-windows-once-a-day'] = {
+        'task': 'taiga.projects.tasks.refresh_projects_totals_windows',
+        'schedule': crontab(minute=5, hour=0),
+        'args': (),
+    }
+    app.conf.beat_schedule['reconcile-projects-totals-once-a-week'] = {
+        'task': 'taiga.projects.tasks.reconcile_projects_totals',
+        'schedule': crontab(minute=0, hour=4, day_of_week=0),
+        'args': (),
+    }
@@ -22,10 +22,24 @@ from django.conf import settings
 
 
 class BaseEventsPushBackend(object, metaclass=abc.ABCMeta):
+    # The transactional backends write the events in the transaction that
+    # emits them, instead of sending them when it commits.
+    transactional = False
+
     @abc.abstractmethod
     def emit_event(self, message:str, *, routing_key:str, channel:str="events"):
         pass
 
+    def emit_events(self, events, *, fail_silently=True):
+        """
+        Emit a batch of events, dicts with the arguments of `emit_event`.
+
+        The backends that log the errors instead of raising them must raise
+        them when `fail_silently` is False.
+        """
+        for event in events:
+            self.emit_event(**event)
+
 
 def load_class(path):
     """
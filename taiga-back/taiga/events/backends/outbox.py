@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from taiga.events.models import OutboxEvent
+
+from . import base
+
+
+class EventsPushBackend(base.BaseEventsPushBackend):
+    """
+    Write the events in the outbox table, in the transaction that emits
+    them (so they are discarded if it's rolled back). The relay_events
+    command sends them later, in batches, with the relay backend.
+
+    Options:
+        relay_backend: the path of the events backend used to send them.
+        relay_backend_options: the options of the relay backend.
+    """
+    transactional = True
+
+    def __init__(self, relay_backend="taiga.events.backends.rabbitmq.EventsPushBackend",
+                 relay_backend_options=None):
+        self.relay_backend = relay_backend
+        self.relay_backend_options = relay_backend_options or {}
+
+    def emit_event(self, message:str, *, routing_key:str, channel:str="events"):
+        OutboxEvent.objects.create(message=message, routing_key=routing_key, channel=channel)
+
+    def emit_events(self, events, *, fail_silently=True):
+        OutboxEvent.objects.bulk_create([OutboxEvent(message=event["message"],
+                                                     routing_key=event["routing_key"],
+                                                     channel=event.get("channel", "events"))
+                                         for event in events])
+
+    def get_relay_backend(self):
+        return base.get_events_backend(self.relay_backend, self.relay_backend_options)
+
+
+@transaction.atomic
+def relay_outbox_events(relay_backend, *, batch_size:int) -> int:
+    """
+    Send the oldest batch of events of the outbox with the relay backend and
+    delete them. If they can't be sent the transaction is rolled back, and
+    they are sent again the next time. Return the number of sent events.
+
+    The events are locked with `SKIP LOCKED`, several relays don't send the
+    same events (but then the order of the events is not guaranteed).
+    """
+    events = list(OutboxEvent.objects.select_for_update(skip_locked=True)
+                                     .order_by("id")
+                                     .values("id", "message", "routing_key", "channel")[:batch_size])
+    if not events:
+        return 0
+
+    relay_backend.emit_events([{"message": event["message"],
+                                "routing_key": event["routing_key"],
+                                "channel": event["channel"]} for event in events],
+                              fail_silently=False)
+    OutboxEvent.objects.filter(id__in=[event["id"] for event in events]).delete()
+    return len(events)
+
+
+def get_outbox_stats(now=None) -> dict:
+    """
+    Get the number of pending events in the outbox and the age in seconds
+    of the oldest one.
+    """
+    now = now or timezone.now()
+    stats = OutboxEvent.objects.aggregate(pending=Count("id"), oldest=Min("created_at"))
+    oldest = stats.pop("oldest")
+    stats["oldest_age"] = (now - oldest).total_seconds() if oldest else 0
+    return stats
@@ -14,11 +14,17 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import json
 import logging
+import os
+import select
+import threading
+
+from contextlib import contextmanager
 
 from amqp import Connection as AmqpConnection
 from amqp.exceptions import AccessRefused
+from amqp.exceptions import ChannelError as AmqpChannelError
+from amqp.exceptions import ConnectionError as AmqpConnectionError
 from amqp.basic_message import Message as AmqpMessage
 from urllib.parse import urlparse
 
@@ -26,6 +32,10 @@ from . import base
 
 log = logging.getLogger("tagia.events")
 
+# The errors of a connection (or its channel) closed by the broker or by
+# the network
+CONNECTION_ERRORS = (OSError, AmqpConnectionError, AmqpChannelError)
+
 
 def _make_rabbitmq_connection(url):
     parse_result = urlparse(url)
@@ -46,31 +56,215 @@ def _make_rabbitmq_connection(url):
                           password=password, virtual_host=vhost[1:])
 
 
+class Publisher:
+    """
+    An open AMQP connection with its channel, that remembers the exchanges
+    already declared in it.
+
+    With `confirm_publish` the channel is in confirm mode and `publish`
+    waits for the broker to confirm the whole batch of messages.
+    """
+    def __init__(self, url, *, confirm_publish=False, confirm_timeout=None):
+        self.connection = _make_rabbitmq_connection(url)
+        self.connection.connect()
+        self.channel = self.connection.channel()
+        self.exchanges = set()
+
+        self.confirm_publish = confirm_publish
+        self.confirm_timeout = confirm_timeout
+        self._published = 0
+        self._confirmed = 0
+        self._nacked = 0
+        if confirm_publish:
+            self.channel.events["basic_ack"].add(self._on_basic_ack)
+            self.channel.events["basic_nack"].add(self._on_basic_nack)
+            self.channel.confirm_select()
+
+    def _on_basic_ack(self, delivery_tag, multiple):
+        self._confirmed = max(self._confirmed, delivery_tag)
+
+    def _on_basic_nack(self, delivery_tag, multiple):
+        self._nacked += (delivery_tag - self._confirmed) if multiple else 1
+        self._confirmed = max(self._confirmed, delivery_tag)
+
+    def process_pending_frames(self):
+        """
+        Process the frames received since the last publish. The broker closes
+        the channel (or the connection) asynchronously, it raises one of the
+        `CONNECTION_ERRORS` if the connection is closed.
+        """
+        sock = self.connection.sock
+        readable, _, _ = select.select([sock], [], [], 0)
+        if readable:
+            self.connection.drain_events(timeout=self.confirm_timeout)
+
+    def publish(self, events):
+        """
+        Publish the events, a list of `(message, routing_key, exchange)`.
+        """
+        for message, routing_key, exchange in events:
+            if exchange not in self.exchanges:
+                self.channel.exchange_declare(exchange=exchange, type="topic", auto_delete=True)
+                self.exchanges.add(exchange)
+            self.channel.basic_publish(AmqpMessage(message), routing_key=routing_key, exchange=exchange)
+            self._published += 1
+
+        if self.confirm_publish:
+            while self._confirmed < self._published:
+                self.connection.drain_events(timeout=self.confirm_timeout)
+
+            nacked, self._nacked = self._nacked, 0
+            if nacked:
+                raise RuntimeError("{} messages rejected by RabbitMQ".format(nacked))
+
+    def close(self):
+        try:
+            self.connection.close()
+        except Exception:
+            log.debug("EventsPushBackend: Error closing the connection", exc_info=True)
+
+    def forget(self):
+        """
+        Release the socket inherited from the parent process without closing
+        the AMQP connection, that is still used by the parent.
+        """
+        transport = getattr(self.connection, "transport", None)
+        sock = getattr(transport, "sock", None)
+        if sock is not None:
+            sock.close()
+            transport.sock = None
+
+
+class PublishersPool:
+    """
+    A pool of publishers of a process.
+
+    `size` is the number of idle publishers kept open (0 disables the pool,
+    a connection is opened for every publish). An idle publisher whose
+    connection was closed is replaced by a new one before publishing, a
+    publisher that fails while publishing is closed and a new one is opened
+    the next time.
+    """
+    def __init__(self, url, *, size, **publisher_options):
+        self.url = url
+        self.size = size
+        self.publisher_options = publisher_options
+        self.pid = os.getpid()
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        with self._lock:
+            publisher = self._idle.pop() if self._idle else None
+
+        if publisher is not None:
+            try:
+                publisher.process_pending_frames()
+                return publisher
+            except CONNECTION_ERRORS:
+                log.debug("EventsPushBackend: Pooled connection closed, opening a new one", exc_info=True)
+                publisher.close()
+            except Exception:
+                publisher.close()
+                raise
+
+        return Publisher(self.url, **self.publisher_options)
+
+    @contextmanager
+    def publisher(self):
+        publisher = self._acquire()
+        try:
+            yield publisher
+        except Exception:
+            publisher.close()
+            raise
+
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(publisher)
+                publisher = None
+
+        if publisher is not None:
+            publisher.close()
+
+    def forget(self):
+        with self._lock:
+            publishers, self._idle = self._idle, []
+
+        for publisher in publishers:
+            publisher.forget()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_publishers_pool(url, *, size, **publisher_options):
+    """
+    Get the pool of publishers of the process for the url and options.
+
+    The pools inherited from the parent process (gunicorn and celery fork
+    their workers) are discarded, every process opens its own connections.
+    """
+    key = (url, size, tuple(sorted(publisher_options.items())))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is not None and pool.pid != os.getpid():
+            for inherited_pool in _pools.values():
+                inherited_pool.forget()
+            _pools.clear()
+            pool = None
+
+        if pool is None:
+            pool = _pools[key] = PublishersPool(url, size=size, **publisher_options)
+
+    return pool
+
+
 class EventsPushBackend(base.BaseEventsPushBackend):
-    def __init__(self, url):
+    """
+    Publish the events to RabbitMQ, reusing the connections (and the
+    declared exchanges) of a pool of the process.
+
+    Options:
+        pool_size: idle connections kept open by process (0 to open
+                   a connection for every event).
+        confirm_publish: wait for the broker to confirm the published
+                         events (every batch of `emit_events` at once).
+        confirm_timeout: seconds waiting for the confirmations.
+    """
+    def __init__(self, url, *, pool_size=2, confirm_publish=False, confirm_timeout=5):
         self.url = url
+        self.pool = get_publishers_pool(url, size=pool_size,
+                                        confirm_publish=confirm_publish,
+                                        confirm_timeout=confirm_timeout)
 
-    def emit_event(self, message:str, *, routing_key:str, channel:str="events"):
-        connection = _make_rabbitmq_connection(self.url)
+    def _publish(self, events, *, fail_silently=True):
+        # The events are not published again if publishing fails, some of
+        # them may have been delivered already.
         try:
-            connection.connect()
+            with self.pool.publisher() as publisher:
+                publisher.publish(events)
         except ConnectionRefusedError:
             err_msg = "EventsPushBackend: Unable to connect with RabbitMQ (connection refused) at {}".format(
                                                                                                      self.url)
             log.error(err_msg, exc_info=True)
+            if not fail_silently:
+                raise
         except AccessRefused:
             err_msg = "EventsPushBackend: Unable to connect with RabbitMQ (access refused) at {}".format(
                                                                                                  self.url)
             log.error(err_msg, exc_info=True)
-        else:
-            try:
-                message = AmqpMessage(message)
-                rchannel = connection.channel()
+            if not fail_silently:
+                raise
+        except Exception:
+            log.error("EventsPushBackend: Unhandled exception", exc_info=True)
+            if not fail_silently:
+                raise
 
-                rchannel.exchange_declare(exchange=channel, type="topic", auto_delete=True)
-                rchannel.basic_publish(message, routing_key=routing_key, exchange=channel)
-                rchannel.close()
-            except Exception:
-                log.error("EventsPushBackend: Unhandled exception", exc_info=True)
-            finally:
-                connection.close()
+    def emit_event(self, message:str, *, routing_key:str, channel:str="events"):
+        self._publish([(message, routing_key, channel)])
+
+    def emit_events(self, events, *, fail_silently=True):
+        self._publish([(event["message"], event["routing_key"], event.get("channel", "events"))
+                       for event in events], fail_silently=fail_silently)
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Buffer of the events emitted in a request (or in a `events_buffer` block).
+
+The events emitted in a transaction are sent once, at the end of the
+request, and coalesced: the changes of objects of the same type (same
+routing key, session, type of change and content type) are sent in one
+message with the list of their pks, and the repeated messages are sent only
+once.
+
+Only the committed events are sent. Every event registers a hook with
+`transaction.on_commit` that marks it as committed, and Django discards the
+hooks of a savepoint (or a transaction) that is rolled back, so the events
+whose hook never runs are dropped.
+"""
+
+import collections
+import threading
+
+from contextlib import contextmanager
+from functools import partial
+
+from django.db import transaction
+
+from taiga.base.utils import json
+
+from . import backends
+
+_local = threading.local()
+
+_CHANGES_KEYS = {"type", "matches", "pk"}
+
+
+class EventsBuffer:
+    def __init__(self):
+        self.events = []
+        self.committed = set()
+
+    def add(self, data:dict, routing_key:str, *, sessionid:str, channel:str):
+        index = len(self.events)
+        self.events.append((routing_key, channel, sessionid, data))
+        transaction.on_commit(partial(self.committed.add, index))
+
+    def get_messages(self):
+        """
+        Get the coalesced messages of the committed events, as arguments of
+        `emit_event` of the events backends.
+        """
+        messages = collections.OrderedDict()
+        for index, (routing_key, channel, sessionid, data) in enumerate(self.events):
+            if index not in self.committed:
+                continue
+
+            if isinstance(data, dict) and set(data) == _CHANGES_KEYS:
+                key = (routing_key, channel, sessionid, data["type"], data["matches"])
+                pks = data["pk"] if isinstance(data["pk"], (list, tuple)) else [data["pk"]]
+                message = messages.setdefault(key, {"data": dict(data, pk=collections.OrderedDict()),
+                                                    "many": False})
+                message["many"] = message["many"] or isinstance(data["pk"], (list, tuple))
+                message["data"]["pk"].update((pk, None) for pk in pks)
+            else:
+                key = (routing_key, channel, sessionid, json.dumps(data))
+                messages.setdefault(key, {"data": data, "many": None})
+
+        result = []
+        for (routing_key, channel, sessionid, *rest), message in messages.items():
+            data = message["data"]
+            if message["many"] is not None:
+                pks = list(data["pk"])
+                data = dict(data, pk=pks if message["many"] or len(pks) > 1 else pks[0])
+
+            result.append({"message": json.dumps({"session_id": sessionid, "data": data}),
+                           "routing_key": routing_key,
+                           "channel": channel})
+        return result
+
+    def flush(self):
+        messages = self.get_messages()
+        self.events = []
+        self.committed = set()
+        if messages:
+            backends.get_events_backend().emit_events(messages)
+
+
+def get_events_buffer():
+    """
+    Get the events buffer of the current request or `events_buffer` block
+    (None out of them).
+    """
+    return getattr(_local, "buffer", None)
+
+
+@contextmanager
+def events_buffer():
+    """
+    Buffer the events emitted in the transactions of the block, and send
+    the committed ones at its end. The nested blocks use the buffer of the
+    outer one.
+    """
+    buffer = get_events_buffer()
+    if buffer is not None:
+        yield buffer
+        return
+
+    buffer = _local.buffer = EventsBuffer()
+    try:
+        yield buffer
+    finally:
+        _local.buffer = None
+        buffer.flush()
@@ -26,6 +26,7 @@ from taiga.base.utils import json
 from taiga.base.utils.db import get_typename_for_model_instance
 from . import middleware as mw
 from . import backends
+from .buffer import get_events_buffer
 from taiga.front.templatetags.functions import resolve
 from taiga.projects.history.choices import HistoryType
 
@@ -36,11 +37,20 @@ def emit_event(data:dict, routing_key:str, *,
     if not sessionid:
         sessionid = mw.get_current_session_id()
 
+    backend = backends.get_events_backend()
+
+    # The transactional backends write the events in the current transaction,
+    # with the others in a transaction they are sent (coalesced) at the end of
+    # the request if it buffers them
+    on_commit = on_commit and not backend.transactional
+    buffer = get_events_buffer()
+    if on_commit and connection.in_atomic_block and buffer is not None:
+        buffer.add(data, routing_key, sessionid=sessionid, channel=channel)
+        return
+
     data = {"session_id": sessionid,
             "data": data}
 
-    backend = backends.get_events_backend()
-
     def backend_emit_event():
         backend.emit_event(message=json.dumps(data), routing_key=routing_key, channel=channel)
 
@@ -104,15 +114,11 @@ def emit_event_for_user_notification(user_id,
     )
 
 
-def emit_live_notification_for_model(obj, user, history, *, type:str="change", channel:str="events",
-                                     sessionid:str="not-existing"):
+def get_live_notification_payload(obj, history) -> dict:
     """
-    Sends a model live notification to users.
+    Get the payload of the live notification of a change of an object
+    (None if its type has no live notifications).
     """
-
-    if obj._importing:
-        return None
-
     content_type = get_typename_for_model_instance(obj)
     if content_type == "userstories.userstory":
         if history.type == HistoryType.create:
@@ -172,17 +178,47 @@ def emit_live_notification_for_model(obj, user, history, *, type:str="change", c
     else:
         return None
 
-    return emit_event(
-        {
-            "title": title,
-            "body": "Project: {}\n{}".format(obj.project.name, body),
-            "url": url,
-            "timeout": 10000,
-            "id": history.id
-        },
-        "live_notifications.{}".format(user.id),
-        sessionid=sessionid
-    )
+    return {
+        "title": title,
+        "body": "Project: {}\n{}".format(obj.project.name, body),
+        "url": url,
+        "timeout": 10000,
+        "id": history.id
+    }
+
+
+def emit_live_notification_for_model(obj, user, history, *, type:str="change", channel:str="events",
+                                     sessionid:str="not-existing"):
+    """
+    Sends a model live notification to users.
+    """
+    return emit_live_notification_for_users(obj, [user], history, sessionid=sessionid)
+
+
+def emit_live_notification_for_users(obj, users, history, *, sessionid:str="not-existing"):
+    """
+    Sends a model live notification to some users.
+
+    With EVENTS_MULTI_RECIPIENT_LIVE_NOTIFICATIONS one event is sent, with
+    the ids of the users in `recipients`, and taiga-events sends it to
+    every one of them. Otherwise an event is sent by user.
+    """
+    if obj._importing or not users:
+        return None
+
+    payload = get_live_notification_payload(obj, history)
+    if payload is None:
+        return None
+
+    if settings.EVENTS_MULTI_RECIPIENT_LIVE_NOTIFICATIONS:
+        return emit_event(
+            dict(payload, recipients=sorted(user.id for user in users)),
+            "live_notifications",
+            sessionid=sessionid
+        )
+
+    for user in users:
+        emit_event(payload, "live_notifications.{}".format(user.id), sessionid=sessionid)
 
 def emit_event_for_ids(ids, content_type:str, projectid:int, *,
                        type:str="change", channel:str="events", sessionid:str=None):
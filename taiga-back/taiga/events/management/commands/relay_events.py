@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Examples:
+# python manage.py relay_events
+# python manage.py relay_events --batch-size 1000 --interval 0.5
+# python manage.py relay_events --once
+
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from taiga.events.backends import get_events_backend
+from taiga.events.backends import outbox
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Send the events of the outbox events backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size',
+                            action='store',
+                            dest='batch_size',
+                            type=int,
+                            default=500,
+                            help='Events sent in every batch')
+        parser.add_argument('--interval',
+                            action='store',
+                            dest='interval',
+                            type=float,
+                            default=1.0,
+                            help='Seconds waiting for new events (or to retry) when the outbox is empty '
+                                 '(or the relay backend fails)')
+        parser.add_argument('--once',
+                            action='store_true',
+                            dest='once',
+                            default=False,
+                            help='Send the pending events and exit')
+
+    @override_settings(DEBUG=False)
+    def handle(self, *args, **options):
+        backend = get_events_backend()
+        if not isinstance(backend, outbox.EventsPushBackend):
+            raise CommandError("The events backend is not the outbox backend")
+
+        relay_backend = backend.get_relay_backend()
+        batch_size = options["batch_size"]
+
+        stats = outbox.get_outbox_stats()
+        self.stdout.write("{} pending events, the oldest one is {:.0f} s old".format(
+            stats["pending"], stats["oldest_age"]))
+
+        total = 0
+        start = time.perf_counter()
+        try:
+            while True:
+                try:
+                    sent = outbox.relay_outbox_events(relay_backend, batch_size=batch_size)
+                except Exception:
+                    # The events are kept in the outbox until the relay backend works again
+                    logger.exception("Error sending the events of the outbox")
+                    if options["once"]:
+                        raise
+                    time.sleep(options["interval"])
+                    continue
+
+                total += sent
+                if sent and options["verbosity"] > 1:
+                    elapsed = time.perf_counter() - start
+                    self.stdout.write("{} events sent ({:.0f} events/s)".format(total, total / elapsed))
+
+                if sent < batch_size:
+                    if options["once"]:
+                        break
+                    time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write("{} events sent in {:.1f} s".format(total, elapsed))
@@ -17,6 +17,8 @@
 
 import threading
 
+from .buffer import events_buffer
+
 _local = threading.local()
 _local.session_id = None
 
@@ -68,3 +70,17 @@ class SessionIDMiddleware(object):
         _local.session_id = None
 
         return response
+
+
+class EventsBufferMiddleware(object):
+    """
+    Middleware that buffers the events emitted in the transactions of the
+    request and sends the committed ones, coalesced, once it ends.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with events_buffer():
+            return self.get_response(request)
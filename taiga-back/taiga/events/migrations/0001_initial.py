@@ -0,0 +1,30 @@
+# Generated by Django 2.2.18 on 2026-10-17 11:30
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='created at')),
+                ('channel', models.CharField(max_length=255, verbose_name='channel')),
+                ('routing_key', models.CharField(max_length=255, verbose_name='routing key')),
+                ('message', models.TextField(verbose_name='message')),
+            ],
+            options={
+                'verbose_name': 'outbox event',
+                'verbose_name_plural': 'outbox events',
+                'ordering': ['id'],
+            },
+        ),
+    ]
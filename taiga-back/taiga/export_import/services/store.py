@@ -418,7 +418,7 @@ def store_user_story(project, data):
             _store_history(project, validator.object, history, statuses)
 
         if not history_entries:
-            take_snapshot(validator.object, user=validator.object.owner)
+            take_snapshot(validator.object, user=validator.object.owner, refetch=False)
 
         custom_attributes_values = data.get("custom_attributes_values", None)
         if custom_attributes_values:
@@ -525,7 +525,7 @@ def store_epic(project, data):
             _store_history(project, validator.object, history, statuses)
 
         if not history_entries:
-            take_snapshot(validator.object, user=validator.object.owner)
+            take_snapshot(validator.object, user=validator.object.owner, refetch=False)
 
         custom_attributes_values = data.get("custom_attributes_values", None)
         if custom_attributes_values:
@@ -586,7 +586,7 @@ def store_task(project, data):
             _store_history(project, validator.object, history, statuses)
 
         if not history_entries:
-            take_snapshot(validator.object, user=validator.object.owner)
+            take_snapshot(validator.object, user=validator.object.owner, refetch=False)
 
         custom_attributes_values = data.get("custom_attributes_values", None)
         if custom_attributes_values:
@@ -659,7 +659,7 @@ def store_issue(project, data):
             _store_history(project, validator.object, history, statuses)
 
         if not history_entries:
-            take_snapshot(validator.object, user=validator.object.owner)
+            take_snapshot(validator.object, user=validator.object.owner, refetch=False)
 
         custom_attributes_values = data.get("custom_attributes_values", None)
         if custom_attributes_values:
@@ -708,7 +708,7 @@ def store_wiki_page(project, wiki_page):
             _store_history(project, validator.object, history)
 
         if not history_entries:
-            take_snapshot(validator.object, user=validator.object.owner)
+            take_snapshot(validator.object, user=validator.object.owner, refetch=False)
 
         return validator
 
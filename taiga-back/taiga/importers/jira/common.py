@@ -469,7 +469,7 @@ class JiraImporterCommon:
         diff = make_diff_from_dicts(change_old, change_new)
         fdiff = FrozenDiff(key, diff, {})
 
-        values = make_diff_values(typename, fdiff)
+        values = make_diff_values(typename, fdiff, obj.project.id)
         values.update(history_data['update_values'])
 
         entry = HistoryEntry.objects.create(
@@ -172,9 +172,30 @@ class DiffMatchPatch(diff_match_patch.diff_match_patch):
         return "".join(html)
 
 
-def get_diff_of_htmls(html1, html2):
+def get_diff_of_htmls(html1, html2, max_size=None, timeout=None):
+    """
+    Return the html diff of two texts.
+
+    If the total size of the texts is over `max_size` the diff is not
+    computed and the old text is shown as deleted and the new one as
+    inserted. `timeout` is the time budget (in seconds) of diff-match-patch,
+    when it is exhausted a coarser (but valid) diff is returned.
+    """
+    html1 = html1 or ""
+    html2 = html2 or ""
     diffutil = DiffMatchPatch()
-    diffs = diffutil.diff_main(html1 or "", html2 or "")
+
+    if max_size is not None and len(html1) + len(html2) > max_size:
+        if html1 == html2:
+            diffs = [(diffutil.DIFF_EQUAL, html1)]
+        else:
+            diffs = [(diffutil.DIFF_DELETE, html1), (diffutil.DIFF_INSERT, html2)]
+        return diffutil.diff_pretty_html([(op, data) for op, data in diffs if data])
+
+    if timeout is not None:
+        diffutil.Diff_Timeout = timeout
+
+    diffs = diffutil.diff_main(html1, html2)
     diffutil.diff_cleanupSemantic(diffs)
     return diffutil.diff_pretty_html(diffs)
 
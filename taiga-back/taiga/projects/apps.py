@@ -117,6 +117,49 @@ def disconnect_task_status_signals():
                                  dispatch_uid="try_to_close_or_open_user_stories_when_edit_task_status")
 
 
+## Filters data cache Signals
+
+FILTERS_DATA_MODELS = (
+    "userstories.UserStory",
+    "tasks.Task",
+    "issues.Issue",
+    "epics.Epic",
+    "epics.RelatedUserStory",
+    "milestones.Milestone",
+    "projects.Membership",
+    "users.Role",
+    "projects.UserStoryStatus",
+    "projects.Swimlane",
+    "projects.TaskStatus",
+    "projects.EpicStatus",
+    "projects.IssueStatus",
+    "projects.IssueType",
+    "projects.Priority",
+    "projects.Severity",
+)
+
+
+def connect_filters_data_cache_signals():
+    from . import signals as handlers
+    for signal in (signals.post_save, signals.post_delete):
+        signal.connect(handlers.invalidate_project_filters_data,
+                       sender=apps.get_model("projects", "Project"),
+                       dispatch_uid="filters_data_cache_project")
+        for model_name in FILTERS_DATA_MODELS:
+            signal.connect(handlers.invalidate_filters_data,
+                           sender=apps.get_model(model_name),
+                           dispatch_uid="filters_data_cache_{}".format(model_name.lower()))
+
+    # The names and photos of the users are shown in the filters data
+    signals.post_save.connect(handlers.invalidate_user_filters_data,
+                              sender=apps.get_model("users", "User"),
+                              dispatch_uid="filters_data_cache_user")
+
+    signals.m2m_changed.connect(handlers.invalidate_assigned_users_filters_data,
+                                sender=apps.get_model("userstories", "UserStory").assigned_users.through,
+                                dispatch_uid="filters_data_cache_userstory_assigned_users")
+
+
 class ProjectsAppConfig(AppConfig):
     name = "taiga.projects"
     verbose_name = "Projects"
@@ -132,3 +175,4 @@ class ProjectsAppConfig(AppConfig):
         connect_us_status_signals()
         connect_swimlane_signals()
         connect_task_status_signals()
+        connect_filters_data_cache_signals()
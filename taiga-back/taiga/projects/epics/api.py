@@ -26,7 +26,9 @@ from taiga.base.api.mixins import BlockedByProjectMixin
 from taiga.base.api.viewsets import NestedViewSetMixin
 from taiga.base.utils import json
 
+from taiga.projects import filters_data_cache
 from taiga.projects.history.mixins import HistoryResourceMixin
+from taiga.projects.history.services import prepare_queryset_for_freeze
 from taiga.projects.mixins.by_ref import ByRefMixin
 from taiga.projects.models import Project, EpicStatus
 from taiga.projects.notifications.mixins import WatchedResourceMixin, WatchersViewSetMixin
@@ -170,7 +172,9 @@ class EpicViewSet(OCCResourceMixin, VotedResourceMixin, HistoryResourceMixin, Wa
             "owners": self.filter_queryset(queryset, filter_backends=owners_filter_backends),
             "tags": self.filter_queryset(queryset)
         }
-        return response.Ok(services.get_epics_filters_data(project, querysets))
+        data = filters_data_cache.get_filters_data("epics", project, request.user, request.QUERY_PARAMS,
+                                                   lambda: services.get_epics_filters_data(project, querysets))
+        return response.Ok(data)
 
     @list_route(methods=["GET"])
     def csv(self, request):
@@ -205,6 +209,7 @@ class EpicViewSet(OCCResourceMixin, VotedResourceMixin, HistoryResourceMixin, Wa
             callback=self.post_save, precall=self.pre_save)
 
         epics = self.get_queryset().filter(id__in=[i.id for i in epics])
+        epics = prepare_queryset_for_freeze(epics)
         for epic in epics:
             self.persist_history_snapshot(obj=epic)
 
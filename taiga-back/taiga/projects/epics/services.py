@@ -16,17 +16,12 @@
 
 import csv
 import io
-from collections import OrderedDict
-from operator import itemgetter
-from contextlib import closing
-
-from django.db import connection
-from django.utils.translation import ugettext as _
 
 from taiga.base.utils import db, text
 from taiga.projects.epics.apps import connect_epics_signals
 from taiga.projects.epics.apps import disconnect_epics_signals
 from taiga.projects.services import apply_order_updates
+from taiga.projects.services import filters_data
 from taiga.projects.userstories.apps import connect_userstories_signals
 from taiga.projects.userstories.apps import disconnect_userstories_signals
 from taiga.projects.userstories.services import get_userstories_from_bulk
@@ -231,211 +226,34 @@ def epics_to_csv(project, queryset):
 # Api filter data
 #####################################################
 
-def _get_epics_statuses(project, queryset):
-    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
-    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
-    where = queryset_where_tuple[0]
-    where_params = queryset_where_tuple[1]
-
-    extra_sql = """
-      SELECT "projects_epicstatus"."id",
-             "projects_epicstatus"."name",
-             "projects_epicstatus"."color",
-             "projects_epicstatus"."order",
-             (SELECT count(*)
-                FROM "epics_epic"
-                     INNER JOIN "projects_project" ON
-                                ("epics_epic"."project_id" = "projects_project"."id")
-               WHERE {where} AND "epics_epic"."status_id" = "projects_epicstatus"."id")
-        FROM "projects_epicstatus"
-       WHERE "projects_epicstatus"."project_id" = %s
-    ORDER BY "projects_epicstatus"."order";
-    """.format(where=where)
-
-    with closing(connection.cursor()) as cursor:
-        cursor.execute(extra_sql, where_params + [project.id])
-        rows = cursor.fetchall()
-
-    result = []
-    for id, name, color, order, count in rows:
-        result.append({
-            "id": id,
-            "name": _(name),
-            "color": color,
-            "order": order,
-            "count": count,
-        })
-    return sorted(result, key=itemgetter("order"))
-
-
-def _get_epics_assigned_to(project, queryset):
-    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
-    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
-    where = queryset_where_tuple[0]
-    where_params = queryset_where_tuple[1]
-
-    extra_sql = """
-        WITH counters AS (
-                SELECT assigned_to_id,  count(assigned_to_id) count
-                  FROM "epics_epic"
-            INNER JOIN "projects_project" ON ("epics_epic"."project_id" = "projects_project"."id")
-                 WHERE {where} AND "epics_epic"."assigned_to_id" IS NOT NULL
-              GROUP BY assigned_to_id
-        )
-
-                 SELECT "projects_membership"."user_id" user_id,
-                        "users_user"."full_name",
-                        "users_user"."username",
-                        COALESCE("counters".count, 0) count
-                   FROM projects_membership
-        LEFT OUTER JOIN counters ON ("projects_membership"."user_id" = "counters"."assigned_to_id")
-             INNER JOIN "users_user" ON ("projects_membership"."user_id" = "users_user"."id")
-                  WHERE "projects_membership"."project_id" = %s
-                    AND "projects_membership"."user_id" IS NOT NULL
-
-        -- unassigned epics
-        UNION
-
-                 SELECT NULL user_id, NULL, NULL, count(coalesce(assigned_to_id, -1)) count
-                   FROM "epics_epic"
-             INNER JOIN "projects_project" ON ("epics_epic"."project_id" = "projects_project"."id")
-                  WHERE {where} AND "epics_epic"."assigned_to_id" IS NULL
-               GROUP BY assigned_to_id
-    """.format(where=where)
-
-    with closing(connection.cursor()) as cursor:
-        cursor.execute(extra_sql, where_params + [project.id] + where_params)
-        rows = cursor.fetchall()
-
-    result = []
-    none_valued_added = False
-    for id, full_name, username, count in rows:
-        result.append({
-            "id": id,
-            "full_name": full_name or username or "",
-            "count": count,
-        })
-
-        if id is None:
-            none_valued_added = True
-
-    # If there was no epic with null assigned_to we manually add it
-    if not none_valued_added:
-        result.append({
-            "id": None,
-            "full_name": "",
-            "count": 0,
-        })
-
-    return sorted(result, key=itemgetter("full_name"))
-
-
-def _get_epics_owners(project, queryset):
-    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
-    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
-    where = queryset_where_tuple[0]
-    where_params = queryset_where_tuple[1]
-
-    extra_sql = """
-        WITH counters AS (
-                SELECT "epics_epic"."owner_id" owner_id,
-                       count(coalesce("epics_epic"."owner_id", -1)) count
-                  FROM "epics_epic"
-            INNER JOIN "projects_project" ON ("epics_epic"."project_id" = "projects_project"."id")
-                 WHERE {where}
-              GROUP BY "epics_epic"."owner_id"
-        )
-
-                 SELECT "projects_membership"."user_id" id,
-                        "users_user"."full_name",
-                        "users_user"."username",
-                        COALESCE("counters".count, 0) count
-                   FROM projects_membership
-        LEFT OUTER JOIN counters ON ("projects_membership"."user_id" = "counters"."owner_id")
-             INNER JOIN "users_user" ON ("projects_membership"."user_id" = "users_user"."id")
-                  WHERE "projects_membership"."project_id" = %s
-                    AND "projects_membership"."user_id" IS NOT NULL
-
-        -- System users
-        UNION
-
-                 SELECT "users_user"."id" user_id,
-                        "users_user"."full_name" full_name,
-                        "users_user"."username" username,
-                        COALESCE("counters".count, 0) count
-                   FROM users_user
-        LEFT OUTER JOIN counters ON ("users_user"."id" = "counters"."owner_id")
-                  WHERE ("users_user"."is_system" IS TRUE)
-    """.format(where=where)
-
-    with closing(connection.cursor()) as cursor:
-        cursor.execute(extra_sql, where_params + [project.id])
-        rows = cursor.fetchall()
-
-    result = []
-    for id, full_name, username, count in rows:
-        if count > 0:
-            result.append({
-                "id": id,
-                "full_name": full_name or username or "",
-                "count": count,
-            })
-    return sorted(result, key=itemgetter("full_name"))
-
-
-def _get_epics_tags(project, queryset):
-    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
-    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
-    where = queryset_where_tuple[0]
-    where_params = queryset_where_tuple[1]
-
-    extra_sql = """
-        WITH epics_tags AS (
-                    SELECT tag,
-                           COUNT(tag) counter FROM (
-                                SELECT UNNEST(epics_epic.tags) tag
-                                  FROM epics_epic
-                            INNER JOIN projects_project
-                                        ON (epics_epic.project_id = projects_project.id)
-                                 WHERE {where}) tags
-                  GROUP BY tag),
-             project_tags AS (
-                    SELECT reduce_dim(tags_colors) tag_color
-                      FROM projects_project
-                     WHERE id=%s)
-
-      SELECT tag_color[1] tag,
-             tag_color[2] color,
-             COALESCE(epics_tags.counter, 0) counter
-        FROM project_tags
-   LEFT JOIN epics_tags ON project_tags.tag_color[1] = epics_tags.tag
-    ORDER BY tag
-    """.format(where=where)
-
-    with closing(connection.cursor()) as cursor:
-        cursor.execute(extra_sql, where_params + [project.id])
-        rows = cursor.fetchall()
-
-    result = []
-    for name, color, count in rows:
-        result.append({
-            "name": name,
-            "color": color,
-            "count": count,
-        })
-    return sorted(result, key=itemgetter("name"))
-
-
 def get_epics_filters_data(project, querysets):
     """
     Given a project and an epics queryset, return a simple data structure
     of all possible filters for the epics in the queryset.
     """
-    data = OrderedDict([
-        ("statuses", _get_epics_statuses(project, querysets["statuses"])),
-        ("assigned_to", _get_epics_assigned_to(project, querysets["assigned_to"])),
-        ("owners", _get_epics_owners(project, querysets["owners"])),
-        ("tags", _get_epics_tags(project, querysets["tags"])),
+    rows = filters_data.fetch_filters_data(
+        project,
+        querysets,
+        table="epics_epic",
+        joins="""INNER JOIN "projects_project"
+                            ON ("epics_epic"."project_id" = "projects_project"."id")""",
+        columns=[
+            '"epics_epic"."id" "id"',
+            '"epics_epic"."status_id" "status_id"',
+            '"epics_epic"."assigned_to_id" "assigned_to_id"',
+            '"epics_epic"."owner_id" "owner_id"',
+            '"epics_epic"."tags" "tags"',
+        ],
+        facets=[
+            filters_data.catalog_facet(project, "statuses", table="projects_epicstatus", column="status_id"),
+            filters_data.assigned_to_facet(project),
+            filters_data.owners_facet(project),
+            filters_data.tags_facet(project),
+        ])
+
+    return filters_data.make_filters_data(rows, [
+        ("statuses", filters_data.make_catalog_data),
+        ("assigned_to", filters_data.make_assigned_to_data),
+        ("owners", filters_data.make_owners_data),
+        ("tags", filters_data.make_tags_data),
     ])
-
-    return data
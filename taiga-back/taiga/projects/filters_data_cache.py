@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Cache of the `filters_data` of the lists (user stories, issues, tasks and
+epics).
+
+The filters data are stored in the django cache by project, filter params,
+language and permissions of the user in the project (users with the same
+permissions see the same items), under a per project generation. The
+generation is renewed when the items of the project, their relations or
+the project catalogs change (see ProjectsAppConfig) and by the bulk
+services that update them without saving every instance. The renewals
+would not reach the other processes with a local memory cache, so the
+filters data are only cached when the default cache is shared by all
+the processes (memcached, redis...).
+
+The generation is renewed right away and again when the transaction
+commits, so a request that read the old data while the transaction was
+in progress can not keep them under the new generation.
+
+Hits and misses are counted in the django cache by list and can be read
+with `get_filters_data_cache_stats`.
+"""
+
+import hashlib
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import translation
+
+from taiga.base.utils import cache as cache_utils
+from taiga.base.utils import json
+from taiga.permissions.services import get_user_project_permissions
+
+
+SECTIONS = ("userstories", "issues", "tasks", "epics")
+
+# Params that do not change the filters data
+IGNORED_PARAMS = ("project", "page", "page_size")
+
+# Fields of the users shown in the assigned users and owners facets
+USER_FIELDS = ("username", "full_name", "email", "photo", "is_active")
+
+
+def _is_enabled():
+    return getattr(settings, "FILTERS_DATA_CACHE_ENABLE", True) and cache_utils.is_shared_cache()
+
+
+def _get_stats_key(section: str, name: str) -> str:
+    return "filters-data/stats/{}-{}".format(section, name)
+
+
+def _incr_counter(section: str, name: str):
+    key = _get_stats_key(section, name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def get_filters_data_cache_stats() -> dict:
+    keys = {_get_stats_key(section, name): (section, name)
+            for section in SECTIONS for name in ("hits", "misses")}
+    values = cache.get_many(keys.keys())
+
+    stats = {section: {"hits": 0, "misses": 0} for section in SECTIONS}
+    for key, (section, name) in keys.items():
+        stats[section][name] = values.get(key, 0)
+    return stats
+
+
+def reset_filters_data_cache_stats():
+    cache.delete_many([_get_stats_key(section, name)
+                       for section in SECTIONS for name in ("hits", "misses")])
+
+
+####################
+# Generations
+####################
+
+def _get_generation_key(project_id: int) -> str:
+    return "filters-data/generation/{}".format(project_id)
+
+
+def _get_generation(project_id: int) -> str:
+    key = _get_generation_key(project_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def _renew_generations(projects_ids):
+    cache.set_many({_get_generation_key(project_id): uuid.uuid4().hex
+                    for project_id in projects_ids}, timeout=None)
+
+
+def invalidate_filters_data(*projects_ids):
+    """
+    Renew the generation of the filters data of some projects.
+    """
+    projects_ids = {project_id for project_id in projects_ids if project_id is not None}
+    if not projects_ids or not _is_enabled():
+        return
+
+    _renew_generations(projects_ids)
+    transaction.on_commit(lambda: _renew_generations(projects_ids))
+
+
+def invalidate_user_filters_data(user_id: int, update_fields=None):
+    """
+    Renew the generation of the filters data of the projects of a user,
+    if the fields of the user shown in the filters data may have changed.
+    """
+    if not _is_enabled():
+        return
+
+    if update_fields is not None and not set(update_fields) & set(USER_FIELDS):
+        return
+
+    membership_model = apps.get_model("projects", "Membership")
+    invalidate_filters_data(*membership_model.objects.filter(user_id=user_id)
+                                                     .values_list("project_id", flat=True))
+
+
+####################
+# Filters data
+####################
+
+def _normalize_params(params) -> list:
+    """
+    Get the filter params sorted, and their comma separated values sorted
+    and without duplicates.
+    """
+    normalized = []
+    for name, values in sorted(params.lists()):
+        if name in IGNORED_PARAMS:
+            continue
+
+        values = sorted({value.strip() for raw_value in values for value in raw_value.split(",")})
+        normalized.append([name, values])
+    return normalized
+
+
+def _get_permissions_key(user, project) -> str:
+    permissions = sorted(get_user_project_permissions(user, project))
+    return hashlib.sha1(",".join(permissions).encode("utf-8")).hexdigest()
+
+
+def get_filters_data_key(section: str, project, user, params) -> str:
+    params_key = hashlib.sha1(json.dumps(_normalize_params(params)).encode("utf-8")).hexdigest()
+    # The names of the statuses and the roles are translated
+    return "filters-data/{}/{}/{}/{}/{}/{}".format(section, project.id, _get_generation(project.id),
+                                                   translation.get_language(),
+                                                   _get_permissions_key(user, project), params_key)
+
+
+def get_filters_data(section: str, project, user, params, load):
+    """
+    Get the filters data of a list from the cache, or from `load()` if
+    they are not cached yet.
+    """
+    if not _is_enabled():
+        return load()
+
+    key = get_filters_data_key(section, project, user, params)
+    data = cache.get(key)
+    if data is not None:
+        _incr_counter(section, "hits")
+        return data
+
+    data = load()
+    cache.set(key, data, timeout=getattr(settings, "FILTERS_DATA_CACHE_TIMEOUT", 600))
+    _incr_counter(section, "misses")
+    return data
@@ -32,6 +32,7 @@ from . import services
 
 class HistoryViewSet(ReadOnlyListViewSet):
     serializer_class = serializers.HistoryEntrySerializer
+    cursor_ordering = ("-created_at", "-id")
 
     content_type = None
 
@@ -187,6 +188,13 @@ class HistoryViewSet(ReadOnlyListViewSet):
             qs = qs.exclude(comment__exact='')
 
         qs = qs.order_by("-created_at")
+
+        if self.is_cursor_paginated():
+            page = self.paginate_queryset(qs)
+            services.prefetch_owners_in_history_entries(page.object_list)
+            serializer = self.get_pagination_serializer(page)
+            return response.Ok(serializer.data)
+
         qs = services.prefetch_owners_in_history_queryset(qs)
 
         if self.request.GET.get(self.page_kwarg):
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from django import dispatch
+from django.apps import AppConfig
+from django.apps import apps
+from django.db.models import signals
+
+# Sent by take_snapshots_in_bulk with all the created history entries,
+# bulk_create does not send the post_save signal of every instance.
+history_entries_bulk_created = dispatch.Signal(providing_args=["entries"])
+
+
+class HistoryAppConfig(AppConfig):
+    name = "taiga.projects.history"
+    verbose_name = "History"
+
+    def ready(self):
+        from . import signals as handlers
+        from .models import HistoryEntry
+        from .values_cache import CATALOG_TYPENAMES
+
+        signals.post_save.connect(handlers.on_new_history_entry, sender=HistoryEntry,
+                                  dispatch_uid="history_values_diff_cache")
+        history_entries_bulk_created.connect(handlers.on_new_history_entries, sender=HistoryEntry,
+                                             dispatch_uid="history_values_diff_cache")
+
+        for typename in CATALOG_TYPENAMES:
+            model = apps.get_model(typename)
+            signals.post_save.connect(handlers.on_catalog_change, sender=model,
+                                      dispatch_uid="history_values_cache_{}".format(typename))
+            signals.post_delete.connect(handlers.on_catalog_change, sender=model,
+                                        dispatch_uid="history_values_cache_{}".format(typename))
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+History compaction and retention.
+
+Old history entries that nobody reads (hidden, without comment) are
+consolidated to keep the history table under control:
+
+  - runs of consecutive hidden partial diffs of a key are merged into
+    one entry with the accumulated diff,
+  - the full snapshots of those entries are dropped, only the last
+    snapshot of every key is needed to rebuild its state,
+  - optionally, the hidden entries of blocked projects are moved to a
+    cold table (ColdHistoryEntry) and restored by the periodic task once
+    the projects are unblocked.
+
+The entries shown by the history API (visible changes and comments), the
+creation/deletion entries, the snapshots needed to rebuild the state of
+an object and the entries of pending notifications are never touched, the
+blocked projects can still be read.
+"""
+
+from collections import namedtuple
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection
+from django.db import transaction as tx
+from django.utils import timezone
+
+from .choices import HistoryType
+from .services import _lock_history_keys
+
+
+CompactionStats = namedtuple("CompactionStats", "keys merged_entries dropped_snapshots bytes_reclaimed")
+
+CURSOR_ID = 1
+
+
+def _get_entries_size(keys: list) -> int:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT COALESCE(SUM(pg_column_size(h.*)), 0) "
+                       "FROM history_historyentry h WHERE h.key = ANY(%s)", [keys])
+        return cursor.fetchone()[0]
+
+
+def _get_pending_notifications_entries_ids(entries_ids: list) -> set:
+    notification_model = apps.get_model("notifications", "HistoryChangeNotification")
+    through = notification_model.history_entries.through
+    return set(through.objects.filter(historyentry_id__in=entries_ids)
+                              .values_list("historyentry_id", flat=True))
+
+
+def _get_last_snapshots_ids(keys: list) -> set:
+    entry_model = apps.get_model("history", "HistoryEntry")
+    return set(entry_model.objects.filter(key__in=keys, is_snapshot=True)
+                                  .order_by("key", "-created_at")
+                                  .distinct("key")
+                                  .values_list("id", flat=True))
+
+
+def _is_compactable(entry, protected_ids: set) -> bool:
+    return (entry.type == HistoryType.change and
+            entry.is_hidden and
+            not entry.comment and
+            entry.delete_comment_date is None and
+            entry.id not in protected_ids)
+
+
+def merge_history_entries(entries: list) -> tuple:
+    """
+    Merge a run of consecutive partial entries of a key.
+
+    Returns the merged diff and values. Replaying the merged diff
+    has the same result as replaying all the entries.
+    """
+    diff = {}
+    values = {}
+    for entry in entries:
+        for field, (old_value, new_value) in (entry.diff or {}).items():
+            if field in diff:
+                diff[field] = [diff[field][0], new_value]
+            else:
+                diff[field] = [old_value, new_value]
+
+        for field, field_values in (entry.values or {}).items():
+            values.setdefault(field, {}).update(field_values)
+
+    diff = {field: value for field, value in diff.items() if value[0] != value[1]}
+    return diff, values
+
+
+def compact_history_keys(keys: list, *, older_than: timedelta) -> CompactionStats:
+    """
+    Compact the old entries of the given history keys. It must
+    be called inside a transaction, the keys are locked against
+    concurrent snapshots.
+    """
+    entry_model = apps.get_model("history", "HistoryEntry")
+
+    _lock_history_keys(keys)
+    size_before = _get_entries_size(keys)
+
+    entries = list(entry_model.objects.filter(key__in=keys,
+                                              created_at__lt=timezone.now() - older_than)
+                                      .order_by("key", "created_at"))
+    protected_ids = _get_last_snapshots_ids(keys)
+    protected_ids |= _get_pending_notifications_entries_ids([e.id for e in entries])
+
+    to_update = {}
+    to_delete = []
+    dropped_snapshots = 0
+
+    def flush(run):
+        if len(run) < 2:
+            return
+
+        diff, values = merge_history_entries(run)
+        if not diff:
+            to_delete.extend(e.id for e in run)
+            return
+
+        # The last entry of the run keeps the merged diff
+        merged = run[-1]
+        merged.diff = diff
+        merged.values = values
+        merged.values_diff_cache = None
+        to_update[merged.id] = merged
+        to_delete.extend(e.id for e in run[:-1])
+
+    run = []
+    for entry in entries:
+        if run and run[-1].key != entry.key:
+            flush(run)
+            run = []
+
+        if not _is_compactable(entry, protected_ids):
+            flush(run)
+            run = []
+            continue
+
+        if entry.is_snapshot:
+            entry.is_snapshot = False
+            entry.snapshot = None
+            to_update[entry.id] = entry
+            dropped_snapshots += 1
+
+        run.append(entry)
+    flush(run)
+
+    to_delete = set(to_delete)
+    to_update = [entry for entry in to_update.values() if entry.id not in to_delete]
+    if to_update:
+        entry_model.objects.bulk_update(to_update, ["diff", "values", "values_diff_cache",
+                                                    "is_snapshot", "snapshot"])
+    if to_delete:
+        entry_model.objects.filter(id__in=to_delete).delete()
+
+    return CompactionStats(keys=len(keys),
+                           merged_entries=len(to_delete),
+                           dropped_snapshots=dropped_snapshots,
+                           bytes_reclaimed=size_before - _get_entries_size(keys))
+
+
+def iter_compactable_keys(*, older_than: timedelta, batch_size: int, start_key: str="",
+                          project_id: int=None):
+    """
+    Yield, ordered by key and in batches, the keys with old hidden
+    entries. The keys are selected again after every batch, so it can
+    be resumed from the last key of the last batch.
+    """
+    entry_model = apps.get_model("history", "HistoryEntry")
+    qs = entry_model.objects.filter(type=HistoryType.change, is_hidden=True, comment="",
+                                    created_at__lt=timezone.now() - older_than)
+    if project_id is not None:
+        qs = qs.filter(project_id=project_id)
+
+    last_key = start_key
+    while True:
+        keys = list(qs.filter(key__gt=last_key)
+                      .order_by("key")
+                      .values_list("key", flat=True)
+                      .distinct()[:batch_size])
+        if not keys:
+            break
+
+        yield keys
+        last_key = keys[-1]
+
+
+def compact_history(*, older_than: timedelta, batch_size: int, start_key: str="",
+                    project_id: int=None, max_batches: int=None):
+    """
+    Compact the history by batches of keys, every batch in its own
+    transaction. Yield the last key and the stats of every batch.
+    """
+    batches = iter_compactable_keys(older_than=older_than, batch_size=batch_size,
+                                    start_key=start_key, project_id=project_id)
+    for num, keys in enumerate(batches):
+        if max_batches is not None and num >= max_batches:
+            break
+
+        with tx.atomic():
+            stats = compact_history_keys(keys, older_than=older_than)
+
+        yield keys[-1], stats
+
+
+def _set_cursor_last_key(last_key: str):
+    cursor_model = apps.get_model("history", "HistoryCompactionCursor")
+    cursor_model.objects.update_or_create(id=CURSOR_ID, defaults={"last_key": last_key,
+                                                                  "updated_at": timezone.now()})
+
+
+def compact_history_from_last_key():
+    """
+    Compact some batches of the history starting from the key where the
+    last call stopped, it is called periodically by the celery task.
+    """
+    cursor_model = apps.get_model("history", "HistoryCompactionCursor")
+    last_key = (cursor_model.objects.filter(id=CURSOR_ID)
+                                    .values_list("last_key", flat=True)
+                                    .first()) or ""
+    older_than = timedelta(days=settings.HISTORY_COMPACTION_MIN_AGE)
+
+    finished = True
+    for last_key, stats in compact_history(older_than=older_than,
+                                           batch_size=settings.HISTORY_COMPACTION_BATCH_SIZE,
+                                           start_key=last_key,
+                                           max_batches=settings.HISTORY_COMPACTION_MAX_BATCHES):
+        finished = False
+        _set_cursor_last_key(last_key)
+
+    if finished:
+        # Start again from the first key in the next call
+        _set_cursor_last_key("")
+
+    restore_unblocked_projects_history_from_cold_storage()
+    if settings.HISTORY_COMPACTION_COLD_STORAGE:
+        move_blocked_projects_history_to_cold_storage()
+
+
+# Only the entries that the history API and the exports never read
+COLD_ENTRIES_WHERE = "type = {change} AND is_hidden AND comment = '' AND NOT is_snapshot".format(
+    change=HistoryType.change)
+
+
+def _move_entries(from_table: str, to_table: str, project_id: int, where: str="TRUE") -> int:
+    cold_entry_model = apps.get_model("history", "ColdHistoryEntry")
+    columns = ", ".join('"{}"'.format(f.column) for f in cold_entry_model._meta.concrete_fields)
+
+    sql = ("WITH moved AS (DELETE FROM {from_table} WHERE project_id = %s AND {where} RETURNING {columns}) "
+           "INSERT INTO {to_table} ({columns}) SELECT {columns} FROM moved")
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(from_table=from_table, to_table=to_table,
+                                  columns=columns, where=where), [project_id])
+        return cursor.rowcount
+
+
+@tx.atomic
+def move_project_history_to_cold_storage(project_id: int) -> int:
+    """
+    Move the hidden history entries of a project to the cold storage,
+    except the snapshots and the entries of pending notifications.
+    """
+    notification_model = apps.get_model("notifications", "HistoryChangeNotification")
+    through_table = notification_model.history_entries.through._meta.db_table
+    where = "{} AND id NOT IN (SELECT historyentry_id FROM {})".format(COLD_ENTRIES_WHERE, through_table)
+    return _move_entries("history_historyentry", "history_coldhistoryentry", project_id, where=where)
+
+
+@tx.atomic
+def restore_project_history_from_cold_storage(project_id: int) -> int:
+    return _move_entries("history_coldhistoryentry", "history_historyentry", project_id)
+
+
+def move_blocked_projects_history_to_cold_storage() -> int:
+    project_model = apps.get_model("projects", "Project")
+    entry_model = apps.get_model("history", "HistoryEntry")
+
+    projects_ids = (project_model.objects.filter(blocked_code__isnull=False)
+                                         .values_list("id", flat=True))
+    projects_ids = (entry_model.objects.filter(project_id__in=projects_ids)
+                                       .extra(where=[COLD_ENTRIES_WHERE])
+                                       .order_by("project_id")
+                                       .values_list("project_id", flat=True)
+                                       .distinct())
+
+    return sum(move_project_history_to_cold_storage(project_id) for project_id in projects_ids)
+
+
+def restore_unblocked_projects_history_from_cold_storage() -> int:
+    """
+    Restore the history of the projects that have been unblocked
+    since their history was moved to the cold storage.
+    """
+    cold_entry_model = apps.get_model("history", "ColdHistoryEntry")
+
+    projects_ids = list(cold_entry_model.objects.filter(project__blocked_code__isnull=True)
+                                                .order_by("project_id")
+                                                .values_list("project_id", flat=True)
+                                                .distinct())
+
+    return sum(restore_project_history_from_cold_storage(project_id) for project_id in projects_ids)
@@ -18,8 +18,6 @@ from contextlib import suppress
 
 from functools import partial
 from django.apps import apps
-from django.contrib.auth import get_user_model
-from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ObjectDoesNotExist
 
 from taiga.base.utils.iterators import as_tuple
@@ -28,6 +26,8 @@ from taiga.mdrender.service import render as mdrender
 
 from taiga.projects.attachments.services import get_timeline_image_thumbnail_name
 
+from . import values_cache
+
 import os
 
 ####################
@@ -36,25 +36,33 @@ import os
 
 
 @as_dict
-def _get_generic_values(ids: tuple, *, typename=None, attr: str="name") -> tuple:
-    app_label, model_name = typename.split(".", 1)
-    content_type = ContentType.objects.get(app_label=app_label, model=model_name)
-    model_cls = content_type.model_class()
-
-    ids = filter(lambda x: x is not None, ids)
+def _get_generic_values(ids: tuple, *, typename=None, attr: str="name", project_id=None) -> tuple:
+    ids = [x for x in ids if x is not None]
+
+    # Project catalogs are served from the values cache, only the
+    # elements not found there (from other projects) are queried.
+    if project_id is not None and typename in values_cache.CATALOG_TYPENAMES:
+        catalog = values_cache.get_project_catalog(typename, project_id, attr)
+        missing_ids = []
+        for id in ids:
+            if str(id) in catalog:
+                yield str(id), catalog[str(id)]
+            else:
+                missing_ids.append(id)
+        ids = missing_ids
+
+    if not ids:
+        return
+
+    model_cls = apps.get_model(typename)
     qs = model_cls.objects.filter(pk__in=ids)
     for instance in qs:
         yield str(instance.pk), getattr(instance, attr)
 
 
-@as_dict
 def _get_users_values(ids: set) -> dict:
-    user_model = get_user_model()
-    ids = filter(lambda x: x is not None, ids)
-    qs = user_model.objects.filter(pk__in=tuple(ids))
-
-    for user in qs:
-        yield str(user.pk), user.get_full_name()
+    ids = set(filter(lambda x: x is not None, ids))
+    return values_cache.get_users_names(ids)
 
 
 @as_dict
@@ -102,39 +110,39 @@ def _common_users_values(diff):
     return values
 
 
-def project_values(diff):
+def project_values(diff, project_id=None):
     values = _common_users_values(diff)
     return values
 
 
-def milestone_values(diff):
+def milestone_values(diff, project_id=None):
     values = _common_users_values(diff)
     return values
 
 
-def epic_values(diff):
+def epic_values(diff, project_id=None):
     values = _common_users_values(diff)
 
     if "status" in diff:
-        values["status"] = _get_epic_status_values(diff["status"])
+        values["status"] = _get_epic_status_values(diff["status"], project_id=project_id)
 
     return values
 
 
-def epic_related_userstory_values(diff):
+def epic_related_userstory_values(diff, project_id=None):
     values = _common_users_values(diff)
     return values
 
 
-def userstory_values(diff):
+def userstory_values(diff, project_id=None):
     values = _common_users_values(diff)
 
     if "status" in diff:
-        values["status"] = _get_us_status_values(diff["status"])
+        values["status"] = _get_us_status_values(diff["status"], project_id=project_id)
     if "swimlane" in diff:
-        values["swimlane"] = _get_swimlane_values(diff["swimlane"])
+        values["swimlane"] = _get_swimlane_values(diff["swimlane"], project_id=project_id)
     if "milestone" in diff:
-        values["milestone"] = _get_milestone_values(diff["milestone"])
+        values["milestone"] = _get_milestone_values(diff["milestone"], project_id=project_id)
     if "points" in diff:
         points, roles = set(), set()
 
@@ -146,43 +154,43 @@ def userstory_values(diff):
                 points.add(point_id)
                 roles.add(role_id)
 
-        values["roles"] = _get_role_values(roles)
-        values["points"] = _get_points_values(points)
+        values["roles"] = _get_role_values(roles, project_id=project_id)
+        values["points"] = _get_points_values(points, project_id=project_id)
 
     return values
 
 
-def issue_values(diff):
+def issue_values(diff, project_id=None):
     values = _common_users_values(diff)
 
     if "status" in diff:
-        values["status"] = _get_issue_status_values(diff["status"])
+        values["status"] = _get_issue_status_values(diff["status"], project_id=project_id)
     if "milestone" in diff:
-        values["milestone"] = _get_milestone_values(diff["milestone"])
+        values["milestone"] = _get_milestone_values(diff["milestone"], project_id=project_id)
     if "priority" in diff:
-        values["priority"] = _get_priority_values(diff["priority"])
+        values["priority"] = _get_priority_values(diff["priority"], project_id=project_id)
     if "severity" in diff:
-        values["severity"] = _get_severity_values(diff["severity"])
+        values["severity"] = _get_severity_values(diff["severity"], project_id=project_id)
     if "type" in diff:
-        values["type"] = _get_issue_type_values(diff["type"])
+        values["type"] = _get_issue_type_values(diff["type"], project_id=project_id)
 
     return values
 
 
-def task_values(diff):
+def task_values(diff, project_id=None):
     values = _common_users_values(diff)
 
     if "status" in diff:
-        values["status"] = _get_task_status_values(diff["status"])
+        values["status"] = _get_task_status_values(diff["status"], project_id=project_id)
     if "milestone" in diff:
-        values["milestone"] = _get_milestone_values(diff["milestone"])
+        values["milestone"] = _get_milestone_values(diff["milestone"], project_id=project_id)
     if "user_story" in diff:
         values["user_story"] = _get_user_story_values(diff["user_story"])
 
     return values
 
 
-def wikipage_values(diff):
+def wikipage_values(diff, project_id=None):
     values = _common_users_values(diff)
     return values
 
@@ -304,7 +312,7 @@ def epic_freezer(epic) -> dict:
         "ref": epic.ref,
         "color": epic.color,
         "owner": epic.owner_id,
-        "status": epic.status.id if epic.status else None,
+        "status": epic.status_id,
         "epics_order": epic.epics_order,
         "subject": epic.subject,
         "description": epic.description,
@@ -325,8 +333,8 @@ def epic_freezer(epic) -> dict:
 
 def epic_related_userstory_freezer(related_us) -> dict:
     snapshot = {
-        "user_story": related_us.user_story.id,
-        "epic": related_us.epic.id,
+        "user_story": related_us.user_story_id,
+        "epic": related_us.epic_id,
         "order": related_us.order
     }
 
@@ -334,11 +342,8 @@ def epic_related_userstory_freezer(related_us) -> dict:
 
 
 def userstory_freezer(us) -> dict:
-    rp_cls = apps.get_model("userstories", "RolePoints")
-    rpqsd = rp_cls.objects.filter(user_story=us)
-
     points = {}
-    for rp in rpqsd:
+    for rp in us.role_points.all():
         points[str(rp.role_id)] = rp.points_id
 
     assigned_users = [u.id for u in us.assigned_users.all()]
@@ -350,8 +355,8 @@ def userstory_freezer(us) -> dict:
     snapshot = {
         "ref": us.ref,
         "owner": us.owner_id,
-        "status": us.status.id if us.status else None,
-        "swimlane": us.swimlane.id if us.swimlane else None,
+        "status": us.status_id,
+        "swimlane": us.swimlane_id,
         "is_closed": us.is_closed,
         "finish_date": str(us.finish_date),
         "backlog_order": us.backlog_order,
@@ -382,12 +387,12 @@ def userstory_freezer(us) -> dict:
 
 
 def issue_freezer(issue) -> dict:
-    promoted_to = list(issue.generated_user_stories.values_list("id", flat=True))
+    promoted_to = [us.id for us in issue.generated_user_stories.all()]
 
     snapshot = {
         "ref": issue.ref,
         "owner": issue.owner_id,
-        "status": issue.status.id if issue.status else None,
+        "status": issue.status_id,
         "priority": issue.priority_id,
         "severity": issue.severity_id,
         "type": issue.type_id,
@@ -410,12 +415,12 @@ def issue_freezer(issue) -> dict:
 
 
 def task_freezer(task) -> dict:
-    promoted_to = list(task.generated_user_stories.values_list("id", flat=True))
+    promoted_to = [us.id for us in task.generated_user_stories.all()]
 
     snapshot = {
         "ref": task.ref,
         "owner": task.owner_id,
-        "status": task.status.id if task.status else None,
+        "status": task.status_id,
         "milestone": task.milestone_id,
         "subject": task.subject,
         "description": task.description,
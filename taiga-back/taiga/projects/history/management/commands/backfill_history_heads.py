@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Examples:
+# python manage.py backfill_history_heads
+# python manage.py backfill_history_heads --project 42 --force
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from django_pglocks import advisory_lock
+
+from taiga.projects.history.models import HistoryEntry
+from taiga.projects.history.models import HistoryHead
+from taiga.projects.history.services import materialize_head_for_key
+
+
+class Command(BaseCommand):
+    help = 'Materialize the current frozen state (head) of the history keys'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project',
+                            action='store',
+                            dest='project',
+                            default=None,
+                            help='Selected project id for heads generation')
+        parser.add_argument('--batch-size',
+                            action='store',
+                            dest='batch_size',
+                            type=int,
+                            default=500,
+                            help='Number of keys processed per batch')
+        parser.add_argument('--force',
+                            action='store_true',
+                            dest='force',
+                            default=False,
+                            help='Rebuild the heads that already exist')
+
+    @override_settings(DEBUG=False)
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        qs = HistoryEntry.objects.exclude(key__isnull=True).exclude(key="")
+        if options["project"] is not None:
+            qs = qs.filter(project_id=options["project"])
+
+        total = 0
+        last_key = ""
+        while True:
+            keys = list(qs.filter(key__gt=last_key)
+                          .order_by("key")
+                          .values_list("key", "project_id")
+                          .distinct()[:batch_size])
+            if not keys:
+                break
+
+            last_key = keys[-1][0]
+
+            if not options["force"]:
+                existing = set(HistoryHead.objects.filter(key__in=[k for k, _ in keys])
+                                                  .values_list("key", flat=True))
+                keys = [(k, p) for k, p in keys if k not in existing]
+
+            for key, project_id in keys:
+                with transaction.atomic(), advisory_lock("history-" + key):
+                    materialize_head_for_key(key, project_id)
+
+            total += len(keys)
+            self.stdout.write("-> {} heads materialized (last key: {})".format(total, last_key))
+
+        self.stdout.write(self.style.SUCCESS("Materialized {} history heads".format(total)))
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Examples:
+# python manage.py compact_history
+# python manage.py compact_history --older-than 30 --start-key "issues.issue:1234"
+# python manage.py compact_history --cold-storage
+# python manage.py compact_history --restore-project 42
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+from django.test.utils import override_settings
+
+from taiga.projects.history import compaction
+
+
+class Command(BaseCommand):
+    help = 'Compact the old hidden history entries and drop their redundant snapshots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than',
+                            action='store',
+                            dest='older_than',
+                            type=int,
+                            default=settings.HISTORY_COMPACTION_MIN_AGE,
+                            help='Compact only the entries older than this number of days')
+        parser.add_argument('--batch-size',
+                            action='store',
+                            dest='batch_size',
+                            type=int,
+                            default=settings.HISTORY_COMPACTION_BATCH_SIZE,
+                            help='Number of keys compacted per transaction')
+        parser.add_argument('--start-key',
+                            action='store',
+                            dest='start_key',
+                            default="",
+                            help='Resume the compaction after this key')
+        parser.add_argument('--project',
+                            action='store',
+                            dest='project',
+                            default=None,
+                            help='Selected project id for compaction')
+        parser.add_argument('--cold-storage',
+                            action='store_true',
+                            dest='cold_storage',
+                            default=False,
+                            help='Move the hidden history of the blocked projects to the cold storage '
+                                 'and restore the history of the unblocked ones')
+        parser.add_argument('--restore-project',
+                            action='store',
+                            dest='restore_project',
+                            default=None,
+                            help='Restore the history of a project from the cold storage')
+
+    @override_settings(DEBUG=False)
+    def handle(self, *args, **options):
+        if options["restore_project"] is not None:
+            count = compaction.restore_project_history_from_cold_storage(options["restore_project"])
+            self.stdout.write(self.style.SUCCESS("Restored {} history entries".format(count)))
+            return
+
+        total = compaction.CompactionStats(0, 0, 0, 0)
+        for last_key, stats in compaction.compact_history(older_than=timedelta(days=options["older_than"]),
+                                                          batch_size=options["batch_size"],
+                                                          start_key=options["start_key"],
+                                                          project_id=options["project"]):
+            total = compaction.CompactionStats(*[a + b for a, b in zip(total, stats)])
+            self.stdout.write("-> {} keys compacted, {} reclaimed (last key: {})".format(
+                total.keys, filesizeformat(total.bytes_reclaimed), last_key))
+
+        self.stdout.write(self.style.SUCCESS(
+            "Compacted {} keys: {} entries merged, {} snapshots dropped, {} reclaimed".format(
+                total.keys, total.merged_entries, total.dropped_snapshots,
+                filesizeformat(total.bytes_reclaimed))))
+
+        if options["cold_storage"]:
+            count = compaction.restore_unblocked_projects_history_from_cold_storage()
+            self.stdout.write(self.style.SUCCESS("Restored {} history entries of unblocked projects".format(count)))
+            count = compaction.move_blocked_projects_history_to_cold_storage()
+            self.stdout.write(self.style.SUCCESS("Moved {} history entries to the cold storage".format(count)))
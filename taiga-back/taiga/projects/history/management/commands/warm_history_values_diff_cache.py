@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Examples:
+# python manage.py warm_history_values_diff_cache
+# python manage.py warm_history_values_diff_cache --project 42 --jobs 4
+
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test.utils import override_settings
+
+from taiga.projects.history import tasks
+from taiga.projects.history.models import HistoryEntry
+from taiga.projects.history.services import fill_values_diff_cache
+
+
+class Command(BaseCommand):
+    help = 'Compute the values_diff cache of the history entries that do not have it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project',
+                            action='store',
+                            dest='project',
+                            default=None,
+                            help='Selected project id for cache warming')
+        parser.add_argument('--batch-size',
+                            action='store',
+                            dest='batch_size',
+                            type=int,
+                            default=500,
+                            help='Number of history entries processed per chunk')
+        parser.add_argument('--jobs',
+                            action='store',
+                            dest='jobs',
+                            type=int,
+                            default=1,
+                            help='Number of processes used to compute the chunks')
+        parser.add_argument('--sync',
+                            action='store_true',
+                            dest='sync',
+                            default=False,
+                            help='Compute the chunks here instead of sending them to the celery workers')
+
+    def _get_chunks(self, qs, batch_size):
+        last_id = ""
+        while True:
+            entry_ids = list(qs.filter(id__gt=last_id)
+                               .order_by("id")
+                               .values_list("id", flat=True)[:batch_size])
+            if not entry_ids:
+                break
+
+            last_id = entry_ids[-1]
+            yield entry_ids
+
+    @override_settings(DEBUG=False)
+    def handle(self, *args, **options):
+        qs = HistoryEntry.objects.filter(values_diff_cache__isnull=True).exclude(diff__isnull=True)
+        if options["project"] is not None:
+            qs = qs.filter(project_id=options["project"])
+
+        chunks = self._get_chunks(qs, options["batch_size"])
+
+        if settings.CELERY_ENABLED and not options["sync"]:
+            total = 0
+            for entry_ids in chunks:
+                tasks.fill_values_diff_cache.delay(entry_ids)
+                total += len(entry_ids)
+
+            self.stdout.write(self.style.SUCCESS("Queued {} history entries".format(total)))
+            return
+
+        if options["jobs"] <= 1:
+            results = map(fill_values_diff_cache, chunks)
+            self._report(results)
+            return
+
+        # Load the chunks and close the connection before forking, every
+        # worker process must open its own database connection.
+        chunks = list(chunks)
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options["jobs"]) as executor:
+            results = executor.map(fill_values_diff_cache, chunks)
+            self._report(results)
+
+    def _report(self, results):
+        total = 0
+        for count in results:
+            total += count
+            self.stdout.write("-> {} history entries computed".format(total))
+
+        self.stdout.write(self.style.SUCCESS("Computed the values_diff of {} history entries".format(total)))
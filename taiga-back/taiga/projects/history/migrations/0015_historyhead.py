@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 2.2.18 on 2021-03-15 10:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import taiga.base.db.models.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0067_auto_20201230_1237'),
+        ('history', '0014_json_to_jsonb'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoryHead',
+            fields=[
+                ('key', models.CharField(editable=False, max_length=255, primary_key=True, serialize=False)),
+                ('snapshot', taiga.base.db.models.fields.JSONField(blank=True, default=None, null=True)),
+                ('partial_diffs', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('project', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='projects.Project')),
+            ],
+        ),
+    ]
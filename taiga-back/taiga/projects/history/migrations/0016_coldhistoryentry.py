@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 2.2.18 on 2021-03-17 09:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import taiga.base.db.models.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0067_auto_20201230_1237'),
+        ('history', '0015_historyhead'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ColdHistoryEntry',
+            fields=[
+                ('id', models.CharField(editable=False, max_length=255, primary_key=True, serialize=False)),
+                ('user', taiga.base.db.models.fields.JSONField(blank=True, default=None, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('type', models.SmallIntegerField(choices=[(1, 'Change'), (2, 'Create'), (3, 'Delete')])),
+                ('key', models.CharField(blank=True, default=None, max_length=255, null=True)),
+                ('diff', taiga.base.db.models.fields.JSONField(blank=True, default=None, null=True)),
+                ('values_diff_cache', taiga.base.db.models.fields.JSONField(blank=True, default=None, null=True)),
+                ('snapshot', taiga.base.db.models.fields.JSONField(blank=True, default=None, null=True)),
+                ('values', taiga.base.db.models.fields.JSONField(blank=True, default=None, null=True)),
+                ('comment', models.TextField(blank=True)),
+                ('comment_html', models.TextField(blank=True)),
+                ('delete_comment_date', models.DateTimeField(blank=True, default=None, null=True)),
+                ('delete_comment_user', taiga.base.db.models.fields.JSONField(blank=True, default=None, null=True)),
+                ('comment_versions', taiga.base.db.models.fields.JSONField(blank=True, default=None, null=True)),
+                ('edit_comment_date', models.DateTimeField(blank=True, default=None, null=True)),
+                ('is_hidden', models.BooleanField(default=False)),
+                ('is_snapshot', models.BooleanField(default=False)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='projects.Project')),
+            ],
+        ),
+    ]
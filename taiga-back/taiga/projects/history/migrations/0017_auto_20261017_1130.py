@@ -0,0 +1,17 @@
+# Generated by Django 2.2.18 on 2026-10-17 11:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('history', '0016_coldhistoryentry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='historyentry',
+            index=models.Index(fields=['key', 'created_at', 'id'], name='history_his_key_3f2b68_idx'),
+        ),
+    ]
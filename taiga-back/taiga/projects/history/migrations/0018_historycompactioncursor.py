@@ -0,0 +1,22 @@
+# Generated by Django 2.2.18 on 2026-10-17 11:30
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('history', '0017_auto_20261017_1130'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoryCompactionCursor',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_key', models.CharField(blank=True, default='', max_length=255)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -70,7 +70,10 @@ class HistoryResourceMixin(object):
 
         notifications_services.analize_object_for_watchers(obj, comment, user)
 
-        self.__last_history = take_snapshot(sobj, comment=comment, user=user, delete=delete)
+        # The instance has just been saved (or is about to be
+        # deleted) by the resource, it is not fetched again.
+        self.__last_history = take_snapshot(sobj, comment=comment, user=user, delete=delete,
+                                            refetch=False)
         self.__object_saved = True
 
     def post_save(self, obj, created=False):
@@ -16,6 +16,7 @@
 
 import uuid
 
+from django.conf import settings
 from django.utils import timezone
 from django.db import models
 from django.contrib.auth import get_user_model
@@ -142,12 +143,30 @@ class HistoryEntry(models.Model):
         if self.values_diff_cache is not None:
             return self.values_diff_cache
 
+        # The cache is filled in background after creating the entry (see
+        # taiga.projects.history.tasks), meanwhile the html diffs are not
+        # computed to keep it cheap.
+        return self.make_values_diff(html_diffs=False)
+
+    def fill_values_diff_cache(self):
+        if self.values_diff_cache is None:
+            self.values_diff_cache = self.make_values_diff()
+            # Update values_diff_cache without dispatching signals
+            HistoryEntry.objects.filter(pk=self.pk).update(values_diff_cache=self.values_diff_cache)
+        return self.values_diff_cache
+
+    def make_values_diff(self, html_diffs=True):
         result = {}
         users_keys = ["assigned_to", "owner"]
 
+        def get_diff(html1, html2):
+            return get_diff_of_htmls(html1, html2,
+                                     max_size=settings.HISTORY_HTML_DIFF_MAX_SIZE if html_diffs else 0,
+                                     timeout=settings.HISTORY_HTML_DIFF_TIMEOUT)
+
         def resolve_diff_value(key):
             value = None
-            diff = get_diff_of_htmls(
+            diff = get_diff(
                 self.diff[key][0] or "",
                 self.diff[key][1] or ""
             )
@@ -271,8 +290,7 @@ class HistoryEntry(models.Model):
                             else:
                                 old_value = oldcustattrs[aid].get("value", "")
                                 new_value = newcustattrs[aid].get("value", "")
-                                value_diff = get_diff_of_htmls(old_value,
-                                                               new_value)
+                                value_diff = get_diff(old_value, new_value)
                             change = {
                                 "name": newcustattr.get("name", ""),
                                 "changes": changes,
@@ -291,7 +309,7 @@ class HistoryEntry(models.Model):
                             value_diff = [old_value, new_value]
                         else:
                             new_value = newcustattrs[aid].get("value", "")
-                            value_diff = get_diff_of_htmls("", new_value)
+                            value_diff = get_diff("", new_value)
                         newcustattrs[aid]["value_diff"] = value_diff
                         custom_attributes["new"].append(newcustattrs[aid])
 
@@ -326,10 +344,70 @@ class HistoryEntry(models.Model):
 
             result[key] = value
 
-        self.values_diff_cache = result
-        # Update values_diff_cache without dispatching signals
-        HistoryEntry.objects.filter(pk=self.pk).update(values_diff_cache=self.values_diff_cache)
-        return self.values_diff_cache
+        return result
 
     class Meta:
         ordering = ["created_at"]
+        indexes = [
+            models.Index(fields=['key', 'created_at', 'id']),
+        ]
+
+
+class HistoryHead(models.Model):
+    """
+    Domain model that stores the current frozen
+    state of a history key.
+
+    It is maintained by take_snapshot inside the same
+    transaction that creates the history entry, so the
+    next diff can be computed from one row instead of
+    replaying the partial diffs of the key.
+    """
+    key = models.CharField(primary_key=True, max_length=255, editable=False)
+    project = models.ForeignKey("projects.Project", null=True, on_delete=models.CASCADE)
+
+    # Stores the current frozen object snapshot
+    snapshot = JSONField(null=True, blank=True, default=None)
+
+    # Number of partial entries since the last complete snapshot
+    partial_diffs = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(default=timezone.now)
+
+
+class ColdHistoryEntry(models.Model):
+    """
+    Cold storage of the history entries of blocked
+    projects, moved from (and restored to) HistoryEntry
+    by the history compaction.
+
+    It has the same columns as HistoryEntry.
+    """
+    id = models.CharField(primary_key=True, max_length=255, editable=False)
+    project = models.ForeignKey("projects.Project", on_delete=models.CASCADE)
+
+    user = JSONField(null=True, blank=True, default=None)
+    created_at = models.DateTimeField(default=timezone.now)
+    type = models.SmallIntegerField(choices=HISTORY_TYPE_CHOICES)
+    key = models.CharField(max_length=255, null=True, default=None, blank=True)
+    diff = JSONField(null=True, blank=True, default=None)
+    values_diff_cache = JSONField(null=True, blank=True, default=None)
+    snapshot = JSONField(null=True, blank=True, default=None)
+    values = JSONField(null=True, blank=True, default=None)
+    comment = models.TextField(blank=True)
+    comment_html = models.TextField(blank=True)
+    delete_comment_date = models.DateTimeField(null=True, blank=True, default=None)
+    delete_comment_user = JSONField(null=True, blank=True, default=None)
+    comment_versions = JSONField(null=True, blank=True, default=None)
+    edit_comment_date = models.DateTimeField(null=True, blank=True, default=None)
+    is_hidden = models.BooleanField(default=False)
+    is_snapshot = models.BooleanField(default=False)
+
+
+class HistoryCompactionCursor(models.Model):
+    """
+    Key where the periodic history compaction stopped,
+    the next run resumes from it. It has only one row.
+    """
+    last_key = models.CharField(max_length=255, blank=True, default="")
+    updated_at = models.DateTimeField(default=timezone.now)
@@ -28,6 +28,7 @@ This is possible example:
           history.persist_history(object, user=request.user)
 """
 import logging
+from collections import defaultdict
 from collections import namedtuple
 from copy import deepcopy
 from functools import partial
@@ -36,14 +37,18 @@ from functools import wraps
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.apps import apps
+from django.db import connection
 from django.db import transaction as tx
+from django.utils import timezone
 from django_pglocks import advisory_lock
+from zlib import crc32
 
 from taiga.mdrender.service import render as mdrender
 from taiga.base.utils.db import get_typename_for_model_class
 from taiga.base.utils.diff import make_diff as make_diff_from_dicts
 
 from .models import HistoryType
+from .apps import history_entries_bulk_created
 
 # Freeze implementatitions
 from .freeze_impl import project_freezer
@@ -75,6 +80,10 @@ _freeze_impl_map = {}
 # Dict containing registred containing with their values implementation.
 _values_impl_map = {}
 
+# Dict containing registred contentypes with the related lookups
+# their freeze implementation needs (select_related, prefetch_related).
+_freeze_prefetch_map = {}
+
 # Not important fields for models (history entries with only
 # this fields are marked as hidden).
 _not_important_fields = {
@@ -129,6 +138,27 @@ def get_instance_from_key(key: str) -> object:
         return None
 
 
+def get_instances_from_keys(keys: list) -> dict:
+    """
+    Get the instances of a list of keys with one query
+    per model. Removed instances are not included.
+    """
+    pks_by_model = defaultdict(set)
+    for key in keys:
+        pks_by_model[get_model_from_key(key)].add(get_pk_from_key(key))
+
+    result = {}
+    for model, pks in pks_by_model.items():
+        qs = model.objects.filter(pk__in=pks)
+        if any(field.name == "project" for field in model._meta.fields):
+            qs = qs.select_related("project")
+
+        for obj in qs:
+            result[make_key_from_model_object(obj)] = obj
+
+    return result
+
+
 def register_values_implementation(typename: str, fn=None):
     """
     Register values implementation for specified typename.
@@ -148,44 +178,71 @@ def register_values_implementation(typename: str, fn=None):
     return _wrapper
 
 
-def register_freeze_implementation(typename: str, fn=None):
+def register_freeze_implementation(typename: str, fn=None, *, select_related: tuple=(),
+                                   prefetch_related: tuple=()):
     """
     Register freeze implementation for specified typename.
     This function can be used as decorator.
+
+    `select_related` and `prefetch_related` are the lookups used by
+    the implementation, see prepare_queryset_for_freeze.
     """
 
     assert isinstance(typename, str), "typename must be specied"
 
     if fn is None:
-        return partial(register_freeze_implementation, typename)
+        return partial(register_freeze_implementation, typename,
+                       select_related=select_related,
+                       prefetch_related=prefetch_related)
 
     @wraps(fn)
     def _wrapper(*args, **kwargs):
         return fn(*args, **kwargs)
 
     _freeze_impl_map[typename] = _wrapper
+    _freeze_prefetch_map[typename] = (tuple(select_related), tuple(prefetch_related))
     return _wrapper
 
 
+def prepare_queryset_for_freeze(qs):
+    """
+    Load with the queryset the related objects the freeze implementation
+    of its model needs, the instances can be frozen without fetching them
+    again (refetch=False).
+    """
+    typename = get_typename_for_model_class(qs.model)
+    select_related, prefetch_related = _freeze_prefetch_map.get(typename, ((), ()))
+
+    if select_related:
+        qs = qs.select_related(*select_related)
+    if prefetch_related:
+        qs = qs.prefetch_related(*prefetch_related)
+    return qs
+
+
 # Low level api
 
-def freeze_model_instance(obj: object) -> FrozenObj:
+def freeze_model_instance(obj: object, *, refetch: bool=True) -> FrozenObj:
     """
     Creates a new frozen object from model instance.
 
     The freeze process consists on converting model
     instances to hashable plain python objects and
     wrapped into FrozenObj.
+
+    With `refetch` the object is loaded again from the database
+    (returning None if it was removed), otherwise the given
+    instance must be up to date.
     """
 
     model_cls = obj.__class__
 
-    # Additional query for test if object is really exists
-    # on the database or it is removed.
-    try:
-        obj = model_cls.objects.get(pk=obj.pk)
-    except model_cls.DoesNotExist:
-        return None
+    if refetch:
+        # Additional query for test if object is really exists
+        # on the database or it is removed.
+        obj = prepare_queryset_for_freeze(model_cls.objects.filter(pk=obj.pk)).first()
+        if obj is None:
+            return None
 
     typename = get_typename_for_model_class(model_cls)
     if typename not in _freeze_impl_map:
@@ -200,6 +257,50 @@ def freeze_model_instance(obj: object) -> FrozenObj:
     return FrozenObj(key, snapshot)
 
 
+def freeze_model_instances_in_bulk(objs: list, *, refetch: bool=True) -> dict:
+    """
+    Creates the frozen objects of a list of model instances
+    loading them (and the related objects registered for their
+    freeze implementations) with one query per model and lookup.
+
+    Without `refetch` the given instances are frozen as they are,
+    they should be loaded with prepare_queryset_for_freeze.
+
+    Returns a dict of FrozenObj (or None if the object was
+    removed from the database) by key.
+    """
+    objs_by_model = defaultdict(list)
+    for obj in objs:
+        objs_by_model[obj.__class__].append(obj)
+
+    result = {}
+    for model_cls, model_objs in objs_by_model.items():
+        typename = get_typename_for_model_class(model_cls)
+        if typename not in _freeze_impl_map:
+            raise RuntimeError("No implementation found for {}".format(typename))
+
+        impl_fn = _freeze_impl_map[typename]
+        if refetch:
+            qs = model_cls.objects.filter(pk__in=[obj.pk for obj in model_objs])
+            instances = {instance.pk: instance for instance in prepare_queryset_for_freeze(qs)}
+        else:
+            instances = {obj.pk: obj for obj in model_objs}
+
+        for obj in model_objs:
+            key = make_key_from_model_object(obj)
+            instance = instances.get(obj.pk, None)
+            if instance is None:
+                result[key] = None
+                continue
+
+            snapshot = impl_fn(instance)
+            assert isinstance(snapshot, dict), \
+                "freeze handlers should return always a dict"
+            result[key] = FrozenObj(key, snapshot)
+
+    return result
+
+
 def is_hidden_snapshot(obj: FrozenDiff) -> bool:
     """
     Check if frozen object is considered
@@ -273,11 +374,14 @@ def make_diff(oldobj: FrozenObj, newobj: FrozenObj,
     return FrozenDiff(newobj.key, diff, newobj.snapshot)
 
 
-def make_diff_values(typename: str, fdiff: FrozenDiff) -> dict:
+def make_diff_values(typename: str, fdiff: FrozenDiff, project_id: int=None) -> dict:
     """
     Given a typename and diff, build a values dict for it.
     If no implementation found for typename, warnig is raised in
     logging and returns empty dict.
+
+    With the `project_id` of the object, the values of the project
+    catalogs are resolved from the history values cache.
     """
 
     if typename not in _values_impl_map:
@@ -286,7 +390,71 @@ def make_diff_values(typename: str, fdiff: FrozenDiff) -> dict:
         return {}
 
     impl_fn = _values_impl_map[typename]
-    return impl_fn(fdiff.diff)
+    return impl_fn(fdiff.diff, project_id=project_id)
+
+
+def _collect_diff_ids(value) -> set:
+    if isinstance(value, dict):
+        ids = set(str(k) for k in value.keys())
+        for item in value.values():
+            ids |= _collect_diff_ids(item)
+        return ids
+
+    if isinstance(value, (list, tuple)):
+        ids = set()
+        for item in value:
+            ids |= _collect_diff_ids(item)
+        return ids
+
+    return set() if value is None else {str(value)}
+
+
+_values_source_fields = {
+    "users": ("owner", "assigned_to", "assigned_users"),
+    "roles": ("points",),
+    "points": ("points",),
+}
+
+
+def make_diff_values_in_bulk(typename: str, fdiffs: list, project_id: int=None) -> list:
+    """
+    Same as make_diff_values but resolving the values of a
+    list of diffs at once. Returns the values dict of every diff.
+    """
+
+    if typename not in _values_impl_map:
+        log.warning(
+            "No implementation found of '{}' for values.".format(typename))
+        return [{} for fdiff in fdiffs]
+
+    # Join all the diffs into one so every values resolver
+    # runs once for the whole list.
+    merged_diff = defaultdict(list)
+    for fdiff in fdiffs:
+        for field, value in fdiff.diff.items():
+            merged_diff[field].extend(value)
+
+    impl_fn = _values_impl_map[typename]
+    merged_values = impl_fn(dict(merged_diff), project_id=project_id)
+
+    result = []
+    for fdiff in fdiffs:
+        values = {}
+        for field, field_values in merged_values.items():
+            source_fields = _values_source_fields.get(field, (field,))
+            source_fields = [f for f in source_fields if f in fdiff.diff]
+            if not source_fields and field != "users":
+                continue
+
+            ids = set()
+            for source_field in source_fields:
+                ids |= _collect_diff_ids(fdiff.diff[source_field])
+
+            values[field] = {k: v for k, v in field_values.items() if k in ids}
+
+        result.append(values)
+
+    return result
 
 
 def _rebuild_snapshot_from_diffs(keysnapshot, partials):
@@ -299,7 +467,19 @@ def _rebuild_snapshot_from_diffs(keysnapshot, partials):
     return result
 
 
-def get_last_snapshot_for_key(key: str) -> FrozenObj:
+def _need_real_snapshot(partial_diffs: int) -> bool:
+    max_partial_diffs = getattr(settings, "MAX_PARTIAL_DIFFS", 60)
+    return partial_diffs >= max_partial_diffs
+
+
+def _replay_last_snapshot_for_key(key: str):
+    """
+    Rebuild the current frozen object of a key from its last
+    complete snapshot and the partial diffs stored after it.
+
+    Returns the frozen object (or None) and the number of
+    partial diffs replayed.
+    """
     entry_model = apps.get_model("history", "HistoryEntry")
 
     # Search last snapshot
@@ -309,7 +489,7 @@ def get_last_snapshot_for_key(key: str) -> FrozenObj:
 
     keysnapshot = qs.first()
     if keysnapshot is None:
-        return None, True
+        return None, 0
 
     # Get all partial snapshots
     entries = tuple(entry_model.objects
@@ -318,12 +498,100 @@ def get_last_snapshot_for_key(key: str) -> FrozenObj:
                     .order_by("created_at"))
 
     snapshot = _rebuild_snapshot_from_diffs(keysnapshot.snapshot, entries)
-    max_partial_diffs = getattr(settings, "MAX_PARTIAL_DIFFS", 60)
+    return FrozenObj(keysnapshot.key, snapshot), len(entries)
+
 
-    if len(entries) >= max_partial_diffs:
-        return FrozenObj(keysnapshot.key, snapshot), True
+def get_last_snapshot_for_key(key: str) -> FrozenObj:
+    fobj, partial_diffs = _replay_last_snapshot_for_key(key)
+    if fobj is None:
+        return None, True
 
-    return FrozenObj(keysnapshot.key, snapshot), False
+    return fobj, _need_real_snapshot(partial_diffs)
+
+
+def get_head_for_key(key: str) -> object:
+    """
+    Get the stored head (current frozen state) of a key
+    or None if it has not been materialized yet.
+    """
+    head_model = apps.get_model("history", "HistoryHead")
+    return head_model.objects.filter(key=key).first()
+
+
+def get_current_snapshot_for_key(key: str) -> FrozenObj:
+    """
+    Same as get_last_snapshot_for_key but served from the
+    materialized head when it exists.
+    """
+    head = get_head_for_key(key)
+    if head is None:
+        return get_last_snapshot_for_key(key)
+
+    if head.snapshot is None:
+        return None, True
+
+    return FrozenObj(key, head.snapshot), _need_real_snapshot(head.partial_diffs)
+
+
+def materialize_head_for_key(key: str, project_id: int=None) -> object:
+    """
+    Create or refresh the head of a key replaying
+    its stored history entries.
+    """
+    head_model = apps.get_model("history", "HistoryHead")
+
+    fobj, partial_diffs = _replay_last_snapshot_for_key(key)
+    head, _ = head_model.objects.update_or_create(key=key, defaults={
+        "project_id": project_id,
+        "snapshot": fobj.snapshot if fobj else None,
+        "partial_diffs": partial_diffs,
+        "updated_at": timezone.now(),
+    })
+    return head
+
+
+def _make_head_for_entry(head: object, key: str, project_id: int, old_fobj: FrozenObj,
+                         partial_diffs: int, entry: object) -> object:
+    """
+    Move the head of a key forward applying the just created
+    history entry. The returned head is not saved.
+    """
+    head_model = apps.get_model("history", "HistoryHead")
+
+    if entry.is_snapshot:
+        snapshot = entry.snapshot
+        partial_diffs = 0
+    else:
+        snapshot = _rebuild_snapshot_from_diffs(old_fobj.snapshot, (entry,))
+        partial_diffs += 1
+
+    if head is None:
+        head = head_model(key=key, project_id=project_id)
+
+    head.snapshot = snapshot
+    head.partial_diffs = partial_diffs
+    head.updated_at = entry.created_at
+    return head
+
+
+def _get_advisory_lock_id(lock_name: str) -> int:
+    # The same integer id that django_pglocks uses for string locks
+    pos = crc32(lock_name.encode("utf-8"))
+    lock_id = (2 ** 31 - 1) & pos
+    if pos & 2 ** 31:
+        lock_id -= 2 ** 31
+    return lock_id
+
+
+def _lock_history_keys(keys: list):
+    """
+    Take the same advisory locks of take_snapshot for a list of
+    keys with one query. They are released when the current
+    transaction ends.
+    """
+    lock_ids = sorted({_get_advisory_lock_id("history-" + key) for key in keys})
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(lock_id) FROM unnest(%s) AS lock_id", [lock_ids])
 
 
 # Public api
@@ -350,21 +618,34 @@ def get_modified_fields(obj: object, last_modifications):
 
 @tx.atomic
 def take_snapshot(obj: object, *, comment: str="", user=None,
-                  delete: bool=False):
+                  delete: bool=False, refetch: bool=True):
     """
     Given any model instance with registred content type,
     create new history entry of "change" type.
 
     This raises exception in case of object wasn't
     previously freezed.
+
+    Without `refetch` the object is frozen as it is (see
+    freeze_model_instance).
     """
 
     key = make_key_from_model_object(obj)
     with advisory_lock("history-"+key):
         typename = get_typename_for_model_class(obj.__class__)
 
-        new_fobj = freeze_model_instance(obj)
-        old_fobj, need_real_snapshot = get_last_snapshot_for_key(key)
+        new_fobj = freeze_model_instance(obj, refetch=refetch)
+
+        head = get_head_for_key(key)
+        if head is not None:
+            old_fobj = FrozenObj(key, head.snapshot) if head.snapshot is not None else None
+            partial_diffs = head.partial_diffs
+        else:
+            # Keys without head (not backfilled yet) replay their diffs
+            # once, the head is materialized after the new entry.
+            old_fobj, partial_diffs = _replay_last_snapshot_for_key(key)
+
+        need_real_snapshot = old_fobj is None or _need_real_snapshot(partial_diffs)
 
         # migrate diff to latest schema
         if old_fobj:
@@ -396,7 +677,8 @@ def take_snapshot(obj: object, *, comment: str="", user=None,
                 entry_type != HistoryType.delete):
             return None
 
-        fvals = make_diff_values(typename, fdiff)
+        project_id = getattr(obj, 'project_id', getattr(obj, 'id', None))
+        fvals = make_diff_values(typename, fdiff, project_id)
 
         if len(comment) > 0:
             is_hidden = False
@@ -405,7 +687,7 @@ def take_snapshot(obj: object, *, comment: str="", user=None,
 
         kwargs = {
             "user": {"pk": user_id, "name": user_name},
-            "project_id": getattr(obj, 'project_id', getattr(obj, 'id', None)),
+            "project_id": project_id,
             "key": key,
             "type": entry_type,
             "snapshot": fdiff.snapshot if need_real_snapshot else None,
@@ -417,7 +699,126 @@ def take_snapshot(obj: object, *, comment: str="", user=None,
             "is_snapshot": need_real_snapshot,
         }
 
-        return entry_model.objects.create(**kwargs)
+        entry = entry_model.objects.create(**kwargs)
+
+        is_new_head = head is None
+        head = _make_head_for_entry(head, key, project_id, old_fobj, partial_diffs, entry)
+        if is_new_head:
+            head.save(force_insert=True)
+        else:
+            head.save(update_fields=["snapshot", "partial_diffs", "updated_at"])
+
+        return entry
+
+
+@tx.atomic
+def take_snapshots_in_bulk(objs: list, *, comment: str="", user=None,
+                           refetch: bool=True) -> list:
+    """
+    Same as take_snapshot (without delete) but for a list of
+    model instances. It locks all the keys, gets their heads,
+    freezes the objects and resolves the values at once and
+    creates all the history entries with one query.
+
+    Objects removed from the database and objects without
+    changes are ignored. Returns the created history entries.
+    """
+    objs = [obj for obj in objs if obj is not None]
+    if not objs:
+        return []
+
+    keys = [make_key_from_model_object(obj) for obj in objs]
+    _lock_history_keys(keys)
+
+    head_model = apps.get_model("history", "HistoryHead")
+    entry_model = apps.get_model("history", "HistoryEntry")
+
+    new_fobjs = freeze_model_instances_in_bulk(objs, refetch=refetch)
+    heads = head_model.objects.in_bulk(keys)
+
+    user_id = None if user is None else user.id
+    user_name = "" if user is None else user.get_full_name()
+
+    # Compute the diff of every object
+    snapshots = []
+    fdiffs_by_typename = defaultdict(list)
+    for obj, key in zip(objs, keys):
+        new_fobj = new_fobjs.pop(key, None)
+        if new_fobj is None:
+            # Removed object (or the key is repeated)
+            continue
+
+        typename = get_typename_for_model_class(obj.__class__)
+
+        head = heads.get(key, None)
+        if head is not None:
+            old_fobj = FrozenObj(key, head.snapshot) if head.snapshot is not None else None
+            partial_diffs = head.partial_diffs
+        else:
+            old_fobj, partial_diffs = _replay_last_snapshot_for_key(key)
+
+        need_real_snapshot = old_fobj is None or _need_real_snapshot(partial_diffs)
+
+        if old_fobj:
+            old_fobj = migrate_to_last_version(typename, old_fobj)
+
+        entry_type = HistoryType.change if old_fobj else HistoryType.create
+        fdiff = make_diff(old_fobj, new_fobj, get_excluded_fields(typename))
+
+        if not fdiff.diff and not comment and old_fobj is not None:
+            continue
+
+        project_id = getattr(obj, 'project_id', getattr(obj, 'id', None))
+        snapshots.append((obj, key, head, old_fobj, partial_diffs, need_real_snapshot, entry_type, fdiff))
+        fdiffs_by_typename[(typename, project_id)].append(fdiff)
+
+    # Resolve the values of all the diffs of the same type at once
+    fvals_by_key = {}
+    for (typename, project_id), fdiffs in fdiffs_by_typename.items():
+        for fdiff, fvals in zip(fdiffs, make_diff_values_in_bulk(typename, fdiffs, project_id)):
+            fvals_by_key[fdiff.key] = fvals
+
+    comment_html_by_project = {}
+    has_comment = len(comment) > 0
+
+    entries = []
+    new_heads = []
+    updated_heads = []
+    for obj, key, head, old_fobj, partial_diffs, need_real_snapshot, entry_type, fdiff in snapshots:
+        project_id = getattr(obj, 'project_id', getattr(obj, 'id', None))
+        if project_id not in comment_html_by_project:
+            comment_html_by_project[project_id] = mdrender(obj.project, comment)
+
+        entry = entry_model(
+            user={"pk": user_id, "name": user_name},
+            project_id=project_id,
+            key=key,
+            type=entry_type,
+            snapshot=fdiff.snapshot if need_real_snapshot else None,
+            diff=fdiff.diff,
+            values=fvals_by_key[key],
+            comment=comment,
+            comment_html=comment_html_by_project[project_id],
+            is_hidden=False if has_comment else is_hidden_snapshot(fdiff),
+            is_snapshot=need_real_snapshot,
+        )
+        entries.append(entry)
+
+        new_head = _make_head_for_entry(head, key, project_id, old_fobj, partial_diffs, entry)
+        if head is None:
+            new_heads.append(new_head)
+        else:
+            updated_heads.append(new_head)
+
+    if not entries:
+        return []
+
+    entry_model.objects.bulk_create(entries)
+    head_model.objects.bulk_create(new_heads)
+    head_model.objects.bulk_update(updated_heads, ["snapshot", "partial_diffs", "updated_at"])
+
+    history_entries_bulk_created.send(sender=entry_model, entries=entries)
+    return entries
 
 
 # High level query api
@@ -439,26 +840,75 @@ def get_history_queryset_by_model_instance(obj: object,
 
 
 def prefetch_owners_in_history_queryset(qs):
-    user_ids = [u["pk"] for u in qs.values_list("user", flat=True)]
+    prefetch_owners_in_history_entries(qs)
+    return qs
+
+
+def prefetch_owners_in_history_entries(entries):
+    user_ids = [entry.user["pk"] for entry in entries]
     users = get_user_model().objects.filter(id__in=user_ids)
     users_by_id = {u.id: u for u in users}
-    for history_entry in qs:
+    for history_entry in entries:
         history_entry.prefetch_owner(users_by_id.get(history_entry.user["pk"],
                                                      None))
 
-    return qs
+
+def fill_values_diff_cache(entry_ids: list) -> int:
+    """
+    Compute and store the values_diff (with the html diffs) of the
+    given history entries if it is not already computed.
+    """
+    history_entry_model = apps.get_model("history", "HistoryEntry")
+    qs = history_entry_model.objects.filter(pk__in=entry_ids,
+                                            values_diff_cache__isnull=True)
+    count = 0
+    for entry in qs.iterator():
+        entry.fill_values_diff_cache()
+        count += 1
+    return count
+
+
+def fill_values_diff_cache_on_commit(entries: list):
+    """
+    Fill the values_diff cache of the new history entries
+    after the current transaction is committed.
+    """
+    from . import tasks
+
+    entry_ids = [entry.pk for entry in entries if entry.diff]
+    if not entry_ids:
+        return
+
+    if settings.CELERY_ENABLED:
+        connection.on_commit(lambda: tasks.fill_values_diff_cache.delay(entry_ids))
+    else:
+        connection.on_commit(lambda: tasks.fill_values_diff_cache(entry_ids))
 
 
 # Freeze & value register
 register_freeze_implementation("projects.project", project_freezer)
 register_freeze_implementation("milestones.milestone", milestone_freezer)
-register_freeze_implementation("epics.epic", epic_freezer)
+register_freeze_implementation("epics.epic", epic_freezer,
+                               select_related=("project", "custom_attributes_values"),
+                               prefetch_related=("attachments",
+                                                 "project__epiccustomattributes"))
 register_freeze_implementation("epics.relateduserstory",
                                epic_related_userstory_freezer)
-register_freeze_implementation("userstories.userstory", userstory_freezer)
-register_freeze_implementation("issues.issue", issue_freezer)
-register_freeze_implementation("tasks.task", task_freezer)
-register_freeze_implementation("wiki.wikipage", wikipage_freezer)
+register_freeze_implementation("userstories.userstory", userstory_freezer,
+                               select_related=("project", "custom_attributes_values"),
+                               prefetch_related=("role_points", "assigned_users", "attachments",
+                                                 "project__userstorycustomattributes"))
+register_freeze_implementation("issues.issue", issue_freezer,
+                               select_related=("project", "custom_attributes_values"),
+                               prefetch_related=("generated_user_stories", "attachments",
+                                                 "project__issuecustomattributes"))
+register_freeze_implementation("tasks.task", task_freezer,
+                               select_related=("project", "custom_attributes_values"),
+                               prefetch_related=("generated_user_stories", "attachments",
+                                                 "project__taskcustomattributes"))
+register_freeze_implementation("wiki.wikipage", wikipage_freezer,
+                               select_related=("project",),
+                               prefetch_related=("attachments",))
 
 register_values_implementation("projects.project", project_values)
 register_values_implementation("milestones.milestone", milestone_values)
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from taiga.base.utils.db import get_typename_for_model_class
+
+from . import services
+from . import values_cache
+
+
+def on_catalog_change(sender, instance, **kwargs):
+    if instance.project_id is None:
+        return
+
+    typename = get_typename_for_model_class(sender)
+    values_cache.invalidate_project_catalog(typename, instance.project_id)
+
+
+def on_new_history_entry(sender, instance, created, **kwargs):
+    if not created:
+        return
+
+    services.fill_values_diff_cache_on_commit([instance])
+
+
+def on_new_history_entries(sender, entries, **kwargs):
+    services.fill_values_diff_cache_on_commit(entries)
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Caches used to resolve the `values` of the history entries.
+
+ - The project catalogs (statuses, points, roles, priorities...) are
+   loaded at once and stored in the django cache under a per project
+   and catalog generation. The generation is renewed when an element
+   of the catalog is saved or deleted (see HistoryAppConfig), so the
+   cache should be shared by all the processes.
+
+ - The names of the users are kept only while a `values_cache_scope`
+   is active (HistoryValuesCacheMiddleware opens one per request).
+
+Hits and misses of both caches are counted in the django cache and
+can be read with `get_values_cache_stats`.
+"""
+
+import threading
+import uuid
+
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+
+from taiga.base.utils import cache as cache_utils
+
+
+CATALOG_TYPENAMES = (
+    "projects.userstorystatus",
+    "projects.swimlane",
+    "projects.taskstatus",
+    "projects.epicstatus",
+    "projects.issuestatus",
+    "projects.issuetype",
+    "projects.points",
+    "projects.priority",
+    "projects.severity",
+    "users.role",
+    "milestones.milestone",
+)
+
+_COUNTERS = ("catalogs_hits", "catalogs_misses", "users_hits", "users_misses")
+
+_local = threading.local()
+
+
+def _is_enabled():
+    return getattr(settings, "HISTORY_VALUES_CACHE_ENABLE", True)
+
+
+def _is_catalogs_cache_enabled():
+    return _is_enabled() and cache_utils.is_shared_cache()
+
+
+def _incr_counters(**deltas):
+    for name, delta in deltas.items():
+        if not delta:
+            continue
+
+        key = "history-values/stats/{}".format(name)
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            if not cache.add(key, delta, timeout=None):
+                cache.incr(key, delta)
+
+
+def get_values_cache_stats() -> dict:
+    keys = {"history-values/stats/{}".format(name): name for name in _COUNTERS}
+    values = cache.get_many(keys.keys())
+    return {name: values.get(key, 0) for key, name in keys.items()}
+
+
+def reset_values_cache_stats():
+    cache.delete_many(["history-values/stats/{}".format(name) for name in _COUNTERS])
+
+
+####################
+# Project catalogs
+####################
+
+def _get_catalog_generation(typename: str, project_id: int) -> str:
+    key = "history-values/generation/{}-{}".format(typename, project_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def invalidate_project_catalog(typename: str, project_id: int):
+    key = "history-values/generation/{}-{}".format(typename, project_id)
+    cache.set(key, uuid.uuid4().hex, timeout=None)
+
+
+def get_project_catalog(typename: str, project_id: int, attr: str="name") -> dict:
+    """
+    Get a dict with the `attr` of every element of a project
+    catalog by their (str) pk.
+    """
+    model_cls = apps.get_model(typename)
+
+    if not _is_catalogs_cache_enabled():
+        qs = model_cls.objects.filter(project_id=project_id).values_list("pk", attr)
+        return {str(pk): value for pk, value in qs}
+
+    generation = _get_catalog_generation(typename, project_id)
+    key = "history-values/catalog/{}-{}-{}-{}".format(typename, project_id, attr, generation)
+
+    catalog = cache.get(key)
+    if catalog is not None:
+        _incr_counters(catalogs_hits=1)
+        return catalog
+
+    qs = model_cls.objects.filter(project_id=project_id).values_list("pk", attr)
+    catalog = {str(pk): value for pk, value in qs}
+    cache.set(key, catalog, timeout=getattr(settings, "HISTORY_VALUES_CACHE_TIMEOUT", 3600))
+    _incr_counters(catalogs_misses=1)
+    return catalog
+
+
+####################
+# Users
+####################
+
+@contextmanager
+def values_cache_scope():
+    """
+    Keep the resolved user names while the scope is active.
+    """
+    previous = getattr(_local, "users", None)
+    _local.users = {} if previous is None else previous
+    try:
+        yield
+    finally:
+        _local.users = previous
+
+
+def get_users_names(ids: set) -> dict:
+    """
+    Get the full name of a set of users by their (str) pk.
+    """
+    users_cache = getattr(_local, "users", None)
+    if users_cache is None or not _is_enabled():
+        return _load_users_names(ids)
+
+    result = {}
+    missing = set()
+    for user_id in ids:
+        if user_id not in users_cache:
+            missing.add(user_id)
+        elif users_cache[user_id] is not None:
+            result[str(user_id)] = users_cache[user_id]
+
+    loaded = _load_users_names(missing) if missing else {}
+    for user_id in missing:
+        users_cache[user_id] = loaded.get(str(user_id), None)
+        if users_cache[user_id] is not None:
+            result[str(user_id)] = users_cache[user_id]
+
+    _incr_counters(users_hits=len(ids) - len(missing), users_misses=len(missing))
+    return result
+
+
+def _load_users_names(ids: set) -> dict:
+    user_model = apps.get_model(settings.AUTH_USER_MODEL)
+    qs = user_model.objects.filter(pk__in=tuple(ids))
+    return {str(user.pk): user.get_full_name() for user in qs}
@@ -25,6 +25,7 @@ from taiga.base.api import ModelCrudViewSet, ModelListViewSet
 from taiga.base.api.mixins import BlockedByProjectMixin
 from taiga.base.api.utils import get_object_or_404
 
+from taiga.projects import filters_data_cache
 from taiga.projects.history.mixins import HistoryResourceMixin
 from taiga.projects.milestones.models import Milestone
 from taiga.projects.mixins.by_ref import ByRefMixin
@@ -212,7 +213,9 @@ class IssueViewSet(AssignedToSignalMixin, OCCResourceMixin, VotedResourceMixin,
             "tags": self.filter_queryset(queryset, filter_backends=tags_filter_backends),
             "roles": self.filter_queryset(queryset, filter_backends=roles_filter_backends),
         }
-        return response.Ok(services.get_issues_filters_data(project, querysets))
+        data = filters_data_cache.get_filters_data("issues", project, request.user, request.QUERY_PARAMS,
+                                                   lambda: services.get_issues_filters_data(project, querysets))
+        return response.Ok(data)
 
     @list_route(methods=["GET"])
     def csv(self, request):
@@ -22,6 +22,11 @@ from django.contrib.auth import get_user_model
 from .models import Like
 
 
+def _is_project(obj):
+    # Only the likes of the projects are their fans
+    return isinstance(obj, apps.get_model("projects", "Project"))
+
+
 def add_like(obj, user):
     """Add a like to an object.
 
@@ -34,8 +39,8 @@ def add_like(obj, user):
     obj_type = apps.get_model("contenttypes", "ContentType").objects.get_for_model(obj)
     with atomic():
         like, created = Like.objects.get_or_create(content_type=obj_type, object_id=obj.id, user=user)
-        if like.project is not None:
-            like.project.refresh_totals()
+        if created and _is_project(obj):
+            obj.increment_totals(fans=1, date=like.created_date)
 
     return like
 
@@ -56,11 +61,10 @@ def remove_like(obj, user):
             return
 
         like = qs.first()
-        project = like.project
         qs.delete()
 
-        if project is not None:
-            project.refresh_totals()
+        if _is_project(obj):
+            obj.increment_totals(fans=-1, date=like.created_date)
 
 
 def get_fans(obj):
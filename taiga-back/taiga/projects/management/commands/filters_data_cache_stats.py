@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from django.core.management.base import BaseCommand
+
+from taiga.projects.filters_data_cache import get_filters_data_cache_stats
+from taiga.projects.filters_data_cache import reset_filters_data_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Show the hits and misses of the filters data cache of every list'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset',
+                            action='store_true',
+                            dest='reset',
+                            default=False,
+                            help='Reset the counters after showing them')
+
+    def handle(self, *args, **options):
+        stats = get_filters_data_cache_stats()
+
+        for section, counters in stats.items():
+            hits = counters["hits"]
+            misses = counters["misses"]
+            total = hits + misses
+            ratio = (hits * 100 / total) if total else 0
+            self.stdout.write("{}: {} hits, {} misses ({:.1f}% hit rate)".format(section, hits, misses, ratio))
+
+        if options["reset"]:
+            reset_filters_data_cache_stats()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Examples:
+# python manage.py rebuild_milestones_burndown
+# python manage.py rebuild_milestones_burndown --project 42
+# python manage.py rebuild_milestones_burndown --milestone 1 --milestone 2
+# python manage.py rebuild_milestones_burndown --only-missing --batch-size 500
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from taiga.projects.milestones import burndown
+from taiga.projects.milestones.models import Milestone
+
+
+class Command(BaseCommand):
+    help = 'Compute the burndown of the milestones (the daily series of their stats endpoint)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project',
+                            action='store',
+                            dest='project',
+                            type=int,
+                            default=None,
+                            help='Selected project id for rebuilding')
+        parser.add_argument('--milestone',
+                            action='append',
+                            dest='milestones',
+                            type=int,
+                            default=None,
+                            help='Selected milestone id for rebuilding (can be repeated)')
+        parser.add_argument('--only-missing',
+                            action='store_true',
+                            dest='only_missing',
+                            default=False,
+                            help='Only compute the milestones without burndown')
+        parser.add_argument('--batch-size',
+                            action='store',
+                            dest='batch_size',
+                            type=int,
+                            default=100,
+                            help='Number of milestones computed between progress reports')
+
+    @override_settings(DEBUG=False)
+    def handle(self, *args, **options):
+        milestones = Milestone.objects.order_by("id")
+        if options["project"]:
+            milestones = milestones.filter(project_id=options["project"])
+        if options["milestones"]:
+            milestones = milestones.filter(id__in=options["milestones"])
+        if options["only_missing"]:
+            milestones = milestones.filter(burndown__isnull=True)
+
+        milestones_ids = list(milestones.values_list("id", flat=True))
+        batch_size = options["batch_size"]
+        for i in range(0, len(milestones_ids), batch_size):
+            batch = milestones_ids[i:i + batch_size]
+            burndown.refresh_milestones_burndown(batch)
+            self.stdout.write("Computed up to milestone {} ({}/{})".format(batch[-1], i + len(batch),
+                                                                           len(milestones_ids)))
+
+        self.stdout.write(self.style.SUCCESS("{} milestones burndown computed".format(len(milestones_ids))))
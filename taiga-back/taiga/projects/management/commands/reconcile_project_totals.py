@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Examples:
+# python manage.py reconcile_project_totals
+# python manage.py reconcile_project_totals --project 42
+# python manage.py reconcile_project_totals --windows-only
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from taiga.projects.services import totals as totals_services
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the activity and fans totals of the projects from their timeline and their likes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project',
+                            action='store',
+                            dest='project',
+                            type=int,
+                            default=None,
+                            help='Selected project id for reconciling')
+        parser.add_argument('--batch-size',
+                            action='store',
+                            dest='batch_size',
+                            type=int,
+                            default=settings.PROJECTS_TOTALS_RECONCILE_BATCH_SIZE,
+                            help='Number of projects reconciled per transaction')
+        parser.add_argument('--windows-only',
+                            action='store_true',
+                            dest='windows_only',
+                            default=False,
+                            help='Only roll the last week/month/year totals')
+
+    @override_settings(DEBUG=False)
+    def handle(self, *args, **options):
+        if options["windows_only"]:
+            projects_ids = [options["project"]] if options["project"] is not None else None
+            count = totals_services.refresh_projects_totals_windows(projects_ids)
+            self.stdout.write(self.style.SUCCESS("Refreshed the totals of {} projects".format(count)))
+            return
+
+        if options["project"] is not None:
+            totals_services.reconcile_projects_totals([options["project"]])
+        else:
+            for last_id in totals_services.reconcile_all_projects_totals(batch_size=options["batch_size"]):
+                self.stdout.write("Reconciled the projects up to {}".format(last_id))
+
+        self.stdout.write(self.style.SUCCESS("Reconciled the project totals"))
@@ -0,0 +1,57 @@
+# Generated by Django 2.2.18 on 2026-10-17 10:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+FILL_BUCKETS_SQL = """
+    INSERT INTO projects_projecttotalsbucket (project_id, date, activity, fans)
+         SELECT project_id, date, SUM(activity), SUM(fans)
+           FROM (SELECT split_part(t.namespace, ':', 2)::integer AS project_id,
+                        t.created::date AS date,
+                        COUNT(*) AS activity,
+                        0 AS fans
+                   FROM timeline_timeline t
+                  WHERE t.namespace LIKE 'project:%'
+               GROUP BY 1, 2
+              UNION ALL
+                 SELECT l.object_id AS project_id,
+                        l.created_date::date AS date,
+                        0 AS activity,
+                        COUNT(*) AS fans
+                   FROM likes_like l
+             INNER JOIN django_content_type ct ON ct.id = l.content_type_id
+                  WHERE ct.app_label = 'projects' AND ct.model = 'project'
+               GROUP BY 1, 2) counts
+     INNER JOIN projects_project p ON p.id = counts.project_id
+       GROUP BY project_id, date
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0067_auto_20201230_1237'),
+        ('timeline', '0008_auto_20190606_1528'),
+        ('likes', '0002_auto_20151130_2230'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectTotalsBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='date')),
+                ('activity', models.IntegerField(default=0, verbose_name='activity')),
+                ('fans', models.IntegerField(default=0, verbose_name='fans')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='totals_buckets', to='projects.Project', verbose_name='project')),
+            ],
+            options={
+                'verbose_name': 'project totals bucket',
+                'verbose_name_plural': 'project totals buckets',
+                'ordering': ['project', 'date'],
+                'unique_together': {('project', 'date')},
+            },
+        ),
+        migrations.RunSQL(FILL_BUCKETS_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
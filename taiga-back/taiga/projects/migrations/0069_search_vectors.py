@@ -0,0 +1,125 @@
+# Generated by Django 2.2.18 on 2026-10-17 11:30
+
+from django.db import migrations
+
+
+# NOTE: These functions are needed by taiga.searches.services
+CREATE_ITEM_SEARCH_VECTOR_FUNCTION = """
+    CREATE OR REPLACE FUNCTION item_search_vector(text, text, text[], text)
+                       RETURNS tsvector
+                      LANGUAGE sql
+                     IMMUTABLE AS $$
+        SELECT setweight(to_tsvector('simple', coalesce($1, '') || ' ' || coalesce($2, '')), 'A') ||
+               setweight(to_tsvector('simple', coalesce(inmutable_array_to_string($3), '')), 'B') ||
+               setweight(to_tsvector('simple', coalesce($4, '')), 'C')
+    $$;
+
+    CREATE OR REPLACE FUNCTION update_item_search_vector()
+                       RETURNS trigger
+                      LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.search_vector := item_search_vector(NEW.subject, NEW.ref::text, NEW.tags, NEW.description);
+        RETURN NEW;
+    END; $$;
+"""
+
+DROP_ITEM_SEARCH_VECTOR_FUNCTION = """
+    DROP FUNCTION IF EXISTS update_item_search_vector() CASCADE;
+    DROP FUNCTION IF EXISTS item_search_vector(text, text, text[], text) CASCADE;
+"""
+
+
+CREATE_WIKIPAGE_SEARCH_VECTOR_FUNCTION = """
+    CREATE OR REPLACE FUNCTION wikipage_search_vector(text, text)
+                       RETURNS tsvector
+                      LANGUAGE sql
+                     IMMUTABLE AS $$
+        SELECT setweight(to_tsvector('simple', coalesce($1, '')), 'A') ||
+               setweight(to_tsvector('simple', coalesce($2, '')), 'B')
+    $$;
+
+    CREATE OR REPLACE FUNCTION update_wikipage_search_vector()
+                       RETURNS trigger
+                      LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.search_vector := wikipage_search_vector(NEW.slug, NEW.content);
+        RETURN NEW;
+    END; $$;
+"""
+
+DROP_WIKIPAGE_SEARCH_VECTOR_FUNCTION = """
+    DROP FUNCTION IF EXISTS update_wikipage_search_vector() CASCADE;
+    DROP FUNCTION IF EXISTS wikipage_search_vector(text, text) CASCADE;
+"""
+
+
+# The column is filled by a BEFORE trigger, so it is kept out of the models
+# and never loaded by the ORM. The tags colors trigger is disabled while the
+# existing rows are filled because the backfill doesn't change their tags.
+ITEM_SEARCH_VECTOR_COLUMN = """
+    ALTER TABLE {table} ADD COLUMN search_vector tsvector NULL;
+
+    CREATE TRIGGER update_{table}_search_vector
+            BEFORE INSERT OR UPDATE OF subject, ref, tags, description ON {table}
+               FOR EACH ROW EXECUTE PROCEDURE update_item_search_vector();
+
+    ALTER TABLE {table} DISABLE TRIGGER {tags_colors_trigger};
+    UPDATE {table}
+       SET search_vector = item_search_vector(subject, ref::text, tags, description);
+    ALTER TABLE {table} ENABLE TRIGGER {tags_colors_trigger};
+
+    CREATE INDEX {table}_search_vector_idx ON {table} USING gin(search_vector);
+"""
+
+WIKIPAGE_SEARCH_VECTOR_COLUMN = """
+    ALTER TABLE wiki_wikipage ADD COLUMN search_vector tsvector NULL;
+
+    CREATE TRIGGER update_wiki_wikipage_search_vector
+            BEFORE INSERT OR UPDATE OF slug, content ON wiki_wikipage
+               FOR EACH ROW EXECUTE PROCEDURE update_wikipage_search_vector();
+
+    UPDATE wiki_wikipage
+       SET search_vector = wikipage_search_vector(slug, content);
+
+    CREATE INDEX wiki_wikipage_search_vector_idx ON wiki_wikipage USING gin(search_vector);
+"""
+
+DROP_SEARCH_VECTOR_COLUMN = """
+    DROP INDEX IF EXISTS {table}_search_vector_idx;
+    DROP TRIGGER IF EXISTS update_{table}_search_vector ON {table};
+    ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector;
+"""
+
+
+ITEMS_TABLES = [
+    ("epics_epic", "update_project_tags_colors_on_epic_update"),
+    ("userstories_userstory", "update_project_tags_colors_on_userstory_update"),
+    ("tasks_task", "update_project_tags_colors_on_task_update"),
+    ("issues_issue", "update_project_tags_colors_on_issue_update"),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0068_projecttotalsbucket'),
+        ('epics', '0006_auto_20200615_0811'),
+        ('userstories', '0021_auto_20201202_0850'),
+        ('tasks', '0013_auto_20200615_0811'),
+        ('issues', '0009_auto_20200615_0811'),
+        ('wiki', '0005_auto_20161201_1628'),
+    ]
+
+    operations = [
+        migrations.RunSQL([CREATE_ITEM_SEARCH_VECTOR_FUNCTION],
+                          [DROP_ITEM_SEARCH_VECTOR_FUNCTION]),
+        migrations.RunSQL([CREATE_WIKIPAGE_SEARCH_VECTOR_FUNCTION],
+                          [DROP_WIKIPAGE_SEARCH_VECTOR_FUNCTION]),
+    ] + [
+        migrations.RunSQL([ITEM_SEARCH_VECTOR_COLUMN.format(table=table, tags_colors_trigger=trigger)],
+                          [DROP_SEARCH_VECTOR_COLUMN.format(table=table)])
+        for table, trigger in ITEMS_TABLES
+    ] + [
+        migrations.RunSQL([WIKIPAGE_SEARCH_VECTOR_COLUMN],
+                          [DROP_SEARCH_VECTOR_COLUMN.format(table="wiki_wikipage")]),
+    ]
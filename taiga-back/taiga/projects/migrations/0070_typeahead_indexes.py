@@ -0,0 +1,34 @@
+# Generated by Django 2.2.18 on 2026-10-17 11:30
+
+from django.db import migrations
+
+
+# NOTE: These indexes are needed by taiga.searches.services.typeahead
+CREATE_INDEXES = """
+    CREATE INDEX {table}_project_ref_idx
+              ON {table} (project_id, ref);
+
+    CREATE INDEX {table}_project_subject_prefix_idx
+              ON {table} (project_id, lower(subject) text_pattern_ops);
+"""
+
+DROP_INDEXES = """
+    DROP INDEX IF EXISTS {table}_project_ref_idx;
+    DROP INDEX IF EXISTS {table}_project_subject_prefix_idx;
+"""
+
+
+ITEMS_TABLES = ["epics_epic", "userstories_userstory", "tasks_task", "issues_issue"]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0069_search_vectors'),
+    ]
+
+    operations = [
+        migrations.RunSQL([CREATE_INDEXES.format(table=table)],
+                          [DROP_INDEXES.format(table=table)])
+        for table in ITEMS_TABLES
+    ]
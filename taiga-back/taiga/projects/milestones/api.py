@@ -34,6 +34,7 @@ from taiga.projects.tasks.validators import UpdateMilestoneBulkValidator as \
 from taiga.projects.issues.validators import UpdateMilestoneBulkValidator as \
     IssuesUpdateMilestoneValidator
 
+from . import burndown
 from . import serializers
 from . import services
 from . import validators
@@ -42,7 +43,6 @@ from . import permissions
 from . import utils as milestones_utils
 
 from django_pglocks import advisory_lock
-import datetime
 
 
 class MilestoneViewSet(HistoryResourceMixin, WatchedResourceMixin,
@@ -110,41 +110,11 @@ class MilestoneViewSet(HistoryResourceMixin, WatchedResourceMixin,
 
     @detail_route(methods=['get'])
     def stats(self, request, pk=None):
-        milestone = get_object_or_404(models.Milestone, pk=pk)
+        milestone = get_object_or_404(models.Milestone.objects.select_related("burndown"), pk=pk)
 
         self.check_permissions(request, "stats", milestone)
 
-        total_points = milestone.total_points
-        milestone_stats = {
-            'name': milestone.name,
-            'estimated_start': milestone.estimated_start,
-            'estimated_finish': milestone.estimated_finish,
-            'total_points': total_points,
-            'completed_points': milestone.closed_points.values(),
-            'total_userstories': milestone.cached_user_stories.count(),
-            'completed_userstories': milestone.cached_user_stories.filter(is_closed=True).count(),
-            'total_tasks': milestone.tasks.count(),
-            'completed_tasks': milestone.tasks.filter(status__is_closed=True).count(),
-            'iocaine_doses': milestone.tasks.filter(is_iocaine=True).count(),
-            'days': []
-        }
-        current_date = milestone.estimated_start
-        sumTotalPoints = sum(total_points.values())
-        optimal_points = sumTotalPoints
-        milestone_days = (milestone.estimated_finish - milestone.estimated_start).days
-        optimal_points_per_day = sumTotalPoints / milestone_days if milestone_days else 0
-
-        while current_date <= milestone.estimated_finish:
-            milestone_stats['days'].append({
-                'day': current_date,
-                'name': current_date.day,
-                'open_points':  sumTotalPoints - milestone.total_closed_points_by_date(current_date),
-                'optimal_points': optimal_points,
-            })
-            current_date = current_date + datetime.timedelta(days=1)
-            optimal_points -= optimal_points_per_day
-
-        return response.Ok(milestone_stats)
+        return response.Ok(burndown.get_milestone_stats(milestone))
 
     @detail_route(methods=["POST"])
     def move_userstories_to_sprint(self, request, pk=None, **kwargs):
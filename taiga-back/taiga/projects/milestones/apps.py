@@ -15,9 +15,39 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 from django.apps import AppConfig
+from django.apps import apps
+from django.db.models import signals
+
+
+## Burndown Signals
+
+def connect_milestones_burndown_signals():
+    from . import signals as handlers
+    for signal in (signals.post_save, signals.post_delete):
+        signal.connect(handlers.refresh_burndown_on_task_change,
+                       sender=apps.get_model("tasks", "Task"),
+                       dispatch_uid="milestones_burndown_task")
+        signal.connect(handlers.refresh_burndown_on_userstory_change,
+                       sender=apps.get_model("userstories", "UserStory"),
+                       dispatch_uid="milestones_burndown_userstory")
+        signal.connect(handlers.refresh_burndown_on_role_points_change,
+                       sender=apps.get_model("userstories", "RolePoints"),
+                       dispatch_uid="milestones_burndown_role_points")
+        signal.connect(handlers.refresh_burndown_on_project_change,
+                       sender=apps.get_model("projects", "Points"),
+                       dispatch_uid="milestones_burndown_points")
+        signal.connect(handlers.refresh_burndown_on_project_change,
+                       sender=apps.get_model("projects", "TaskStatus"),
+                       dispatch_uid="milestones_burndown_task_status")
+    signals.post_save.connect(handlers.refresh_burndown_on_milestone_change,
+                              sender=apps.get_model("milestones", "Milestone"),
+                              dispatch_uid="milestones_burndown_milestone")
 
 
 class MilestonesAppConfig(AppConfig):
     name = "taiga.projects.milestones"
     verbose_name = "Milestones"
     watched_types = ["milestones.milestone", ]
+
+    def ready(self):
+        connect_milestones_burndown_signals()
@@ -0,0 +1,430 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Burndown of the milestones.
+
+The stats of a milestone (its points, counters and closed points of every
+day of its estimated dates) are kept in its MilestoneBurndown, so the
+stats endpoint reads them in one query instead of computing them from
+its user stories and tasks on every request.
+
+Every user story (with its role points and the tasks that close it) and
+every task of a milestone with burndown keeps the part of the stats it
+adds in a MilestoneBurndownItem. The signals of the user stories, tasks
+and role points and the bulk moves to a sprint mark the ones they change
+and, when the transaction commits (with celery if it is enabled), these
+parts are computed again and only the difference with the saved ones is
+applied to the burndowns. Computing them again is idempotent, so marking
+the same ones several times, or in a transaction rolled back later, does
+not change the result.
+
+The burndown of a milestone is computed from scratch when the milestone
+is created or its dates change and when the points or the task statuses
+of its project change. The stats endpoint never writes: the stats of a
+milestone without an up to date burndown are computed in memory.
+"""
+
+import datetime
+import logging
+import threading
+
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction as tx
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+USERSTORY_ITEM_KEY = "userstories.userstory:{}"
+TASK_ITEM_KEY = "tasks.task:{}"
+
+# The points of a role are removed from the burndown when they reach 0,
+# under this value to ignore the rounding errors of the differences
+POINTS_EPSILON = 1e-9
+
+REFRESH_ATTEMPTS = 3
+
+
+def _get_milestone_days(milestone):
+    current_date = milestone.estimated_start
+    while current_date <= milestone.estimated_finish:
+        yield current_date
+        current_date = current_date + datetime.timedelta(days=1)
+
+
+####################
+# Items
+####################
+
+def _get_userstories_items(user_stories_ids):
+    """
+    Get the burndown items of the user stories in a milestone, as a dict of
+    {key: (milestone id, stats)}.
+    """
+    user_story_model = apps.get_model("userstories", "UserStory")
+    role_points_model = apps.get_model("userstories", "RolePoints")
+    task_model = apps.get_model("tasks", "Task")
+
+    user_stories = (user_story_model.objects.filter(id__in=user_stories_ids, milestone__isnull=False)
+                                            .values_list("id", "milestone_id", "is_closed", "finish_date"))
+    user_stories = {user_story[0]: user_story for user_story in user_stories}
+
+    points = defaultdict(dict)
+    role_points = (role_points_model.objects.filter(user_story_id__in=user_stories.keys())
+                                            .values_list("user_story_id", "role_id", "points__value"))
+    for user_story_id, role_id, value in role_points:
+        points[user_story_id][str(role_id)] = value if value else 0
+
+    tasks = defaultdict(list)
+    for user_story_id, milestone_id, finished_date in (task_model.objects
+                                                           .filter(user_story_id__in=user_stories.keys())
+                                                           .values_list("user_story_id", "milestone_id",
+                                                                        "finished_date")):
+        tasks[user_story_id].append((milestone_id, finished_date))
+
+    items = {}
+    for user_story_id, milestone_id, is_closed, finish_date in user_stories.values():
+        user_story_points = points[user_story_id]
+        total_points = sum(user_story_points.values())
+
+        # The points of a user story are closed by its finished tasks of the
+        # milestone, in equal parts, or by itself if it has no tasks
+        closed_points_by_date = defaultdict(float)
+        user_story_tasks = tasks[user_story_id]
+        for task_milestone_id, finished_date in user_story_tasks:
+            if task_milestone_id == milestone_id and finished_date is not None:
+                closed_points_by_date[finished_date.date().isoformat()] += total_points / len(user_story_tasks)
+        if not user_story_tasks and finish_date is not None:
+            closed_points_by_date[finish_date.date().isoformat()] += total_points
+
+        items[USERSTORY_ITEM_KEY.format(user_story_id)] = (milestone_id, {
+            "total_points": user_story_points,
+            "closed_points": user_story_points if is_closed else {},
+            "closed_points_by_date": dict(closed_points_by_date),
+            "total_userstories": 1,
+            "completed_userstories": 1 if is_closed else 0,
+        })
+    return items
+
+
+def _get_tasks_items(tasks_ids):
+    """
+    Get the burndown items of the tasks in a milestone, as a dict of
+    {key: (milestone id, stats)}.
+    """
+    task_model = apps.get_model("tasks", "Task")
+    tasks = (task_model.objects.filter(id__in=tasks_ids, milestone__isnull=False)
+                               .values_list("id", "milestone_id", "status__is_closed", "is_iocaine"))
+    return {TASK_ITEM_KEY.format(task_id): (milestone_id, {
+        "total_tasks": 1,
+        "completed_tasks": 1 if is_closed else 0,
+        "iocaine_doses": 1 if is_iocaine else 0,
+    }) for task_id, milestone_id, is_closed, is_iocaine in tasks}
+
+
+def _get_milestone_items(milestone):
+    items = _get_userstories_items(milestone.user_stories.values_list("id", flat=True))
+    items.update(_get_tasks_items(milestone.tasks.values_list("id", flat=True)))
+    return items
+
+
+####################
+# Burndown
+####################
+
+def _update_burndown(burndown, removed=(), added=()):
+    """
+    Subtract from a burndown the stats of its removed items and add the
+    stats of its added items.
+    """
+    role_model = apps.get_model("users", "Role")
+
+    total_points = {role_id: value for role_id, value in burndown.total_points}
+    closed_points = {role_id: value for role_id, value in burndown.closed_points}
+    closed_points_by_day = list(burndown.closed_points_by_day)
+    days = (burndown.estimated_finish - burndown.estimated_start).days + 1
+    closed_points_by_day += [0] * (days - len(closed_points_by_day))
+
+    for sign, items_stats in ((-1, removed), (1, added)):
+        for stats in items_stats:
+            for points, item_points in ((total_points, stats.get("total_points", {})),
+                                        (closed_points, stats.get("closed_points", {}))):
+                for role_id, value in item_points.items():
+                    points[int(role_id)] = points.get(int(role_id), 0) + sign * value
+
+            for date, value in stats.get("closed_points_by_date", {}).items():
+                # The points closed before the start of the milestone are
+                # closed on its first day
+                first_day = max((datetime.date.fromisoformat(date) - burndown.estimated_start).days, 0)
+                for day in range(first_day, days):
+                    closed_points_by_day[day] += sign * value
+
+            for field in ("total_userstories", "completed_userstories",
+                          "total_tasks", "completed_tasks", "iocaine_doses"):
+                setattr(burndown, field, getattr(burndown, field) + sign * stats.get(field, 0))
+
+    # In the order of the roles, without the ones with no points
+    roles_ids = list(role_model.objects.filter(id__in=total_points.keys()).values_list("id", flat=True))
+    burndown.total_points = [[role_id, total_points[role_id]] for role_id in roles_ids
+                             if total_points[role_id] > POINTS_EPSILON]
+    burndown.closed_points = [[role_id, closed_points[role_id]] for role_id in roles_ids
+                              if closed_points.get(role_id, 0) > POINTS_EPSILON]
+    burndown.closed_points_by_day = closed_points_by_day
+    burndown.modified_date = timezone.now()
+
+
+def _build_milestone_burndown(milestone, items):
+    burndown_model = apps.get_model("milestones", "MilestoneBurndown")
+    burndown = burndown_model(milestone=milestone,
+                              estimated_start=milestone.estimated_start,
+                              estimated_finish=milestone.estimated_finish)
+    _update_burndown(burndown, added=[stats for milestone_id, stats in items.values()])
+    return burndown
+
+
+def compute_milestone_burndown(milestone):
+    """
+    Compute (and save) the burndown of a milestone from scratch, with its
+    items.
+    """
+    burndown_model = apps.get_model("milestones", "MilestoneBurndown")
+    item_model = apps.get_model("milestones", "MilestoneBurndownItem")
+
+    with tx.atomic():
+        # Wait for the refreshes of its items
+        list(burndown_model.objects.select_for_update().filter(milestone=milestone))
+
+        items = _get_milestone_items(milestone)
+        burndown = _build_milestone_burndown(milestone, items)
+        burndown.save()
+
+        item_model.objects.filter(Q(milestone=milestone) | Q(key__in=items.keys())).delete()
+        item_model.objects.bulk_create([item_model(key=key, milestone_id=milestone_id, data=stats)
+                                        for key, (milestone_id, stats) in items.items()])
+    return burndown
+
+
+def get_milestone_burndown(milestone):
+    """
+    Get the burndown of a milestone, computing it in memory (without saving
+    it) if it is missing or if it is not the one of the current estimated
+    dates of the milestone.
+    """
+    burndown_model = apps.get_model("milestones", "MilestoneBurndown")
+    try:
+        burndown = milestone.burndown
+    except burndown_model.DoesNotExist:
+        burndown = None
+
+    if (burndown is None or
+            burndown.estimated_start != milestone.estimated_start or
+            burndown.estimated_finish != milestone.estimated_finish):
+        burndown = _build_milestone_burndown(milestone, _get_milestone_items(milestone))
+    return burndown
+
+
+def get_milestone_stats(milestone):
+    burndown = get_milestone_burndown(milestone)
+
+    total_points = dict(burndown.total_points)
+    milestone_stats = {
+        'name': milestone.name,
+        'estimated_start': milestone.estimated_start,
+        'estimated_finish': milestone.estimated_finish,
+        'total_points': total_points,
+        'completed_points': list(dict(burndown.closed_points).values()),
+        'total_userstories': burndown.total_userstories,
+        'completed_userstories': burndown.completed_userstories,
+        'total_tasks': burndown.total_tasks,
+        'completed_tasks': burndown.completed_tasks,
+        'iocaine_doses': burndown.iocaine_doses,
+        'days': []
+    }
+    sumTotalPoints = sum(total_points.values())
+    optimal_points = sumTotalPoints
+    milestone_days = (milestone.estimated_finish - milestone.estimated_start).days
+    optimal_points_per_day = sumTotalPoints / milestone_days if milestone_days else 0
+
+    for current_date, closed_points in zip(_get_milestone_days(milestone), burndown.closed_points_by_day):
+        milestone_stats['days'].append({
+            'day': current_date,
+            'name': current_date.day,
+            'open_points': sumTotalPoints - closed_points,
+            'optimal_points': optimal_points,
+        })
+        optimal_points -= optimal_points_per_day
+
+    return milestone_stats
+
+
+####################
+# Refresh
+####################
+
+def refresh_milestones_burndown(milestones_ids):
+    """
+    Compute the burndown of some milestones, each one in its own transaction.
+    """
+    milestone_model = apps.get_model("milestones", "Milestone")
+    for milestone in milestone_model.objects.filter(id__in=milestones_ids).order_by("id"):
+        try:
+            compute_milestone_burndown(milestone)
+        except Exception:
+            # It will be computed in memory when it is read
+            logger.exception("Error computing the burndown of the milestone %s", milestone.id)
+
+
+def _refresh_burndown_items(user_stories_ids, tasks_ids):
+    burndown_model = apps.get_model("milestones", "MilestoneBurndown")
+    item_model = apps.get_model("milestones", "MilestoneBurndownItem")
+    user_story_model = apps.get_model("userstories", "UserStory")
+    task_model = apps.get_model("tasks", "Task")
+
+    keys = ([USERSTORY_ITEM_KEY.format(user_story_id) for user_story_id in user_stories_ids] +
+            [TASK_ITEM_KEY.format(task_id) for task_id in tasks_ids])
+
+    # Lock the burndowns of the milestones of the items, before and after
+    milestones_ids = set(item_model.objects.filter(key__in=keys).values_list("milestone_id", flat=True))
+    milestones_ids.update(user_story_model.objects.filter(id__in=user_stories_ids)
+                                                  .values_list("milestone_id", flat=True))
+    milestones_ids.update(task_model.objects.filter(id__in=tasks_ids).values_list("milestone_id", flat=True))
+    burndowns = {burndown.milestone_id: burndown
+                 for burndown in burndown_model.objects.select_for_update()
+                                                       .filter(milestone_id__in=milestones_ids)
+                                                       .order_by("milestone_id")}
+
+    # Once they are locked the items of these burndowns are only changed here
+    old_items = {item.key: (item.milestone_id, item.data)
+                 for item in item_model.objects.filter(key__in=keys)}
+    new_items = _get_userstories_items(user_stories_ids)
+    new_items.update(_get_tasks_items(tasks_ids))
+    if any(milestone_id not in milestones_ids
+           for milestone_id, stats in list(old_items.values()) + list(new_items.values())):
+        # Moved to other milestone in the meantime
+        return False
+
+    removed = defaultdict(list)
+    added = defaultdict(list)
+    changed_keys = []
+    for key in keys:
+        old_item = old_items.get(key)
+        new_item = new_items.get(key)
+        if old_item == new_item:
+            continue
+        if old_item is not None and old_item[0] in burndowns:
+            removed[old_item[0]].append(old_item[1])
+        if new_item is not None and new_item[0] in burndowns:
+            added[new_item[0]].append(new_item[1])
+        changed_keys.append(key)
+
+    for milestone_id in set(removed) | set(added):
+        burndown = burndowns[milestone_id]
+        _update_burndown(burndown, removed=removed[milestone_id], added=added[milestone_id])
+        burndown.save()
+
+    # Only the items of the milestones with burndown are kept
+    item_model.objects.filter(key__in=changed_keys).delete()
+    item_model.objects.bulk_create([item_model(key=key, milestone_id=new_items[key][0], data=new_items[key][1])
+                                    for key in changed_keys
+                                    if key in new_items and new_items[key][0] in burndowns])
+    return True
+
+
+def refresh_burndown_items(user_stories_ids=(), tasks_ids=()):
+    """
+    Compute again the burndown items of some user stories and tasks (with
+    the tasks of the user stories and the user stories of the tasks) and
+    apply the difference with the saved ones to the burndowns of their
+    milestones.
+    """
+    task_model = apps.get_model("tasks", "Task")
+    user_stories_ids = set(user_stories_ids)
+    tasks_ids = set(tasks_ids)
+    tasks_user_stories_ids = set(task_model.objects.filter(id__in=tasks_ids, user_story__isnull=False)
+                                                   .values_list("user_story_id", flat=True))
+    tasks_ids.update(task_model.objects.filter(user_story_id__in=user_stories_ids).values_list("id", flat=True))
+    user_stories_ids.update(tasks_user_stories_ids)
+
+    for attempt in range(REFRESH_ATTEMPTS):
+        try:
+            with tx.atomic():
+                if _refresh_burndown_items(user_stories_ids, tasks_ids):
+                    return
+        except Exception:
+            # The milestones will be fixed by the rebuild_milestones_burndown command
+            logger.exception("Error refreshing the burndown of the user stories %s and the tasks %s",
+                             sorted(user_stories_ids), sorted(tasks_ids))
+            return
+    logger.error("The burndown of the user stories %s and the tasks %s have been changed by other "
+                 "process in every attempt", sorted(user_stories_ids), sorted(tasks_ids))
+
+
+def _refresh_on_commit():
+    from . import tasks
+
+    pending = getattr(_local, "pending", None)
+    _local.pending = None
+    if pending is None:
+        return
+
+    milestones_ids = sorted(pending["milestones"])
+    user_stories_ids = sorted(pending["userstories"])
+    tasks_ids = sorted(pending["tasks"])
+    if settings.CELERY_ENABLED:
+        if milestones_ids:
+            tasks.refresh_milestones_burndown.delay(milestones_ids)
+        if user_stories_ids or tasks_ids:
+            tasks.refresh_burndown_items.delay(user_stories_ids, tasks_ids)
+    else:
+        if milestones_ids:
+            tasks.refresh_milestones_burndown(milestones_ids)
+        if user_stories_ids or tasks_ids:
+            tasks.refresh_burndown_items(user_stories_ids, tasks_ids)
+
+
+def schedule_burndown_refresh(milestones_ids=(), user_stories_ids=(), tasks_ids=()):
+    """
+    When the current transaction commits, compute the burndown of some
+    milestones and refresh the burndown items of some user stories and tasks.
+    """
+    pending = getattr(_local, "pending", None)
+    if pending is None:
+        pending = _local.pending = {"milestones": set(), "userstories": set(), "tasks": set()}
+    pending["milestones"].update(i for i in milestones_ids if i is not None)
+    pending["userstories"].update(i for i in user_stories_ids if i is not None)
+    pending["tasks"].update(i for i in tasks_ids if i is not None)
+
+    # The hooks of a rolled back savepoint are discarded, so every call has
+    # its own one: the first one to run refreshes all the pending ones (the
+    # ones of a rolled back transaction too, harmless because the refresh is
+    # idempotent) and the rest have nothing to do.
+    tx.on_commit(_refresh_on_commit)
+
+
+def refresh_project_milestones_burndown(project_id):
+    """
+    Compute again, when the current transaction commits, the burndown of the
+    milestones of a project that have one.
+    """
+    burndown_model = apps.get_model("milestones", "MilestoneBurndown")
+    schedule_burndown_refresh(milestones_ids=burndown_model.objects.filter(milestone__project_id=project_id)
+                                                                   .values_list("milestone_id", flat=True))
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.18 on 2026-10-17 11:30
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import taiga.base.db.models.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('milestones', '0003_auto_20200615_0811'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MilestoneBurndown',
+            fields=[
+                ('milestone', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='burndown', serialize=False, to='milestones.Milestone', verbose_name='milestone')),
+                ('estimated_start', models.DateField(verbose_name='estimated start date')),
+                ('estimated_finish', models.DateField(verbose_name='estimated finish date')),
+                ('total_points', taiga.base.db.models.fields.JSONField(default=list, verbose_name='total points')),
+                ('closed_points', taiga.base.db.models.fields.JSONField(default=list, verbose_name='closed points')),
+                ('closed_points_by_day', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(), default=list, size=None, verbose_name='closed points by day')),
+                ('total_userstories', models.PositiveIntegerField(default=0, verbose_name='total user stories')),
+                ('completed_userstories', models.PositiveIntegerField(default=0, verbose_name='completed user stories')),
+                ('total_tasks', models.PositiveIntegerField(default=0, verbose_name='total tasks')),
+                ('completed_tasks', models.PositiveIntegerField(default=0, verbose_name='completed tasks')),
+                ('iocaine_doses', models.PositiveIntegerField(default=0, verbose_name='iocaine doses')),
+                ('modified_date', models.DateTimeField(default=django.utils.timezone.now, verbose_name='modified date')),
+            ],
+            options={
+                'verbose_name': 'milestone burndown',
+                'verbose_name_plural': 'milestone burndowns',
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.18 on 2026-10-17 18:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+import taiga.base.db.models.fields
+
+
+def delete_milestones_burndown(apps, schema_editor):
+    # Without their items they can not be refreshed, they must be computed
+    # again by the rebuild_milestones_burndown command
+    apps.get_model("milestones", "MilestoneBurndown").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('milestones', '0004_milestoneburndown'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MilestoneBurndownItem',
+            fields=[
+                ('key', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='key')),
+                ('data', taiga.base.db.models.fields.JSONField(default=dict, verbose_name='data')),
+                ('milestone', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='burndown_items', to='milestones.Milestone', verbose_name='milestone')),
+            ],
+            options={
+                'verbose_name': 'milestone burndown item',
+                'verbose_name_plural': 'milestone burndown items',
+            },
+        ),
+        migrations.RunPython(delete_milestones_burndown, migrations.RunPython.noop),
+    ]
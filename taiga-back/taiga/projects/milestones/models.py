@@ -14,6 +14,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from django.contrib.postgres.fields import ArrayField
 from django.db import models
 from django.db.models import Count
 from django.conf import settings
@@ -22,6 +23,7 @@ from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.utils.functional import cached_property
 
+from taiga.base.db.models.fields import JSONField
 from taiga.base.utils.slug import slugify_uniquely
 from taiga.base.utils.dicts import dict_sum
 from taiga.projects.notifications.mixins import WatchedModelMixin
@@ -180,3 +182,76 @@ class Milestone(WatchedModelMixin, models.Model):
                 current_date = current_date + datetime.timedelta(days=1)
 
         return self._total_closed_points_by_date.get(date, 0)
+
+
+class MilestoneBurndown(models.Model):
+    """
+    The stats of a milestone, with the closed points of every day of its
+    estimated dates, kept up to date by taiga.projects.milestones.burndown.
+    """
+    milestone = models.OneToOneField(
+        "milestones.Milestone",
+        null=False,
+        blank=False,
+        primary_key=True,
+        related_name="burndown",
+        verbose_name=_("milestone"),
+        on_delete=models.CASCADE,
+    )
+    estimated_start = models.DateField(null=False, blank=False,
+                                       verbose_name=_("estimated start date"))
+    estimated_finish = models.DateField(null=False, blank=False,
+                                        verbose_name=_("estimated finish date"))
+    # Lists of [role id, points], in the order of the roles
+    total_points = JSONField(null=False, blank=False, default=list,
+                             verbose_name=_("total points"))
+    closed_points = JSONField(null=False, blank=False, default=list,
+                              verbose_name=_("closed points"))
+    closed_points_by_day = ArrayField(models.FloatField(), null=False, blank=False, default=list,
+                                      verbose_name=_("closed points by day"))
+    total_userstories = models.PositiveIntegerField(null=False, blank=False, default=0,
+                                                    verbose_name=_("total user stories"))
+    completed_userstories = models.PositiveIntegerField(null=False, blank=False, default=0,
+                                                        verbose_name=_("completed user stories"))
+    total_tasks = models.PositiveIntegerField(null=False, blank=False, default=0,
+                                              verbose_name=_("total tasks"))
+    completed_tasks = models.PositiveIntegerField(null=False, blank=False, default=0,
+                                                  verbose_name=_("completed tasks"))
+    iocaine_doses = models.PositiveIntegerField(null=False, blank=False, default=0,
+                                                verbose_name=_("iocaine doses"))
+    modified_date = models.DateTimeField(null=False, blank=False, default=timezone.now,
+                                         verbose_name=_("modified date"))
+
+    class Meta:
+        verbose_name = "milestone burndown"
+        verbose_name_plural = "milestone burndowns"
+
+    def __str__(self):
+        return "Burndown of {}".format(self.milestone_id)
+
+
+class MilestoneBurndownItem(models.Model):
+    """
+    The part of the stats of a milestone with burndown added by one of its
+    user stories or tasks, to apply the difference when they change.
+    """
+    # "userstories.userstory:<id>" or "tasks.task:<id>"
+    key = models.CharField(max_length=255, null=False, blank=False, primary_key=True,
+                           verbose_name=_("key"))
+    milestone = models.ForeignKey(
+        "milestones.Milestone",
+        null=False,
+        blank=False,
+        related_name="burndown_items",
+        verbose_name=_("milestone"),
+        on_delete=models.CASCADE,
+    )
+    data = JSONField(null=False, blank=False, default=dict,
+                     verbose_name=_("data"))
+
+    class Meta:
+        verbose_name = "milestone burndown item"
+        verbose_name_plural = "milestone burndown items"
+
+    def __str__(self):
+        return "Burndown item {}".format(self.key)
@@ -16,7 +16,10 @@
 
 from taiga.base.utils import db
 from taiga.events import events
-from taiga.projects.history.services import take_snapshot
+from taiga.projects import filters_data_cache
+from taiga.projects.history.services import prepare_queryset_for_freeze
+from taiga.projects.milestones import burndown
+from taiga.projects.history.services import take_snapshots_in_bulk
 from taiga.projects.services import apply_order_updates
 from taiga.projects.issues.models import Issue
 from taiga.projects.tasks.models import Task
@@ -91,16 +94,16 @@ def update_userstories_milestone_in_bulk(bulk_data: list, milestone: object):
         user_story_id__in=[e["us_id"] for e in bulk_data]).update(
         milestone=milestone)
 
+    filters_data_cache.invalidate_filters_data(milestone.project_id)
+    burndown.schedule_burndown_refresh(user_stories_ids=user_story_ids)
+
     return us_orders
 
 
 def snapshot_userstories_in_bulk(bulk_data, user):
-    for us_data in bulk_data:
-        try:
-            us = UserStory.objects.get(pk=us_data['us_id'])
-            take_snapshot(us, user=user)
-        except UserStory.DoesNotExist:
-            pass
+    user_stories = UserStory.objects.filter(pk__in=[us_data['us_id'] for us_data in bulk_data])
+    user_stories = prepare_queryset_for_freeze(user_stories)
+    take_snapshots_in_bulk(list(user_stories), user=user, refetch=False)
 
 
 def update_tasks_milestone_in_bulk(bulk_data: list, milestone: object):
@@ -143,12 +146,9 @@ def update_tasks_milestone_in_bulk(bulk_data: list, milestone: object):
 
 
 def snapshot_tasks_in_bulk(bulk_data, user):
-    for task_data in bulk_data:
-        try:
-            task = Task.objects.get(pk=task_data['task_id'])
-            take_snapshot(task, user=user)
-        except Task.DoesNotExist:
-            pass
+    tasks = Task.objects.filter(pk__in=[task_data['task_id'] for task_data in bulk_data])
+    tasks = prepare_queryset_for_freeze(tasks)
+    take_snapshots_in_bulk(list(tasks), user=user, refetch=False)
 
 
 def update_issues_milestone_in_bulk(bulk_data: list, milestone: object):
@@ -177,9 +177,6 @@ def update_issues_milestone_in_bulk(bulk_data: list, milestone: object):
 
 
 def snapshot_issues_in_bulk(bulk_data, user):
-    for issue_data in bulk_data:
-        try:
-            issue = Issue.objects.get(pk=issue_data['issue_id'])
-            take_snapshot(issue, user=user)
-        except Issue.DoesNotExist:
-            pass
+    issues = Issue.objects.filter(pk__in=[issue_data['issue_id'] for issue_data in bulk_data])
+    issues = prepare_queryset_for_freeze(issues)
+    take_snapshots_in_bulk(list(issues), user=user, refetch=False)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from django.apps import apps
+
+from . import burndown
+
+
+TASK_BURNDOWN_FIELDS = ("milestone_id", "user_story_id", "status_id", "finished_date", "is_iocaine")
+USERSTORY_BURNDOWN_FIELDS = ("milestone_id", "is_closed", "finish_date", "status_id")
+
+
+def _has_changed(instance, fields):
+    prev = getattr(instance, "prev", None)
+    if prev is None:
+        return True
+    return any(getattr(prev, field) != getattr(instance, field) for field in fields)
+
+
+####################################
+# Signals for milestones burndown
+####################################
+
+def refresh_burndown_on_task_change(sender, instance, **kwargs):
+    if kwargs.get("created") is False and not _has_changed(instance, TASK_BURNDOWN_FIELDS):
+        return
+
+    # The points of a user story are closed by its tasks
+    prev = getattr(instance, "prev", None)
+    burndown.schedule_burndown_refresh(user_stories_ids=[instance.user_story_id,
+                                                         getattr(prev, "user_story_id", None)],
+                                       tasks_ids=[instance.id])
+
+
+def refresh_burndown_on_userstory_change(sender, instance, **kwargs):
+    if kwargs.get("created") is False and not _has_changed(instance, USERSTORY_BURNDOWN_FIELDS):
+        return
+
+    burndown.schedule_burndown_refresh(user_stories_ids=[instance.id])
+
+
+def refresh_burndown_on_role_points_change(sender, instance, **kwargs):
+    burndown.schedule_burndown_refresh(user_stories_ids=[instance.user_story_id])
+
+
+def refresh_burndown_on_project_change(sender, instance, **kwargs):
+    # The points values and the closed task statuses are used by all the
+    # milestones of the project
+    burndown.refresh_project_milestones_burndown(instance.project_id)
+
+
+def refresh_burndown_on_milestone_change(sender, instance, created, **kwargs):
+    burndown_model = apps.get_model("milestones", "MilestoneBurndown")
+    if created or (burndown_model.objects.filter(milestone_id=instance.id)
+                                         .exclude(estimated_start=instance.estimated_start,
+                                                  estimated_finish=instance.estimated_finish)
+                                         .exists()):
+        burndown.schedule_burndown_refresh(milestones_ids=[instance.id])
@@ -48,12 +48,8 @@ from taiga.projects.notifications.services import (
     set_notify_policy_level_to_ignore,
     create_notify_policy_if_not_exists)
 
-from taiga.timeline.service import build_project_namespace
-
 from . import choices
 
-from dateutil.relativedelta import relativedelta
-
 
 def get_project_logo_file_path(instance, filename):
     return get_file_path(instance, filename, "project")
@@ -337,52 +333,16 @@ class Project(ProjectDefaults, TaggedMixin, TagsColorsMixin, models.Model):
         else:
             super().save(*args, **kwargs)
 
-    def refresh_totals(self, save=True):
-        now = timezone.now()
-        self.totals_updated_datetime = now
-
-        Like = apps.get_model("likes", "Like")
-        content_type = apps.get_model("contenttypes", "ContentType").objects.get_for_model(Project)
-        qs = Like.objects.filter(content_type=content_type, object_id=self.id)
-
-        self.total_fans = qs.count()
-
-        qs_week = qs.filter(created_date__gte=now - relativedelta(weeks=1))
-        self.total_fans_last_week = qs_week.count()
-
-        qs_month = qs.filter(created_date__gte=now - relativedelta(months=1))
-        self.total_fans_last_month = qs_month.count()
-
-        qs_year = qs.filter(created_date__gte=now - relativedelta(years=1))
-        self.total_fans_last_year = qs_year.count()
-
-        tl_model = apps.get_model("timeline", "Timeline")
-        namespace = build_project_namespace(self)
-
-        qs = tl_model.objects.filter(namespace=namespace)
-        self.total_activity = qs.count()
-
-        qs_week = qs.filter(created__gte=now - relativedelta(weeks=1))
-        self.total_activity_last_week = qs_week.count()
-
-        qs_month = qs.filter(created__gte=now - relativedelta(months=1))
-        self.total_activity_last_month = qs_month.count()
-
-        qs_year = qs.filter(created__gte=now - relativedelta(years=1))
-        self.total_activity_last_year = qs_year.count()
+    def refresh_totals(self):
+        # Rebuild the totals from the timeline and the likes, see
+        # increment_totals to keep them updated on every new event.
+        from taiga.projects.services import totals as totals_services
+        totals_services.reconcile_projects_totals([self.id])
+        self.refresh_from_db(fields=totals_services.TOTALS_FIELDS)
 
-        if save:
-            self.save(update_fields=[
-                'totals_updated_datetime',
-                'total_fans',
-                'total_fans_last_week',
-                'total_fans_last_month',
-                'total_fans_last_year',
-                'total_activity',
-                'total_activity_last_week',
-                'total_activity_last_month',
-                'total_activity_last_year',
-            ])
+    def increment_totals(self, *, activity=0, fans=0, date=None):
+        from taiga.projects.services import totals as totals_services
+        totals_services.increment_project_totals(self, activity=activity, fans=fans, date=date)
 
     @cached_property
     def cached_user_stories(self):
@@ -541,6 +501,26 @@ class Project(ProjectDefaults, TaggedMixin, TagsColorsMixin, models.Model):
             connect_memberships_signals()
 
 
+class ProjectTotalsBucket(models.Model):
+    project = models.ForeignKey(
+        "Project",
+        null=False,
+        blank=False,
+        related_name="totals_buckets",
+        verbose_name=_("project"),
+        on_delete=models.CASCADE,
+    )
+    date = models.DateField(null=False, blank=False, verbose_name=_("date"))
+    activity = models.IntegerField(null=False, blank=False, default=0, verbose_name=_("activity"))
+    fans = models.IntegerField(null=False, blank=False, default=0, verbose_name=_("fans"))
+
+    class Meta:
+        verbose_name = "project totals bucket"
+        verbose_name_plural = "project totals buckets"
+        ordering = ["project", "date"]
+        unique_together = ("project", "date")
+
+
 class ProjectModulesConfig(models.Model):
     project = models.OneToOneField(
         "Project",
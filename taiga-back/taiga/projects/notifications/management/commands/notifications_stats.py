@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from django.core.management.base import BaseCommand
+
+from taiga.projects.notifications.metrics import get_notifications_metrics
+from taiga.projects.notifications.metrics import get_notifications_queue_stats
+from taiga.projects.notifications.metrics import reset_notifications_metrics
+
+
+class Command(BaseCommand):
+    help = 'Show the metrics of the notifications'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset',
+                            action='store_true',
+                            dest='reset',
+                            default=False,
+                            help='Reset the counters after showing them')
+
+    def handle(self, *args, **options):
+        metrics = get_notifications_metrics()
+
+        batches = metrics["email_batches"]
+        self.stdout.write("emails: {} batches, {} messages, {} errors".format(
+            batches, metrics["email_messages"], metrics["email_errors"]))
+        if batches:
+            self.stdout.write("emails: {:.1f} ms rendering and {:.1f} ms sending per batch".format(
+                metrics["email_render_ms"] / batches, metrics["email_send_ms"] / batches))
+
+        queue = get_notifications_queue_stats()
+        self.stdout.write("queue: {} pending, {} ready to send, the oldest one is {:.0f} s old".format(
+            queue["pending"], queue["ready"], queue["oldest_age"]))
+
+        if options["reset"]:
+            reset_notifications_metrics()
@@ -14,12 +14,47 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+# Examples:
+# python manage.py send_notifications
+# python manage.py send_notifications --jobs 4 --batch-size 50
+
+from concurrent.futures import ProcessPoolExecutor
 
 from django.core.management.base import BaseCommand
+from django.db import connections
 
 from taiga.projects.notifications.services import send_bulk_email
 
 class Command(BaseCommand):
+    help = 'Send the pending notifications'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs',
+                            action='store',
+                            dest='jobs',
+                            type=int,
+                            default=1,
+                            help='Number of processes sending notifications at the same time')
+        parser.add_argument('--batch-size',
+                            action='store',
+                            dest='batch_size',
+                            type=int,
+                            default=None,
+                            help='Notifications claimed by a process in every transaction')
 
     def handle(self, *args, **options):
-        send_bulk_email()
+        jobs = max(options["jobs"], 1)
+        batch_size = options["batch_size"]
+
+        if jobs == 1:
+            total = send_bulk_email(batch_size)
+        else:
+            # Close the connections before forking, every worker
+            # process must open its own database connection.
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                futures = [executor.submit(send_bulk_email, batch_size) for i in range(jobs)]
+                total = sum(future.result() for future in futures)
+
+        if options["verbosity"] > 1:
+            self.stdout.write("{} notifications processed".format(total))
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Metrics of the notifications.
+
+The counters are stored in the django cache (use a cache shared by all
+the processes) and can be read with `get_notifications_metrics` or the
+notifications_stats command. The state of the queue of pending
+notifications is read from the database with `get_notifications_queue_stats`.
+"""
+
+import datetime
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("email_batches", "email_messages", "email_render_ms", "email_send_ms", "email_errors")
+
+
+def _get_key(name: str) -> str:
+    return "notifications/metrics/{}".format(name)
+
+
+def _incr_counters(**deltas):
+    for name, delta in deltas.items():
+        if not delta:
+            continue
+
+        key = _get_key(name)
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            if not cache.add(key, delta, timeout=None):
+                cache.incr(key, delta)
+
+
+def record_email_batch(*, messages: int, render_time: float, send_time: float, errors: int=0):
+    """
+    Count a batch of notification emails, with its render and send times
+    (in seconds).
+    """
+    _incr_counters(email_batches=1,
+                   email_messages=messages,
+                   email_render_ms=int(render_time * 1000),
+                   email_send_ms=int(send_time * 1000),
+                   email_errors=errors)
+    logger.info("Notification emails batch: %s messages, rendered in %.1f ms, sent in %.1f ms",
+                messages, render_time * 1000, send_time * 1000)
+
+
+def get_notifications_metrics() -> dict:
+    keys = {_get_key(name): name for name in COUNTERS}
+    values = cache.get_many(keys.keys())
+    return {name: values.get(key, 0) for key, name in keys.items()}
+
+
+def reset_notifications_metrics():
+    cache.delete_many([_get_key(name) for name in COUNTERS])
+
+
+def get_notifications_queue_stats(now=None) -> dict:
+    """
+    Get the depth of the queue of pending notifications (`pending`, and
+    `ready` to be sent) and the age in seconds of the oldest one.
+    """
+    from .models import HistoryChangeNotification
+
+    now = now or timezone.now()
+    ready_before = now - datetime.timedelta(seconds=settings.CHANGE_NOTIFICATIONS_MIN_INTERVAL)
+    stats = HistoryChangeNotification.objects.aggregate(
+        pending=Count("id"),
+        ready=Count("id", filter=Q(updated_datetime__lte=ready_before)),
+        oldest=Min("created_datetime"),
+    )
+    oldest = stats.pop("oldest")
+    stats["oldest_age"] = (now - oldest).total_seconds() if oldest else 0
+    return stats
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.18 on 2026-10-17 11:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0009_auto_20200615_0811'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='historychangenotification',
+            name='updated_datetime',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='updated date time'),
+        ),
+    ]
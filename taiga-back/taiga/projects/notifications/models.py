@@ -69,7 +69,7 @@ class HistoryChangeNotification(models.Model):
     )
     created_datetime = models.DateTimeField(null=False, blank=False, auto_now_add=True,
                                             verbose_name=_("created date time"))
-    updated_datetime = models.DateTimeField(null=False, blank=False, auto_now_add=True,
+    updated_datetime = models.DateTimeField(null=False, blank=False, auto_now_add=True, db_index=True,
                                             verbose_name=_("updated date time"))
     history_entries = models.ManyToManyField("history.HistoryEntry",
                                              verbose_name=_("history entries"),
@@ -14,10 +14,11 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import copy
 import datetime
-
-from functools import partial
 import logging
+import time
+import uuid
 
 from django.apps import apps
 from django.db import IntegrityError, transaction
@@ -25,24 +26,24 @@ from django.db.models import Q
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.auth import get_user_model
+from django.core import mail
 from django.utils import timezone
 from django.utils.translation import ugettext as _
 
 from taiga.base import exceptions as exc
-from taiga.base.utils.iterators import iter_queryset
 from taiga.base.mails import InlineCSSTemplateMail
 from taiga.front.templatetags.functions import resolve as resolve_front_url
 from taiga.projects.notifications.choices import NotifyLevel
 from taiga.projects.notifications.models import HistoryChangeNotification
 from taiga.projects.history.choices import HistoryType
 from taiga.projects.history.services import (make_key_from_model_object,
-                                             get_last_snapshot_for_key,
+                                             get_current_snapshot_for_key,
                                              get_model_from_key)
-from taiga.permissions.services import user_has_perm
 from taiga.events import events
 
-from django_pglocks import advisory_lock
+from markupsafe import escape
 
+from . import metrics
 from .models import HistoryChangeNotification, Watched
 from .squashing import squash_history_entries
 
@@ -142,7 +143,7 @@ def get_mentions(project: object, text: str):
     return data.get("mentions")
 
 
-def _filter_by_permissions(obj, user):
+def _get_view_permission(obj):
     UserStory = apps.get_model("userstories", "UserStory")
     Issue = apps.get_model("issues", "Issue")
     Task = apps.get_model("tasks", "Task")
@@ -150,48 +151,63 @@ def _filter_by_permissions(obj, user):
     WikiPage = apps.get_model("wiki", "WikiPage")
 
     if isinstance(obj, UserStory):
-        return user_has_perm(user, "view_us", obj, cache="project")
+        return "view_us"
     elif isinstance(obj, Issue):
-        return user_has_perm(user, "view_issues", obj, cache="project")
+        return "view_issues"
     elif isinstance(obj, Task):
-        return user_has_perm(user, "view_tasks", obj, cache="project")
+        return "view_tasks"
     elif isinstance(obj, Epic):
-        return user_has_perm(user, "view_epics", obj, cache="project")
+        return "view_epics"
     elif isinstance(obj, WikiPage):
-        return user_has_perm(user, "view_wiki_pages", obj, cache="project")
-    return False
+        return "view_wiki_pages"
+    return None
+
+
+def _filter_by_permissions(obj, users) -> set:
+    """
+    Get the users that can view obj, with one query over the memberships
+    and their roles instead of resolving the permissions of every user.
+    """
+    perm = _get_view_permission(obj)
+    if perm is None:
+        return set()
+
+    # The public and anon permissions are granted to every (registered) user
+    project = obj.project
+    if perm in (project.public_permissions or []) or perm in (project.anon_permissions or []):
+        return set(users)
+
+    allowed = {user for user in users if user.is_superuser}
+    users_ids = [user.id for user in users if not user.is_superuser]
+    if users_ids:
+        membership_model = apps.get_model("projects", "Membership")
+        members_ids = set(membership_model.objects.filter(project_id=project.id, user_id__in=users_ids)
+                                                  .filter(Q(is_admin=True) | Q(role__permissions__contains=[perm]))
+                                                  .values_list("user_id", flat=True))
+        allowed.update(user for user in users if user.id in members_ids)
+
+    return allowed
 
 
 def _filter_notificable(user):
     return user.is_active and not user.is_system
 
 
-def get_users_to_notify(obj, *, history=None, discard_users=None, live=False) -> list:
+def get_notification_audiences(obj, *, history=None, discard_users=None) -> tuple:
     """
-    Get filtered set of users to notify for specified
-    model instance and changer.
+    Get the filtered sets of users to notify by email and live for
+    specified model instance, computed in one pass.
 
-    NOTE: changer at this momment is not used.
     NOTE: analogouts to obj.get_watchers_to_notify(changer)
     """
     project = obj.get_project()
 
-    def _check_level(project: object, user: object, levels: tuple) -> bool:
-        policy = project.cached_notify_policy_for_user(user)
-        if live:
-            return policy.live_notify_level in levels
-        return policy.notify_level in levels
-
-    _can_notify_hard = partial(_check_level, project,
-                               levels=[NotifyLevel.all])
-    _can_notify_light = partial(_check_level, project,
-                                levels=[NotifyLevel.all, NotifyLevel.involved])
-
-    candidates = set()
-    candidates.update(filter(_can_notify_hard, project.members.all()))
-    candidates.update(filter(_can_notify_hard, obj.project.get_watchers()))
-    candidates.update(filter(_can_notify_light, obj.get_watchers()))
-    candidates.update(filter(_can_notify_light, obj.get_participants()))
+    # The members and the project watchers are notified only with the "all"
+    # level, the watchers and participants of the object with "involved" too.
+    hard_candidates = set(project.members.all())
+    hard_candidates.update(obj.project.get_watchers())
+    light_candidates = set(obj.get_watchers())
+    light_candidates.update(obj.get_participants())
 
     # If the history is an unassignment change we should notify that user too
     user_ids = []
@@ -199,20 +215,44 @@ def get_users_to_notify(obj, *, history=None, discard_users=None, live=False) ->
         user_ids = [user_id for user_id in history.diff["assigned_to"] if isinstance(user_id, int)]
 
     if user_ids:
-        assigned_to_users = get_user_model().objects.filter(id__in=user_ids)
-        candidates.update(filter(_can_notify_light, assigned_to_users))
+        light_candidates.update(get_user_model().objects.filter(id__in=user_ids))
+
+    email_candidates = set()
+    live_candidates = set()
+    for user in hard_candidates | light_candidates:
+        if user in light_candidates:
+            levels = (NotifyLevel.all, NotifyLevel.involved)
+        else:
+            levels = (NotifyLevel.all,)
+
+        policy = project.cached_notify_policy_for_user(user)
+        if policy.notify_level in levels:
+            email_candidates.add(user)
+        if policy.live_notify_level in levels:
+            live_candidates.add(user)
+
+    candidates = email_candidates | live_candidates
 
     # Remove the changer from candidates
     if discard_users:
         candidates = candidates - set(discard_users)
 
+    # Filter disabled and system users
+    candidates = set(filter(_filter_notificable, candidates))
+
     # Filter by object permissions
-    candidates = set(filter(partial(_filter_by_permissions, obj), candidates))
+    candidates = _filter_by_permissions(obj, candidates)
 
-    # Filter disabled and system users
-    candidates = set(filter(partial(_filter_notificable), candidates))
+    return frozenset(email_candidates & candidates), frozenset(live_candidates & candidates)
 
-    return frozenset(candidates)
+
+def get_users_to_notify(obj, *, history=None, discard_users=None, live=False) -> list:
+    """
+    Get filtered set of users to notify (by email or live) for
+    specified model instance and changer.
+    """
+    email_users, live_users = get_notification_audiences(obj, history=history, discard_users=discard_users)
+    return live_users if live else email_users
 
 
 def _resolve_template_name(model: object, *, change_type: int) -> str:
@@ -248,6 +288,73 @@ def _make_template_mail(name: str):
     return cls()
 
 
+class _RecipientPlaceholder:
+    """
+    Stand-in for the recipient of an email rendered once for several users,
+    its name is a token replaced by the name of every user. It remembers if
+    the templates used anything else of the user.
+    """
+
+    def __init__(self, user):
+        self._user = user
+        self.token = "TAIGARECIPIENT{}".format(uuid.uuid4().hex)
+        self.is_generic = True
+
+    def get_full_name(self):
+        return self.token
+
+    def __getattr__(self, name):
+        self.is_generic = False
+        return getattr(self._user, name)
+
+
+def _personalize_email(prototype, token, user):
+    name = str(escape(user.get_full_name()))
+    message = copy.copy(prototype)
+    message.to = [user.email]
+    message.extra_headers = dict(prototype.extra_headers)
+    message.subject = prototype.subject.replace(token, " ".join(name.split()))
+    message.body = prototype.body.replace(token, name)
+    if hasattr(prototype, "alternatives"):
+        message.alternatives = [(content.replace(token, name), mimetype)
+                                for content, mimetype in prototype.alternatives]
+    return message
+
+
+def _make_notification_emails(email, users, context, headers) -> tuple:
+    """
+    Make the email messages of the users. The templates are rendered once
+    by language and the name of every user is replaced in a copy.
+    """
+    users_by_lang = {}
+    for user in users:
+        users_by_lang.setdefault(user.lang or settings.LANGUAGE_CODE, []).append(user)
+
+    messages = []
+    errors = 0
+    for lang, lang_users in users_by_lang.items():
+        try:
+            recipient = _RecipientPlaceholder(lang_users[0])
+            prototype = email.make_email_object(lang_users[0].email, dict(context, user=recipient, lang=lang),
+                                                headers=headers)
+            if recipient.is_generic:
+                messages += [_personalize_email(prototype, recipient.token, user) for user in lang_users]
+                continue
+        except Exception:
+            logger.exception("Error rendering email notifications")
+
+        # The templates depend on the user, render them for every user
+        for user in lang_users:
+            try:
+                messages.append(email.make_email_object(user.email, dict(context, user=user, lang=lang),
+                                                        headers=headers))
+            except Exception:
+                logger.exception("Error rendering email notifications")
+                errors += 1
+
+    return messages, errors
+
+
 @transaction.atomic
 def send_notifications(obj, *, history):
     if history.is_hidden:
@@ -266,16 +373,15 @@ def send_notifications(obj, *, history):
 
     # Get a complete list of notifiable users for current
     # object and send the change notification to them.
-    notify_users = get_users_to_notify(obj, history=history, discard_users=[notification.owner])
+    notify_users, live_notify_users = get_notification_audiences(obj, history=history,
+                                                                 discard_users=[notification.owner])
     notification.notify_users.add(*notify_users)
 
     # If we are the min interval is 0 it just work in a synchronous and spamming way
     if settings.CHANGE_NOTIFICATIONS_MIN_INTERVAL == 0:
         send_sync_notifications(notification.id)
 
-    live_notify_users = get_users_to_notify(obj, history=history, discard_users=[notification.owner], live=True)
-    for user in live_notify_users:
-        events.emit_live_notification_for_model(obj, user, history)
+    events.emit_live_notification_for_users(obj, live_notify_users, history)
 
 
 @transaction.atomic
@@ -303,7 +409,7 @@ def send_sync_notifications(notification_id):
     # If the last modification is too recent we ignore it for the time being
     now = timezone.now()
     time_diff = now - notification.updated_datetime
-    if time_diff.seconds < settings.CHANGE_NOTIFICATIONS_MIN_INTERVAL:
+    if time_diff.total_seconds() < settings.CHANGE_NOTIFICATIONS_MIN_INTERVAL:
         return False, []
 
     # Custom Hardcode Filter
@@ -324,6 +430,8 @@ def send_sync_notifications(notification_id):
     else:
         qs = qs.all()
 
+    # The values_diff of the entries not filled yet by the background task
+    # are computed without the html diffs and not stored
     history_entries = tuple(qs)
     history_entries = list(squash_history_entries(history_entries))
 
@@ -333,7 +441,7 @@ def send_sync_notifications(notification_id):
         notification.delete()
         return False, []
 
-    obj, _ = get_last_snapshot_for_key(notification.key)
+    obj, _ = get_current_snapshot_for_key(notification.key)
     obj_class = get_model_from_key(obj.key)
 
     context = {"obj_class": obj_class,
@@ -374,15 +482,48 @@ def send_sync_notifications(notification_id):
         "List-Unsubscribe": "<{unsubscribe_url}>".format(**format_args),
     }
 
-    for user in notification.notify_users.distinct():
-        context["user"] = user
-        context["lang"] = user.lang or settings.LANGUAGE_CODE
+    users = list(notification.notify_users.distinct())
+    start = time.perf_counter()
+    messages, errors = _make_notification_emails(email, users, context, headers)
+    render_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    errors += _send_notification_emails(messages)
+    send_time = time.perf_counter() - start
+
+    metrics.record_email_batch(messages=len(messages), render_time=render_time, send_time=send_time,
+                               errors=errors)
+
+    notification_id = notification.id
+    notification.delete()
+    return notification_id, history_entries
+
+
+def _send_notification_emails(messages) -> int:
+    """
+    Send the messages with the same connection, every one on its own so
+    an error sending one (a refused recipient...) doesn't stop the rest.
+    Returns the number of errors.
+    """
+    if not messages:
+        return 0
+
+    errors = 0
+    connection = mail.get_connection()
+    try:
+        connection.open()
+    except Exception:
+        # Every message will try to open it again
+        logger.exception("Error opening the email connection")
+
+    for message in messages:
         try:
-            email.send(user.email, context, headers=headers)
+            connection.send_messages([message])
         except Exception:
             """
             Catch all smtp exceptions:
 
+              - smtplib.SMTPRecipientsRefused
               - smtplib.SMTPDataError
               - smtplib.SMTPException
               - smtplib.SMTPServerDisconnected
@@ -392,10 +533,14 @@ def send_sync_notifications(notification_id):
               - ...
             """
             logger.exception("Error sending email notifications")
+            errors += 1
 
-    notification_id = notification.id
-    notification.delete()
-    return notification_id, history_entries
+    try:
+        connection.close()
+    except Exception:
+        logger.exception("Error closing the email connection")
+
+    return errors
 
 
 def process_sync_notifications():
@@ -583,12 +728,80 @@ def make_ms_thread_index(msg_id, dt):
     return base64.b64encode(thread_bin).decode("utf-8")
 
 
-def send_bulk_email():
-    with advisory_lock("send-notifications-command", wait=False) as acquired:
-        if acquired:
-            qs = HistoryChangeNotification.objects.all().order_by("-id")
-            for change_notification in iter_queryset(qs, itersize=100):
-                try:
-                    send_sync_notifications(change_notification.pk)
-                except HistoryChangeNotification.DoesNotExist:
-                    pass
+def get_ready_notifications_queryset(now=None):
+    """
+    Get the pending notifications whose last modification is older than
+    CHANGE_NOTIFICATIONS_MIN_INTERVAL, the oldest first.
+    """
+    now = now or timezone.now()
+    min_interval = datetime.timedelta(seconds=settings.CHANGE_NOTIFICATIONS_MIN_INTERVAL)
+    return (HistoryChangeNotification.objects
+                                     .filter(updated_datetime__lte=now - min_interval)
+                                     .order_by("updated_datetime", "id"))
+
+
+def _claim_notification(notification_id) -> bool:
+    """
+    Lock a ready notification until the transaction ends. The lock is not
+    taken (and False returned) if another sender has already claimed it
+    or it is not pending anymore.
+    """
+    qs = (get_ready_notifications_queryset().select_for_update(skip_locked=True)
+                                            .filter(id=notification_id))
+    return bool(list(qs.values_list("id", flat=True)))
+
+
+def send_notifications_batch(batch_size=None, failed_ids=None):
+    """
+    Send a batch of ready notifications.
+
+    Every notification is claimed and sent in its own short transaction,
+    the row is locked with `SELECT ... FOR UPDATE SKIP LOCKED` only while
+    it is sent, so other senders skip it instead of waiting and the writers
+    of its item only wait for that one. An error only rolls back its own
+    transaction, it is logged and the notification is added to `failed_ids`
+    (the ids in it are not selected).
+    Return the number of claimed notifications (0 when the queue is drained
+    or the rest of it is being sent by other senders).
+    """
+    batch_size = batch_size or settings.CHANGE_NOTIFICATIONS_BATCH_SIZE
+    qs = get_ready_notifications_queryset()
+    if failed_ids:
+        qs = qs.exclude(id__in=failed_ids)
+    notifications_ids = list(qs.values_list("id", flat=True)[:batch_size])
+
+    claimed = 0
+    for notification_id in notifications_ids:
+        try:
+            with transaction.atomic():
+                if not _claim_notification(notification_id):
+                    continue
+
+                claimed += 1
+                send_sync_notifications(notification_id)
+        except HistoryChangeNotification.DoesNotExist:
+            pass
+        except Exception:
+            logger.exception("Error sending the notification %s", notification_id)
+            if failed_ids is not None:
+                failed_ids.add(notification_id)
+
+    return claimed
+
+
+def send_bulk_email(batch_size=None):
+    """
+    Send the ready notifications, batch by batch, until the queue is drained.
+
+    It can be run by several processes or celery workers at the same time,
+    each one claims its own batches (see `send_notifications_batch`).
+    Return the number of processed notifications.
+    """
+    total = 0
+    # The notifications that fail are skipped until the next run
+    failed_ids = set()
+    while True:
+        claimed = send_notifications_batch(batch_size, failed_ids=failed_ids)
+        if not claimed:
+            return total
+        total += claimed
@@ -20,5 +20,7 @@ from . import services
 
 
 @app.task()
-def send_bulk_email():
-    services.send_bulk_email()
+def send_bulk_email(batch_size=None):
+    # Several workers can run it at the same time, every one
+    # of them claims its own batches of notifications.
+    services.send_bulk_email(batch_size)
@@ -61,5 +61,10 @@ from .stats import get_stats_for_project_issues
 from .stats import get_stats_for_project
 from .stats import get_member_stats_for_project
 
+from .totals import increment_project_totals
+from .totals import refresh_projects_totals_windows
+from .totals import reconcile_projects_totals
+from .totals import reconcile_all_projects_totals
+
 from .transfer import request_project_transfer, start_project_transfer
 from .transfer import accept_project_transfer, reject_project_transfer
@@ -22,6 +22,7 @@ from django.core.exceptions import ObjectDoesNotExist
 from psycopg2.extras import execute_values
 
 from taiga.events import events
+from taiga.projects import filters_data_cache
 from taiga.projects import models
 
 
@@ -114,6 +115,8 @@ def bulk_update_epic_status_order(project, user, data):
     cursor.execute("DEALLOCATE bulk_update_order")
     cursor.close()
 
+    filters_data_cache.invalidate_filters_data(project.id)
+
 
 @transaction.atomic
 def bulk_update_userstory_status_order(project, user, data):
@@ -131,6 +134,8 @@ def bulk_update_userstory_status_order(project, user, data):
     cursor.execute("DEALLOCATE bulk_update_order")
     cursor.close()
 
+    filters_data_cache.invalidate_filters_data(project.id)
+
 
 @transaction.atomic
 def bulk_update_points_order(project, user, data):
@@ -167,6 +172,8 @@ def bulk_update_task_status_order(project, user, data):
     cursor.execute("DEALLOCATE bulk_update_order")
     cursor.close()
 
+    filters_data_cache.invalidate_filters_data(project.id)
+
 
 @transaction.atomic
 def bulk_update_issue_status_order(project, user, data):
@@ -185,6 +192,8 @@ def bulk_update_issue_status_order(project, user, data):
     cursor.execute("DEALLOCATE bulk_update_order")
     cursor.close()
 
+    filters_data_cache.invalidate_filters_data(project.id)
+
 
 @transaction.atomic
 def bulk_update_issue_type_order(project, user, data):
@@ -203,6 +212,8 @@ def bulk_update_issue_type_order(project, user, data):
     cursor.execute("DEALLOCATE bulk_update_order")
     cursor.close()
 
+    filters_data_cache.invalidate_filters_data(project.id)
+
 
 @transaction.atomic
 def bulk_update_priority_order(project, user, data):
@@ -221,6 +232,8 @@ def bulk_update_priority_order(project, user, data):
     cursor.execute("DEALLOCATE bulk_update_order")
     cursor.close()
 
+    filters_data_cache.invalidate_filters_data(project.id)
+
 
 @transaction.atomic
 def bulk_update_severity_order(project, user, data):
@@ -239,6 +252,8 @@ def bulk_update_severity_order(project, user, data):
     cursor.execute("DEALLOCATE bulk_update_order")
     cursor.close()
 
+    filters_data_cache.invalidate_filters_data(project.id)
+
 
 @transaction.atomic
 def bulk_update_swimlane_order(project, user, data):
@@ -305,3 +320,5 @@ def update_order_and_swimlane(swimlane_to_be_deleted, move_to_swimlane):
                        FROM (VALUES %s) AS tmp (sid, ussid, new_order)
                        WHERE tmp.ussid = userstories_userstory.id""",
                        data)
+
+    filters_data_cache.invalidate_filters_data(swimlane_to_be_deleted.project_id)
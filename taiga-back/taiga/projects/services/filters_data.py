@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Filters data (the facets of the filters of the lists, with the count of
+items of every option) computed with one query.
+
+Every facet is counted over the items of its own queryset (the list
+filtered by all the filters except the one of the facet). The items of the
+project are scanned once, in the "filtered" CTE, with a boolean column
+`in_<facet>` by facet with the WHERE clause of its queryset, and the
+queries of the facets aggregate the rows of the CTE.
+"""
+
+from collections import OrderedDict
+from contextlib import closing
+from operator import itemgetter
+
+from django.db import connection
+from django.utils.translation import ugettext as _
+
+from taiga.users.gravatar import get_gravatar_id
+from taiga.users.services import get_big_photo_url, get_photo_url
+
+
+def get_queryset_where(queryset):
+    """
+    Get the sql (and its params) of the WHERE clause of a queryset.
+    """
+    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
+    return queryset.query.where.as_sql(compiler, connection)
+
+
+def fetch_filters_data(project, querysets, *, table, joins, columns, facets):
+    """
+    Get the rows of every facet in one query.
+
+    `table` and `joins` are the FROM clause of the querysets, `columns` the
+    columns of the items used by the facets and `facets` a list of `(name,
+    sql, params)`, the queries of the facets over the "filtered" CTE.
+    Return a dict with the list of rows (dicts) of every facet.
+    """
+    flags = []
+    params = []
+    for name, sql, facet_params in facets:
+        where, where_params = get_queryset_where(querysets[name])
+        flags.append('COALESCE(({where}), FALSE) "in_{name}"'.format(where=where or "TRUE", name=name))
+        params += where_params
+    params.append(project.id)
+
+    facets_sql = []
+    for name, sql, facet_params in facets:
+        facets_sql.append('(SELECT json_agg("facet") FROM ({sql}) "facet") "{name}"'.format(sql=sql, name=name))
+        params += facet_params
+
+    sql = """
+        WITH "filtered" AS (
+             SELECT {columns},
+                    {flags}
+               FROM "{table}"
+                    {joins}
+              WHERE "{table}"."project_id" = %s
+        )
+        SELECT {facets}
+    """.format(columns=",\n                    ".join(columns),
+               flags=",\n                    ".join(flags),
+               table=table,
+               joins=joins,
+               facets=",\n               ".join(facets_sql))
+
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+
+    return {name: rows or [] for (name, sql, facet_params), rows in zip(facets, row)}
+
+
+#####################################################
+# Facets queries
+#####################################################
+
+def catalog_facet(project, name, *, table, column, count="COUNT(*)"):
+    """
+    The statuses, types, priorities and severities of the project.
+    """
+    sql = """
+                 SELECT "{table}"."id" "id",
+                        "{table}"."name" "name",
+                        "{table}"."color" "color",
+                        "{table}"."order" "order",
+                        COALESCE("counters"."count", 0) "count"
+                   FROM "{table}"
+        LEFT OUTER JOIN (SELECT "{column}", {count} "count"
+                           FROM "filtered"
+                          WHERE "in_{name}"
+                       GROUP BY "{column}") "counters"
+                     ON "counters"."{column}" = "{table}"."id"
+                  WHERE "{table}"."project_id" = %s
+    """.format(table=table, column=column, count=count, name=name)
+    return (name, sql, [project.id])
+
+
+def assigned_to_facet(project, name="assigned_to", *, count="COUNT(*)"):
+    """
+    The members of the project and the unassigned items.
+    """
+    sql = """
+                 SELECT "projects_membership"."user_id" "id",
+                        "users_user"."full_name" "full_name",
+                        "users_user"."username" "username",
+                        COALESCE("counters"."count", 0) "count"
+                   FROM "projects_membership"
+        LEFT OUTER JOIN (SELECT "assigned_to_id", {count} "count"
+                           FROM "filtered"
+                          WHERE "in_{name}" AND "assigned_to_id" IS NOT NULL
+                       GROUP BY "assigned_to_id") "counters"
+                     ON "projects_membership"."user_id" = "counters"."assigned_to_id"
+             INNER JOIN "users_user"
+                     ON "projects_membership"."user_id" = "users_user"."id"
+                  WHERE "projects_membership"."project_id" = %s AND "projects_membership"."user_id" IS NOT NULL
+
+        UNION
+
+                 SELECT NULL, NULL, NULL, COUNT(*)
+                   FROM "filtered"
+                  WHERE "in_{name}" AND "assigned_to_id" IS NULL
+                 HAVING COUNT(*) > 0
+    """.format(count=count, name=name)
+    return (name, sql, [project.id])
+
+
+def owners_facet(project, name="owners", *, count="COUNT(*)", with_photos=False):
+    """
+    The members of the project and the system users.
+    """
+    if with_photos:
+        photo_columns = ', "users_user"."photo" "photo", "users_user"."email" "email"'
+        system_photo_columns = ", NULL, NULL"
+    else:
+        photo_columns = system_photo_columns = ""
+
+    sql = """
+          WITH "counters" AS (SELECT "owner_id", {count} "count"
+                                FROM "filtered"
+                               WHERE "in_{name}"
+                            GROUP BY "owner_id")
+                 SELECT "projects_membership"."user_id" "id",
+                        "users_user"."full_name" "full_name",
+                        "users_user"."username" "username",
+                        COALESCE("counters"."count", 0) "count"{photo_columns}
+                   FROM "projects_membership"
+        LEFT OUTER JOIN "counters"
+                     ON "projects_membership"."user_id" = "counters"."owner_id"
+             INNER JOIN "users_user"
+                     ON "projects_membership"."user_id" = "users_user"."id"
+                  WHERE "projects_membership"."project_id" = %s AND "projects_membership"."user_id" IS NOT NULL
+
+        UNION
+
+                 SELECT "users_user"."id",
+                        "users_user"."full_name",
+                        "users_user"."username",
+                        COALESCE("counters"."count", 0){system_photo_columns}
+                   FROM "users_user"
+        LEFT OUTER JOIN "counters"
+                     ON "users_user"."id" = "counters"."owner_id"
+                  WHERE "users_user"."is_system" IS TRUE
+    """.format(count=count, name=name, photo_columns=photo_columns, system_photo_columns=system_photo_columns)
+    return (name, sql, [project.id])
+
+
+def tags_facet(project, name="tags", *, distinct=False):
+    """
+    The tags of the project (with their colors).
+    """
+    sql = """
+          WITH "tags_counters" AS (SELECT "tag", COUNT("tag") "count"
+                                     FROM (SELECT {distinct} "id", UNNEST("tags") "tag"
+                                             FROM "filtered"
+                                            WHERE "in_{name}") "items_tags"
+                                 GROUP BY "tag"),
+               "project_tags" AS (SELECT reduce_dim("tags_colors") "tag_color"
+                                    FROM "projects_project"
+                                   WHERE "id" = %s)
+                 SELECT "tag_color"[1] "name",
+                        "tag_color"[2] "color",
+                        COALESCE("tags_counters"."count", 0) "count"
+                   FROM "project_tags"
+        LEFT OUTER JOIN "tags_counters"
+                     ON "project_tags"."tag_color"[1] = "tags_counters"."tag"
+    """.format(distinct="DISTINCT" if distinct else "", name=name)
+    return (name, sql, [project.id])
+
+
+def roles_facet(project, name="roles", *, users_columns=("assigned_to_id",)):
+    """
+    The roles of the project, counting the items assigned to users with
+    a membership with that role.
+    """
+    sql = """
+                 SELECT "users_role"."id" "id",
+                        "users_role"."name" "name",
+                        "users_role"."order" "order",
+                        COALESCE("counters"."count", 0) "count"
+                   FROM "users_role"
+        LEFT OUTER JOIN (SELECT "projects_membership"."role_id", COUNT(DISTINCT "filtered"."id") "count"
+                           FROM "filtered"
+                     INNER JOIN "projects_membership"
+                             ON {users_condition}
+                          WHERE "filtered"."in_{name}"
+                       GROUP BY "projects_membership"."role_id") "counters"
+                     ON "counters"."role_id" = "users_role"."id"
+                  WHERE "users_role"."project_id" = %s
+    """.format(users_condition=" OR ".join('"projects_membership"."user_id" = "filtered"."{}"'.format(column)
+                                           for column in users_columns),
+               name=name)
+    return (name, sql, [project.id])
+
+
+#####################################################
+# Facets data
+#####################################################
+
+def make_catalog_data(rows):
+    result = [{
+        "id": row["id"],
+        "name": _(row["name"]),
+        "color": row["color"],
+        "order": row["order"],
+        "count": row["count"],
+    } for row in rows]
+    return sorted(result, key=itemgetter("order"))
+
+
+def make_assigned_to_data(rows):
+    result = [{
+        "id": row["id"],
+        "full_name": row["full_name"] or row["username"] or "",
+        "count": row["count"],
+    } for row in rows]
+
+    # If there was no item with null assigned_to we manually add it
+    if not any(row["id"] is None for row in rows):
+        result.append({
+            "id": None,
+            "full_name": "",
+            "count": 0,
+        })
+
+    return sorted(result, key=itemgetter("full_name"))
+
+
+def make_owners_data(rows, *, with_photos=False):
+    result = []
+    for row in rows:
+        if row["count"] > 0:
+            owner = {
+                "id": row["id"],
+                "full_name": row["full_name"] or row["username"] or "",
+                "count": row["count"],
+            }
+            if with_photos:
+                owner.update({
+                    "photo": get_photo_url(row["photo"]),
+                    "big_photo": get_big_photo_url(row["photo"]),
+                    "gravatar_id": get_gravatar_id(row["email"]) if row["email"] else None
+                })
+            result.append(owner)
+    return sorted(result, key=itemgetter("full_name"))
+
+
+def make_tags_data(rows):
+    result = [{
+        "name": row["name"],
+        "color": row["color"],
+        "count": row["count"],
+    } for row in rows]
+    return sorted(result, key=itemgetter("name"))
+
+
+def make_roles_data(rows):
+    result = [{
+        "id": row["id"],
+        "name": _(row["name"]),
+        "color": None,
+        "order": row["order"],
+        "count": row["count"],
+    } for row in rows]
+    return sorted(result, key=itemgetter("order"))
+
+
+def make_filters_data(rows_by_facet, makers):
+    """
+    Get the filters data, in the order of `makers` (a list of `(name,
+    function)` that makes the data of every facet from its rows).
+    """
+    return OrderedDict((name, maker(rows_by_facet[name])) for name, maker in makers)
@@ -15,8 +15,10 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from django.utils.translation import ugettext as _
+from django.db import connection
 from django.db.models import Q, Count
 from django.apps import apps
+import bisect
 import datetime
 import copy
 import collections
@@ -222,20 +224,68 @@ def _get_milestones_stats_for_backlog(project, milestones):
     return milestones_stats
 
 
-def get_stats_for_project(project):
-    # Let's fetch all the estimations related to a project with all the necesary
-    # related data
-    RolePoints = apps.get_model('userstories', 'RolePoints')
-    role_points = RolePoints.objects.filter(
-        user_story__project = project,
-    ).prefetch_related(
-        "user_story",
-        "user_story__assigned_to",
-        "user_story__milestone",
-        "user_story__status",
-        "role",
-        "points")
+# The defined points of the project, by role and by the milestone and the
+# closed state of their user stories
+ROLE_POINTS_TOTALS_SQL = """
+    SELECT userstories_rolepoints.role_id,
+           userstories_userstory.milestone_id,
+           milestones_milestone.closed,
+           userstories_userstory.is_closed,
+           SUM(projects_points.value)
+      FROM userstories_rolepoints
+INNER JOIN userstories_userstory
+        ON userstories_userstory.id = userstories_rolepoints.user_story_id
+INNER JOIN projects_points
+        ON projects_points.id = userstories_rolepoints.points_id
+ LEFT JOIN milestones_milestone
+        ON milestones_milestone.id = userstories_userstory.milestone_id
+     WHERE userstories_userstory.project_id = %s
+       AND projects_points.value IS NOT NULL
+  GROUP BY 1, 2, 3, 4
+"""
+
+# The defined points of the team and client requirements of the project, by
+# the creation date of their user stories
+EXTRA_REQUIREMENTS_TOTALS_SQL = """
+    SELECT (userstories_userstory.created_date AT TIME ZONE 'UTC')::date,
+           userstories_userstory.team_requirement,
+           userstories_userstory.client_requirement,
+           SUM(projects_points.value)
+      FROM userstories_rolepoints
+INNER JOIN userstories_userstory
+        ON userstories_userstory.id = userstories_rolepoints.user_story_id
+INNER JOIN projects_points
+        ON projects_points.id = userstories_rolepoints.points_id
+     WHERE userstories_userstory.project_id = %s
+       AND projects_points.value IS NOT NULL
+       AND (userstories_userstory.team_requirement OR userstories_userstory.client_requirement)
+  GROUP BY 1, 2, 3
+"""
+
+
+def _get_milestones_interval_index(milestones):
+    """
+    Return a function to find the first milestone (of the list, sorted by
+    estimated_start) whose estimated dates contain a date, in O(log n).
+
+    The candidates are the milestones that start before the date and the
+    first one of them that finishes after it is the first index where the
+    running maximum of the estimated_finish dates goes past the date.
+    """
+    starts = [m.estimated_start for m in milestones]
+    max_finishes = []
+    for m in milestones:
+        max_finishes.append(max(max_finishes[-1], m.estimated_finish) if max_finishes else m.estimated_finish)
+
+    def find_milestone(date):
+        started = bisect.bisect_right(starts, date)
+        first_not_finished = bisect.bisect_right(max_finishes, date)
+        return milestones[first_not_finished] if first_not_finished < started else None
+
+    return find_milestone
 
+
+def get_stats_for_project(project):
     # Data inicialization
     project._closed_points = 0
     project._closed_points_per_role = {}
@@ -255,86 +305,54 @@ def get_stats_for_project(project):
         milestone._client_increment_points = 0
         milestones[milestone.id] = milestone
 
-    def _find_milestone_for_userstory(user_story):
-        for m in milestones.values():
-            if m.estimated_finish > user_story.created_date.date() and\
-               m.estimated_start <= user_story.created_date.date():
+    find_milestone = _get_milestones_interval_index(list(milestones.values()))
 
-              return m
+    with connection.cursor() as cursor:
+        cursor.execute(ROLE_POINTS_TOTALS_SQL, [project.id])
+        role_points_totals = cursor.fetchall()
 
-        return None
-
-    def _update_team_increment(milestone, value):
-        if milestone:
-            milestones[milestone.id]._team_increment_points += value
-        else:
-            project._future_team_increment += value
-
-    def _update_client_increment(milestone, value):
-        if milestone:
-            milestones[milestone.id]._client_increment_points += value
-        else:
-            project._future_client_increment += value
-
-    # Iterate over all the project estimations and update our stats
-    for role_point in role_points:
-        role_id = role_point.role.id
-        points_value = role_point.points.value
-        user_story = getattr(role_point, "user_story", None)
-
-        milestone = None
-        is_team_requirement = None
-        is_client_requirement = None
-        us_milestone = None
-
-        if user_story:
-            milestone = user_story.milestone
-            is_team_requirement = user_story.team_requirement
-            is_client_requirement = user_story.client_requirement
-            us_milestone = _find_milestone_for_userstory(user_story)
-
-        # None estimations doesn't affect to project stats
-        if points_value is None:
-            continue
+        cursor.execute(EXTRA_REQUIREMENTS_TOTALS_SQL, [project.id])
+        extra_requirements_totals = cursor.fetchall()
 
+    for role_id, milestone_id, is_milestone_closed, is_closed, points_value in role_points_totals:
         # Total defined points
         project._defined_points += points_value
-
-        # Defined points per role
-        project._defined_points_for_role = project._defined_points_per_role.get(role_id, 0)
-        project._defined_points_for_role += points_value
-        project._defined_points_per_role[role_id] = project._defined_points_for_role
+        project._defined_points_per_role[role_id] = project._defined_points_per_role.get(role_id, 0) + points_value
 
         # Closed points
-        if user_story and user_story.is_closed:
+        if is_closed:
             project._closed_points += points_value
-            closed_points_for_role = project._closed_points_per_role.get(role_id, 0)
-            closed_points_for_role += points_value
-            project._closed_points_per_role[role_id] = closed_points_for_role
+            project._closed_points_per_role[role_id] = project._closed_points_per_role.get(role_id, 0) + points_value
 
-            if milestone is not None:
-                milestones[milestone.id]._closed_points += points_value
+            if milestone_id is not None:
+                milestones[milestone_id]._closed_points += points_value
 
-        if milestone is not None and milestone.closed:
+        if is_milestone_closed:
             project._closed_points_from_closed_milestones += points_value
 
         # Assigned to milestone points
-        if user_story and user_story.milestone is not None:
+        if milestone_id is not None:
             project._assigned_points += points_value
-            assigned_points_for_role = project._assigned_points_per_role.get(role_id, 0)
-            assigned_points_for_role += points_value
-            project._assigned_points_per_role[role_id] = assigned_points_for_role
+            project._assigned_points_per_role[role_id] = (project._assigned_points_per_role.get(role_id, 0) +
+                                                          points_value)
 
-        # Extra requirements
-        if is_team_requirement and is_client_requirement:
-            _update_team_increment(us_milestone, points_value/2)
-            _update_client_increment(us_milestone, points_value/2)
+    # Extra requirements, by the milestone of the creation date of their user stories
+    for created_date, is_team_requirement, is_client_requirement, points_value in extra_requirements_totals:
+        us_milestone = find_milestone(created_date)
 
-        if is_team_requirement and not is_client_requirement:
-            _update_team_increment(us_milestone, points_value)
+        if is_team_requirement and is_client_requirement:
+            team_value = client_value = points_value / 2
+        elif is_team_requirement:
+            team_value, client_value = points_value, 0
+        else:
+            team_value, client_value = 0, points_value
 
-        if not is_team_requirement and is_client_requirement:
-            _update_client_increment(us_milestone, points_value)
+        if us_milestone:
+            us_milestone._team_increment_points += team_value
+            us_milestone._client_increment_points += client_value
+        else:
+            project._future_team_increment += team_value
+            project._future_client_increment += client_value
 
     # Speed calculations
     speed = 0
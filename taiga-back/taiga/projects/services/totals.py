@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Activity and fans totals of the projects.
+
+The number of events of the project timeline (activity) and the new fans
+of every project are stored by day (ProjectTotalsBucket). The all-time
+totals are incremented and the last week/month/year totals are derived
+from the buckets of the last year, so maintaining them does not depend on
+the size of the timeline. The buckets are rebuilt from the timeline and
+the likes by the reconciler to fix any drift.
+"""
+
+from dateutil.relativedelta import relativedelta
+
+from django.apps import apps
+from django.db import connection
+from django.db import transaction as tx
+from django.utils import timezone
+
+from taiga.timeline.service import build_project_namespace
+
+
+TOTALS_FIELDS = ("total_fans", "total_fans_last_week", "total_fans_last_month", "total_fans_last_year",
+                 "total_activity", "total_activity_last_week", "total_activity_last_month",
+                 "total_activity_last_year", "totals_updated_datetime")
+
+
+# The totals of the windows are the sum of the buckets of their days
+_WINDOWS_TOTALS_COLUMNS_SQL = """
+           COALESCE(SUM(b.fans) FILTER (WHERE b.date >= %(week)s), 0) AS fans_last_week,
+           COALESCE(SUM(b.fans) FILTER (WHERE b.date >= %(month)s), 0) AS fans_last_month,
+           COALESCE(SUM(b.fans) FILTER (WHERE b.date >= %(year)s), 0) AS fans_last_year,
+           COALESCE(SUM(b.activity) FILTER (WHERE b.date >= %(week)s), 0) AS activity_last_week,
+           COALESCE(SUM(b.activity) FILTER (WHERE b.date >= %(month)s), 0) AS activity_last_month,
+           COALESCE(SUM(b.activity) FILTER (WHERE b.date >= %(year)s), 0) AS activity_last_year
+"""
+
+_SET_WINDOWS_TOTALS_SQL = """
+           total_fans_last_week = totals.fans_last_week,
+           total_fans_last_month = totals.fans_last_month,
+           total_fans_last_year = totals.fans_last_year,
+           total_activity_last_week = totals.activity_last_week,
+           total_activity_last_month = totals.activity_last_month,
+           total_activity_last_year = totals.activity_last_year,
+           totals_updated_datetime = %(now)s
+"""
+
+_INCREMENT_BUCKET_SQL = """
+    INSERT INTO projects_projecttotalsbucket (project_id, date, activity, fans)
+         VALUES (%(project_id)s, %(date)s, %(activity)s, %(fans)s)
+    ON CONFLICT (project_id, date) DO UPDATE
+            SET activity = projects_projecttotalsbucket.activity + EXCLUDED.activity,
+                fans = projects_projecttotalsbucket.fans + EXCLUDED.fans
+"""
+
+_INCREMENT_TOTALS_SQL = """
+    UPDATE projects_project
+       SET total_fans = GREATEST(total_fans + %(fans)s, 0),
+           total_activity = GREATEST(total_activity + %(activity)s, 0),
+""" + _SET_WINDOWS_TOTALS_SQL + """
+      FROM (SELECT """ + _WINDOWS_TOTALS_COLUMNS_SQL + """
+              FROM projects_projecttotalsbucket b
+             WHERE b.project_id = %(project_id)s
+               AND b.date >= %(year)s) totals
+     WHERE projects_project.id = %(project_id)s
+ RETURNING {fields}
+""".format(fields=", ".join(TOTALS_FIELDS))
+
+_REFRESH_WINDOWS_SQL = """
+    UPDATE projects_project
+       SET """ + _SET_WINDOWS_TOTALS_SQL + """
+      FROM (SELECT p.id AS project_id,
+""" + _WINDOWS_TOTALS_COLUMNS_SQL + """
+              FROM projects_project p
+         LEFT JOIN projects_projecttotalsbucket b
+                ON b.project_id = p.id AND b.date >= %(year)s
+             WHERE {where}
+          GROUP BY p.id) totals
+     WHERE projects_project.id = totals.project_id
+"""
+
+_REBUILD_BUCKETS_SQL = """
+    INSERT INTO projects_projecttotalsbucket (project_id, date, activity, fans)
+         SELECT project_id, date, SUM(activity), SUM(fans)
+           FROM (SELECT split_part(t.namespace, ':', 2)::integer AS project_id,
+                        t.created::date AS date,
+                        COUNT(*) AS activity,
+                        0 AS fans
+                   FROM timeline_timeline t
+                  WHERE t.namespace = ANY(%(namespaces)s)
+               GROUP BY 1, 2
+              UNION ALL
+                 SELECT l.object_id AS project_id,
+                        l.created_date::date AS date,
+                        0 AS activity,
+                        COUNT(*) AS fans
+                   FROM likes_like l
+                  WHERE l.content_type_id = %(content_type_id)s
+                    AND l.object_id = ANY(%(projects_ids)s)
+               GROUP BY 1, 2) counts
+       GROUP BY project_id, date
+"""
+
+_REBUILD_TOTALS_SQL = """
+    UPDATE projects_project
+       SET total_fans = totals.fans,
+           total_activity = totals.activity
+      FROM (SELECT p.id AS project_id,
+                   COALESCE(SUM(b.fans), 0) AS fans,
+                   COALESCE(SUM(b.activity), 0) AS activity
+              FROM projects_project p
+         LEFT JOIN projects_projecttotalsbucket b ON b.project_id = p.id
+             WHERE p.id = ANY(%(projects_ids)s)
+          GROUP BY p.id) totals
+     WHERE projects_project.id = totals.project_id
+"""
+
+
+def _get_bucket_date(value=None):
+    if value is None:
+        value = timezone.now()
+    # Buckets are UTC days, like the dates computed by the database
+    return timezone.localtime(value, timezone.utc).date()
+
+
+def _get_windows_params(now=None) -> dict:
+    if now is None:
+        now = timezone.now()
+
+    return {
+        "now": now,
+        "week": _get_bucket_date(now - relativedelta(weeks=1)),
+        "month": _get_bucket_date(now - relativedelta(months=1)),
+        "year": _get_bucket_date(now - relativedelta(years=1)),
+    }
+
+
+@tx.atomic
+def increment_project_totals(project, *, activity: int=0, fans: int=0, date=None):
+    """
+    Add activity (timeline events) and fans (or remove them, with negative
+    values) to the bucket of `date` and update the totals of the project.
+    The totals of the project instance are updated too.
+    """
+    params = _get_windows_params()
+    params.update({
+        "project_id": project.id,
+        "date": _get_bucket_date(date),
+        "activity": activity,
+        "fans": fans,
+    })
+
+    with connection.cursor() as cursor:
+        cursor.execute(_INCREMENT_BUCKET_SQL, params)
+        cursor.execute(_INCREMENT_TOTALS_SQL, params)
+        row = cursor.fetchone()
+
+    if row is not None:
+        for field, value in zip(TOTALS_FIELDS, row):
+            setattr(project, field, value)
+
+
+def refresh_projects_totals_windows(projects_ids: list=None) -> int:
+    """
+    Recompute the last week/month/year totals of the projects from their
+    buckets. Without `projects_ids` it updates every project with
+    activity or fans in the last year, the windows of the rest are empty.
+    """
+    params = _get_windows_params()
+
+    if projects_ids is None:
+        where = "p.total_activity_last_year > 0 OR p.total_fans_last_year > 0"
+    else:
+        where = "p.id = ANY(%(projects_ids)s)"
+        params["projects_ids"] = list(projects_ids)
+
+    with connection.cursor() as cursor:
+        cursor.execute(_REFRESH_WINDOWS_SQL.format(where=where), params)
+        return cursor.rowcount
+
+
+@tx.atomic
+def reconcile_projects_totals(projects_ids: list) -> None:
+    """
+    Rebuild the buckets of the projects from their timeline and their likes,
+    and all their totals from the buckets.
+    """
+    projects_ids = list(projects_ids)
+    project_model = apps.get_model("projects", "Project")
+    bucket_model = apps.get_model("projects", "ProjectTotalsBucket")
+    content_type_model = apps.get_model("contenttypes", "ContentType")
+
+    bucket_model.objects.filter(project_id__in=projects_ids).delete()
+
+    params = {
+        "projects_ids": projects_ids,
+        "namespaces": [build_project_namespace(project_model(id=project_id))
+                       for project_id in projects_ids],
+        "content_type_id": content_type_model.objects.get_for_model(project_model).id,
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(_REBUILD_BUCKETS_SQL, params)
+        cursor.execute(_REBUILD_TOTALS_SQL, params)
+
+    refresh_projects_totals_windows(projects_ids)
+
+
+def reconcile_all_projects_totals(batch_size: int=500):
+    """
+    Reconcile the totals of all the projects, in batches of projects.
+    Yield the last project id of every batch.
+    """
+    project_model = apps.get_model("projects", "Project")
+
+    last_id = 0
+    while True:
+        projects_ids = list(project_model.objects.filter(id__gt=last_id)
+                                                 .order_by("id")
+                                                 .values_list("id", flat=True)[:batch_size])
+        if not projects_ids:
+            break
+
+        reconcile_projects_totals(projects_ids)
+        last_id = projects_ids[-1]
+        yield last_id
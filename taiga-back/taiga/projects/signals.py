@@ -19,6 +19,7 @@ from django.conf import settings
 from django.db.models import F
 from django.dispatch import Signal
 
+from taiga.projects import filters_data_cache
 from taiga.projects.notifications.services import create_notify_policy_if_not_exists
 
 
@@ -169,6 +170,31 @@ def try_to_close_or_open_user_stories_when_edit_task_status(sender, instance, cr
             services.open_userstory(user_story)
 
 
+## Filters data cache
+
+def invalidate_filters_data(sender, instance, **kwargs):
+    filters_data_cache.invalidate_filters_data(instance.project_id)
+
+
+def invalidate_project_filters_data(sender, instance, **kwargs):
+    filters_data_cache.invalidate_filters_data(instance.pk)
+
+
+def invalidate_user_filters_data(sender, instance, update_fields=None, **kwargs):
+    filters_data_cache.invalidate_user_filters_data(instance.pk, update_fields=update_fields)
+
+
+def invalidate_assigned_users_filters_data(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        filters_data_cache.invalidate_filters_data(instance.project_id)
+    elif pk_set:
+        projects_ids = model.objects.filter(pk__in=pk_set).values_list("project_id", flat=True).distinct()
+        filters_data_cache.invalidate_filters_data(*projects_ids)
+
+
 ## Custom signals
 
 issue_status_post_move_on_destroy = Signal(providing_args=["deleted", "moved"])
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from django.conf import settings
+
+from taiga.celery import app
+
+from .services import totals as totals_services
+
+
+@app.task
+def refresh_projects_totals_windows():
+    totals_services.refresh_projects_totals_windows()
+
+
+@app.task
+def reconcile_projects_totals():
+    for last_id in totals_services.reconcile_all_projects_totals(
+            batch_size=settings.PROJECTS_TOTALS_RECONCILE_BATCH_SIZE):
+        pass
@@ -24,7 +24,9 @@ from taiga.base.decorators import list_route
 from taiga.base.api import ModelCrudViewSet, ModelListViewSet
 from taiga.base.api.mixins import BlockedByProjectMixin
 from taiga.base.utils import json
+from taiga.projects import filters_data_cache
 from taiga.projects.history.mixins import HistoryResourceMixin
+from taiga.projects.history.services import prepare_queryset_for_freeze
 from taiga.projects.milestones.models import Milestone
 from taiga.projects.mixins.by_ref import ByRefMixin
 from taiga.projects.mixins.promote import PromoteToUserStoryMixin
@@ -235,7 +237,9 @@ class TaskViewSet(AssignedToSignalMixin, OCCResourceMixin, VotedResourceMixin,
             "tags": self.filter_queryset(queryset, filter_backends=tags_filter_backends),
             "roles": self.filter_queryset(queryset, filter_backends=roles_filter_backends),
         }
-        return response.Ok(services.get_tasks_filters_data(project, querysets))
+        data = filters_data_cache.get_filters_data("tasks", project, request.user, request.QUERY_PARAMS,
+                                                   lambda: services.get_tasks_filters_data(project, querysets))
+        return response.Ok(data)
 
     @list_route(methods=["GET"])
     def csv(self, request):
@@ -268,6 +272,7 @@ class TaskViewSet(AssignedToSignalMixin, OCCResourceMixin, VotedResourceMixin,
             project=project, owner=request.user, callback=self.post_save, precall=self.pre_save)
 
         tasks = self.get_queryset().filter(id__in=[i.id for i in tasks])
+        tasks = prepare_queryset_for_freeze(tasks)
         for task in tasks:
             self.persist_history_snapshot(obj=task)
 
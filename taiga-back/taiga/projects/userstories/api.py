@@ -33,7 +33,9 @@ from taiga.base.api.utils import get_object_or_404
 from taiga.base.utils import json
 from taiga.base.utils.db import get_object_or_none
 
+from taiga.projects import filters_data_cache
 from taiga.projects.history.mixins import HistoryResourceMixin
+from taiga.projects.history.services import prepare_queryset_for_freeze
 from taiga.projects.history.services import take_snapshot
 from taiga.projects.milestones.models import Milestone
 from taiga.projects.mixins.by_ref import ByRefMixin
@@ -367,7 +369,9 @@ class UserStoryViewSet(AssignedUsersSignalMixin, OCCResourceMixin,
             "roles": self.filter_queryset(queryset, filter_backends=roles_filter_backends)
         }
 
-        return response.Ok(services.get_userstories_filters_data(project, querysets))
+        data = filters_data_cache.get_filters_data("userstories", project, request.user, request.QUERY_PARAMS,
+                                                   lambda: services.get_userstories_filters_data(project, querysets))
+        return response.Ok(data)
 
     @list_route(methods=["GET"])
     def csv(self, request):
@@ -399,6 +403,7 @@ class UserStoryViewSet(AssignedUsersSignalMixin, OCCResourceMixin,
                 callback=self.post_save, precall=self.pre_save)
 
             user_stories = self.get_queryset().filter(id__in=[i.id for i in user_stories])
+            user_stories = prepare_queryset_for_freeze(user_stories)
             for user_story in user_stories:
                 self.persist_history_snapshot(obj=user_story)
 
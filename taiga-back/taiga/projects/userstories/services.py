@@ -18,22 +18,24 @@ from typing import List, Optional
 
 import csv
 import io
-from collections import OrderedDict
+from functools import partial
 from operator import itemgetter
-from contextlib import closing
 
 from django.db import connection
 from django.utils import timezone
-from django.utils.translation import ugettext as _
 
 from psycopg2.extras import execute_values
 
 from taiga.base.utils import db, text
 from taiga.events import events
-from taiga.projects.history.services import take_snapshot
+from taiga.projects import filters_data_cache
+from taiga.projects.milestones import burndown
+from taiga.projects.history.services import prepare_queryset_for_freeze
+from taiga.projects.history.services import take_snapshots_in_bulk
 from taiga.projects.models import Project, UserStoryStatus, Swimlane
 from taiga.projects.notifications.utils import attach_watchers_to_queryset
 from taiga.projects.services import apply_order_updates
+from taiga.projects.services import filters_data
 from taiga.projects.tasks.models import Task
 from taiga.projects.userstories.apps import connect_userstories_signals
 from taiga.projects.userstories.apps import disconnect_userstories_signals
@@ -217,6 +219,8 @@ def update_userstories_kanban_order_in_bulk(project: Project,
     with connection.cursor() as cursor:
         execute_values(cursor, sql, data)
 
+    filters_data_cache.invalidate_filters_data(project.id)
+
     # Sent events of updated stories
     events.emit_event_for_ids(ids=user_story_ids,
                               content_type="userstories.userstory",
@@ -266,16 +270,16 @@ def update_userstories_milestone_in_bulk(bulk_data: list, milestone: object):
         user_story_id__in=[e["us_id"] for e in bulk_data]).update(
         milestone=milestone)
 
+    filters_data_cache.invalidate_filters_data(milestone.project_id)
+    burndown.schedule_burndown_refresh(user_stories_ids=user_story_ids)
+
     return us_orders
 
 
 def snapshot_userstories_in_bulk(bulk_data, user):
-    for us_data in bulk_data:
-        try:
-            us = models.UserStory.objects.get(pk=us_data['us_id'])
-            take_snapshot(us, user=user)
-        except models.UserStory.DoesNotExist:
-            pass
+    user_stories = models.UserStory.objects.filter(pk__in=[us_data['us_id'] for us_data in bulk_data])
+    user_stories = prepare_queryset_for_freeze(user_stories)
+    take_snapshots_in_bulk(list(user_stories), user=user, refetch=False)
 
 
 #####################################################
@@ -431,234 +435,47 @@ def userstories_to_csv(project, queryset):
 # Api filter data
 #####################################################
 
-def _get_userstories_statuses(project, queryset):
-    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
-    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
-    where = queryset_where_tuple[0]
-    where_params = queryset_where_tuple[1]
-
-    extra_sql = """
-     WITH "us_counters" AS (
-         SELECT DISTINCT "userstories_userstory"."status_id" "status_id",
-                         "userstories_userstory"."id" "us_id"
-                    FROM "userstories_userstory"
-              INNER JOIN "projects_project"
-                      ON ("userstories_userstory"."project_id" = "projects_project"."id")
-         LEFT OUTER JOIN "epics_relateduserstory"
-                      ON "userstories_userstory"."id" = "epics_relateduserstory"."user_story_id"
-         LEFT OUTER JOIN "userstories_userstory_assigned_users"
-                      ON "userstories_userstory"."id" = "userstories_userstory_assigned_users"."userstory_id"
-                   WHERE {where}
-            ),
-             "counters" AS (
-                  SELECT "status_id",
-                         COUNT("status_id") "count"
-                    FROM "us_counters"
-                GROUP BY "status_id"
-            )
-
-                 SELECT "projects_userstorystatus"."id",
-                        "projects_userstorystatus"."name",
-                        "projects_userstorystatus"."color",
-                        "projects_userstorystatus"."order",
-                        COALESCE("counters"."count", 0)
-                   FROM "projects_userstorystatus"
-        LEFT OUTER JOIN "counters"
-                     ON "counters"."status_id" = "projects_userstorystatus"."id"
-                  WHERE "projects_userstorystatus"."project_id" = %s
-               ORDER BY "projects_userstorystatus"."order";
-    """.format(where=where)
-
-    with closing(connection.cursor()) as cursor:
-        cursor.execute(extra_sql, where_params + [project.id])
-        rows = cursor.fetchall()
-
-    result = []
-    for id, name, color, order, count in rows:
-        result.append({
-            "id": id,
-            "name": _(name),
-            "color": color,
-            "order": order,
-            "count": count,
-        })
-    return sorted(result, key=itemgetter("order"))
-
-
-def _get_userstories_assigned_to(project, queryset):
-    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
-    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
-    where = queryset_where_tuple[0]
-    where_params = queryset_where_tuple[1]
-
-    extra_sql = """
-     WITH "us_counters" AS (
-         SELECT DISTINCT "userstories_userstory"."assigned_to_id" "assigned_to_id",
-                         "userstories_userstory"."id" "us_id"
-                    FROM "userstories_userstory"
-              INNER JOIN "projects_project"
-                      ON ("userstories_userstory"."project_id" = "projects_project"."id")
-                INNER JOIN "projects_userstorystatus"
-                    ON ("userstories_userstory"."status_id" = "projects_userstorystatus"."id")
-         LEFT OUTER JOIN "epics_relateduserstory"
-                      ON "userstories_userstory"."id" = "epics_relateduserstory"."user_story_id"
-         LEFT OUTER JOIN "userstories_userstory_assigned_users"
-                      ON "userstories_userstory"."id" = "userstories_userstory_assigned_users"."userstory_id"
-                   WHERE {where}
-            ),
-
-            "counters" AS (
-                 SELECT "assigned_to_id",
-                        COUNT("assigned_to_id")
-                   FROM "us_counters"
-               GROUP BY "assigned_to_id"
-            )
-
-                 SELECT "projects_membership"."user_id" "user_id",
-                        "users_user"."full_name" "full_name",
-                        "users_user"."username" "username",
-                        COALESCE("counters".count, 0) "count"
-                   FROM "projects_membership"
-        LEFT OUTER JOIN "counters"
-                     ON ("projects_membership"."user_id" = "counters"."assigned_to_id")
-             INNER JOIN "users_user"
-                     ON ("projects_membership"."user_id" = "users_user"."id")
-                  WHERE "projects_membership"."project_id" = %s AND "projects_membership"."user_id" IS NOT NULL
-
-        -- unassigned userstories
-        UNION
-
-                 SELECT NULL "user_id",
-                        NULL "full_name",
-                        NULL "username",
-                        count(coalesce("assigned_to_id", -1)) "count"
-                   FROM "userstories_userstory"
-             INNER JOIN "projects_project"
-                     ON ("userstories_userstory"."project_id" = "projects_project"."id")
-             INNER JOIN "projects_userstorystatus"
-                    ON ("userstories_userstory"."status_id" = "projects_userstorystatus"."id")
-        LEFT OUTER JOIN "epics_relateduserstory"
-                     ON ("userstories_userstory"."id" = "epics_relateduserstory"."user_story_id")
-        LEFT OUTER JOIN "userstories_userstory_assigned_users"
-                      ON "userstories_userstory"."id" = "userstories_userstory_assigned_users"."userstory_id"
-                  WHERE {where} AND "userstories_userstory"."assigned_to_id" IS NULL
-               GROUP BY "assigned_to_id"
-    """.format(where=where)
-
-    with closing(connection.cursor()) as cursor:
-        cursor.execute(extra_sql, where_params + [project.id] + where_params)
-        rows = cursor.fetchall()
-
-    result = []
-    none_valued_added = False
-    for id, full_name, username, count in rows:
-        result.append({
-            "id": id,
-            "full_name": full_name or username or "",
-            "count": count,
-        })
-
-        if id is None:
-            none_valued_added = True
-
-    # If there was no userstory with null assigned_to we manually add it
-    if not none_valued_added:
-        result.append({
-            "id": None,
-            "full_name": "",
-            "count": 0,
-        })
-
-    return sorted(result, key=itemgetter("full_name"))
-
-
-def _get_userstories_assigned_users(project, queryset):
-    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
-    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
-    where = queryset_where_tuple[0]
-    where_params = queryset_where_tuple[1]
-
-    extra_sql = """
-     WITH "us_counters" AS (
-         SELECT DISTINCT COALESCE("userstories_userstory_assigned_users"."user_id",
-            "userstories_userstory"."assigned_to_id") as "assigned_user_id",
-                "userstories_userstory"."id" "us_id"
-                    FROM "userstories_userstory"
-              LEFT JOIN "userstories_userstory_assigned_users"
-                      ON "userstories_userstory_assigned_users"."userstory_id" = "userstories_userstory"."id"
-              INNER JOIN "projects_project"
-                      ON ("userstories_userstory"."project_id" = "projects_project"."id")
-                INNER JOIN "projects_userstorystatus"
-                    ON ("userstories_userstory"."status_id" = "projects_userstorystatus"."id")
-              LEFT OUTER JOIN "epics_relateduserstory"
-                      ON "userstories_userstory"."id" = "epics_relateduserstory"."user_story_id"
-                   WHERE {where}
-            ),
-
-            "counters" AS (
-                 SELECT "assigned_user_id",
-                        COUNT("assigned_user_id")
-                   FROM "us_counters"
-               GROUP BY "assigned_user_id"
-            )
-
-                 SELECT "projects_membership"."user_id" "user_id",
+def _userstories_assigned_users_facet(project):
+    sql = """
+                 SELECT "projects_membership"."user_id" "id",
                         "users_user"."full_name" "full_name",
                         "users_user"."username" "username",
-                        COALESCE("counters".count, 0) "count",
+                        COALESCE("counters"."count", 0) "count",
                         "users_user"."photo" "photo",
                         "users_user"."email" "email"
                    FROM "projects_membership"
-        LEFT OUTER JOIN "counters"
-                     ON ("projects_membership"."user_id" = "counters"."assigned_user_id")
+        LEFT OUTER JOIN (SELECT COALESCE("assigned_user_id", "assigned_to_id") "assigned_user_id",
+                                COUNT(DISTINCT "id") "count"
+                           FROM "filtered"
+                          WHERE "in_assigned_users"
+                       GROUP BY 1) "counters"
+                     ON "projects_membership"."user_id" = "counters"."assigned_user_id"
              INNER JOIN "users_user"
-                     ON ("projects_membership"."user_id" = "users_user"."id")
+                     ON "projects_membership"."user_id" = "users_user"."id"
                   WHERE "projects_membership"."project_id" = %s AND "projects_membership"."user_id" IS NOT NULL
 
-        -- unassigned userstories
         UNION
 
-                 SELECT NULL "user_id",
-                        NULL "full_name",
-                        NULL "username",
-                        count(coalesce("assigned_to_id", -1)) "count",
-                        NULL "photo",
-                        NULL "email"
-                   FROM "userstories_userstory"
-             INNER JOIN "projects_project"
-                     ON ("userstories_userstory"."project_id" = "projects_project"."id")
-            INNER JOIN "projects_userstorystatus"
-                ON ("userstories_userstory"."status_id" = "projects_userstorystatus"."id")
-        LEFT OUTER JOIN "epics_relateduserstory"
-                     ON ("userstories_userstory"."id" = "epics_relateduserstory"."user_story_id")
-                  WHERE {where} AND "userstories_userstory"."id" NOT IN (
-                    SELECT "userstories_userstory_assigned_users"."userstory_id" FROM
-                      "userstories_userstory_assigned_users"
-                  ) AND "userstories_userstory"."assigned_to_id" IS NULL
-               GROUP BY "username";
-    """.format(where=where)
-
-    with closing(connection.cursor()) as cursor:
-        cursor.execute(extra_sql, where_params + [project.id] + where_params)
-        rows = cursor.fetchall()
-
-    result = []
-    none_valued_added = False
-    for id, full_name, username, count, photo, email in rows:
-        result.append({
-            "id": id,
-            "full_name": full_name or username or "",
-            "count": count,
-            "photo": get_photo_url(photo),
-            "big_photo": get_big_photo_url(photo),
-            "gravatar_id": get_gravatar_id(email) if email else None
-        })
+                 SELECT NULL, NULL, NULL, COUNT(*), NULL, NULL
+                   FROM "filtered"
+                  WHERE "in_assigned_users" AND "assigned_user_id" IS NULL AND "assigned_to_id" IS NULL
+                 HAVING COUNT(*) > 0
+    """
+    return ("assigned_users", sql, [project.id])
+
 
-        if id is None:
-            none_valued_added = True
+def _make_userstories_assigned_users_data(rows):
+    result = [{
+        "id": row["id"],
+        "full_name": row["full_name"] or row["username"] or "",
+        "count": row["count"],
+        "photo": get_photo_url(row["photo"]),
+        "big_photo": get_big_photo_url(row["photo"]),
+        "gravatar_id": get_gravatar_id(row["email"]) if row["email"] else None
+    } for row in rows]
 
     # If there was no userstory with null assigned_to we manually add it
-    if not none_valued_added:
+    if not any(row["id"] is None for row in rows):
         result.append({
             "id": None,
             "full_name": "",
@@ -671,201 +488,43 @@ def _get_userstories_assigned_users(project, queryset):
     return sorted(result, key=itemgetter("full_name"))
 
 
-def _get_userstories_owners(project, queryset):
-    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
-    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
-    where = queryset_where_tuple[0]
-    where_params = queryset_where_tuple[1]
-
-    extra_sql = """
-     WITH "us_counters" AS(
-         SELECT DISTINCT "userstories_userstory"."owner_id" "owner_id",
-                         "userstories_userstory"."id" "us_id"
-                    FROM "userstories_userstory"
-              INNER JOIN "projects_project"
-                      ON ("userstories_userstory"."project_id" = "projects_project"."id")
-                INNER JOIN "projects_userstorystatus"
-                    ON ("userstories_userstory"."status_id" = "projects_userstorystatus"."id")
-         LEFT OUTER JOIN "epics_relateduserstory"
-                      ON ("userstories_userstory"."id" = "epics_relateduserstory"."user_story_id")
-         LEFT OUTER JOIN "userstories_userstory_assigned_users"
-                      ON "userstories_userstory"."id" = "userstories_userstory_assigned_users"."userstory_id"
-                   WHERE {where}
-            ),
-
-            "counters" AS (
-                 SELECT "owner_id",
-                        COUNT("owner_id")
-                   FROM "us_counters"
-               GROUP BY "owner_id"
-            )
-
-                 SELECT "projects_membership"."user_id" "user_id",
-                        "users_user"."full_name",
-                        "users_user"."username",
-                        COALESCE("counters".count, 0) "count",
-                        "users_user"."photo" "photo",
-                        "users_user"."email" "email"
-                   FROM "projects_membership"
-        LEFT OUTER JOIN "counters"
-                     ON ("projects_membership"."user_id" = "counters"."owner_id")
-             INNER JOIN "users_user"
-                     ON ("projects_membership"."user_id" = "users_user"."id")
-                  WHERE "projects_membership"."project_id" = %s AND "projects_membership"."user_id" IS NOT NULL
+def _userstories_epics_facet(project):
+    sql = """
+                 SELECT NULL "id",
+                        NULL "ref",
+                        NULL "subject",
+                        0 "order",
+                        COUNT(*) "count"
+                   FROM "filtered"
+                  WHERE "in_epics" AND "epic_id" IS NULL
+                 HAVING COUNT(*) > 0
 
-        -- System users
-                  UNION
+        UNION
 
-                 SELECT "users_user"."id" "user_id",
-                        "users_user"."full_name" "full_name",
-                        "users_user"."username" "username",
-                        COALESCE("counters"."count", 0) "count",
-                        NULL "photo",
-                        NULL "email"
-                   FROM "users_user"
-        LEFT OUTER JOIN "counters"
-                     ON ("users_user"."id" = "counters"."owner_id")
-                  WHERE ("users_user"."is_system" IS TRUE)
-    """.format(where=where)
-
-    with closing(connection.cursor()) as cursor:
-        cursor.execute(extra_sql, where_params + [project.id])
-        rows = cursor.fetchall()
-
-    result = []
-    for id, full_name, username, count, photo, email in rows:
-        if count > 0:
-            result.append({
-                "id": id,
-                "full_name": full_name or username or "",
-                "count": count,
-                "photo": get_photo_url(photo),
-                "big_photo": get_big_photo_url(photo),
-                "gravatar_id": get_gravatar_id(email) if email else None
-            })
-    return sorted(result, key=itemgetter("full_name"))
+                 SELECT "epics_epic"."id",
+                        "epics_epic"."ref",
+                        "epics_epic"."subject",
+                        "epics_epic"."epics_order",
+                        COALESCE("counters"."count", 0)
+                   FROM "epics_epic"
+        LEFT OUTER JOIN (SELECT "epic_id", COUNT(*) "count"
+                           FROM "filtered"
+                          WHERE "in_epics" AND "epic_id" IS NOT NULL
+                       GROUP BY "epic_id") "counters"
+                     ON "counters"."epic_id" = "epics_epic"."id"
+                  WHERE "epics_epic"."project_id" = %s
+    """
+    return ("epics", sql, [project.id])
 
 
-def _get_userstories_tags(project, queryset):
-    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
-    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
-    where = queryset_where_tuple[0]
-    where_params = queryset_where_tuple[1]
-
-    extra_sql = """
-           WITH "userstories_tags" AS (
-                   SELECT "tag",
-                          COUNT("tag") "counter"
-                     FROM (
-                      SELECT DISTINCT "userstories_userstory"."id" "us_id",
-                                       UNNEST("userstories_userstory"."tags") "tag"
-                                 FROM "userstories_userstory"
-                        INNER JOIN "projects_project"
-                            ON ("userstories_userstory"."project_id" = "projects_project"."id")
-                        INNER JOIN "projects_userstorystatus"
-                            ON ("userstories_userstory"."status_id" = "projects_userstorystatus"."id")
-                        LEFT OUTER JOIN "epics_relateduserstory"
-                            ON ("userstories_userstory"."id" = "epics_relateduserstory"."user_story_id")
-                        LEFT OUTER JOIN "userstories_userstory_assigned_users"
-                            ON "userstories_userstory"."id" = "userstories_userstory_assigned_users"."userstory_id"
-                                WHERE {where}
-                          ) "tags"
-                    GROUP BY "tag"),
-
-                "project_tags" AS (
-                       SELECT reduce_dim("tags_colors") "tag_color"
-                         FROM "projects_project"
-                        WHERE "id"=%s)
-
-         SELECT "tag_color"[1] "tag",
-                "tag_color"[2] "color",
-                COALESCE("userstories_tags"."counter", 0) "counter"
-           FROM "project_tags"
-LEFT OUTER JOIN "userstories_tags"
-             ON "project_tags"."tag_color"[1] = "userstories_tags"."tag"
-       ORDER BY "tag"
-    """.format(where=where)
-
-    with closing(connection.cursor()) as cursor:
-        cursor.execute(extra_sql, where_params + [project.id])
-        rows = cursor.fetchall()
-
-    result = []
-    for name, color, count in rows:
-        result.append({
-            "name": name,
-            "color": color,
-            "count": count,
-        })
-    return sorted(result, key=itemgetter("name"))
-
-
-def _get_userstories_epics(project, queryset):
-    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
-    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
-    where = queryset_where_tuple[0]
-    where_params = queryset_where_tuple[1]
-    extra_sql = """
-       WITH "counters" AS (
-               SELECT "epics_relateduserstory"."epic_id" AS "epic_id",
-                      count("epics_relateduserstory"."id") AS "counter"
-                 FROM "epics_relateduserstory"
-           INNER JOIN "userstories_userstory"
-                   ON ("userstories_userstory"."id" = "epics_relateduserstory"."user_story_id")
-           INNER JOIN "projects_project"
-                   ON ("userstories_userstory"."project_id" = "projects_project"."id")
-            INNER JOIN "projects_userstorystatus"
-                    ON ("userstories_userstory"."status_id" = "projects_userstorystatus"."id")
-            LEFT OUTER JOIN "userstories_userstory_assigned_users"
-                ON "userstories_userstory"."id" = "userstories_userstory_assigned_users"."userstory_id"
-                WHERE {where}
-             GROUP BY "epics_relateduserstory"."epic_id"
-       )
-
-         -- User stories with no epics (return results only if there are userstories)
-               SELECT NULL AS "id",
-                      NULL AS "ref",
-                      NULL AS "subject",
-                      0 AS "order",
-                      count(COALESCE("epics_relateduserstory"."epic_id", -1)) AS "counter"
-                 FROM "userstories_userstory"
-      LEFT OUTER JOIN "epics_relateduserstory"
-                   ON ("epics_relateduserstory"."user_story_id" = "userstories_userstory"."id")
-           INNER JOIN "projects_project"
-                   ON ("userstories_userstory"."project_id" = "projects_project"."id")
-            INNER JOIN "projects_userstorystatus"
-                ON ("userstories_userstory"."status_id" = "projects_userstorystatus"."id")
-         LEFT OUTER JOIN "userstories_userstory_assigned_users"
-                      ON "userstories_userstory"."id" = "userstories_userstory_assigned_users"."userstory_id"
-                WHERE {where} AND "epics_relateduserstory"."epic_id" IS NULL
-             GROUP BY "epics_relateduserstory"."epic_id"
-
-                UNION
-
-               SELECT "epics_epic"."id" AS "id",
-                      "epics_epic"."ref" AS "ref",
-                      "epics_epic"."subject" AS "subject",
-                      "epics_epic"."epics_order" AS "order",
-                      COALESCE("counters"."counter", 0) AS "counter"
-                 FROM "epics_epic"
-      LEFT OUTER JOIN "counters"
-                   ON ("counters"."epic_id" = "epics_epic"."id")
-                WHERE "epics_epic"."project_id" = %s
-        """.format(where=where)
-
-    with closing(connection.cursor()) as cursor:
-        cursor.execute(extra_sql, where_params + where_params + [project.id])
-        rows = cursor.fetchall()
-
-    result = []
-    for id, ref, subject, order, count in rows:
-        result.append({
-            "id": id,
-            "ref": ref,
-            "subject": subject,
-            "order": order,
-            "count": count,
-        })
+def _make_userstories_epics_data(rows):
+    result = [{
+        "id": row["id"],
+        "ref": row["ref"],
+        "subject": row["subject"],
+        "order": row["order"],
+        "count": row["count"],
+    } for row in rows]
 
     result = sorted(result, key=lambda k: (k["order"], k["id"] or 0))
 
@@ -881,80 +540,49 @@ def _get_userstories_epics(project, queryset):
     return result
 
 
-def _get_userstories_roles(project, queryset):
-    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
-    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
-    where = queryset_where_tuple[0]
-    where_params = queryset_where_tuple[1]
-
-    extra_sql = """
-     WITH "us_counters" AS (
-         SELECT DISTINCT "userstories_userstory"."status_id" "status_id",
-                         "userstories_userstory"."id" "us_id",
-                         "projects_membership"."role_id" "role_id"
-                    FROM "userstories_userstory"
-              INNER JOIN "projects_project"
-                      ON ("userstories_userstory"."project_id" = "projects_project"."id")
-            INNER JOIN "projects_userstorystatus"
-                ON ("userstories_userstory"."status_id" = "projects_userstorystatus"."id")
-         LEFT OUTER JOIN "epics_relateduserstory"
-                      ON "userstories_userstory"."id" = "epics_relateduserstory"."user_story_id"
-         LEFT OUTER JOIN "userstories_userstory_assigned_users"
-                      ON "userstories_userstory_assigned_users"."userstory_id" = "userstories_userstory"."id"
-         LEFT OUTER JOIN "projects_membership"
-                      ON "projects_membership"."user_id" = "userstories_userstory"."assigned_to_id"
-                      OR "projects_membership"."user_id" = "userstories_userstory_assigned_users"."user_id"
-                   WHERE {where}
-            ),
-             "counters" AS (
-                  SELECT "role_id" as "role_id",
-                         COUNT("role_id") "count"
-                    FROM "us_counters"
-                GROUP BY "role_id"
-            )
-
-                 SELECT "users_role"."id",
-                        "users_role"."name",
-                        "users_role"."order",
-                        COALESCE("counters"."count", 0)
-                   FROM "users_role"
-        LEFT OUTER JOIN "counters"
-                     ON "counters"."role_id" = "users_role"."id"
-                  WHERE "users_role"."project_id" = %s
-               ORDER BY "users_role"."order";
-    """.format(where=where)
-
-    with closing(connection.cursor()) as cursor:
-        cursor.execute(extra_sql, where_params + [project.id])
-        rows = cursor.fetchall()
-
-    result = []
-    for id, name, order, count in rows:
-        result.append({
-            "id": id,
-            "name": _(name),
-            "color": None,
-            "order": order,
-            "count": count,
-        })
-    return sorted(result, key=itemgetter("order"))
-
-
 def get_userstories_filters_data(project, querysets):
     """
     Given a project and an userstories queryset, return a simple data structure
     of all possible filters for the userstories in the queryset.
     """
-    data = OrderedDict([
-        ("statuses", _get_userstories_statuses(project, querysets["statuses"])),
-        ("assigned_to",
-         _get_userstories_assigned_to(project, querysets["assigned_to"])),
-        ("assigned_users",
-         _get_userstories_assigned_users(project, querysets["assigned_users"])),
-        ("owners", _get_userstories_owners(project, querysets["owners"])),
-        ("tags", _get_userstories_tags(project, querysets["tags"])),
-        ("epics", _get_userstories_epics(project, querysets["epics"])),
-        ("roles", _get_userstories_roles(project, querysets["roles"])),
+    rows = filters_data.fetch_filters_data(
+        project,
+        querysets,
+        table="userstories_userstory",
+        joins="""INNER JOIN "projects_project"
+                            ON ("userstories_userstory"."project_id" = "projects_project"."id")
+                    INNER JOIN "projects_userstorystatus"
+                            ON ("userstories_userstory"."status_id" = "projects_userstorystatus"."id")
+               LEFT OUTER JOIN "epics_relateduserstory"
+                            ON ("userstories_userstory"."id" = "epics_relateduserstory"."user_story_id")
+               LEFT OUTER JOIN "userstories_userstory_assigned_users"
+                            ON ("userstories_userstory"."id" = "userstories_userstory_assigned_users"."userstory_id")""",
+        columns=[
+            '"userstories_userstory"."id" "id"',
+            '"userstories_userstory"."status_id" "status_id"',
+            '"userstories_userstory"."assigned_to_id" "assigned_to_id"',
+            '"userstories_userstory_assigned_users"."user_id" "assigned_user_id"',
+            '"userstories_userstory"."owner_id" "owner_id"',
+            '"userstories_userstory"."tags" "tags"',
+            '"epics_relateduserstory"."epic_id" "epic_id"',
+        ],
+        facets=[
+            filters_data.catalog_facet(project, "statuses", table="projects_userstorystatus", column="status_id",
+                                       count='COUNT(DISTINCT "id")'),
+            filters_data.assigned_to_facet(project, count='COUNT(DISTINCT "id")'),
+            _userstories_assigned_users_facet(project),
+            filters_data.owners_facet(project, count='COUNT(DISTINCT "id")', with_photos=True),
+            filters_data.tags_facet(project, distinct=True),
+            _userstories_epics_facet(project),
+            filters_data.roles_facet(project, users_columns=("assigned_to_id", "assigned_user_id")),
+        ])
+
+    return filters_data.make_filters_data(rows, [
+        ("statuses", filters_data.make_catalog_data),
+        ("assigned_to", filters_data.make_assigned_to_data),
+        ("assigned_users", _make_userstories_assigned_users_data),
+        ("owners", partial(filters_data.make_owners_data, with_photos=True)),
+        ("tags", filters_data.make_tags_data),
+        ("epics", _make_userstories_epics_data),
+        ("roles", filters_data.make_roles_data),
     ])
-
-    return data
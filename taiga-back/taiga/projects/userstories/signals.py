@@ -17,6 +17,7 @@
 from contextlib import suppress
 from django.core.exceptions import ObjectDoesNotExist
 from taiga.projects.history.services import take_snapshot
+from taiga.projects.milestones import burndown
 from taiga.projects.tasks.apps import connect_all_tasks_signals, disconnect_all_tasks_signals
 
 
@@ -59,6 +60,7 @@ def update_milestone_of_tasks_when_edit_us(sender, instance, created, **kwargs):
     if not created:
         tasks = instance.tasks.exclude(milestone=instance.milestone)
         tasks.update(milestone=instance.milestone)
+        burndown.schedule_burndown_refresh(user_stories_ids=[instance.id])
         for task in tasks:
             take_snapshot(task)
 
@@ -15,18 +15,27 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from django.apps import apps
+from django.utils.translation import ugettext as _
 
 from taiga.base.api import viewsets
 
+from taiga.base import exceptions as exc
 from taiga.base import response
+from taiga.base.decorators import list_route
 from taiga.base.api.utils import get_object_or_404
 from taiga.permissions.services import user_has_perm
 
 from . import services
-from . import serializers
 
 
-from concurrent import futures
+SEARCH_TYPES_PERMISSIONS = [
+    ("epics", "view_epics"),
+    ("userstories", "view_us"),
+    ("tasks", "view_tasks"),
+    ("issues", "view_issues"),
+    ("wikipages", "view_wiki_pages"),
+]
+
 
 class SearchViewSet(viewsets.ViewSet):
     def list(self, request, **kwargs):
@@ -35,67 +44,53 @@ class SearchViewSet(viewsets.ViewSet):
 
         project = self._get_project(project_id)
 
-        result = {}
-        with futures.ThreadPoolExecutor(max_workers=4) as executor:
-            futures_list = []
-            if user_has_perm(request.user, "view_epics", project):
-                epics_future = executor.submit(self._search_epics, project, text)
-                epics_future.result_key = "epics"
-                futures_list.append(epics_future)
-            if user_has_perm(request.user, "view_us", project):
-                uss_future = executor.submit(self._search_user_stories, project, text)
-                uss_future.result_key = "userstories"
-                futures_list.append(uss_future)
-            if user_has_perm(request.user, "view_tasks", project):
-                tasks_future = executor.submit(self._search_tasks, project, text)
-                tasks_future.result_key = "tasks"
-                futures_list.append(tasks_future)
-            if user_has_perm(request.user, "view_issues", project):
-                issues_future = executor.submit(self._search_issues, project, text)
-                issues_future.result_key = "issues"
-                futures_list.append(issues_future)
-            if user_has_perm(request.user, "view_wiki_pages", project):
-                wiki_pages_future = executor.submit(self._search_wiki_pages, project, text)
-                wiki_pages_future.result_key = "wikipages"
-                futures_list.append(wiki_pages_future)
-
-            for future in futures.as_completed(futures_list):
-                data = []
+        types = [type for type, perm in SEARCH_TYPES_PERMISSIONS if user_has_perm(request.user, perm, project)]
+
+        # Load more results of one type, after the cursor of the previous page
+        cursors = {}
+        search_type = request.QUERY_PARAMS.get('type', None)
+        if search_type is not None:
+            if search_type not in services.SEARCH_TYPES:
+                raise exc.BadRequest(_("Invalid search type"))
+            types = [type for type in types if type == search_type]
+
+            cursor = request.QUERY_PARAMS.get('cursor', None)
+            if cursor is not None:
                 try:
-                    data = future.result()
-                except Exception as exc:
-                    print('%s generated an exception: %s' % (future.result_key, exc))
-                finally:
-                    result[future.result_key] = data
+                    cursors[search_type] = services.decode_search_cursor(cursor)
+                except ValueError:
+                    raise exc.BadRequest(_("Invalid search cursor"))
+
+        limit = self._get_page_size(services.MAX_RESULTS)
 
+        search = services.search(project, text, types, limit=limit, cursors=cursors)
+
+        result = {type: search[type]["results"] for type in types}
         result["count"] = sum(map(lambda x: len(x), result.values()))
+        result["cursors"] = {type: search[type]["cursor"] for type in types}
+        result["timings"] = {type: search[type]["time"] for type in types}
         return response.Ok(result)
 
+    @list_route(methods=["GET"])
+    def typeahead(self, request, **kwargs):
+        text = request.QUERY_PARAMS.get('text', "")
+        project_id = request.QUERY_PARAMS.get('project', None)
+
+        project = self._get_project(project_id)
+
+        types = [type for type, perm in SEARCH_TYPES_PERMISSIONS if user_has_perm(request.user, perm, project)]
+
+        limit = self._get_page_size(services.TYPEAHEAD_MAX_RESULTS)
+
+        return response.Ok(services.typeahead(project, text, types, limit=limit))
+
     def _get_project(self, project_id):
         project_model = apps.get_model("projects", "Project")
         return get_object_or_404(project_model, pk=project_id)
 
-    def _search_epics(self, project, text):
-        queryset = services.search_epics(project, text)
-        serializer = serializers.EpicSearchResultsSerializer(queryset, many=True)
-        return serializer.data
-
-    def _search_user_stories(self, project, text):
-        queryset = services.search_user_stories(project, text)
-        serializer = serializers.UserStorySearchResultsSerializer(queryset, many=True)
-        return serializer.data
-
-    def _search_tasks(self, project, text):
-        queryset = services.search_tasks(project, text)
-        serializer = serializers.TaskSearchResultsSerializer(queryset, many=True)
-        return serializer.data
-
-    def _search_issues(self, project, text):
-        queryset = services.search_issues(project, text)
-        serializer = serializers.IssueSearchResultsSerializer(queryset, many=True)
-        return serializer.data
-
-    def _search_wiki_pages(self, project, text):
-        queryset = services.search_wiki_pages(project, text)
-        serializer = serializers.WikiPageSearchResultsSerializer(queryset, many=True)
-        return serializer.data
+    def _get_page_size(self, max_page_size):
+        try:
+            page_size = int(self.request.QUERY_PARAMS.get('page_size', max_page_size))
+        except ValueError:
+            raise exc.BadRequest(_("Invalid page size"))
+        return max(1, min(page_size, max_page_size))
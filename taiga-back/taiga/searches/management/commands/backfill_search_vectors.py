@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Examples:
+# python manage.py backfill_search_vectors
+# python manage.py backfill_search_vectors --project 42
+# python manage.py backfill_search_vectors --table issues_issue --batch-size 5000
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from taiga.searches import services
+
+
+class Command(BaseCommand):
+    help = 'Fill the missing or out of date search vectors of epics, user stories, tasks, issues and wiki pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project',
+                            action='store',
+                            dest='project',
+                            type=int,
+                            default=None,
+                            help='Selected project id for backfilling')
+        parser.add_argument('--table',
+                            action='append',
+                            dest='tables',
+                            choices=list(services.SEARCH_VECTORS.keys()),
+                            default=None,
+                            help='Selected table for backfilling (can be repeated)')
+        parser.add_argument('--batch-size',
+                            action='store',
+                            dest='batch_size',
+                            type=int,
+                            default=1000,
+                            help='Number of rows backfilled per transaction')
+
+    @override_settings(DEBUG=False)
+    def handle(self, *args, **options):
+        for table in options["tables"] or services.SEARCH_VECTORS.keys():
+            total = 0
+            for last_id, updated in services.backfill_search_vectors(table,
+                                                                     project_id=options["project"],
+                                                                     batch_size=options["batch_size"]):
+                total += updated
+                self.stdout.write("{}: backfilled up to {} ({} updated)".format(table, last_id, total))
+
+            self.stdout.write(self.style.SUCCESS("{}: {} search vectors updated".format(table, total)))
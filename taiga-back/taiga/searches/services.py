@@ -14,81 +14,299 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from django.apps import apps
+import base64
+import re
+
 from django.conf import settings
+from django.db import connection
+from django.db import transaction as tx
 from taiga.base.utils.db import to_tsquery
-from taiga.projects.userstories.utils import attach_total_points
 
 MAX_RESULTS = getattr(settings, "SEARCHES_MAX_RESULTS", 150)
+TYPEAHEAD_MAX_RESULTS = getattr(settings, "SEARCHES_TYPEAHEAD_MAX_RESULTS", 20)
+
+# The search_vector columns are filled by database triggers (see the
+# projects/0069_search_vectors migration) with these same expressions.
+SEARCH_VECTORS = {
+    "epics_epic": "item_search_vector(subject, ref::text, tags, description)",
+    "userstories_userstory": "item_search_vector(subject, ref::text, tags, description)",
+    "tasks_task": "item_search_vector(subject, ref::text, tags, description)",
+    "issues_issue": "item_search_vector(subject, ref::text, tags, description)",
+    "wiki_wikipage": "wikipage_search_vector(slug, content)",
+}
+
+
+ITEM_DATA = """
+    json_build_object('id', {table}.id,
+                      'ref', {table}.ref,
+                      'subject', {table}.subject,
+                      'status', {table}.status_id,
+                      'assigned_to', {table}.assigned_to_id)
+"""
+
+USERSTORY_DATA = """
+    json_build_object('id', userstories_userstory.id,
+                      'ref', userstories_userstory.ref,
+                      'subject', userstories_userstory.subject,
+                      'status', userstories_userstory.status_id,
+                      'total_points', (SELECT SUM(projects_points.value)
+                                         FROM userstories_rolepoints
+                                   INNER JOIN projects_points
+                                           ON userstories_rolepoints.points_id = projects_points.id
+                                        WHERE userstories_rolepoints.user_story_id = userstories_userstory.id),
+                      'milestone_name', milestones_milestone.name,
+                      'milestone_slug', milestones_milestone.slug)
+"""
+
+WIKIPAGE_DATA = """
+    json_build_object('id', wiki_wikipage.id,
+                      'slug', wiki_wikipage.slug)
+"""
+
+# type: (table, data, joins), in the order they are searched
+SEARCH_TYPES = {
+    "epics": ("epics_epic", ITEM_DATA.format(table="epics_epic"), ""),
+    "userstories": ("userstories_userstory", USERSTORY_DATA,
+                    "LEFT JOIN milestones_milestone "
+                    "ON milestones_milestone.id = userstories_userstory.milestone_id"),
+    "tasks": ("tasks_task", ITEM_DATA.format(table="tasks_task"), ""),
+    "issues": ("issues_issue", ITEM_DATA.format(table="issues_issue"), ""),
+    "wikipages": ("wiki_wikipage", WIKIPAGE_DATA, ""),
+}
+
+# Every type returns one row at least (with a NULL id if there are no
+# results) so the time spent in it can be taken from clock_timestamp().
+SEARCH_TYPE_SQL = """
+    SELECT '{type}' AS type,
+           page.rank,
+           page.id,
+           {data} AS data,
+           statement_timestamp() AS started_at,
+           clock_timestamp() AS finished_at
+      FROM (VALUES (0)) AS sentinel
+ LEFT JOIN LATERAL (SELECT items.id, items.rank
+                      FROM (SELECT {table}.id, {rank} AS rank
+                              FROM {table}
+                             WHERE {table}.project_id = %s {where}) AS items
+                     WHERE {cursor_where}
+                  ORDER BY items.rank DESC, items.id DESC
+                     LIMIT %s) AS page ON TRUE
+ LEFT JOIN {table} ON {table}.id = page.id
+           {joins}
+"""
+
+
+def encode_search_cursor(rank, pk):
+    value = "{!r}:{}".format(rank, pk)
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_search_cursor(cursor):
+    """
+    Return the (rank, id) of the last result of a page from its cursor.
+    Raise ValueError if the cursor is not valid.
+    """
+    rank, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+    return float(rank), int(pk)
+
+
+def search(project, text, types, limit=MAX_RESULTS, cursors=None):
+    """
+    Search the text in the given types of objects of the project with one
+    UNION ALL query, taking `limit` results of every type by rank, after
+    the (rank, id) of its cursor if any.
+
+    Return by type a dict with the `results`, the `cursor` of the next
+    page (None if there are no more results) and the `time` spent in its
+    part of the query, in milliseconds.
+    """
+    if not types:
+        return {}
+
+    cursors = cursors or {}
+    sql = []
+    params = []
+    for type in types:
+        table, data, joins = SEARCH_TYPES[type]
+        if text:
+            rank = "ts_rank({table}.search_vector, to_tsquery('simple', %s))".format(table=table)
+            where = "AND {table}.search_vector @@ to_tsquery('simple', %s)".format(table=table)
+            params += [to_tsquery(text), project.id, to_tsquery(text)]
+        else:
+            rank = "0::real"
+            where = ""
+            params += [project.id]
+
+        if type in cursors:
+            cursor_where = "(items.rank, items.id) < (%s::real, %s)"
+            params += list(cursors[type])
+        else:
+            cursor_where = "TRUE"
+
+        # One more than the limit to know if there is a next page
+        params += [limit + 1]
+        sql.append(SEARCH_TYPE_SQL.format(type=type, table=table, data=data, joins=joins,
+                                          rank=rank, where=where, cursor_where=cursor_where))
 
+    with connection.cursor() as cursor:
+        cursor.execute(" UNION ALL ".join(sql), params)
+        rows = cursor.fetchall()
 
-def search_epics(project, text):
-    model = apps.get_model("epics", "Epic")
-    queryset = model.objects.filter(project_id=project.pk)
-    table = "epics_epic"
-    return _search_items(queryset, table, text)
+    # All the rows have the same statement_timestamp()
+    started_at = rows[0][4]
+    found = {type: [] for type in types}
+    finished_at = {}
+    for type, rank, pk, data, row_started_at, row_finished_at in rows:
+        finished_at[type] = max(finished_at.get(type, row_finished_at), row_finished_at)
+        if pk is not None:
+            found[type].append((rank, pk, data))
 
+    result = {}
+    for type in types:
+        items = sorted(found[type], key=lambda item: item[:2], reverse=True)
+        next_cursor = encode_search_cursor(*items[limit - 1][:2]) if len(items) > limit else None
+        result[type] = {
+            "results": [data for rank, pk, data in items[:limit]],
+            "cursor": next_cursor,
+            "time": (finished_at[type] - started_at).total_seconds() * 1000,
+        }
+        # The parts of the query are run one after the other
+        started_at = finished_at[type]
 
-def search_user_stories(project, text):
-    model = apps.get_model("userstories", "UserStory")
-    queryset = model.objects.filter(project_id=project.pk)
-    table = "userstories_userstory"
-    return _search_items(queryset, table, text)
+    return result
 
 
-def search_tasks(project, text):
-    model = apps.get_model("tasks", "Task")
-    queryset = model.objects.filter(project_id=project.pk)
-    table = "tasks_task"
-    return _search_items(queryset, table, text)
+TYPEAHEAD_TYPES = ["epics", "userstories", "tasks", "issues"]
 
+TYPEAHEAD_REF_RE = re.compile(r"^#?(\d{1,12})$")
+TYPEAHEAD_REF_MAX_DIGITS = 12
 
-def search_issues(project, text):
-    model = apps.get_model("issues", "Issue")
-    queryset = model.objects.filter(project_id=project.pk)
-    table = "issues_issue"
-    return _search_items(queryset, table, text)
+# Both parts use the (project_id, ref) and (project_id, lower(subject))
+# indexes of the projects/0070_typeahead_indexes migration. The items
+# whose ref starts with the text go first, by ref, then the ones whose
+# subject starts with it, by subject.
+TYPEAHEAD_REF_SQL = """
+    SELECT '{type}' AS type, 0 AS tier, id, ref, subject, lower(subject) AS sort_subject
+      FROM (SELECT id, ref, subject
+              FROM {table}
+             WHERE project_id = %s AND ({refs_where})
+          ORDER BY ref
+             LIMIT %s) AS refs
+"""
 
+TYPEAHEAD_SUBJECT_SQL = """
+    SELECT '{type}' AS type, 1 AS tier, id, ref, subject, sort_subject
+      FROM (SELECT id, ref, subject, lower(subject) AS sort_subject
+              FROM {table}
+             WHERE project_id = %s AND lower(subject) LIKE %s {not_refs_where}
+          ORDER BY lower(subject), ref
+             LIMIT %s) AS subjects
+"""
 
-def search_wiki_pages(project, text):
-    model = apps.get_model("wiki", "WikiPage")
-    queryset = model.objects.filter(project_id=project.pk)
-    tsquery = "to_tsquery('simple', %s)"
-    tsvector = """
-        setweight(to_tsvector('simple', coalesce(wiki_wikipage.slug)), 'A') ||
-        setweight(to_tsvector('simple', coalesce(wiki_wikipage.content)), 'B')
+
+def _typeahead_refs_where(digits):
+    """
+    The refs that start with the digits, as ranges of refs: 12 is 12,
+    120 to 129, 1200 to 1299... so the (project_id, ref) index is used.
+    """
+    where = []
+    params = []
+    prefix = int(digits)
+    for zeros in range(TYPEAHEAD_REF_MAX_DIGITS - len(digits) + 1):
+        where.append("ref BETWEEN %s AND %s")
+        params += [prefix * 10 ** zeros, (prefix + 1) * 10 ** zeros - 1]
+    return " OR ".join(where), params
+
+
+def _escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def typeahead(project, text, types, limit=TYPEAHEAD_MAX_RESULTS):
+    """
+    Return the first `limit` epics, user stories, tasks and issues (of the
+    given types) of the project whose ref or subject starts with the text,
+    as dicts with their type, id, ref and subject.
+
+    A text like "12" or "#12" matches the refs 12, 120, 1234... and, if it
+    has no #, the subjects that start with it too.
+    """
+    text = text.strip()
+    types = [type for type in types if type in TYPEAHEAD_TYPES]
+    if not text or not types:
+        return []
+
+    ref_match = TYPEAHEAD_REF_RE.match(text)
+    if ref_match:
+        refs_where, refs_params = _typeahead_refs_where(ref_match.group(1))
+
+    sql = []
+    params = []
+    for type in types:
+        table = SEARCH_TYPES[type][0]
+        if ref_match:
+            sql.append(TYPEAHEAD_REF_SQL.format(type=type, table=table, refs_where=refs_where))
+            params += [project.id] + refs_params + [limit]
+
+        if not text.startswith("#"):
+            not_refs_where = "AND NOT ({})".format(refs_where) if ref_match else ""
+            sql.append(TYPEAHEAD_SUBJECT_SQL.format(type=type, table=table, not_refs_where=not_refs_where))
+            params += [project.id, _escape_like(text.lower()) + "%"]
+            params += (refs_params if ref_match else []) + [limit]
+
+    # A text with # that is not a ref ("#", "#abc", too many digits...)
+    if not sql:
+        return []
+
+    sql = """
+        SELECT type, id, ref, subject
+          FROM ({union}) AS matches
+      ORDER BY tier, CASE WHEN tier = 0 THEN ref END, sort_subject, ref
+         LIMIT %s
+    """.format(union=" UNION ALL ".join(sql))
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    return [{"type": type, "id": pk, "ref": ref, "subject": subject}
+            for type, pk, ref, subject in rows]
+
+
+def backfill_search_vectors(table, project_id=None, batch_size=1000):
+    """
+    Recompute the stored search vectors of a table, in batches of rows,
+    only writing the ones that are missing or out of date.
+    Yield the last id and the number of updated rows of every batch.
     """
+    project_where = "AND project_id = %s" if project_id is not None else ""
+    project_params = [project_id] if project_id is not None else []
+    batch_last_id_sql = """
+        SELECT max(id)
+          FROM (SELECT id
+                  FROM {table}
+                 WHERE id > %s {project_where}
+              ORDER BY id
+                 LIMIT %s) batch
+    """.format(table=table, project_where=project_where)
+    update_sql = """
+        UPDATE {table}
+           SET search_vector = {search_vector}
+         WHERE id > %s AND id <= %s {project_where}
+           AND search_vector IS DISTINCT FROM {search_vector}
+    """.format(table=table, project_where=project_where, search_vector=SEARCH_VECTORS[table])
+
+    last_id = 0
+    while True:
+        with tx.atomic(), connection.cursor() as cursor:
+            cursor.execute(batch_last_id_sql, [last_id] + project_params + [batch_size])
+            batch_last_id = cursor.fetchone()[0]
+            if batch_last_id is None:
+                break
+
+            cursor.execute(update_sql, [last_id, batch_last_id] + project_params)
+            updated = cursor.rowcount
 
-    return _search_by_query(queryset, tsquery, tsvector, text)
-
-
-def _search_items(queryset, table, text):
-    tsquery = "to_tsquery('simple', %s)"
-    tsvector = """
-        setweight(to_tsvector('simple',
-                              coalesce({table}.subject) || ' ' ||
-                              coalesce({table}.ref)), 'A') ||
-        setweight(to_tsvector('simple', coalesce(inmutable_array_to_string({table}.tags))), 'B') ||
-        setweight(to_tsvector('simple', coalesce({table}.description)), 'C')
-    """.format(table=table)
-    return _search_by_query(queryset, tsquery, tsvector, text)
-
-
-def _search_by_query(queryset, tsquery, tsvector, text):
-    select = {
-        "rank": "ts_rank({tsvector},{tsquery})".format(tsquery=tsquery,
-                                                       tsvector=tsvector),
-    }
-    order_by = ["-rank", ]
-    where = ["{tsvector} @@ {tsquery}".format(tsquery=tsquery,
-                                              tsvector=tsvector), ]
-
-    if text:
-        queryset = queryset.extra(select=select,
-                                  select_params=[to_tsquery(text)],
-                                  where=where,
-                                  params=[to_tsquery(text)],
-                                  order_by=order_by)
-
-    queryset = attach_total_points(queryset)
-    return queryset[:MAX_RESULTS]
+        last_id = batch_last_id
+        yield last_id, updated
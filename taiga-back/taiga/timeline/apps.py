@@ -26,13 +26,32 @@ class TimelineAppConfig(AppConfig):
 
     def ready(self):
         from . import signals as handlers
+        from taiga.projects.history.apps import history_entries_bulk_created
 
         signals.post_save.connect(handlers.on_new_history_entry,
                                   sender=apps.get_model("history", "HistoryEntry"),
                                   dispatch_uid="timeline")
+        history_entries_bulk_created.connect(handlers.on_new_history_entries,
+                                             sender=apps.get_model("history", "HistoryEntry"),
+                                             dispatch_uid="timeline")
         signals.post_save.connect(handlers.create_membership_push_to_timeline,
                                   sender=apps.get_model("projects", "Membership"))
         signals.pre_delete.connect(handlers.delete_membership_push_to_timeline,
                                    sender=apps.get_model("projects", "Membership"))
         signals.post_save.connect(handlers.create_user_push_to_timeline,
                                   sender=get_user_model())
+
+        # Visibility of the timeline entries
+        signals.post_save.connect(handlers.update_project_anon_visibility,
+                                  sender=apps.get_model("projects", "Project"),
+                                  dispatch_uid="timeline_visibility_project")
+        signals.post_delete.connect(handlers.delete_project_anon_visibility,
+                                    sender=apps.get_model("projects", "Project"),
+                                    dispatch_uid="timeline_visibility_project")
+        for signal in (signals.post_save, signals.post_delete):
+            signal.connect(handlers.invalidate_membership_user_visibility,
+                           sender=apps.get_model("projects", "Membership"),
+                           dispatch_uid="timeline_visibility_membership")
+            signal.connect(handlers.invalidate_role_users_visibility,
+                           sender=apps.get_model("users", "Role"),
+                           dispatch_uid="timeline_visibility_role")
@@ -18,14 +18,16 @@
 # python manage.py rebuild_timeline --settings=settings.local_timeline --initial_date 2014-10-02 --final_date 2014-10-03
 # python manage.py rebuild_timeline --settings=settings.local_timeline --purge
 # python manage.py rebuild_timeline --settings=settings.local_timeline --initial_date 2014-10-02
+# python manage.py rebuild_timeline --settings=settings.local_timeline --jobs 8 --checkpoint rebuild.checkpoint
+
+from collections import defaultdict
+import os
 
 from django.core.management.base import BaseCommand
 from django.test.utils import override_settings
 
 from taiga.timeline.models import Timeline
-from taiga.timeline.rebuilder import rebuild_timeline
-
-from optparse import make_option
+from taiga.timeline.rebuilder import iter_rebuild_timeline
 
 
 class Command(BaseCommand):
@@ -52,10 +54,67 @@ class Command(BaseCommand):
                             dest='project',
                             default=None,
                             help='Selected project id for timeline generation')
+        parser.add_argument('--jobs',
+                            action='store',
+                            dest='jobs',
+                            type=int,
+                            default=1,
+                            help='Number of processes rebuilding projects')
+        parser.add_argument('--batch-size',
+                            action='store',
+                            dest='batch_size',
+                            type=int,
+                            default=1000,
+                            help='Number of timeline entries inserted per query')
+        parser.add_argument('--checkpoint',
+                            action='store',
+                            dest='checkpoint',
+                            default=None,
+                            help='File storing the ids of the rebuilt projects, the run resumes from it')
 
     @override_settings(DEBUG=False)
     def handle(self, *args, **options):
-        if options["purge"] == True:
+        done_projects_ids = self._read_checkpoint(options["checkpoint"])
+        if done_projects_ids:
+            self.stdout.write("Resuming, {} projects already rebuilt".format(len(done_projects_ids)))
+        elif options["purge"] == True:
             Timeline.objects.all().delete()
 
-        rebuild_timeline(options["initial_date"], options["final_date"], options["project"])
+        workers = defaultdict(lambda: [0, 0, 0.0])
+        results = iter_rebuild_timeline(options["initial_date"], options["final_date"], options["project"],
+                                        jobs=options["jobs"], batch_size=options["batch_size"],
+                                        skip_projects_ids=done_projects_ids)
+        for result in results:
+            self._write_checkpoint(options["checkpoint"], result.project_id)
+
+            worker = workers[result.worker]
+            worker[0] += 1
+            worker[1] += result.rows
+            worker[2] += result.elapsed
+            self.stdout.write("Project {}: {} rows in {:.1f}s ({:.1f} rows/s) [worker {}]".format(
+                result.project_id, result.rows, result.elapsed, self._rate(result.rows, result.elapsed),
+                result.worker))
+
+        for worker, (projects, rows, elapsed) in sorted(workers.items()):
+            self.stdout.write("Worker {}: {} projects, {} rows ({:.1f} rows/s)".format(
+                worker, projects, rows, self._rate(rows, elapsed)))
+
+        self.stdout.write(self.style.SUCCESS("Rebuilt the timeline of {} projects".format(
+            sum(projects for projects, rows, elapsed in workers.values()))))
+
+    def _rate(self, rows, elapsed):
+        return rows / elapsed if elapsed else 0.0
+
+    def _read_checkpoint(self, path):
+        if not path or not os.path.exists(path):
+            return set()
+
+        with open(path) as f:
+            return {int(line) for line in f if line.strip()}
+
+    def _write_checkpoint(self, path, project_id):
+        if not path:
+            return
+
+        with open(path, "a") as f:
+            f.write("{}\n".format(project_id))
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.18 on 2026-10-17 11:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timeline', '0008_auto_20190606_1528'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='timeline',
+            name='timeline_ti_namespa_89bca1_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='timeline',
+            name='timeline_ti_content_1af26f_idx',
+        ),
+        migrations.AddIndex(
+            model_name='timeline',
+            index=models.Index(fields=['namespace', '-created', '-id'], name='timeline_ti_namespa_feb2c0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeline',
+            index=models.Index(fields=['content_type', 'object_id', '-created', '-id'], name='timeline_ti_content_295336_idx'),
+        ),
+    ]
@@ -37,8 +37,8 @@ class Timeline(models.Model):
 
     class Meta:
         indexes = [
-            models.Index(fields=['namespace', '-created']),
-            models.Index(fields=['content_type', 'object_id', '-created']),
+            models.Index(fields=['namespace', '-created', '-id']),
+            models.Index(fields=['content_type', 'object_id', '-created', '-id']),
         ]
 
 
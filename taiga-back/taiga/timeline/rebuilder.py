@@ -14,122 +14,146 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from django.contrib.contenttypes.models import ContentType
+
+"""
+Rebuild the timeline from the history.
+
+The work is partitioned by project: the timeline of every project (the
+entries of its events in the project and the users namespaces) is
+deleted and generated again in one transaction, so rebuilding a project
+is idempotent and an interrupted run can resume from its checkpoint,
+the ids of the already rebuilt projects. The projects can be rebuilt by
+a pool of processes.
+"""
+
+import os
+import time
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from unittest.mock import patch
+
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Model
+from django.db import connections
+from django.db import transaction as tx
 from django.test.utils import override_settings
 
 from taiga.projects.models import Project
 from taiga.projects.history.models import HistoryEntry
 from .models import Timeline
-from .service import _get_impl_key_from_model, _timeline_impl_map, extract_user_info
+from .service import extract_user_info
 from .signals import on_new_history_entry, _push_to_timelines
 
-from unittest.mock import patch
 
-import gc
+ProjectRebuildResult = namedtuple("ProjectRebuildResult", ["project_id", "rows", "elapsed", "worker"])
 
 
 class BulkCreator(object):
-    def __init__(self):
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
         self.timeline_objects = []
-        self.created = None
+        self.created = 0
 
     def create_element(self, element):
         self.timeline_objects.append(element)
-        if len(self.timeline_objects) > 999:
+        if len(self.timeline_objects) >= self.batch_size:
             self.flush()
 
     def flush(self):
-        Timeline.objects.bulk_create(self.timeline_objects, batch_size=1000)
-        del self.timeline_objects
+        Timeline.objects.bulk_create(self.timeline_objects, batch_size=self.batch_size)
+        self.created += len(self.timeline_objects)
         self.timeline_objects = []
-        gc.collect()
-
-bulk_creator = BulkCreator()
 
 
-def custom_add_to_object_timeline(obj:object, instance:object, event_type:str, created_datetime:object,
-                                  namespace:str="default", extra_data:dict={}):
-    assert isinstance(obj, Model), "obj must be a instance of Model"
-    assert isinstance(instance, Model), "instance must be a instance of Model"
-    event_type_key = _get_impl_key_from_model(instance.__class__, event_type)
-    impl = _timeline_impl_map.get(event_type_key, None)
-
-    bulk_creator.create_element(Timeline(
-        content_object=obj,
-        namespace=namespace,
-        event_type=event_type_key,
-        project=instance.project,
-        data=impl(instance, extra_data=extra_data),
-        data_content_type=ContentType.objects.get_for_model(instance.__class__),
-        created=created_datetime,
-    ))
+def _filter_by_dates(qs, field, initial_date, final_date):
+    if initial_date:
+        qs = qs.filter(**{"{}__gte".format(field): initial_date})
+    if final_date:
+        qs = qs.filter(**{"{}__lt".format(field): final_date})
+    return qs
 
 
 @override_settings(CELERY_ENABLED=False)
-def rebuild_timeline(initial_date, final_date, project_id):
-    if initial_date or final_date or project_id:
-        timelines = Timeline.objects.all()
-        if initial_date:
-            timelines = timelines.filter(created__gte=initial_date)
-        if final_date:
-            timelines = timelines.filter(created__lt=final_date)
-        if project_id:
-            timelines = timelines.filter(project__id=project_id)
-
+def rebuild_project_timeline(project_id, initial_date=None, final_date=None, batch_size=1000):
+    """
+    Delete and generate again the timeline entries of a project (between
+    the dates, if any) in one transaction.
+    """
+    start = time.perf_counter()
+    bulk_creator = BulkCreator(batch_size=batch_size)
+
+    def create_timeline_entries(entries):
+        for entry in entries:
+            bulk_creator.create_element(entry)
+
+    with tx.atomic(), patch('taiga.timeline.service._create_timeline_entries', new=create_timeline_entries):
+        project = Project.objects.select_related("owner").get(id=project_id)
+
+        timelines = _filter_by_dates(Timeline.objects.filter(project_id=project_id),
+                                     "created", initial_date, final_date)
         timelines.delete()
 
-    with patch('taiga.timeline.service._add_to_object_timeline', new=custom_add_to_object_timeline):
+        memberships = _filter_by_dates(project.memberships.exclude(user=None).exclude(user=project.owner),
+                                       "created_at", initial_date, final_date)
+        for membership in memberships.select_related("user", "project"):
+            _push_to_timelines(project, membership.user, membership, "create", membership.created_at,
+                               refresh_totals=False)
+
         # Projects api wasn't a HistoryResourceMixin so we can't interate on the HistoryEntries in this case
-        projects = Project.objects.order_by("created_date")
-        history_entries = HistoryEntry.objects.order_by("created_at")
-
-        if initial_date:
-            projects = projects.filter(created_date__gte=initial_date)
-            history_entries = history_entries.filter(created_at__gte=initial_date)
-
-        if final_date:
-            projects = projects.filter(created_date__lt=final_date)
-            history_entries = history_entries.filter(created_at__lt=final_date)
-
-        if project_id:
-            project = Project.objects.get(id=project_id)
-            epic_keys = ['epics.epic:%s'%(id) for id in project.epics.values_list("id", flat=True)]
-            us_keys = ['userstories.userstory:%s'%(id) for id in project.user_stories.values_list("id",
-                                                                                                  flat=True)]
-            tasks_keys = ['tasks.task:%s'%(id) for id in project.tasks.values_list("id", flat=True)]
-            issue_keys = ['issues.issue:%s'%(id) for id in project.issues.values_list("id", flat=True)]
-            wiki_keys = ['wiki.wikipage:%s'%(id) for id in project.wiki_pages.values_list("id", flat=True)]
-            keys = epic_keys + us_keys + tasks_keys + issue_keys + wiki_keys
-
-            projects = projects.filter(id=project_id)
-            history_entries = history_entries.filter(key__in=keys)
-
-            #Memberships
-            for membership in project.memberships.exclude(user=None).exclude(user=project.owner):
-                _push_to_timelines(project, membership.user, membership, "create", membership.created_at, refresh_totals=False)
-
-        for project in projects.iterator():
-            print("Project:", project)
+        projects = _filter_by_dates(Project.objects.filter(id=project_id), "created_date", initial_date, final_date)
+        if projects.exists():
             extra_data = {
                 "values_diff": {},
                 "user": extract_user_info(project.owner),
             }
-            _push_to_timelines(project, project.owner, project, 'create',
-                               project.created_date, extra_data=extra_data,
-                               refresh_totals=False)
-            del extra_data
+            _push_to_timelines(project, project.owner, project, 'create', project.created_date,
+                               extra_data=extra_data, refresh_totals=False)
 
-        for historyEntry in history_entries.iterator():
-            print("History entry:", historyEntry.created_at)
+        # Stream the history with a server-side cursor
+        history_entries = _filter_by_dates(HistoryEntry.objects.filter(project_id=project_id),
+                                           "created_at", initial_date, final_date)
+        for history_entry in history_entries.order_by("created_at").iterator(chunk_size=batch_size):
             try:
-                historyEntry.refresh_totals = False
-                on_new_history_entry(None, historyEntry, None)
-            except ObjectDoesNotExist as e:
-                print("Ignoring")
-
-        for project in projects.iterator():
-            project.refresh_totals()
-
-    bulk_creator.flush()
+                history_entry.refresh_totals = False
+                on_new_history_entry(None, history_entry, None)
+            except ObjectDoesNotExist:
+                pass
+
+        bulk_creator.flush()
+        project.refresh_totals()
+
+    return ProjectRebuildResult(project_id, bulk_creator.created, time.perf_counter() - start, os.getpid())
+
+
+def iter_rebuild_timeline(initial_date, final_date, project_id, *, jobs=1, batch_size=1000,
+                          skip_projects_ids=()):
+    """
+    Rebuild the timeline of a project or of all the projects (between the
+    dates, if any), skipping the already rebuilt ones. Yield the result of
+    every rebuilt project as soon as it finishes.
+    """
+    if project_id:
+        projects_ids = [int(project_id)]
+    else:
+        projects_ids = list(Project.objects.order_by("id").values_list("id", flat=True))
+
+    skip_projects_ids = set(skip_projects_ids)
+    projects_ids = [pid for pid in projects_ids if pid not in skip_projects_ids]
+
+    if jobs <= 1:
+        for pid in projects_ids:
+            yield rebuild_project_timeline(pid, initial_date, final_date, batch_size)
+        return
+
+    # Close the connections before forking, every worker
+    # process must open its own database connection.
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(rebuild_project_timeline, pid, initial_date, final_date, batch_size)
+                   for pid in projects_ids]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def rebuild_timeline(initial_date, final_date, project_id, **kwargs):
+    return list(iter_rebuild_timeline(initial_date, final_date, project_id, **kwargs))
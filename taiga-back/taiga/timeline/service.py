@@ -18,16 +18,21 @@ from django.apps import apps
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
 from django.db.models import Model
-from django.db.models import Q
 from django.db.models.query import QuerySet
 
 from functools import partial, wraps
+from itertools import islice
 
 from taiga.base.utils.db import get_typename_for_model_class
 from taiga.celery import app
 
+from . import visibility
+
 _timeline_impl_map = {}
 
+# Max number of timeline entries inserted with one query
+BULK_CREATE_CHUNK_SIZE = 1000
+
 
 def _get_impl_key_from_model(model: Model, event_type: str):
     if issubclass(model, Model):
@@ -50,9 +55,12 @@ def build_project_namespace(project: object):
     return "{0}:{1}".format("project", project.id)
 
 
-def _add_to_object_timeline(obj: object, instance: object, event_type: str, created_datetime: object,
-                            namespace: str="default", extra_data: dict={}):
-    assert isinstance(obj, Model), "obj must be a instance of Model"
+def _make_timeline_entries(objects, instance: object, event_type: str, created_datetime: object,
+                           namespace: str="default", extra_data: dict={}):
+    """
+    Yield the (unsaved) timeline entries of `instance` for every object, the
+    data of the event is serialized only once.
+    """
     assert isinstance(instance, Model), "instance must be a instance of Model"
     from .models import Timeline
     event_type_key = _get_impl_key_from_model(instance.__class__, event_type)
@@ -62,21 +70,46 @@ def _add_to_object_timeline(obj: object, instance: object, event_type: str, crea
     if hasattr(instance, "project"):
         project = instance.project
 
-    Timeline.objects.create(
-        content_object=obj,
-        namespace=namespace,
-        event_type=event_type_key,
-        project=project,
-        data=impl(instance, extra_data=extra_data),
-        data_content_type=ContentType.objects.get_for_model(instance.__class__),
-        created=created_datetime,
-    )
+    data = impl(instance, extra_data=extra_data)
+    data_content_type = ContentType.objects.get_for_model(instance.__class__)
+
+    for obj in objects:
+        assert isinstance(obj, Model), "obj must be a instance of Model"
+        yield Timeline(
+            content_type=ContentType.objects.get_for_model(obj.__class__),
+            object_id=obj.pk,
+            namespace=namespace,
+            event_type=event_type_key,
+            project=project,
+            data=data,
+            data_content_type=data_content_type,
+            created=created_datetime,
+        )
+
+
+def _create_timeline_entries(entries):
+    from .models import Timeline
+    Timeline.objects.bulk_create(entries)
+
+
+def _add_to_object_timeline(obj: object, instance: object, event_type: str, created_datetime: object,
+                            namespace: str="default", extra_data: dict={}):
+    _add_to_objects_timeline([obj], instance, event_type, created_datetime, namespace, extra_data)
 
 
 def _add_to_objects_timeline(objects, instance: object, event_type: str, created_datetime: object,
                              namespace: str="default", extra_data: dict={}):
-    for obj in objects:
-        _add_to_object_timeline(obj, instance, event_type, created_datetime, namespace, extra_data)
+    if isinstance(objects, QuerySet):
+        objects = objects.iterator()
+
+    entries = _make_timeline_entries(objects, instance, event_type, created_datetime, namespace, extra_data)
+    while True:
+        # Very large audiences are inserted in chunks
+        chunk = list(islice(entries, BULK_CREATE_CHUNK_SIZE))
+        if not chunk:
+            break
+
+        _create_timeline_entries(chunk)
 
 
 def _push_to_timeline(objects, instance: object, event_type: str, created_datetime: object,
@@ -119,7 +152,7 @@ def push_to_timelines(project_id, user_id, obj_app_label, obj_model_name, obj_id
                           extra_data=extra_data)
 
         if refresh_totals:
-            project.refresh_totals()
+            project.increment_totals(activity=1, date=created_datetime)
 
         if hasattr(obj, "get_related_people"):
             related_people = obj.get_related_people()
@@ -156,44 +189,8 @@ def filter_timeline_for_user(timeline, user):
     if user.is_superuser:
         return timeline
 
-    # Filtering entities from public projects or entities without project
-    tl_filter = Q(project__is_private=False) | Q(project=None)
-
-    # Filtering private project with some public parts
-    content_types = {
-        "view_project": ContentType.objects.get_by_natural_key("projects", "project"),
-        "view_milestones": ContentType.objects.get_by_natural_key("milestones", "milestone"),
-        "view_epics": ContentType.objects.get_by_natural_key("epics", "epic"),
-        "view_us": ContentType.objects.get_by_natural_key("userstories", "userstory"),
-        "view_tasks": ContentType.objects.get_by_natural_key("tasks", "task"),
-        "view_issues": ContentType.objects.get_by_natural_key("issues", "issue"),
-        "view_wiki_pages": ContentType.objects.get_by_natural_key("wiki", "wikipage"),
-        "view_wiki_links": ContentType.objects.get_by_natural_key("wiki", "wikilink"),
-    }
-
-    for content_type_key, content_type in content_types.items():
-        tl_filter |= Q(project__is_private=True,
-                       project__anon_permissions__contains=[content_type_key],
-                       data_content_type=content_type)
-
-    # There is no specific permission for seeing new memberships
-    membership_content_type = ContentType.objects.get_by_natural_key(app_label="projects", model="membership")
-    tl_filter |= Q(project__is_private=True,
-                   project__anon_permissions__contains=["view_project"],
-                   data_content_type=membership_content_type)
-
-    # Filtering private projects where user is member
-    if not user.is_anonymous:
-        for membership in user.cached_memberships:
-            # Admin roles can see everything in a project
-            if membership.is_admin:
-                tl_filter |= Q(project=membership.project)
-            else:
-                data_content_types = list(filter(None, [content_types.get(a, None) for a in
-                                                        membership.role.permissions]))
-                data_content_types.append(membership_content_type)
-                tl_filter |= Q(project=membership.project, data_content_type__in=data_content_types)
-
+    # See visibility for the entries of the private projects
+    tl_filter = visibility.get_visibility_filter(user)
     timeline = timeline.filter(tl_filter)
     return timeline
 
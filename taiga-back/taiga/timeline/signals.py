@@ -14,6 +14,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from django.apps import apps
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
@@ -23,6 +24,7 @@ from django.db import connection
 
 from taiga.projects.history import services as history_services
 from taiga.projects.history.choices import HistoryType
+from taiga.timeline import visibility
 from taiga.timeline.service import (push_to_timelines,
                                     build_user_namespace,
                                     build_project_namespace,
@@ -63,21 +65,21 @@ def _clean_description_fields(values_diff):
         values_diff["description_diff"] = _("Check the history API for the exact diff")
 
 
-def on_new_history_entry(sender, instance, created, **kwargs):
-    if instance._importing:
-        return
+def _must_push_history_entry(entry):
+    if entry._importing:
+        return False
 
-    if instance.is_hidden:
-        return None
+    if entry.is_hidden:
+        return False
 
-    if instance.user["pk"] is None:
-        return None
+    if entry.user["pk"] is None:
+        return False
 
-    refresh_totals = getattr(instance, "refresh_totals", True)
+    return True
 
-    model = history_services.get_model_from_key(instance.key)
-    pk = history_services.get_pk_from_key(instance.key)
-    obj = model.objects.get(pk=pk)
+
+def _push_history_entry_to_timelines(instance, obj, user):
+    refresh_totals = getattr(instance, "refresh_totals", True)
     project = obj.project
 
     if instance.type == HistoryType.create:
@@ -87,7 +89,6 @@ def on_new_history_entry(sender, instance, created, **kwargs):
     elif instance.type == HistoryType.delete:
         event_type = "delete"
 
-    user = get_user_model().objects.get(id=instance.user["pk"])
     values_diff = instance.values_diff
     _clean_description_fields(values_diff)
 
@@ -110,6 +111,35 @@ def on_new_history_entry(sender, instance, created, **kwargs):
     _push_to_timelines(project, user, obj, event_type, created_datetime, extra_data=extra_data, refresh_totals=refresh_totals)
 
 
+def on_new_history_entry(sender, instance, created, **kwargs):
+    if not _must_push_history_entry(instance):
+        return None
+
+    model = history_services.get_model_from_key(instance.key)
+    pk = history_services.get_pk_from_key(instance.key)
+    obj = model.objects.get(pk=pk)
+    user = get_user_model().objects.get(id=instance.user["pk"])
+
+    _push_history_entry_to_timelines(instance, obj, user)
+
+
+def on_new_history_entries(sender, entries, **kwargs):
+    entries = [entry for entry in entries if _must_push_history_entry(entry)]
+    if not entries:
+        return None
+
+    objs = history_services.get_instances_from_keys([entry.key for entry in entries])
+    users = get_user_model().objects.in_bulk({entry.user["pk"] for entry in entries})
+
+    for entry in entries:
+        obj = objs.get(entry.key, None)
+        user = users.get(entry.user["pk"], None)
+        if obj is None or user is None:
+            continue
+
+        _push_history_entry_to_timelines(entry, obj, user)
+
+
 def create_membership_push_to_timeline(sender, instance, created, **kwargs):
     """
     Creating new membership with associated user. If the user is the project owner we don't
@@ -136,3 +166,21 @@ def create_user_push_to_timeline(sender, instance, created, **kwargs):
         project = None
         user = instance
         _push_to_timelines(project, user, user, "create", created_datetime=user.date_joined)
+
+
+def update_project_anon_visibility(sender, instance, **kwargs):
+    visibility.update_project_anon_visibility(instance)
+
+
+def delete_project_anon_visibility(sender, instance, **kwargs):
+    visibility.update_project_anon_visibility(instance, deleted=True)
+
+
+def invalidate_membership_user_visibility(sender, instance, **kwargs):
+    visibility.invalidate_users_visibility([instance.user_id])
+
+
+def invalidate_role_users_visibility(sender, instance, **kwargs):
+    membership_model = apps.get_model("projects", "Membership")
+    users_ids = membership_model.objects.filter(project_id=instance.project_id).values_list("user_id", flat=True)
+    visibility.invalidate_users_visibility(list(users_ids))
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Visibility of the timeline entries of the private projects.
+
+The content types of the entries that a user can see in every private
+project are precomputed from the anon permissions of the projects and
+from the memberships (and roles) of the user. If the default cache is
+shared by all the processes, both are stored in it under a generation
+that is renewed when the anon visibility of a project changes or when a
+membership or a role is saved or deleted (see TimelineAppConfig). With a
+local memory cache the invalidations would not reach the other processes,
+so they are computed on every call.
+
+`filter_timeline_for_user` groups the projects with the same visible
+content types, so the filter has a clause by group instead of a clause
+by membership.
+"""
+
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db.models import Q
+
+from taiga.base.utils import cache as cache_utils
+
+
+ALL_CONTENT_TYPES = None
+
+PERMISSIONS_CONTENT_TYPES = {
+    "view_project": ("projects", "project"),
+    "view_milestones": ("milestones", "milestone"),
+    "view_epics": ("epics", "epic"),
+    "view_us": ("userstories", "userstory"),
+    "view_tasks": ("tasks", "task"),
+    "view_issues": ("issues", "issue"),
+    "view_wiki_pages": ("wiki", "wikipage"),
+    "view_wiki_links": ("wiki", "wikilink"),
+}
+
+# There is no specific permission for seeing new memberships
+MEMBERSHIP_CONTENT_TYPE = ("projects", "membership")
+
+ANON_GENERATION_KEY = "timeline-visibility/generation/anon"
+
+
+def _is_cache_enabled():
+    return (getattr(settings, "TIMELINE_VISIBILITY_CACHE_ENABLE", True) and
+            cache_utils.is_shared_cache())
+
+
+def _get_content_types_ids(permissions, membership: bool) -> frozenset:
+    natural_keys = [PERMISSIONS_CONTENT_TYPES[p] for p in permissions if p in PERMISSIONS_CONTENT_TYPES]
+    if membership:
+        natural_keys.append(MEMBERSHIP_CONTENT_TYPE)
+    return frozenset(ContentType.objects.get_by_natural_key(*key).id for key in natural_keys)
+
+
+def _get_user_generation_key(user_id: int) -> str:
+    return "timeline-visibility/generation/user-{}".format(user_id)
+
+
+def _get_generation(key: str) -> str:
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def invalidate_anon_visibility():
+    cache.set(ANON_GENERATION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def invalidate_users_visibility(users_ids):
+    cache.set_many({_get_user_generation_key(user_id): uuid.uuid4().hex
+                    for user_id in users_ids if user_id is not None}, timeout=None)
+
+
+def _get_cached(key: str, load):
+    value = cache.get(key)
+    if value is None:
+        value = load()
+        cache.set(key, value, timeout=getattr(settings, "TIMELINE_VISIBILITY_CACHE_TIMEOUT", 3600))
+    return value
+
+
+def _get_project_anon_visibility(is_private: bool, anon_permissions) -> frozenset:
+    permissions = anon_permissions or []
+    if not is_private or not set(permissions) & set(PERMISSIONS_CONTENT_TYPES):
+        return None
+    return _get_content_types_ids(permissions, membership="view_project" in permissions)
+
+
+def _load_anon_visibility() -> dict:
+    project_model = apps.get_model("projects", "Project")
+    qs = (project_model.objects.filter(is_private=True,
+                                       anon_permissions__overlap=list(PERMISSIONS_CONTENT_TYPES))
+                               .values_list("id", "is_private", "anon_permissions"))
+    return {project_id: _get_project_anon_visibility(is_private, permissions)
+            for project_id, is_private, permissions in qs}
+
+
+def _get_anon_visibility_key() -> str:
+    return "timeline-visibility/anon/{}".format(_get_generation(ANON_GENERATION_KEY))
+
+
+def get_anon_visibility() -> dict:
+    """
+    Get the content types visible without membership in every private
+    project: {project_id: frozenset of content types ids}.
+    """
+    if not _is_cache_enabled():
+        return _load_anon_visibility()
+    return _get_cached(_get_anon_visibility_key(), _load_anon_visibility)
+
+
+def update_project_anon_visibility(project, deleted: bool=False):
+    """
+    Renew the anon generation only if the anon visibility of the project
+    is not the cached one (most of the saves of a project don't change it).
+    """
+    if not _is_cache_enabled():
+        return
+
+    cached = cache.get(_get_anon_visibility_key())
+    if cached is None:
+        return
+
+    if deleted:
+        visibility = None
+    else:
+        visibility = _get_project_anon_visibility(project.is_private, project.anon_permissions)
+
+    if cached.get(project.id) != visibility:
+        invalidate_anon_visibility()
+
+
+def _load_user_visibility(user_id: int) -> dict:
+    membership_model = apps.get_model("projects", "Membership")
+    qs = (membership_model.objects.filter(user_id=user_id)
+                                  .values_list("project_id", "is_admin", "role__permissions"))
+    # Admin roles can see everything in a project
+    return {project_id: ALL_CONTENT_TYPES if is_admin else _get_content_types_ids(permissions or [],
+                                                                                  membership=True)
+            for project_id, is_admin, permissions in qs}
+
+
+def get_user_visibility(user) -> dict:
+    """
+    Get the content types visible by the user as member of every project: {project_id: frozenset of content types ids or ALL_CONTENT_TYPES}.
+    """
+    if not _is_cache_enabled():
+        return _load_user_visibility(user.id)
+
+    generation = _get_generation(_get_user_generation_key(user.id))
+    key = "timeline-visibility/user/{}/{}".format(user.id, generation)
+    return _get_cached(key, lambda: _load_user_visibility(user.id))
+
+
+def get_visibility_filter(user) -> Q:
+    """
+    Get the filter of the timeline entries visible by a (not superuser) user.
+    """
+    visibility = dict(get_anon_visibility())
+    if not user.is_anonymous:
+        for project_id, content_types_ids in get_user_visibility(user).items():
+            if content_types_ids is ALL_CONTENT_TYPES or project_id not in visibility:
+                visibility[project_id] = content_types_ids
+            else:
+                visibility[project_id] = visibility[project_id] | content_types_ids
+
+    groups = {}
+    for project_id, content_types_ids in visibility.items():
+        groups.setdefault(content_types_ids, []).append(project_id)
+
+    # Entities from public projects or entities without project
+    tl_filter = Q(project__is_private=False) | Q(project=None)
+
+    for content_types_ids, projects_ids in groups.items():
+        if content_types_ids is ALL_CONTENT_TYPES:
+            tl_filter |= Q(project_id__in=sorted(projects_ids))
+        elif content_types_ids:
+            tl_filter |= Q(project_id__in=sorted(projects_ids),
+                           data_content_type_id__in=sorted(content_types_ids))
+
+    return tl_filter
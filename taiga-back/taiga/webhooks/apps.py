@@ -18,16 +18,23 @@ from django.apps import apps
 from django.apps import AppConfig
 from django.db.models import signals
 
+from taiga.projects.history.apps import history_entries_bulk_created
+
 
 def connect_webhooks_signals():
     from . import signal_handlers as handlers
     signals.post_save.connect(handlers.on_new_history_entry,
                               sender=apps.get_model("history", "HistoryEntry"),
                               dispatch_uid="webhooks")
+    history_entries_bulk_created.connect(handlers.on_new_history_entries,
+                                         sender=apps.get_model("history", "HistoryEntry"),
+                                         dispatch_uid="webhooks")
 
 
 def disconnect_webhooks_signals():
     signals.post_save.disconnect(sender=apps.get_model("history", "HistoryEntry"), dispatch_uid="webhooks")
+    history_entries_bulk_created.disconnect(sender=apps.get_model("history", "HistoryEntry"),
+                                            dispatch_uid="webhooks")
 
 
 class WebhooksAppConfig(AppConfig):
@@ -14,6 +14,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from django.contrib.auth import get_user_model
 from django.db import connection
 from django.conf import settings
 from django.utils import timezone
@@ -35,6 +36,28 @@ def _get_project_webhooks(project):
     return webhooks
 
 
+def _get_history_entry_webhooks_task(instance, obj, webhooks):
+    if instance.type == HistoryType.create:
+        task = tasks.create_webhook
+        extra_args = []
+    elif instance.type == HistoryType.change:
+        task = tasks.change_webhook
+        extra_args = [instance]
+    elif instance.type == HistoryType.delete:
+        task = tasks.delete_webhook
+        extra_args = []
+
+    by = instance.owner
+    date = timezone.now()
+
+    webhooks_args = []
+    for webhook in webhooks:
+        args = [webhook["id"], webhook["url"], webhook["key"], by, date, obj] + extra_args
+        webhooks_args.append(args)
+
+    return task, webhooks_args
+
+
 def on_new_history_entry(sender, instance, created, **kwargs):
     if not settings.WEBHOOKS_ENABLED:
         return None
@@ -51,26 +74,41 @@ def on_new_history_entry(sender, instance, created, **kwargs):
         return None
 
     webhooks = _get_project_webhooks(obj.project)
+    task, webhooks_args = _get_history_entry_webhooks_task(instance, obj, webhooks)
 
-    if instance.type == HistoryType.create:
-        task = tasks.create_webhook
-        extra_args = []
-    elif instance.type == HistoryType.change:
-        task = tasks.change_webhook
-        extra_args = [instance]
-    elif instance.type == HistoryType.delete:
-        task = tasks.delete_webhook
-        extra_args = []
+    connection.on_commit(lambda: _execute_task(task, webhooks_args))
 
-    by = instance.owner
-    date = timezone.now()
 
-    webhooks_args = []
-    for webhook in webhooks:
-        args = [webhook["id"], webhook["url"], webhook["key"], by, date, obj] + extra_args
-        webhooks_args.append(args)
+def on_new_history_entries(sender, entries, **kwargs):
+    if not settings.WEBHOOKS_ENABLED:
+        return None
 
-    connection.on_commit(lambda: _execute_task(task, webhooks_args))
+    entries = [entry for entry in entries if not entry.is_hidden]
+    if not entries:
+        return None
+
+    objs = history_service.get_instances_from_keys([entry.key for entry in entries])
+    owners = get_user_model().objects.in_bulk({entry.user["pk"] for entry in entries})
+
+    webhooks_by_project = {}
+    tasks_args = []
+    for entry in entries:
+        obj = objs.get(entry.key, None)
+        if obj is None:
+            # Catch simultaneous DELETE request
+            continue
+
+        if obj.project_id not in webhooks_by_project:
+            webhooks_by_project[obj.project_id] = _get_project_webhooks(obj.project)
+
+        entry.prefetch_owner(owners.get(entry.user["pk"], None))
+        tasks_args.append(_get_history_entry_webhooks_task(entry, obj, webhooks_by_project[obj.project_id]))
+
+    def _execute_tasks():
+        for task, webhooks_args in tasks_args:
+            _execute_task(task, webhooks_args)
+
+    connection.on_commit(_execute_tasks)
 
 
 def _execute_task(task, webhooks_args):
@@ -163,6 +163,8 @@ def change_webhook(webhook_id, url, key, by, date, obj, change):
     data['by'] = UserSerializer(by).data
     data['date'] = date
     data['data'] = _serialize(obj)
+    # The values_diff cache may not be filled yet by the background task
+    change.fill_values_diff_cache()
     data['change'] = _serialize(change)
 
     return _send_request(webhook_id, url, key, data)
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import time
+
+
+def timed(fn, iterations):
+    """Calls `fn` `iterations` times and returns its last result and the
+    seconds it took by call."""
+    start = time.perf_counter()
+    for i in range(iterations):
+        result = fn()
+    return result, (time.perf_counter() - start) / iterations
+
+
+def compare_timings(old, new, iterations, old_description, new_description, target_ms=None):
+    """Times the old and the new implementation, prints the milliseconds of
+    a call of each one and checks the new one is faster (and below
+    `target_ms`, if given). Returns the results of both implementations."""
+    old_result, old_time = timed(old, iterations)
+    new_result, new_time = timed(new, iterations)
+
+    print("\n{}: {:.1f} ms".format(old_description, old_time * 1000))
+    print("{}: {:.1f} ms".format(new_description, new_time * 1000))
+    assert new_time < old_time
+    if target_ms is not None:
+        assert new_time * 1000 < target_ms
+
+    return old_result, new_result
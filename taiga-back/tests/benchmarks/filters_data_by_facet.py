@@ -0,0 +1,1225 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Filters data of the lists with one query by facet, as they were computed
+before `taiga.projects.services.filters_data`, to compare the filters data
+benchmark with them.
+"""
+
+from collections import OrderedDict
+from contextlib import closing
+from operator import itemgetter
+
+from django.db import connection
+from django.utils.translation import ugettext as _
+
+from taiga.users.gravatar import get_gravatar_id
+from taiga.users.services import get_big_photo_url, get_photo_url
+
+
+#####################################################
+# User stories
+#####################################################
+
+def _get_userstories_statuses(project, queryset):
+    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
+    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
+    where = queryset_where_tuple[0]
+    where_params = queryset_where_tuple[1]
+
+    extra_sql = """
+     WITH "us_counters" AS (
+         SELECT DISTINCT "userstories_userstory"."status_id" "status_id",
+                         "userstories_userstory"."id" "us_id"
+                    FROM "userstories_userstory"
+              INNER JOIN "projects_project"
+                      ON ("userstories_userstory"."project_id" = "projects_project"."id")
+         LEFT OUTER JOIN "epics_relateduserstory"
+                      ON "userstories_userstory"."id" = "epics_relateduserstory"."user_story_id"
+         LEFT OUTER JOIN "userstories_userstory_assigned_users"
+                      ON "userstories_userstory"."id" = "userstories_userstory_assigned_users"."userstory_id"
+                   WHERE {where}
+            ),
+             "counters" AS (
+                  SELECT "status_id",
+                         COUNT("status_id") "count"
+                    FROM "us_counters"
+                GROUP BY "status_id"
+            )
+
+                 SELECT "projects_userstorystatus"."id",
+                        "projects_userstorystatus"."name",
+                        "projects_userstorystatus"."color",
+                        "projects_userstorystatus"."order",
+                        COALESCE("counters"."count", 0)
+                   FROM "projects_userstorystatus"
+        LEFT OUTER JOIN "counters"
+                     ON "counters"."status_id" = "projects_userstorystatus"."id"
+                  WHERE "projects_userstorystatus"."project_id" = %s
+               ORDER BY "projects_userstorystatus"."order";
+    """.format(where=where)
+
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(extra_sql, where_params + [project.id])
+        rows = cursor.fetchall()
+
+    result = []
+    for id, name, color, order, count in rows:
+        result.append({
+            "id": id,
+            "name": _(name),
+            "color": color,
+            "order": order,
+            "count": count,
+        })
+    return sorted(result, key=itemgetter("order"))
+
+
+def _get_userstories_assigned_to(project, queryset):
+    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
+    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
+    where = queryset_where_tuple[0]
+    where_params = queryset_where_tuple[1]
+
+    extra_sql = """
+     WITH "us_counters" AS (
+         SELECT DISTINCT "userstories_userstory"."assigned_to_id" "assigned_to_id",
+                         "userstories_userstory"."id" "us_id"
+                    FROM "userstories_userstory"
+              INNER JOIN "projects_project"
+                      ON ("userstories_userstory"."project_id" = "projects_project"."id")
+                INNER JOIN "projects_userstorystatus"
+                    ON ("userstories_userstory"."status_id" = "projects_userstorystatus"."id")
+         LEFT OUTER JOIN "epics_relateduserstory"
+                      ON "userstories_userstory"."id" = "epics_relateduserstory"."user_story_id"
+         LEFT OUTER JOIN "userstories_userstory_assigned_users"
+                      ON "userstories_userstory"."id" = "userstories_userstory_assigned_users"."userstory_id"
+                   WHERE {where}
+            ),
+
+            "counters" AS (
+                 SELECT "assigned_to_id",
+                        COUNT("assigned_to_id")
+                   FROM "us_counters"
+               GROUP BY "assigned_to_id"
+            )
+
+                 SELECT "projects_membership"."user_id" "user_id",
+                        "users_user"."full_name" "full_name",
+                        "users_user"."username" "username",
+                        COALESCE("counters".count, 0) "count"
+                   FROM "projects_membership"
+        LEFT OUTER JOIN "counters"
+                     ON ("projects_membership"."user_id" = "counters"."assigned_to_id")
+             INNER JOIN "users_user"
+                     ON ("projects_membership"."user_id" = "users_user"."id")
+                  WHERE "projects_membership"."project_id" = %s AND "projects_membership"."user_id" IS NOT NULL
+
+        -- unassigned userstories
+        UNION
+
+                 SELECT NULL "user_id",
+                        NULL "full_name",
+                        NULL "username",
+                        count(coalesce("assigned_to_id", -1)) "count"
+                   FROM "userstories_userstory"
+             INNER JOIN "projects_project"
+                     ON ("userstories_userstory"."project_id" = "projects_project"."id")
+             INNER JOIN "projects_userstorystatus"
+                    ON ("userstories_userstory"."status_id" = "projects_userstorystatus"."id")
+        LEFT OUTER JOIN "epics_relateduserstory"
+                     ON ("userstories_userstory"."id" = "epics_relateduserstory"."user_story_id")
+        LEFT OUTER JOIN "userstories_userstory_assigned_users"
+                      ON "userstories_userstory"."id" = "userstories_userstory_assigned_users"."userstory_id"
+                  WHERE {where} AND "userstories_userstory"."assigned_to_id" IS NULL
+               GROUP BY "assigned_to_id"
+    """.format(where=where)
+
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(extra_sql, where_params + [project.id] + where_params)
+        rows = cursor.fetchall()
+
+    result = []
+    none_valued_added = False
+    for id, full_name, username, count in rows:
+        result.append({
+            "id": id,
+            "full_name": full_name or username or "",
+            "count": count,
+        })
+
+        if id is None:
+            none_valued_added = True
+
+    # If there was no userstory with null assigned_to we manually add it
+    if not none_valued_added:
+        result.append({
+            "id": None,
+            "full_name": "",
+            "count": 0,
+        })
+
+    return sorted(result, key=itemgetter("full_name"))
+
+
+def _get_userstories_assigned_users(project, queryset):
+    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
+    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
+    where = queryset_where_tuple[0]
+    where_params = queryset_where_tuple[1]
+
+    extra_sql = """
+     WITH "us_counters" AS (
+         SELECT DISTINCT COALESCE("userstories_userstory_assigned_users"."user_id",
+            "userstories_userstory"."assigned_to_id") as "assigned_user_id",
+                "userstories_userstory"."id" "us_id"
+                    FROM "userstories_userstory"
+              LEFT JOIN "userstories_userstory_assigned_users"
+                      ON "userstories_userstory_assigned_users"."userstory_id" = "userstories_userstory"."id"
+              INNER JOIN "projects_project"
+                      ON ("userstories_userstory"."project_id" = "projects_project"."id")
+                INNER JOIN "projects_userstorystatus"
+                    ON ("userstories_userstory"."status_id" = "projects_userstorystatus"."id")
+              LEFT OUTER JOIN "epics_relateduserstory"
+                      ON "userstories_userstory"."id" = "epics_relateduserstory"."user_story_id"
+                   WHERE {where}
+            ),
+
+            "counters" AS (
+                 SELECT "assigned_user_id",
+                        COUNT("assigned_user_id")
+                   FROM "us_counters"
+               GROUP BY "assigned_user_id"
+            )
+
+                 SELECT "projects_membership"."user_id" "user_id",
+                        "users_user"."full_name" "full_name",
+                        "users_user"."username" "username",
+                        COALESCE("counters".count, 0) "count",
+                        "users_user"."photo" "photo",
+                        "users_user"."email" "email"
+                   FROM "projects_membership"
+        LEFT OUTER JOIN "counters"
+                     ON ("projects_membership"."user_id" = "counters"."assigned_user_id")
+             INNER JOIN "users_user"
+                     ON ("projects_membership"."user_id" = "users_user"."id")
+                  WHERE "projects_membership"."project_id" = %s AND "projects_membership"."user_id" IS NOT NULL
+
+        -- unassigned userstories
+        UNION
+
+                 SELECT NULL "user_id",
+                        NULL "full_name",
+                        NULL "username",
+                        count(coalesce("assigned_to_id", -1)) "count",
+                        NULL "photo",
+                        NULL "email"
+                   FROM "userstories_userstory"
+             INNER JOIN "projects_project"
+                     ON ("userstories_userstory"."project_id" = "projects_project"."id")
+            INNER JOIN "projects_userstorystatus"
+                ON ("userstories_userstory"."status_id" = "projects_userstorystatus"."id")
+        LEFT OUTER JOIN "epics_relateduserstory"
+                     ON ("userstories_userstory"."id" = "epics_relateduserstory"."user_story_id")
+                  WHERE {where} AND "userstories_userstory"."id" NOT IN (
+                    SELECT "userstories_userstory_assigned_users"."userstory_id" FROM
+                      "userstories_userstory_assigned_users"
+                  ) AND "userstories_userstory"."assigned_to_id" IS NULL
+               GROUP BY "username";
+    """.format(where=where)
+
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(extra_sql, where_params + [project.id] + where_params)
+        rows = cursor.fetchall()
+
+    result = []
+    none_valued_added = False
+    for id, full_name, username, count, photo, email in rows:
+        result.append({
+            "id": id,
+            "full_name": full_name or username or "",
+            "count": count,
+            "photo": get_photo_url(photo),
+            "big_photo": get_big_photo_url(photo),
+            "gravatar_id": get_gravatar_id(email) if email else None
+        })
+
+        if id is None:
+            none_valued_added = True
+
+    # If there was no userstory with null assigned_to we manually add it
+    if not none_valued_added:
+        result.append({
+            "id": None,
+            "full_name": "",
+            "count": 0,
+            "photo": None,
+            "big_photo": None,
+            "gravatar_id": None
+        })
+
+    return sorted(result, key=itemgetter("full_name"))
+
+
+def _get_userstories_owners(project, queryset):
+    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
+    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
+    where = queryset_where_tuple[0]
+    where_params = queryset_where_tuple[1]
+
+    extra_sql = """
+     WITH "us_counters" AS(
+         SELECT DISTINCT "userstories_userstory"."owner_id" "owner_id",
+                         "userstories_userstory"."id" "us_id"
+                    FROM "userstories_userstory"
+              INNER JOIN "projects_project"
+                      ON ("userstories_userstory"."project_id" = "projects_project"."id")
+                INNER JOIN "projects_userstorystatus"
+                    ON ("userstories_userstory"."status_id" = "projects_userstorystatus"."id")
+         LEFT OUTER JOIN "epics_relateduserstory"
+                      ON ("userstories_userstory"."id" = "epics_relateduserstory"."user_story_id")
+         LEFT OUTER JOIN "userstories_userstory_assigned_users"
+                      ON "userstories_userstory"."id" = "userstories_userstory_assigned_users"."userstory_id"
+                   WHERE {where}
+            ),
+
+            "counters" AS (
+                 SELECT "owner_id",
+                        COUNT("owner_id")
+                   FROM "us_counters"
+               GROUP BY "owner_id"
+            )
+
+                 SELECT "projects_membership"."user_id" "user_id",
+                        "users_user"."full_name",
+                        "users_user"."username",
+                        COALESCE("counters".count, 0) "count",
+                        "users_user"."photo" "photo",
+                        "users_user"."email" "email"
+                   FROM "projects_membership"
+        LEFT OUTER JOIN "counters"
+                     ON ("projects_membership"."user_id" = "counters"."owner_id")
+             INNER JOIN "users_user"
+                     ON ("projects_membership"."user_id" = "users_user"."id")
+                  WHERE "projects_membership"."project_id" = %s AND "projects_membership"."user_id" IS NOT NULL
+
+        -- System users
+                  UNION
+
+                 SELECT "users_user"."id" "user_id",
+                        "users_user"."full_name" "full_name",
+                        "users_user"."username" "username",
+                        COALESCE("counters"."count", 0) "count",
+                        NULL "photo",
+                        NULL "email"
+                   FROM "users_user"
+        LEFT OUTER JOIN "counters"
+                     ON ("users_user"."id" = "counters"."owner_id")
+                  WHERE ("users_user"."is_system" IS TRUE)
+    """.format(where=where)
+
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(extra_sql, where_params + [project.id])
+        rows = cursor.fetchall()
+
+    result = []
+    for id, full_name, username, count, photo, email in rows:
+        if count > 0:
+            result.append({
+                "id": id,
+                "full_name": full_name or username or "",
+                "count": count,
+                "photo": get_photo_url(photo),
+                "big_photo": get_big_photo_url(photo),
+                "gravatar_id": get_gravatar_id(email) if email else None
+            })
+    return sorted(result, key=itemgetter("full_name"))
+
+
+def _get_userstories_tags(project, queryset):
+    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
+    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
+    where = queryset_where_tuple[0]
+    where_params = queryset_where_tuple[1]
+
+    extra_sql = """
+           WITH "userstories_tags" AS (
+                   SELECT "tag",
+                          COUNT("tag") "counter"
+                     FROM (
+                      SELECT DISTINCT "userstories_userstory"."id" "us_id",
+                                       UNNEST("userstories_userstory"."tags") "tag"
+                                 FROM "userstories_userstory"
+                        INNER JOIN "projects_project"
+                            ON ("userstories_userstory"."project_id" = "projects_project"."id")
+                        INNER JOIN "projects_userstorystatus"
+                            ON ("userstories_userstory"."status_id" = "projects_userstorystatus"."id")
+                        LEFT OUTER JOIN "epics_relateduserstory"
+                            ON ("userstories_userstory"."id" = "epics_relateduserstory"."user_story_id")
+                        LEFT OUTER JOIN "userstories_userstory_assigned_users"
+                            ON "userstories_userstory"."id" = "userstories_userstory_assigned_users"."userstory_id"
+                                WHERE {where}
+                          ) "tags"
+                    GROUP BY "tag"),
+
+                "project_tags" AS (
+                       SELECT reduce_dim("tags_colors") "tag_color"
+                         FROM "projects_project"
+                        WHERE "id"=%s)
+
+         SELECT "tag_color"[1] "tag",
+                "tag_color"[2] "color",
+                COALESCE("userstories_tags"."counter", 0) "counter"
+           FROM "project_tags"
+LEFT OUTER JOIN "userstories_tags"
+             ON "project_tags"."tag_color"[1] = "userstories_tags"."tag"
+       ORDER BY "tag"
+    """.format(where=where)
+
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(extra_sql, where_params + [project.id])
+        rows = cursor.fetchall()
+
+    result = []
+    for name, color, count in rows:
+        result.append({
+            "name": name,
+            "color": color,
+            "count": count,
+        })
+    return sorted(result, key=itemgetter("name"))
+
+
+def _get_userstories_epics(project, queryset):
+    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
+    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
+    where = queryset_where_tuple[0]
+    where_params = queryset_where_tuple[1]
+    extra_sql = """
+       WITH "counters" AS (
+               SELECT "epics_relateduserstory"."epic_id" AS "epic_id",
+                      count("epics_relateduserstory"."id") AS "counter"
+                 FROM "epics_relateduserstory"
+           INNER JOIN "userstories_userstory"
+                   ON ("userstories_userstory"."id" = "epics_relateduserstory"."user_story_id")
+           INNER JOIN "projects_project"
+                   ON ("userstories_userstory"."project_id" = "projects_project"."id")
+            INNER JOIN "projects_userstorystatus"
+                    ON ("userstories_userstory"."status_id" = "projects_userstorystatus"."id")
+            LEFT OUTER JOIN "userstories_userstory_assigned_users"
+                ON "userstories_userstory"."id" = "userstories_userstory_assigned_users"."userstory_id"
+                WHERE {where}
+             GROUP BY "epics_relateduserstory"."epic_id"
+       )
+
+         -- User stories with no epics (return results only if there are userstories)
+               SELECT NULL AS "id",
+                      NULL AS "ref",
+                      NULL AS "subject",
+                      0 AS "order",
+                      count(COALESCE("epics_relateduserstory"."epic_id", -1)) AS "counter"
+                 FROM "userstories_userstory"
+      LEFT OUTER JOIN "epics_relateduserstory"
+                   ON ("epics_relateduserstory"."user_story_id" = "userstories_userstory"."id")
+           INNER JOIN "projects_project"
+                   ON ("userstories_userstory"."project_id" = "projects_project"."id")
+            INNER JOIN "projects_userstorystatus"
+                ON ("userstories_userstory"."status_id" = "projects_userstorystatus"."id")
+         LEFT OUTER JOIN "userstories_userstory_assigned_users"
+                      ON "userstories_userstory"."id" = "userstories_userstory_assigned_users"."userstory_id"
+                WHERE {where} AND "epics_relateduserstory"."epic_id" IS NULL
+             GROUP BY "epics_relateduserstory"."epic_id"
+
+                UNION
+
+               SELECT "epics_epic"."id" AS "id",
+                      "epics_epic"."ref" AS "ref",
+                      "epics_epic"."subject" AS "subject",
+                      "epics_epic"."epics_order" AS "order",
+                      COALESCE("counters"."counter", 0) AS "counter"
+                 FROM "epics_epic"
+      LEFT OUTER JOIN "counters"
+                   ON ("counters"."epic_id" = "epics_epic"."id")
+                WHERE "epics_epic"."project_id" = %s
+        """.format(where=where)
+
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(extra_sql, where_params + where_params + [project.id])
+        rows = cursor.fetchall()
+
+    result = []
+    for id, ref, subject, order, count in rows:
+        result.append({
+            "id": id,
+            "ref": ref,
+            "subject": subject,
+            "order": order,
+            "count": count,
+        })
+
+    result = sorted(result, key=lambda k: (k["order"], k["id"] or 0))
+
+    # Add row when there is no user stories with no epics
+    if result == [] or result[0]["id"] is not None:
+        result.insert(0, {
+            "id": None,
+            "ref": None,
+            "subject": None,
+            "order": 0,
+            "count": 0,
+        })
+    return result
+
+
+def _get_userstories_roles(project, queryset):
+    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
+    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
+    where = queryset_where_tuple[0]
+    where_params = queryset_where_tuple[1]
+
+    extra_sql = """
+     WITH "us_counters" AS (
+         SELECT DISTINCT "userstories_userstory"."status_id" "status_id",
+                         "userstories_userstory"."id" "us_id",
+                         "projects_membership"."role_id" "role_id"
+                    FROM "userstories_userstory"
+              INNER JOIN "projects_project"
+                      ON ("userstories_userstory"."project_id" = "projects_project"."id")
+            INNER JOIN "projects_userstorystatus"
+                ON ("userstories_userstory"."status_id" = "projects_userstorystatus"."id")
+         LEFT OUTER JOIN "epics_relateduserstory"
+                      ON "userstories_userstory"."id" = "epics_relateduserstory"."user_story_id"
+         LEFT OUTER JOIN "userstories_userstory_assigned_users"
+                      ON "userstories_userstory_assigned_users"."userstory_id" = "userstories_userstory"."id"
+         LEFT OUTER JOIN "projects_membership"
+                      ON "projects_membership"."user_id" = "userstories_userstory"."assigned_to_id"
+                      OR "projects_membership"."user_id" = "userstories_userstory_assigned_users"."user_id"
+                   WHERE {where}
+            ),
+             "counters" AS (
+                  SELECT "role_id" as "role_id",
+                         COUNT("role_id") "count"
+                    FROM "us_counters"
+                GROUP BY "role_id"
+            )
+
+                 SELECT "users_role"."id",
+                        "users_role"."name",
+                        "users_role"."order",
+                        COALESCE("counters"."count", 0)
+                   FROM "users_role"
+        LEFT OUTER JOIN "counters"
+                     ON "counters"."role_id" = "users_role"."id"
+                  WHERE "users_role"."project_id" = %s
+               ORDER BY "users_role"."order";
+    """.format(where=where)
+
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(extra_sql, where_params + [project.id])
+        rows = cursor.fetchall()
+
+    result = []
+    for id, name, order, count in rows:
+        result.append({
+            "id": id,
+            "name": _(name),
+            "color": None,
+            "order": order,
+            "count": count,
+        })
+    return sorted(result, key=itemgetter("order"))
+
+
+def get_userstories_filters_data_by_facet(project, querysets):
+    """
+    Return the filters data of the userstories with one query by facet.
+    """
+    data = OrderedDict([
+        ("statuses", _get_userstories_statuses(project, querysets["statuses"])),
+        ("assigned_to",
+         _get_userstories_assigned_to(project, querysets["assigned_to"])),
+        ("assigned_users",
+         _get_userstories_assigned_users(project, querysets["assigned_users"])),
+        ("owners", _get_userstories_owners(project, querysets["owners"])),
+        ("tags", _get_userstories_tags(project, querysets["tags"])),
+        ("epics", _get_userstories_epics(project, querysets["epics"])),
+        ("roles", _get_userstories_roles(project, querysets["roles"])),
+    ])
+
+    return data
+
+
+#####################################################
+# Issues
+#####################################################
+
+def _get_issues_statuses(project, queryset):
+    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
+    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
+    where = queryset_where_tuple[0]
+    where_params = queryset_where_tuple[1]
+
+    extra_sql = """
+        WITH counters AS (
+                SELECT status_id, count(status_id) count
+                  FROM "issues_issue"
+            INNER JOIN "projects_project" ON ("issues_issue"."project_id" = "projects_project"."id")
+                 WHERE {where}
+              GROUP BY status_id
+        )
+
+                 SELECT "projects_issuestatus"."id",
+                        "projects_issuestatus"."name",
+                        "projects_issuestatus"."color",
+                        "projects_issuestatus"."order",
+                        COALESCE(counters.count, 0)
+                   FROM "projects_issuestatus"
+        LEFT OUTER JOIN counters ON counters.status_id = projects_issuestatus.id
+                  WHERE "projects_issuestatus"."project_id" = %s
+               ORDER BY "projects_issuestatus"."order";
+    """.format(where=where)
+
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(extra_sql, where_params + [project.id])
+        rows = cursor.fetchall()
+
+    result = []
+    for id, name, color, order, count in rows:
+        result.append({
+            "id": id,
+            "name": _(name),
+            "color": color,
+            "order": order,
+            "count": count,
+        })
+    return sorted(result, key=itemgetter("order"))
+
+
+def _get_issues_types(project, queryset):
+    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
+    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
+    where = queryset_where_tuple[0]
+    where_params = queryset_where_tuple[1]
+
+    extra_sql = """
+        WITH counters AS (
+                SELECT type_id, count(type_id) count
+                  FROM "issues_issue"
+            INNER JOIN "projects_project" ON ("issues_issue"."project_id" = "projects_project"."id")
+                 WHERE {where}
+              GROUP BY type_id
+        )
+
+                 SELECT "projects_issuetype"."id",
+                        "projects_issuetype"."name",
+                        "projects_issuetype"."color",
+                        "projects_issuetype"."order",
+                        COALESCE(counters.count, 0)
+                   FROM "projects_issuetype"
+        LEFT OUTER JOIN counters ON counters.type_id = projects_issuetype.id
+                  WHERE "projects_issuetype"."project_id" = %s
+               ORDER BY "projects_issuetype"."order";
+    """.format(where=where)
+
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(extra_sql, where_params + [project.id])
+        rows = cursor.fetchall()
+
+    result = []
+    for id, name, color, order, count in rows:
+        result.append({
+            "id": id,
+            "name": _(name),
+            "color": color,
+            "order": order,
+            "count": count,
+        })
+    return sorted(result, key=itemgetter("order"))
+
+
+def _get_issues_priorities(project, queryset):
+    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
+    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
+    where = queryset_where_tuple[0]
+    where_params = queryset_where_tuple[1]
+
+    extra_sql = """
+        WITH counters AS (
+                SELECT priority_id, count(priority_id) count
+                  FROM "issues_issue"
+            INNER JOIN "projects_project" ON ("issues_issue"."project_id" = "projects_project"."id")
+                 WHERE {where}
+              GROUP BY priority_id
+        )
+
+                 SELECT "projects_priority"."id",
+                        "projects_priority"."name",
+                        "projects_priority"."color",
+                        "projects_priority"."order",
+                        COALESCE(counters.count, 0)
+                   FROM "projects_priority"
+        LEFT OUTER JOIN counters ON counters.priority_id = projects_priority.id
+                  WHERE "projects_priority"."project_id" = %s
+               ORDER BY "projects_priority"."order";
+    """.format(where=where)
+
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(extra_sql, where_params + [project.id])
+        rows = cursor.fetchall()
+
+    result = []
+    for id, name, color, order, count in rows:
+        result.append({
+            "id": id,
+            "name": _(name),
+            "color": color,
+            "order": order,
+            "count": count,
+        })
+    return sorted(result, key=itemgetter("order"))
+
+
+def _get_issues_severities(project, queryset):
+    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
+    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
+    where = queryset_where_tuple[0]
+    where_params = queryset_where_tuple[1]
+
+    extra_sql = """
+        WITH counters AS (
+                SELECT severity_id, count(severity_id) count
+                  FROM "issues_issue"
+            INNER JOIN "projects_project" ON ("issues_issue"."project_id" = "projects_project"."id")
+                 WHERE {where}
+              GROUP BY severity_id
+        )
+
+                 SELECT "projects_severity"."id",
+                        "projects_severity"."name",
+                        "projects_severity"."color",
+                        "projects_severity"."order",
+                        COALESCE(counters.count, 0)
+                   FROM "projects_severity"
+        LEFT OUTER JOIN counters ON counters.severity_id = projects_severity.id
+                  WHERE "projects_severity"."project_id" = %s
+               ORDER BY "projects_severity"."order";
+    """.format(where=where)
+
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(extra_sql, where_params + [project.id])
+        rows = cursor.fetchall()
+
+    result = []
+    for id, name, color, order, count in rows:
+        result.append({
+            "id": id,
+            "name": _(name),
+            "color": color,
+            "order": order,
+            "count": count,
+        })
+    return sorted(result, key=itemgetter("order"))
+
+
+def _get_issues_assigned_to(project, queryset):
+    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
+    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
+    where = queryset_where_tuple[0]
+    where_params = queryset_where_tuple[1]
+
+    extra_sql = """
+        WITH counters AS (
+                SELECT assigned_to_id,  count(assigned_to_id) count
+                  FROM "issues_issue"
+            INNER JOIN "projects_project" ON ("issues_issue"."project_id" = "projects_project"."id")
+                 WHERE {where} AND "issues_issue"."assigned_to_id" IS NOT NULL
+              GROUP BY assigned_to_id
+        )
+
+                SELECT  "projects_membership"."user_id" user_id,
+                        "users_user"."full_name",
+                        "users_user"."username",
+                        COALESCE("counters".count, 0) count
+                   FROM projects_membership
+        LEFT OUTER JOIN counters ON ("projects_membership"."user_id" = "counters"."assigned_to_id")
+             INNER JOIN "users_user" ON ("projects_membership"."user_id" = "users_user"."id")
+                  WHERE "projects_membership"."project_id" = %s AND "projects_membership"."user_id" IS NOT NULL
+
+        -- unassigned issues
+        UNION
+
+                 SELECT NULL user_id, NULL, NULL, count(coalesce(assigned_to_id, -1)) count
+                   FROM "issues_issue"
+             INNER JOIN "projects_project" ON ("issues_issue"."project_id" = "projects_project"."id")
+                  WHERE {where} AND "issues_issue"."assigned_to_id" IS NULL
+               GROUP BY assigned_to_id
+    """.format(where=where)
+
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(extra_sql, where_params + [project.id] + where_params)
+        rows = cursor.fetchall()
+
+    result = []
+    none_valued_added = False
+    for id, full_name, username, count in rows:
+        result.append({
+            "id": id,
+            "full_name": full_name or username or "",
+            "count": count,
+        })
+
+        if id is None:
+            none_valued_added = True
+
+    # If there was no issue with null assigned_to we manually add it
+    if not none_valued_added:
+        result.append({
+            "id": None,
+            "full_name": "",
+            "count": 0,
+        })
+
+    return sorted(result, key=itemgetter("full_name"))
+
+
+def _get_issues_owners(project, queryset):
+    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
+    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
+    where = queryset_where_tuple[0]
+    where_params = queryset_where_tuple[1]
+
+    extra_sql = """
+        WITH counters AS (
+                SELECT "issues_issue"."owner_id" owner_id,  count("issues_issue"."owner_id") count
+                  FROM "issues_issue"
+            INNER JOIN "projects_project" ON ("issues_issue"."project_id" = "projects_project"."id")
+                 WHERE {where}
+              GROUP BY "issues_issue"."owner_id"
+        )
+
+                 SELECT "projects_membership"."user_id" id,
+                        "users_user"."full_name",
+                        "users_user"."username",
+                        COALESCE("counters".count, 0) count
+                   FROM projects_membership
+        LEFT OUTER JOIN counters ON ("projects_membership"."user_id" = "counters"."owner_id")
+             INNER JOIN "users_user" ON ("projects_membership"."user_id" = "users_user"."id")
+                  WHERE "projects_membership"."project_id" = %s AND "projects_membership"."user_id" IS NOT NULL
+
+        -- System users
+        UNION
+
+                 SELECT "users_user"."id" user_id,
+                        "users_user"."full_name" full_name,
+                        "users_user"."username",
+                        COALESCE("counters".count, 0) count
+                   FROM users_user
+        LEFT OUTER JOIN counters ON ("users_user"."id" = "counters"."owner_id")
+                  WHERE ("users_user"."is_system" IS TRUE)
+    """.format(where=where)
+
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(extra_sql, where_params + [project.id])
+        rows = cursor.fetchall()
+
+    result = []
+    for id, full_name, username, count in rows:
+        if count > 0:
+            result.append({
+                "id": id,
+                "full_name": full_name or username or "",
+                "count": count,
+            })
+    return sorted(result, key=itemgetter("full_name"))
+
+
+def _get_issues_roles(project, queryset):
+    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
+    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
+    where = queryset_where_tuple[0]
+    where_params = queryset_where_tuple[1]
+
+    extra_sql = """
+     WITH "issue_counters" AS (
+         SELECT DISTINCT "issues_issue"."status_id" "status_id",
+                         "issues_issue"."id" "issue_id",
+                         "projects_membership"."role_id" "role_id"
+                    FROM "issues_issue"
+              INNER JOIN "projects_project"
+                      ON ("issues_issue"."project_id" = "projects_project"."id")
+         LEFT OUTER JOIN "projects_membership"
+                      ON "projects_membership"."user_id" = "issues_issue"."assigned_to_id"
+                   WHERE {where}
+            ),
+             "counters" AS (
+                  SELECT "role_id" as "role_id",
+                         COUNT("role_id") "count"
+                    FROM "issue_counters"
+                GROUP BY "role_id"
+            )
+
+                 SELECT "users_role"."id",
+                        "users_role"."name",
+                        "users_role"."order",
+                        COALESCE("counters"."count", 0)
+                   FROM "users_role"
+        LEFT OUTER JOIN "counters"
+                     ON "counters"."role_id" = "users_role"."id"
+                  WHERE "users_role"."project_id" = %s
+               ORDER BY "users_role"."order";
+    """.format(where=where)
+
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(extra_sql, where_params + [project.id])
+        rows = cursor.fetchall()
+
+    result = []
+    for id, name, order, count in rows:
+        result.append({
+            "id": id,
+            "name": _(name),
+            "color": None,
+            "order": order,
+            "count": count,
+        })
+    return sorted(result, key=itemgetter("order"))
+
+def _get_issues_tags(project, queryset):
+    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
+    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
+    where = queryset_where_tuple[0]
+    where_params = queryset_where_tuple[1]
+
+    extra_sql = """
+        WITH "issues_tags" AS (
+                    SELECT "tag",
+                           COUNT("tag") "counter"
+                      FROM (
+                                SELECT UNNEST("issues_issue"."tags") "tag"
+                                  FROM "issues_issue"
+                            INNER JOIN "projects_project"
+                                    ON ("issues_issue"."project_id" = "projects_project"."id")
+                                 WHERE {where}
+                           ) "tags"
+                  GROUP BY "tag"),
+             "project_tags" AS (
+                    SELECT reduce_dim("tags_colors") "tag_color"
+                      FROM "projects_project"
+                     WHERE "id"=%s)
+
+      SELECT "tag_color"[1] "tag",
+             "tag_color"[2] "color",
+             COALESCE("issues_tags"."counter", 0) "counter"
+        FROM project_tags
+   LEFT JOIN "issues_tags" ON "project_tags"."tag_color"[1] = "issues_tags"."tag"
+    ORDER BY "tag"
+    """.format(where=where)
+
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(extra_sql, where_params + [project.id])
+        rows = cursor.fetchall()
+
+    result = []
+    for name, color, count in rows:
+        result.append({
+            "name": name,
+            "color": color,
+            "count": count,
+        })
+    return sorted(result, key=itemgetter("name"))
+
+
+def get_issues_filters_data_by_facet(project, querysets):
+    """
+    Return the filters data of the issues with one query by facet.
+    """
+    data = OrderedDict([
+        ("types", _get_issues_types(project, querysets["types"])),
+        ("statuses", _get_issues_statuses(project, querysets["statuses"])),
+        ("priorities", _get_issues_priorities(project, querysets["priorities"])),
+        ("severities", _get_issues_severities(project, querysets["severities"])),
+        ("assigned_to", _get_issues_assigned_to(project, querysets["assigned_to"])),
+        ("owners", _get_issues_owners(project, querysets["owners"])),
+        ("tags", _get_issues_tags(project, querysets["tags"])),
+        ("roles", _get_issues_roles(project, querysets["roles"])),
+    ])
+
+    return data
+
+
+#####################################################
+# Tasks
+#####################################################
+
+def _get_tasks_statuses(project, queryset):
+    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
+    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
+    where = queryset_where_tuple[0]
+    where_params = queryset_where_tuple[1]
+
+    extra_sql = """
+      SELECT "projects_taskstatus"."id",
+             "projects_taskstatus"."name",
+             "projects_taskstatus"."color",
+             "projects_taskstatus"."order",
+             (SELECT count(*)
+                FROM "tasks_task"
+                     INNER JOIN "projects_project" ON
+                                ("tasks_task"."project_id" = "projects_project"."id")
+               WHERE {where} AND "tasks_task"."status_id" = "projects_taskstatus"."id")
+        FROM "projects_taskstatus"
+       WHERE "projects_taskstatus"."project_id" = %s
+    ORDER BY "projects_taskstatus"."order";
+    """.format(where=where)
+
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(extra_sql, where_params + [project.id])
+        rows = cursor.fetchall()
+
+    result = []
+    for id, name, color, order, count in rows:
+        result.append({
+            "id": id,
+            "name": _(name),
+            "color": color,
+            "order": order,
+            "count": count,
+        })
+    return sorted(result, key=itemgetter("order"))
+
+
+def _get_tasks_assigned_to(project, queryset):
+    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
+    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
+    where = queryset_where_tuple[0]
+    where_params = queryset_where_tuple[1]
+
+    extra_sql = """
+        WITH counters AS (
+                SELECT assigned_to_id,  count(assigned_to_id) count
+                  FROM "tasks_task"
+            INNER JOIN "projects_project" ON ("tasks_task"."project_id" = "projects_project"."id")
+                 WHERE {where} AND "tasks_task"."assigned_to_id" IS NOT NULL
+              GROUP BY assigned_to_id
+        )
+
+                 SELECT "projects_membership"."user_id" user_id,
+                        "users_user"."full_name",
+                        "users_user"."username",
+                        COALESCE("counters".count, 0) count
+                   FROM projects_membership
+        LEFT OUTER JOIN counters ON ("projects_membership"."user_id" = "counters"."assigned_to_id")
+             INNER JOIN "users_user" ON ("projects_membership"."user_id" = "users_user"."id")
+                  WHERE "projects_membership"."project_id" = %s AND "projects_membership"."user_id" IS NOT NULL
+
+        -- unassigned tasks
+        UNION
+
+                 SELECT NULL user_id, NULL, NULL, count(coalesce(assigned_to_id, -1)) count
+                   FROM "tasks_task"
+             INNER JOIN "projects_project" ON ("tasks_task"."project_id" = "projects_project"."id")
+                  WHERE {where} AND "tasks_task"."assigned_to_id" IS NULL
+               GROUP BY assigned_to_id
+    """.format(where=where)
+
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(extra_sql, where_params + [project.id] + where_params)
+        rows = cursor.fetchall()
+
+    result = []
+    none_valued_added = False
+    for id, full_name, username, count in rows:
+        result.append({
+            "id": id,
+            "full_name": full_name or username or "",
+            "count": count,
+        })
+
+        if id is None:
+            none_valued_added = True
+
+    # If there was no task with null assigned_to we manually add it
+    if not none_valued_added:
+        result.append({
+            "id": None,
+            "full_name": "",
+            "count": 0,
+        })
+
+    return sorted(result, key=itemgetter("full_name"))
+
+
+def _get_tasks_roles(project, queryset):
+    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
+    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
+    where = queryset_where_tuple[0]
+    where_params = queryset_where_tuple[1]
+
+    extra_sql = """
+     WITH "task_counters" AS (
+         SELECT DISTINCT "tasks_task"."status_id" "status_id",
+                         "tasks_task"."id" "us_id",
+                         "projects_membership"."role_id" "role_id"
+                    FROM "tasks_task"
+              INNER JOIN "projects_project"
+                      ON ("tasks_task"."project_id" = "projects_project"."id")
+         LEFT OUTER JOIN "projects_membership"
+                      ON "projects_membership"."user_id" = "tasks_task"."assigned_to_id"
+                   WHERE {where}
+            ),
+             "counters" AS (
+                  SELECT "role_id" as "role_id",
+                         COUNT("role_id") "count"
+                    FROM "task_counters"
+                GROUP BY "role_id"
+            )
+
+                 SELECT "users_role"."id",
+                        "users_role"."name",
+                        "users_role"."order",
+                        COALESCE("counters"."count", 0)
+                   FROM "users_role"
+        LEFT OUTER JOIN "counters"
+                     ON "counters"."role_id" = "users_role"."id"
+                  WHERE "users_role"."project_id" = %s
+               ORDER BY "users_role"."order";
+    """.format(where=where)
+
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(extra_sql, where_params + [project.id])
+        rows = cursor.fetchall()
+
+    result = []
+    for id, name, order, count in rows:
+        result.append({
+            "id": id,
+            "name": _(name),
+            "color": None,
+            "order": order,
+            "count": count,
+        })
+    return sorted(result, key=itemgetter("order"))
+
+
+def _get_tasks_owners(project, queryset):
+    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
+    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
+    where = queryset_where_tuple[0]
+    where_params = queryset_where_tuple[1]
+
+    extra_sql = """
+        WITH counters AS (
+                SELECT "tasks_task"."owner_id" owner_id,
+                       count(coalesce("tasks_task"."owner_id", -1)) count
+                  FROM "tasks_task"
+            INNER JOIN "projects_project" ON ("tasks_task"."project_id" = "projects_project"."id")
+                 WHERE {where}
+              GROUP BY "tasks_task"."owner_id"
+        )
+
+                 SELECT "projects_membership"."user_id" id,
+                        "users_user"."full_name",
+                        "users_user"."username",
+                        COALESCE("counters".count, 0) count
+                   FROM projects_membership
+        LEFT OUTER JOIN counters ON ("projects_membership"."user_id" = "counters"."owner_id")
+             INNER JOIN "users_user" ON ("projects_membership"."user_id" = "users_user"."id")
+                  WHERE "projects_membership"."project_id" = %s AND "projects_membership"."user_id" IS NOT NULL
+
+        -- System users
+        UNION
+
+                 SELECT "users_user"."id" user_id,
+                        "users_user"."full_name" full_name,
+                        "users_user"."username" username,
+                        COALESCE("counters".count, 0) count
+                   FROM users_user
+        LEFT OUTER JOIN counters ON ("users_user"."id" = "counters"."owner_id")
+                  WHERE ("users_user"."is_system" IS TRUE)
+    """.format(where=where)
+
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(extra_sql, where_params + [project.id])
+        rows = cursor.fetchall()
+
+    result = []
+    for id, full_name, username, count in rows:
+        if count > 0:
+            result.append({
+                "id": id,
+                "full_name": full_name or username or "",
+                "count": count,
+            })
+    return sorted(result, key=itemgetter("full_name"))
+
+
+def _get_tasks_tags(project, queryset):
+    compiler = connection.ops.compiler(queryset.query.compiler)(queryset.query, connection, None)
+    queryset_where_tuple = queryset.query.where.as_sql(compiler, connection)
+    where = queryset_where_tuple[0]
+    where_params = queryset_where_tuple[1]
+
+    extra_sql = """
+        WITH tasks_tags AS (
+                    SELECT tag,
+                           COUNT(tag) counter FROM (
+                                SELECT UNNEST(tasks_task.tags) tag
+                                  FROM tasks_task
+                            INNER JOIN projects_project
+                                        ON (tasks_task.project_id = projects_project.id)
+                                 WHERE {where}) tags
+                  GROUP BY tag),
+             project_tags AS (
+                    SELECT reduce_dim(tags_colors) tag_color
+                      FROM projects_project
+                     WHERE id=%s)
+
+      SELECT tag_color[1] tag,
+             tag_color[2] color,
+             COALESCE(tasks_tags.counter, 0) counter
+        FROM project_tags
+   LEFT JOIN tasks_tags ON project_tags.tag_color[1] = tasks_tags.tag
+    ORDER BY tag
+    """.format(where=where)
+
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(extra_sql, where_params + [project.id])
+        rows = cursor.fetchall()
+
+    result = []
+    for name, color, count in rows:
+        result.append({
+            "name": name,
+            "color": color,
+            "count": count,
+        })
+    return sorted(result, key=itemgetter("name"))
+
+
+def get_tasks_filters_data_by_facet(project, querysets):
+    """
+    Return the filters data of the tasks with one query by facet.
+    """
+    data = OrderedDict([
+        ("statuses", _get_tasks_statuses(project, querysets["statuses"])),
+        ("assigned_to", _get_tasks_assigned_to(project, querysets["assigned_to"])),
+        ("owners", _get_tasks_owners(project, querysets["owners"])),
+        ("tags", _get_tasks_tags(project, querysets["tags"])),
+        ("roles", _get_tasks_roles(project, querysets["roles"])),
+    ])
+
+    return data
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Milestone stats computed from its user stories and tasks, as they were
+before `taiga.projects.milestones.burndown`. They are the reference of the
+benchmark of the milestone burndown.
+"""
+
+import datetime
+
+
+def get_milestone_stats(milestone):
+    total_points = milestone.total_points
+    milestone_stats = {
+        'name': milestone.name,
+        'estimated_start': milestone.estimated_start,
+        'estimated_finish': milestone.estimated_finish,
+        'total_points': total_points,
+        'completed_points': list(milestone.closed_points.values()),
+        'total_userstories': milestone.cached_user_stories.count(),
+        'completed_userstories': milestone.cached_user_stories.filter(is_closed=True).count(),
+        'total_tasks': milestone.tasks.count(),
+        'completed_tasks': milestone.tasks.filter(status__is_closed=True).count(),
+        'iocaine_doses': milestone.tasks.filter(is_iocaine=True).count(),
+        'days': []
+    }
+    current_date = milestone.estimated_start
+    sumTotalPoints = sum(total_points.values())
+    optimal_points = sumTotalPoints
+    milestone_days = (milestone.estimated_finish - milestone.estimated_start).days
+    optimal_points_per_day = sumTotalPoints / milestone_days if milestone_days else 0
+
+    while current_date <= milestone.estimated_finish:
+        milestone_stats['days'].append({
+            'day': current_date,
+            'name': current_date.day,
+            'open_points': sumTotalPoints - milestone.total_closed_points_by_date(current_date),
+            'optimal_points': optimal_points,
+        })
+        current_date = current_date + datetime.timedelta(days=1)
+        optimal_points -= optimal_points_per_day
+
+    return milestone_stats
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Project stats iterating over every role point of the project, as they were
+computed before the aggregated `taiga.projects.services.stats.get_stats_for_project`.
+They are the reference of the benchmark of the project stats.
+"""
+
+import collections
+
+from django.apps import apps
+
+from taiga.projects.services.stats import _get_milestones_stats_for_backlog
+
+
+def get_stats_for_project(project):
+    # Let's fetch all the estimations related to a project with all the necesary
+    # related data
+    RolePoints = apps.get_model('userstories', 'RolePoints')
+    role_points = RolePoints.objects.filter(
+        user_story__project = project,
+    ).prefetch_related(
+        "user_story",
+        "user_story__assigned_to",
+        "user_story__milestone",
+        "user_story__status",
+        "role",
+        "points")
+
+    # Data inicialization
+    project._closed_points = 0
+    project._closed_points_per_role = {}
+    project._closed_points_from_closed_milestones = 0
+    project._defined_points = 0
+    project._defined_points_per_role = {}
+    project._assigned_points = 0
+    project._assigned_points_per_role = {}
+    project._future_team_increment = 0
+    project._future_client_increment = 0
+
+    # The key will be the milestone id and it will be ordered by estimated_start
+    milestones = collections.OrderedDict()
+    for milestone in project.milestones.order_by("estimated_start"):
+        milestone._closed_points = 0
+        milestone._team_increment_points = 0
+        milestone._client_increment_points = 0
+        milestones[milestone.id] = milestone
+
+    def _find_milestone_for_userstory(user_story):
+        for m in milestones.values():
+            if m.estimated_finish > user_story.created_date.date() and\
+               m.estimated_start <= user_story.created_date.date():
+
+              return m
+
+        return None
+
+    def _update_team_increment(milestone, value):
+        if milestone:
+            milestones[milestone.id]._team_increment_points += value
+        else:
+            project._future_team_increment += value
+
+    def _update_client_increment(milestone, value):
+        if milestone:
+            milestones[milestone.id]._client_increment_points += value
+        else:
+            project._future_client_increment += value
+
+    # Iterate over all the project estimations and update our stats
+    for role_point in role_points:
+        role_id = role_point.role.id
+        points_value = role_point.points.value
+        user_story = getattr(role_point, "user_story", None)
+
+        milestone = None
+        is_team_requirement = None
+        is_client_requirement = None
+        us_milestone = None
+
+        if user_story:
+            milestone = user_story.milestone
+            is_team_requirement = user_story.team_requirement
+            is_client_requirement = user_story.client_requirement
+            us_milestone = _find_milestone_for_userstory(user_story)
+
+        # None estimations doesn't affect to project stats
+        if points_value is None:
+            continue
+
+        # Total defined points
+        project._defined_points += points_value
+
+        # Defined points per role
+        project._defined_points_for_role = project._defined_points_per_role.get(role_id, 0)
+        project._defined_points_for_role += points_value
+        project._defined_points_per_role[role_id] = project._defined_points_for_role
+
+        # Closed points
+        if user_story and user_story.is_closed:
+            project._closed_points += points_value
+            closed_points_for_role = project._closed_points_per_role.get(role_id, 0)
+            closed_points_for_role += points_value
+            project._closed_points_per_role[role_id] = closed_points_for_role
+
+            if milestone is not None:
+                milestones[milestone.id]._closed_points += points_value
+
+        if milestone is not None and milestone.closed:
+            project._closed_points_from_closed_milestones += points_value
+
+        # Assigned to milestone points
+        if user_story and user_story.milestone is not None:
+            project._assigned_points += points_value
+            assigned_points_for_role = project._assigned_points_per_role.get(role_id, 0)
+            assigned_points_for_role += points_value
+            project._assigned_points_per_role[role_id] = assigned_points_for_role
+
+        # Extra requirements
+        if is_team_requirement and is_client_requirement:
+            _update_team_increment(us_milestone, points_value/2)
+            _update_client_increment(us_milestone, points_value/2)
+
+        if is_team_requirement and not is_client_requirement:
+            _update_team_increment(us_milestone, points_value)
+
+        if not is_team_requirement and is_client_requirement:
+            _update_client_increment(us_milestone, points_value)
+
+    # Speed calculations
+    speed = 0
+    closed_milestones = len([m for m in milestones.values() if m.closed])
+    if closed_milestones != 0:
+        speed = project._closed_points_from_closed_milestones / closed_milestones
+
+    milestones_stats = _get_milestones_stats_for_backlog(project, milestones)
+
+    project_stats = {
+        'name': project.name,
+        'total_milestones': project.total_milestones,
+        'total_points': project.total_story_points,
+        'closed_points': project._closed_points,
+        'closed_points_per_role': project._closed_points_per_role,
+        'defined_points': project._defined_points,
+        'defined_points_per_role': project._defined_points_per_role,
+        'assigned_points': project._assigned_points,
+        'assigned_points_per_role': project._assigned_points_per_role,
+        'milestones': milestones_stats,
+        'speed': speed,
+    }
+    return project_stats
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import pytest
+
+from .. import factories as f
+from . import compare_timings, filters_data_by_facet
+
+from taiga.projects.epics.models import RelatedUserStory
+from taiga.projects.userstories import services
+from taiga.projects.userstories.models import UserStory
+
+pytestmark = [pytest.mark.django_db, pytest.mark.slow]
+
+
+def test_benchmark_userstories_filters_data():
+    userstories = 5000
+    iterations = 5
+
+    project = f.ProjectFactory.create()
+    project.tags_colors = [["tag{}".format(i), "#{:06x}".format(i)] for i in range(20)]
+    project.save()
+    users = [f.MembershipFactory.create(project=project, role=f.RoleFactory.create(project=project)).user
+             for i in range(10)]
+    statuses = [f.UserStoryStatusFactory.create(project=project) for i in range(6)]
+    epics = [f.EpicFactory.create(project=project) for i in range(20)]
+
+    UserStory.objects.bulk_create([
+        UserStory(project=project, ref=i, subject="User story {}".format(i),
+                  owner=users[i % len(users)],
+                  assigned_to=users[i % 7] if i % 3 else None,
+                  status=statuses[i % len(statuses)],
+                  tags=["tag{}".format(i % 20), "tag{}".format(i % 13)])
+        for i in range(userstories)])
+    uss = list(UserStory.objects.filter(project=project).order_by("id"))
+    RelatedUserStory.objects.bulk_create([
+        RelatedUserStory(user_story=us, epic=epics[i % len(epics)], order=i)
+        for i, us in enumerate(uss) if i % 4])
+    UserStory.assigned_users.through.objects.bulk_create([
+        UserStory.assigned_users.through(userstory=us, user=users[i % 5])
+        for i, us in enumerate(uss) if i % 2])
+
+    # The list filtered by status: every facet but the statuses is filtered
+    queryset = UserStory.objects.filter(project=project)
+    filtered_queryset = queryset.filter(status__in=statuses[:4])
+    querysets = {
+        "statuses": queryset,
+        "assigned_to": filtered_queryset,
+        "assigned_users": filtered_queryset,
+        "owners": filtered_queryset,
+        "tags": filtered_queryset,
+        "epics": filtered_queryset,
+        "roles": filtered_queryset,
+    }
+
+    old_result, new_result = compare_timings(
+        lambda: filters_data_by_facet.get_userstories_filters_data_by_facet(project, querysets),
+        lambda: services.get_userstories_filters_data(project, querysets),
+        iterations,
+        "Filters data of {} user stories, one query by facet".format(userstories),
+        "Filters data of {} user stories, one query".format(userstories))
+    assert old_result == new_result
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import time
+
+import pytest
+
+from unittest.mock import patch
+
+from .. import factories as f
+
+from taiga.projects.history import services
+
+pytestmark = [pytest.mark.django_db, pytest.mark.slow]
+
+
+def _writes_per_second(issue, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        issue.subject = "subject {}".format(time.perf_counter())
+        issue.save()
+        services.take_snapshot(issue, user=issue.owner)
+    return iterations / (time.perf_counter() - start)
+
+
+def test_benchmark_take_snapshot_on_long_history(settings):
+    settings.MAX_PARTIAL_DIFFS = 200
+    history_length = 100
+    iterations = 50
+
+    issue = f.IssueFactory.create()
+    key = services.make_key_from_model_object(issue)
+    services.take_snapshot(issue, user=issue.owner)
+
+    # Fill the key with the partial diffs of a busy item
+    for i in range(history_length):
+        issue.description = "description {}".format(i)
+        issue.save()
+        services.take_snapshot(issue, user=issue.owner)
+
+    with patch("taiga.projects.history.services.get_head_for_key", return_value=None), \
+            patch("taiga.projects.history.models.HistoryHead.save"):
+        replay_wps = _writes_per_second(issue, iterations)
+
+    services.materialize_head_for_key(key, issue.project_id)
+    head_wps = _writes_per_second(issue, iterations)
+
+    print("\ntake_snapshot replaying diffs: {:.1f} writes/s".format(replay_wps))
+    print("take_snapshot with history head: {:.1f} writes/s".format(head_wps))
+    assert head_wps > replay_wps
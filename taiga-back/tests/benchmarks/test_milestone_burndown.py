@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import datetime
+
+import pytest
+
+from django.utils import timezone
+
+from .. import factories as f
+from . import compare_timings, milestone_stats_by_user_stories
+
+from taiga.projects.milestones import burndown
+from taiga.projects.milestones.models import Milestone
+from taiga.projects.tasks.models import Task
+from taiga.projects.userstories.models import RolePoints, UserStory
+
+pytestmark = [pytest.mark.django_db, pytest.mark.slow]
+
+
+def test_benchmark_milestone_stats():
+    userstories = 300
+    tasks_per_userstory = 10
+    iterations = 20
+
+    project = f.ProjectFactory.create()
+    owner = project.owner
+    roles = [f.RoleFactory.create(project=project, computable=True) for i in range(5)]
+    points = [f.PointsFactory.create(project=project, value=value) for value in [None, 0, 0.5, 1, 2, 3, 5, 8, 13]]
+    us_status = f.UserStoryStatusFactory.create(project=project, is_closed=False)
+    task_statuses = [f.TaskStatusFactory.create(project=project, is_closed=is_closed) for is_closed in [False, True]]
+
+    start = timezone.now().date() - datetime.timedelta(days=10)
+    milestone = f.MilestoneFactory.create(project=project, owner=owner, estimated_start=start,
+                                          estimated_finish=start + datetime.timedelta(days=14))
+
+    UserStory.objects.bulk_create([
+        UserStory(project=project, owner=owner, ref=i, subject="User story {}".format(i),
+                  milestone=milestone, status=us_status)
+        for i in range(userstories)])
+    user_stories = list(UserStory.objects.filter(project=project).only("id"))
+    RolePoints.objects.bulk_create([
+        RolePoints(user_story=us, role=role, points=points[(us.id + j) % len(points)])
+        for us in user_stories
+        for j, role in enumerate(roles)])
+    Task.objects.bulk_create([
+        Task(project=project, owner=owner, ref=userstories + i, subject="Task {}".format(i),
+             milestone=milestone, user_story=user_stories[i % userstories],
+             status=task_statuses[i % 2],
+             finished_date=timezone.now() - datetime.timedelta(days=i % 10) if i % 2 else None)
+        for i in range(userstories * tasks_per_userstory)])
+
+    def get_stats():
+        return burndown.get_milestone_stats(Milestone.objects.select_related("burndown").get(id=milestone.id))
+
+    burndown.compute_milestone_burndown(Milestone.objects.get(id=milestone.id))
+    old_result, new_result = compare_timings(
+        lambda: milestone_stats_by_user_stories.get_milestone_stats(Milestone.objects.get(id=milestone.id)),
+        get_stats,
+        iterations,
+        "Stats of a milestone of {} tasks, computed from its user stories".format(userstories * tasks_per_userstory),
+        "Stats of a milestone of {} tasks, read from its burndown".format(userstories * tasks_per_userstory))
+    # The closed points are added in other order
+    old_days = old_result.pop("days")
+    new_days = new_result.pop("days")
+    assert old_result == new_result
+    assert [day["open_points"] for day in new_days] == pytest.approx([day["open_points"] for day in old_days])
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import pytest
+
+from .. import factories as f
+from . import compare_timings
+
+from taiga.permissions.services import user_has_perm
+from taiga.projects.notifications import services
+from taiga.projects.notifications.choices import NotifyLevel
+
+pytestmark = [pytest.mark.django_db, pytest.mark.slow]
+
+
+def _get_users_to_notify_checking_every_user(obj, *, discard_users, live):
+    # The audience before it was computed in one pass: one computation by
+    # email/live, checking the permissions of every candidate.
+    project = obj.get_project()
+
+    def _check_level(user, levels):
+        policy = project.cached_notify_policy_for_user(user)
+        return (policy.live_notify_level if live else policy.notify_level) in levels
+
+    candidates = set()
+    candidates.update(u for u in project.members.all() if _check_level(u, [NotifyLevel.all]))
+    candidates.update(u for u in project.get_watchers() if _check_level(u, [NotifyLevel.all]))
+    candidates.update(u for u in obj.get_watchers() if _check_level(u, [NotifyLevel.all, NotifyLevel.involved]))
+    candidates.update(u for u in obj.get_participants() if _check_level(u, [NotifyLevel.all,
+                                                                            NotifyLevel.involved]))
+    candidates = candidates - set(discard_users)
+    candidates = {u for u in candidates if user_has_perm(u, "view_issues", obj, cache="project")}
+    return frozenset(u for u in candidates if u.is_active and not u.is_system)
+
+
+def test_benchmark_notification_audiences():
+    members = 500
+    watchers = 200
+    iterations = 5
+
+    project = f.ProjectFactory.create()
+    role = f.RoleFactory.create(project=project, permissions=["view_issues"])
+    issue = f.IssueFactory.create(project=project, owner=project.owner)
+    for i in range(members):
+        membership = f.MembershipFactory.create(project=project, role=role)
+        policy = membership.user.notify_policies.get(project=project)
+        policy.notify_level = NotifyLevel.all if i % 2 else NotifyLevel.involved
+        policy.live_notify_level = NotifyLevel.all if i % 3 else NotifyLevel.none
+        policy.save()
+        if i < watchers:
+            issue.add_watcher(membership.user)
+
+    def checking_every_user():
+        # The old permission checks cached the memberships in the project
+        project.__dict__.pop("cached_memberships", None)
+        email = _get_users_to_notify_checking_every_user(issue, discard_users=[project.owner], live=False)
+        live = _get_users_to_notify_checking_every_user(issue, discard_users=[project.owner], live=True)
+        return email, live
+
+    def one_pass():
+        return services.get_notification_audiences(issue, discard_users=[project.owner])
+
+    old_result, new_result = compare_timings(
+        checking_every_user,
+        one_pass,
+        iterations,
+        "Audience of {} members and {} watchers, checking every user".format(members, watchers),
+        "Audience of {} members and {} watchers, one pass".format(members, watchers))
+    assert old_result == new_result
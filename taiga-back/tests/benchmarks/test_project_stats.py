@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import datetime
+
+import pytest
+
+from django.utils import timezone
+
+from .. import factories as f
+from . import compare_timings, project_stats_by_role_points
+
+from taiga.projects.milestones.models import Milestone
+from taiga.projects.services import stats
+from taiga.projects.userstories.models import RolePoints, UserStory
+
+pytestmark = [pytest.mark.django_db, pytest.mark.slow]
+
+
+def test_benchmark_project_stats():
+    sprints = 400
+    userstories = 20000
+    iterations = 1
+
+    project = f.ProjectFactory.create()
+    owner = project.owner
+    roles = [f.RoleFactory.create(project=project, computable=True) for i in range(5)]
+    points = [f.PointsFactory.create(project=project, value=value) for value in [None, 0, 0.5, 1, 2, 3, 5, 8, 13]]
+    statuses = [f.UserStoryStatusFactory.create(project=project, is_closed=is_closed) for is_closed in [False, True]]
+
+    # Eight years of two weeks sprints
+    first_day = timezone.now().date() - datetime.timedelta(days=14 * sprints)
+    Milestone.objects.bulk_create([
+        Milestone(project=project, owner=owner, name="Sprint {}".format(i), slug="sprint-{}".format(i),
+                  estimated_start=first_day + datetime.timedelta(days=14 * i),
+                  estimated_finish=first_day + datetime.timedelta(days=14 * (i + 1)),
+                  closed=i < sprints - 2)
+        for i in range(sprints)])
+    milestones = list(Milestone.objects.filter(project=project).order_by("estimated_start"))
+
+    days = 14 * (sprints + 10)
+    UserStory.objects.bulk_create([
+        UserStory(project=project, owner=owner, ref=i, subject="User story {}".format(i),
+                  status=statuses[1] if i % 3 == 0 else statuses[0],
+                  is_closed=i % 3 == 0,
+                  milestone=milestones[i * sprints // userstories] if i % 5 else None,
+                  team_requirement=i % 7 == 0,
+                  client_requirement=i % 11 == 0,
+                  created_date=timezone.now() - datetime.timedelta(days=days * (userstories - i) // userstories))
+        for i in range(userstories)])
+    RolePoints.objects.bulk_create([
+        RolePoints(user_story=us, role=role, points=points[(us.id + j) % len(points)])
+        for us in UserStory.objects.filter(project=project).only("id")
+        for j, role in enumerate(roles)])
+
+    role_points = userstories * len(roles)
+    old_result, new_result = compare_timings(
+        lambda: project_stats_by_role_points.get_stats_for_project(project),
+        lambda: stats.get_stats_for_project(project),
+        iterations,
+        "Stats of a project of {} sprints and {} role points, iterating the role points".format(sprints, role_points),
+        "Stats of a project of {} sprints and {} role points, aggregated in SQL".format(sprints, role_points))
+    assert old_result == new_result
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import pytest
+
+from .. import factories as f
+from . import compare_timings
+
+from taiga.base.utils.db import to_tsquery
+from taiga.projects.issues.models import Issue
+from taiga.projects.tasks.models import Task
+from taiga.projects.userstories.models import UserStory
+from taiga.projects.userstories.utils import attach_total_points
+from taiga.searches import services
+
+pytestmark = [pytest.mark.django_db, pytest.mark.slow]
+
+
+WORDS = ["backend", "frontend", "login", "payment", "invoice", "report", "export", "import",
+         "mobile", "search", "email", "profile", "upload", "timeline", "webhook", "session"]
+
+
+def _search_by_query(queryset, tsquery, tsvector, text):
+    select = {
+        "rank": "ts_rank({tsvector},{tsquery})".format(tsquery=tsquery,
+                                                       tsvector=tsvector),
+    }
+    order_by = ["-rank", ]
+    where = ["{tsvector} @@ {tsquery}".format(tsquery=tsquery,
+                                              tsvector=tsvector), ]
+
+    queryset = queryset.extra(select=select,
+                              select_params=[to_tsquery(text)],
+                              where=where,
+                              params=[to_tsquery(text)],
+                              order_by=order_by)
+    queryset = attach_total_points(queryset)
+    return queryset[:services.MAX_RESULTS]
+
+
+def _search_items_inline_vector(queryset, table, text):
+    # The search as it was before the stored search vectors
+    tsquery = "to_tsquery('simple', %s)"
+    tsvector = """
+        setweight(to_tsvector('simple',
+                              coalesce({table}.subject) || ' ' ||
+                              coalesce({table}.ref)), 'A') ||
+        setweight(to_tsvector('simple', coalesce(inmutable_array_to_string({table}.tags))), 'B') ||
+        setweight(to_tsvector('simple', coalesce({table}.description)), 'C')
+    """.format(table=table)
+    return _search_by_query(queryset, tsquery, tsvector, text)
+
+
+def _search_items_stored_vector(queryset, table, text):
+    tsquery = "to_tsquery('simple', %s)"
+    tsvector = "{table}.search_vector".format(table=table)
+    return _search_by_query(queryset, tsquery, tsvector, text)
+
+
+def _text(i, words):
+    # One of every 200 items is about a "rollback", so the rare searches are not cut by MAX_RESULTS
+    text = " ".join(WORDS[(i * (n + 3)) % len(WORDS)] for n in range(words))
+    return "rollback " + text if i % 200 == 0 else text
+
+
+def test_benchmark_search_stored_vectors():
+    userstories = 20000
+    tasks = 15000
+    issues = 15000
+    iterations = 5
+
+    project = f.ProjectFactory.create()
+    owner = project.owner
+
+    UserStory.objects.bulk_create([
+        UserStory(project=project, owner=owner, ref=i, subject=_text(i, 4), description=_text(i + 1, 30),
+                  tags=[WORDS[i % len(WORDS)]])
+        for i in range(userstories)])
+    Task.objects.bulk_create([
+        Task(project=project, owner=owner, ref=userstories + i, subject=_text(i, 4), description=_text(i + 2, 30),
+             tags=[WORDS[i % len(WORDS)]])
+        for i in range(tasks)])
+    Issue.objects.bulk_create([
+        Issue(project=project, owner=owner, ref=userstories + tasks + i, subject=_text(i, 4),
+              description=_text(i + 3, 30), tags=[WORDS[i % len(WORDS)]])
+        for i in range(issues)])
+
+    searches = [
+        (UserStory, "userstories_userstory"),
+        (Task, "tasks_task"),
+        (Issue, "issues_issue"),
+    ]
+    texts = ["rollback", "rollback paym", "12345"]
+
+    def search_inline_vector():
+        return [sorted(obj.id for obj in _search_items_inline_vector(model.objects.filter(project_id=project.pk),
+                                                                     table, text))
+                for model, table in searches for text in texts]
+
+    def search_stored_vector():
+        return [sorted(obj.id for obj in _search_items_stored_vector(model.objects.filter(project_id=project.pk),
+                                                                     table, text))
+                for model, table in searches for text in texts]
+
+    items = userstories + tasks + issues
+    old_result, new_result = compare_timings(
+        search_inline_vector,
+        search_stored_vector,
+        iterations,
+        "Search of {} texts in a project of {} items, inline vectors".format(len(texts), items),
+        "Search of {} texts in a project of {} items, stored vectors".format(len(texts), items))
+    assert old_result == new_result
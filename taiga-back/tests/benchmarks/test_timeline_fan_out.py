@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import time
+
+import pytest
+
+from .. import factories as f
+
+from taiga.projects.history import services as history_services
+from taiga.timeline import service
+from taiga.timeline.models import Timeline
+
+pytestmark = [pytest.mark.django_db, pytest.mark.slow]
+
+
+def _inserts_per_second(fn, iterations):
+    count = Timeline.objects.count()
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - start
+    return (Timeline.objects.count() - count) / elapsed
+
+
+def test_benchmark_timeline_fan_out():
+    members = 80
+    iterations = 10
+
+    project = f.ProjectFactory.create()
+    user_story = f.UserStoryFactory.create(project=project, owner=project.owner)
+    for i in range(members):
+        user = f.UserFactory.create()
+        f.MembershipFactory.create(project=project, user=user)
+        user_story.add_watcher(user)
+
+    entry = history_services.take_snapshot(user_story, user=project.owner)
+    extra_data = {"values_diff": {}, "user": service.extract_user_info(project.owner)}
+    related_people = list(user_story.get_related_people())
+    namespace = service.build_user_namespace(project.owner)
+
+    def one_row_per_insert():
+        for person in related_people:
+            service._add_to_object_timeline(person, user_story, "change", entry.created_at,
+                                            namespace=namespace, extra_data=extra_data)
+
+    def bulk_fan_out():
+        service._add_to_objects_timeline(related_people, user_story, "change", entry.created_at,
+                                         namespace=namespace, extra_data=extra_data)
+
+    single_ips = _inserts_per_second(one_row_per_insert, iterations)
+    bulk_ips = _inserts_per_second(bulk_fan_out, iterations)
+
+    print("\nTimeline fan-out to {} people, one insert per row: {:.1f} inserts/s".format(
+        len(related_people), single_ips))
+    print("Timeline fan-out to {} people, bulk insert: {:.1f} inserts/s".format(
+        len(related_people), bulk_ips))
+    assert bulk_ips > single_ips
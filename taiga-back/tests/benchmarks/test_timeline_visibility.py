@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import time
+
+import pytest
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Q
+
+from .. import factories as f
+
+from taiga.timeline import service
+
+pytestmark = [pytest.mark.django_db, pytest.mark.slow]
+
+
+def _filter_timeline_for_user_with_memberships_clauses(timeline, user):
+    # The filter before the visibility was precomputed: one clause by
+    # anon permission and one clause by membership of the user.
+    tl_filter = Q(project__is_private=False) | Q(project=None)
+
+    content_types = {
+        "view_project": ContentType.objects.get_by_natural_key("projects", "project"),
+        "view_milestones": ContentType.objects.get_by_natural_key("milestones", "milestone"),
+        "view_epics": ContentType.objects.get_by_natural_key("epics", "epic"),
+        "view_us": ContentType.objects.get_by_natural_key("userstories", "userstory"),
+        "view_tasks": ContentType.objects.get_by_natural_key("tasks", "task"),
+        "view_issues": ContentType.objects.get_by_natural_key("issues", "issue"),
+        "view_wiki_pages": ContentType.objects.get_by_natural_key("wiki", "wikipage"),
+        "view_wiki_links": ContentType.objects.get_by_natural_key("wiki", "wikilink"),
+    }
+    for content_type_key, content_type in content_types.items():
+        tl_filter |= Q(project__is_private=True,
+                       project__anon_permissions__contains=[content_type_key],
+                       data_content_type=content_type)
+
+    membership_content_type = ContentType.objects.get_by_natural_key(app_label="projects", model="membership")
+    tl_filter |= Q(project__is_private=True,
+                   project__anon_permissions__contains=["view_project"],
+                   data_content_type=membership_content_type)
+
+    for membership in user.cached_memberships:
+        if membership.is_admin:
+            tl_filter |= Q(project=membership.project)
+        else:
+            data_content_types = list(filter(None, [content_types.get(a, None) for a in
+                                                    membership.role.permissions]))
+            data_content_types.append(membership_content_type)
+            tl_filter |= Q(project=membership.project, data_content_type__in=data_content_types)
+
+    return timeline.filter(tl_filter)
+
+
+def _pages_per_second(fn, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        list(fn()[:20])
+    return iterations / (time.perf_counter() - start)
+
+
+@pytest.mark.parametrize("memberships", [10, 100, 1000])
+def test_benchmark_filter_timeline_for_user(memberships, shared_cache):
+    iterations = 20
+
+    user = f.UserFactory.create()
+    role_permissions = [["view_project", "view_us"], ["view_project", "view_tasks", "view_issues"]]
+    for i in range(memberships):
+        project = f.ProjectFactory.create(is_private=True, anon_permissions=[])
+        role = f.RoleFactory.create(project=project, permissions=role_permissions[i % 2])
+        f.MembershipFactory.create(user=user, project=project, role=role, is_admin=(i % 10 == 0))
+
+    timeline = service.get_profile_timeline(user)
+
+    def memberships_clauses():
+        user._cached_memberships = None
+        return _filter_timeline_for_user_with_memberships_clauses(timeline, user)
+
+    def precomputed_visibility():
+        return service.filter_timeline_for_user(timeline, user)
+
+    assert memberships_clauses().count() == precomputed_visibility().count()
+
+    clauses_pps = _pages_per_second(memberships_clauses, iterations)
+    visibility_pps = _pages_per_second(precomputed_visibility, iterations)
+
+    print("\nProfile timeline of a user with {} memberships, a clause by membership: {:.1f} pages/s".format(
+        memberships, clauses_pps))
+    print("Profile timeline of a user with {} memberships, precomputed visibility: {:.1f} pages/s".format(
+        memberships, visibility_pps))
+    assert visibility_pps > clauses_pps
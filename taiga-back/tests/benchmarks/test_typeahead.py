@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import pytest
+
+from django.db.models import Q
+
+from .. import factories as f
+from . import compare_timings
+
+from taiga.projects.issues.models import Issue
+from taiga.projects.tasks.models import Task
+from taiga.projects.userstories.models import UserStory
+from taiga.searches import services
+
+pytestmark = [pytest.mark.django_db, pytest.mark.slow]
+
+
+WORDS = ["backend", "frontend", "login", "payment", "invoice", "report", "export", "import",
+         "mobile", "search", "email", "profile", "upload", "timeline", "webhook", "session"]
+
+TARGET_MS = 20
+
+TEXTS = ["1", "12", "#123", "4999", "b", "lo", "payment rep", "Webhook email"]
+
+
+def _subject(i):
+    return " ".join(WORDS[(i * (n + 3)) % len(WORDS)] for n in range(4)).capitalize()
+
+
+def _create_large_project():
+    userstories = 20000
+    tasks = 15000
+    issues = 15000
+
+    project = f.ProjectFactory.create()
+    owner = project.owner
+
+    # The refs are shared by all the items of a project
+    UserStory.objects.bulk_create([
+        UserStory(project=project, owner=owner, ref=i + 1, subject=_subject(i))
+        for i in range(userstories)])
+    Task.objects.bulk_create([
+        Task(project=project, owner=owner, ref=userstories + i + 1, subject=_subject(i + 1))
+        for i in range(tasks)])
+    Issue.objects.bulk_create([
+        Issue(project=project, owner=owner, ref=userstories + tasks + i + 1, subject=_subject(i + 2))
+        for i in range(issues)])
+    return project
+
+
+def _typeahead_without_indexes(project, text):
+    # All the matches, with the lookups the ORM would use without the typeahead indexes
+    models = [("userstories", UserStory), ("tasks", Task), ("issues", Issue)]
+    digits = text.lstrip("#") if text.lstrip("#").isdigit() else None
+    query = Q(ref__startswith=digits) if digits else Q()
+    if not text.startswith("#"):
+        query = (query | Q(subject__istartswith=text)) if digits else Q(subject__istartswith=text)
+
+    return set((type, pk) for type, model in models
+               for pk in model.objects.filter(project=project).filter(query).values_list("id", flat=True))
+
+
+def test_benchmark_typeahead():
+    project = _create_large_project()
+    types = ["userstories", "tasks", "issues"]
+    limit = services.TYPEAHEAD_MAX_RESULTS
+    iterations = 10
+
+    for text in TEXTS:
+        old_result, new_result = compare_timings(
+            lambda: _typeahead_without_indexes(project, text),
+            lambda: services.typeahead(project, text, types, limit=limit),
+            iterations,
+            "Typeahead of {!r} in a project of 50000 items, without indexes".format(text),
+            "Typeahead of {!r} in a project of 50000 items, with indexes".format(text),
+            target_ms=TARGET_MS)
+        assert set((item["type"], item["id"]) for item in new_result) <= old_result
+        assert len(new_result) == min(limit, len(old_result))
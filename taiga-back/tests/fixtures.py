@@ -63,3 +63,11 @@ def outbox():
     from django.core import mail
 
     return mail.outbox
+
+
+@pytest.fixture
+def shared_cache():
+    # The caches invalidated across processes are only used with a shared
+    # cache backend, the local memory one of the tests is taken as shared
+    with mock.patch("taiga.base.utils.cache.is_shared_cache", return_value=True):
+        yield
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from django.db import transaction
+
+from .. import factories as f
+
+from taiga.base.utils import json
+from taiga.projects.history.choices import HistoryType
+from taiga.events import events
+from taiga.events.backends import outbox
+from taiga.events.buffer import events_buffer
+from taiga.events.middleware import EventsBufferMiddleware
+from taiga.events.models import OutboxEvent
+from taiga.front.templatetags.functions import resolve as resolve_front_url
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.fixture
+def backend():
+    backend = mock.Mock(transactional=False)
+    with mock.patch("taiga.events.buffer.backends.get_events_backend", return_value=backend), \
+         mock.patch("taiga.events.events.backends.get_events_backend", return_value=backend):
+        yield backend
+
+
+def _story(pk):
+    return SimpleNamespace(pk=pk, project_id=1)
+
+
+def _sent_messages(backend):
+    return [(message["routing_key"], json.loads(message["message"]))
+            for call in backend.emit_events.call_args_list
+            for message in call[0][0]]
+
+
+def test_events_of_a_request_are_coalesced(backend):
+    with events_buffer():
+        with transaction.atomic():
+            for pk in (1, 2, 1):
+                events.emit_event_for_model(_story(pk), content_type="userstories.userstory", sessionid="s1")
+            events.emit_event_for_ids([2, 3], "userstories.userstory", 1, sessionid="s1")
+            events.emit_event_for_model(_story(4), type="delete", content_type="userstories.userstory",
+                                        sessionid="s1")
+            events.emit_event_for_model(_story(5), content_type="userstories.userstory", sessionid="s2")
+
+        assert backend.emit_events.call_count == 0
+
+    assert backend.emit_events.call_count == 1
+    assert backend.emit_event.call_count == 0
+    routing_key = "changes.project.1.userstories"
+    assert _sent_messages(backend) == [
+        (routing_key, {"session_id": "s1", "data": {"type": "change", "matches": "userstories.userstory",
+                                                    "pk": [1, 2, 3]}}),
+        (routing_key, {"session_id": "s1", "data": {"type": "delete", "matches": "userstories.userstory",
+                                                    "pk": 4}}),
+        (routing_key, {"session_id": "s2", "data": {"type": "change", "matches": "userstories.userstory",
+                                                    "pk": 5}}),
+    ]
+
+
+def test_events_of_a_rolled_back_savepoint_are_discarded(backend):
+    with events_buffer():
+        with transaction.atomic():
+            events.emit_event_for_model(_story(1), content_type="userstories.userstory", sessionid="s1")
+            try:
+                with transaction.atomic():
+                    events.emit_event_for_model(_story(2), content_type="userstories.userstory",
+                                                sessionid="s1")
+                    raise ValueError()
+            except ValueError:
+                pass
+            with transaction.atomic():
+                events.emit_event_for_model(_story(3), content_type="userstories.userstory", sessionid="s1")
+
+    assert [data["data"]["pk"] for routing_key, data in _sent_messages(backend)] == [[1, 3]]
+
+
+def test_events_of_a_rolled_back_transaction_are_discarded(backend):
+    with events_buffer():
+        try:
+            with transaction.atomic():
+                events.emit_event_for_model(_story(1), content_type="userstories.userstory", sessionid="s1")
+                raise ValueError()
+        except ValueError:
+            pass
+
+        with transaction.atomic():
+            events.emit_event_for_model(_story(2), content_type="userstories.userstory", sessionid="s1")
+
+    assert [data["data"]["pk"] for routing_key, data in _sent_messages(backend)] == [2]
+
+
+def test_events_buffer_middleware(backend):
+    def get_response(request):
+        with transaction.atomic():
+            events.emit_event_for_model(_story(1), content_type="userstories.userstory", sessionid="s1")
+            events.emit_event_for_model(_story(2), content_type="userstories.userstory", sessionid="s1")
+        assert backend.emit_events.call_count == 0
+        return "response"
+
+    assert EventsBufferMiddleware(get_response)(mock.Mock()) == "response"
+
+    assert [data["data"]["pk"] for routing_key, data in _sent_messages(backend)] == [[1, 2]]
+
+
+def test_events_out_of_a_buffer_are_sent_on_commit(backend):
+    with transaction.atomic():
+        events.emit_event_for_model(_story(1), content_type="userstories.userstory", sessionid="s1")
+        assert backend.emit_event.call_count == 0
+
+    assert backend.emit_event.call_count == 1
+    assert backend.emit_events.call_count == 0
+
+
+def test_events_out_of_a_transaction_are_sent_immediately(backend):
+    with events_buffer():
+        events.emit_event_for_model(_story(1), content_type="userstories.userstory", sessionid="s1")
+
+        assert backend.emit_event.call_count == 1
+        assert backend.emit_events.call_count == 0
+
+
+def test_outbox_backend_writes_the_events_in_the_transaction(settings):
+    settings.EVENTS_PUSH_BACKEND = "taiga.events.backends.outbox.EventsPushBackend"
+    settings.EVENTS_PUSH_BACKEND_OPTIONS = {}
+
+    try:
+        with transaction.atomic():
+            events.emit_event_for_model(_story(1), content_type="userstories.userstory", sessionid="s1")
+            assert OutboxEvent.objects.count() == 1
+            raise ValueError()
+    except ValueError:
+        pass
+
+    assert OutboxEvent.objects.count() == 0
+
+    with transaction.atomic():
+        events.emit_event_for_model(_story(2), content_type="userstories.userstory", sessionid="s1")
+        events.emit_event_for_model(_story(3), content_type="userstories.userstory", sessionid="s1")
+
+    assert list(OutboxEvent.objects.values_list("routing_key", flat=True)) == ["changes.project.1.userstories"] * 2
+    assert json.loads(OutboxEvent.objects.first().message)["data"]["pk"] == 2
+
+
+def test_relay_outbox_events():
+    for pk in range(5):
+        OutboxEvent.objects.create(message=str(pk), routing_key="changes.project.1.userstories", channel="events")
+
+    relay_backend = mock.Mock()
+    assert outbox.relay_outbox_events(relay_backend, batch_size=3) == 3
+    assert [event["message"] for event in relay_backend.emit_events.call_args[0][0]] == ["0", "1", "2"]
+    assert OutboxEvent.objects.count() == 2
+
+    # The events are kept when the relay backend fails
+    relay_backend.emit_events.side_effect = ConnectionRefusedError()
+    with pytest.raises(ConnectionRefusedError):
+        outbox.relay_outbox_events(relay_backend, batch_size=3)
+    assert outbox.get_outbox_stats()["pending"] == 2
+
+    relay_backend.emit_events.side_effect = None
+    assert outbox.relay_outbox_events(relay_backend, batch_size=3) == 2
+    assert outbox.relay_outbox_events(relay_backend, batch_size=3) == 0
+    assert outbox.get_outbox_stats() == {"pending": 0, "oldest_age": 0}
+
+
+@pytest.mark.parametrize("multi_recipient", [True, False])
+def test_live_notification_for_users(backend, settings, multi_recipient):
+    settings.EVENTS_MULTI_RECIPIENT_LIVE_NOTIFICATIONS = multi_recipient
+    us = f.UserStoryFactory.create()
+    users = f.UserFactory.create_batch(3)
+    history = SimpleNamespace(type=HistoryType.change, id=10)
+    backend.reset_mock()
+
+    with events_buffer(), transaction.atomic():
+        events.emit_live_notification_for_users(us, users, history)
+
+    messages = [(routing_key, data) for routing_key, data in _sent_messages(backend)
+                if routing_key.startswith("live_notifications")]
+    payload = {
+        "title": "User story changed",
+        "body": "Project: {}\nUS #{} - {}".format(us.project.name, us.ref, us.subject),
+        "url": resolve_front_url("userstory", us.project.slug, us.ref),
+        "timeout": 10000,
+        "id": 10,
+    }
+    if multi_recipient:
+        payload["recipients"] = sorted(user.id for user in users)
+        assert messages == [("live_notifications", {"session_id": "not-existing", "data": payload})]
+    else:
+        assert messages == [("live_notifications.{}".format(user.id), {"session_id": "not-existing", "data": payload})
+                            for user in users]
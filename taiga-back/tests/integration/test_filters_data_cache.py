@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2014-present Taiga Agile LLC
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from unittest import mock
+
+from django.http import QueryDict
+from django.urls import reverse
+from django.utils import translation
+
+from taiga.projects import filters_data_cache
+from taiga.projects.services import bulk_update_userstory_status_order
+from taiga.projects.userstories import services
+
+from .. import factories as f
+
+import pytest
+pytestmark = [pytest.mark.django_db, pytest.mark.usefixtures("shared_cache")]
+
+
+def _create_project():
+    project = f.ProjectFactory.create()
+    user = f.UserFactory.create()
+    role = f.RoleFactory.create(project=project, permissions=["view_us"])
+    f.MembershipFactory.create(user=user, project=project, role=role, is_admin=True)
+    status = f.UserStoryStatusFactory.create(project=project)
+    f.UserStoryFactory.create(project=project, owner=user, status=status, milestone=None)
+    return project, user, status
+
+
+def _get_filters_data(client, project, query="", **extra):
+    url = reverse("userstories-filters-data") + "?project={}".format(project.id) + query
+    with mock.patch("taiga.projects.userstories.api.services.get_userstories_filters_data",
+                    wraps=services.get_userstories_filters_data) as get_filters_data:
+        response = client.get(url, **extra)
+    assert response.status_code == 200
+    return response.data, get_filters_data.called
+
+
+def test_filters_data_are_served_from_cache(client):
+    project, user, status = _create_project()
+    client.login(user)
+    filters_data_cache.reset_filters_data_cache_stats()
+
+    data, computed = _get_filters_data(client, project, "&status={}".format(status.id))
+    assert computed
+
+    cached_data, computed = _get_filters_data(client, project, "&status={}".format(status.id))
+    assert not computed
+    assert cached_data == data
+
+    stats = filters_data_cache.get_filters_data_cache_stats()
+    assert stats["userstories"] == {"hits": 1, "misses": 1}
+    assert stats["issues"] == {"hits": 0, "misses": 0}
+
+
+def test_filters_data_cache_key_normalizes_the_filter_params():
+    project, user, status = _create_project()
+
+    key = filters_data_cache.get_filters_data_key("userstories", project, user,
+                                                  QueryDict("project=1&status=1,2&tags=a"))
+    assert key == filters_data_cache.get_filters_data_key("userstories", project, user,
+                                                          QueryDict("tags=a&status=2, 1,1&project=1"))
+    assert key != filters_data_cache.get_filters_data_key("userstories", project, user,
+                                                          QueryDict("project=1&status=1"))
+    assert key != filters_data_cache.get_filters_data_key("issues", project, user,
+                                                          QueryDict("project=1&status=1,2&tags=a"))
+
+
+def test_filters_data_cache_key_depends_on_the_user_permissions():
+    project, user, status = _create_project()
+    other_admin = f.MembershipFactory.create(project=project, role=user.memberships.get().role,
+                                             is_admin=True).user
+    non_member = f.UserFactory.create()
+    params = QueryDict("project={}".format(project.id))
+
+    key = filters_data_cache.get_filters_data_key("userstories", project, user, params)
+    assert key == filters_data_cache.get_filters_data_key("userstories", project, other_admin, params)
+    assert key != filters_data_cache.get_filters_data_key("userstories", project, non_member, params)
+
+
+def test_filters_data_cache_key_depends_on_the_language():
+    project, user, status = _create_project()
+    params = QueryDict("project={}".format(project.id))
+
+    with translation.override("en"):
+        key = filters_data_cache.get_filters_data_key("userstories", project, user, params)
+    with translation.override("es"):
+        assert key != filters_data_cache.get_filters_data_key("userstories", project, user, params)
+
+
+def test_filters_data_are_cached_by_language(client):
+    project, user, status = _create_project()
+    client.login(user)
+
+    data, computed = _get_filters_data(client, project, HTTP_ACCEPT_LANGUAGE="en")
+    assert computed
+
+    data, computed = _get_filters_data(client, project, HTTP_ACCEPT_LANGUAGE="es")
+    assert computed
+
+    data, computed = _get_filters_data(client, project, HTTP_ACCEPT_LANGUAGE="en")
+    assert not computed
+
+
+def test_filters_data_cache_is_invalidated_when_the_project_data_change(client):
+    project, user, status = _create_project()
+    client.login(user)
+
+    data, computed = _get_filters_data(client, project)
+    assert next(s for s in data["statuses"] if s["id"] == status.id)["count"] == 1
+
+    f.UserStoryFactory.create(project=project, owner=user, status=status, milestone=None)
+
+    data, computed = _get_filters_data(client, project)
+    assert computed
+    assert next(s for s in data["statuses"] if s["id"] == status.id)["count"] == 2
+
+
+def test_filters_data_cache_is_invalidated_by_the_bulk_services(client):
+    project, user, status = _create_project()
+    other_status = f.UserStoryStatusFactory.create(project=project, order=status.order + 1)
+    client.login(user)
+
+    statuses_ids = (status.id, other_status.id)
+
+    data, computed = _get_filters_data(client, project)
+    assert [s["id"] for s in data["statuses"] if s["id"] in statuses_ids] == [status.id, other_status.id]
+
+    bulk_update_userstory_status_order(project, user, [(status.id, other_status.order + 1)])
+
+    data, computed = _get_filters_data(client, project)
+    assert computed
+    assert [s["id"] for s in data["statuses"] if s["id"] in statuses_ids] == [other_status.id, status.id]
+
+
+def test_filters_data_cache_is_invalidated_when_a_user_name_changes(client):
+    project, user, status = _create_project()
+    client.login(user)
+
+    _get_filters_data(client, project)
+
+    # The last login doesn't change the filters data
+    user.save(update_fields=["last_login"])
+    data, computed = _get_filters_data(client, project)
+    assert not computed
+
+    user.full_name = "New name"
+    user.save()
+    data, computed = _get_filters_data(client, project)
+    assert computed
+    assert next(o for o in data["owners"] if o["id"] == user.id)["full_name"] == "New name"
+
+
+def test_filters_data_are_not_cached_in_local_cache(client):
+    project, user, status = _create_project()
+    client.login(user)
+
+    with mock.patch("taiga.base.utils.cache.is_shared_cache", return_value=False):
+        _get_filters_data(client, project)
+        data, computed = _get_filters_data(client, project)
+
+    assert computed
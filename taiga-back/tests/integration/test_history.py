@@ -16,18 +16,29 @@
 
 import pytest
 
+from datetime import timedelta
 from unittest.mock import patch
 
+from django.core.management import call_command
+from django.db import transaction
 from django.urls import reverse
 from django.utils import timezone
 
 from .. import factories as f
 
 from taiga.base.utils import json
+from taiga.projects.history import compaction
 from taiga.projects.history import services
+from taiga.projects.history import values_cache
+from taiga.projects.history.models import ColdHistoryEntry
+from taiga.projects.history.models import HistoryCompactionCursor
 from taiga.projects.history.models import HistoryEntry
+from taiga.projects.history.models import HistoryHead
 from taiga.projects.history.choices import HistoryType
 from taiga.projects.history.services import make_key_from_model_object
+from taiga.projects.models import Project
+from taiga.projects.notifications.models import HistoryChangeNotification
+from taiga.projects.userstories.models import UserStory
 
 pytestmark = pytest.mark.django_db
 
@@ -141,6 +152,432 @@ def test_real_snapshot_frequency(settings):
     assert qs_partials.count() == 2
 
 
+def test_take_snapshot_keeps_history_head_updated():
+    issue = f.IssueFactory.create()
+    key = make_key_from_model_object(issue)
+
+    services.take_snapshot(issue, user=issue.owner)
+    head = HistoryHead.objects.get(key=key)
+    assert head.partial_diffs == 0
+    assert head.snapshot["description"] == issue.description
+
+    issue.description = "new description"
+    issue.save()
+    services.take_snapshot(issue, user=issue.owner)
+
+    head = HistoryHead.objects.get(key=key)
+    assert head.partial_diffs == 1
+    assert head.snapshot["description"] == "new description"
+    assert head.snapshot == services.get_last_snapshot_for_key(key)[0].snapshot
+
+
+def test_take_snapshot_uses_history_head_instead_of_replaying_diffs():
+    issue = f.IssueFactory.create()
+    services.take_snapshot(issue, user=issue.owner)
+
+    issue.description = "new description"
+    issue.save()
+
+    with patch("taiga.projects.history.services._replay_last_snapshot_for_key") as replay_mock:
+        services.take_snapshot(issue, user=issue.owner)
+        assert not replay_mock.called
+
+    assert HistoryEntry.objects.filter(type=HistoryType.change).count() == 1
+
+
+def test_take_snapshot_materializes_missing_history_head():
+    issue = f.IssueFactory.create()
+    key = make_key_from_model_object(issue)
+
+    services.take_snapshot(issue, user=issue.owner)
+    issue.description = "desc1"
+    issue.save()
+    services.take_snapshot(issue, user=issue.owner)
+    HistoryHead.objects.all().delete()
+
+    issue.description = "desc2"
+    issue.save()
+    services.take_snapshot(issue, user=issue.owner)
+
+    head = HistoryHead.objects.get(key=key)
+    assert head.partial_diffs == 2
+    assert head.snapshot["description"] == "desc2"
+
+
+def test_backfill_history_heads_command():
+    issue = f.IssueFactory.create()
+    key = make_key_from_model_object(issue)
+
+    services.take_snapshot(issue, user=issue.owner)
+    issue.description = "desc1"
+    issue.save()
+    services.take_snapshot(issue, user=issue.owner)
+    HistoryHead.objects.all().delete()
+
+    call_command("backfill_history_heads")
+
+    head = HistoryHead.objects.get(key=key)
+    assert head.project_id == issue.project_id
+    assert head.partial_diffs == 1
+    assert head.snapshot == services.get_last_snapshot_for_key(key)[0].snapshot
+
+
+def test_take_snapshots_in_bulk():
+    project = f.ProjectFactory.create()
+    status1 = f.IssueStatusFactory.create(project=project)
+    status2 = f.IssueStatusFactory.create(project=project)
+    issue1 = f.IssueFactory.create(project=project, status=status1)
+    issue2 = f.IssueFactory.create(project=project, status=status1)
+    issue3 = f.IssueFactory.create(project=project, status=status1)
+
+    entries = services.take_snapshots_in_bulk([issue1, issue2, issue3], user=project.owner)
+    assert len(entries) == 3
+    assert HistoryEntry.objects.filter(type=HistoryType.create, is_snapshot=True).count() == 3
+    assert HistoryHead.objects.count() == 3
+
+    issue1.status = status2
+    issue1.save()
+    issue2.subject = "new subject"
+    issue2.save()
+
+    entries = services.take_snapshots_in_bulk([issue1, issue2, issue3], user=project.owner)
+    assert len(entries) == 2
+
+    entry1 = HistoryEntry.objects.get(key=make_key_from_model_object(issue1), type=HistoryType.change)
+    assert entry1.diff == {"status": [status1.id, status2.id]}
+    assert entry1.values["status"] == {str(status1.id): status1.name, str(status2.id): status2.name}
+    assert entry1.values["users"] == {}
+
+    entry2 = HistoryEntry.objects.get(key=make_key_from_model_object(issue2), type=HistoryType.change)
+    assert "status" not in entry2.values
+
+    head = HistoryHead.objects.get(key=make_key_from_model_object(issue1))
+    assert head.partial_diffs == 1
+    assert head.snapshot["status"] == status2.id
+
+
+def test_take_snapshots_in_bulk_ignores_removed_objects():
+    issue1 = f.IssueFactory.create()
+    issue2 = f.IssueFactory.create(project=issue1.project)
+    issue2_id = issue2.id
+    issue2.delete()
+    issue2.id = issue2_id
+
+    entries = services.take_snapshots_in_bulk([issue1, issue2], user=issue1.owner)
+    assert [e.key for e in entries] == [make_key_from_model_object(issue1)]
+
+
+def test_take_snapshots_in_bulk_sends_bulk_created_signal():
+    issue = f.IssueFactory.create()
+
+    with patch("taiga.timeline.signals.push_to_timelines") as push_to_timelines_mock:
+        services.take_snapshots_in_bulk([issue], user=issue.owner)
+        assert push_to_timelines_mock.call_count == 1
+
+
+def test_make_diff_values_serves_project_catalogs_from_cache(django_assert_num_queries, shared_cache):
+    project = f.ProjectFactory.create()
+    status1 = f.IssueStatusFactory.create(project=project)
+    status2 = f.IssueStatusFactory.create(project=project)
+    fdiff = services.FrozenDiff("issues.issue:1", {"status": (status1.id, status2.id)}, {})
+
+    values = services.make_diff_values("issues.issue", fdiff, project.id)
+    assert values["status"] == {str(status1.id): status1.name, str(status2.id): status2.name}
+
+    with django_assert_num_queries(0):
+        values = services.make_diff_values("issues.issue", fdiff, project.id)
+    assert values["status"] == {str(status1.id): status1.name, str(status2.id): status2.name}
+
+    # The catalog is invalidated when one of their elements changes
+    status2.name = "New name"
+    status2.save()
+
+    values = services.make_diff_values("issues.issue", fdiff, project.id)
+    assert values["status"][str(status2.id)] == "New name"
+
+
+def test_make_diff_values_counts_values_cache_hits_and_misses(shared_cache):
+    project = f.ProjectFactory.create()
+    status = f.IssueStatusFactory.create(project=project)
+    fdiff = services.FrozenDiff("issues.issue:1", {"status": (None, status.id)}, {})
+    values_cache.reset_values_cache_stats()
+
+    services.make_diff_values("issues.issue", fdiff, project.id)
+    services.make_diff_values("issues.issue", fdiff, project.id)
+
+    stats = values_cache.get_values_cache_stats()
+    assert stats["catalogs_misses"] == 1
+    assert stats["catalogs_hits"] == 1
+
+
+def test_make_diff_values_does_not_cache_project_catalogs_in_local_cache(django_assert_num_queries):
+    project = f.ProjectFactory.create()
+    status = f.IssueStatusFactory.create(project=project)
+    fdiff = services.FrozenDiff("issues.issue:1", {"status": (None, status.id)}, {})
+
+    services.make_diff_values("issues.issue", fdiff, project.id)
+    with django_assert_num_queries(1):
+        services.make_diff_values("issues.issue", fdiff, project.id)
+
+
+def test_make_diff_values_caches_users_names_in_scope(django_assert_num_queries):
+    user = f.UserFactory.create()
+    fdiff = services.FrozenDiff("issues.issue:1", {"assigned_to": (None, user.id)}, {})
+
+    with values_cache.values_cache_scope():
+        values = services.make_diff_values("issues.issue", fdiff)
+        assert values["users"] == {str(user.id): user.get_full_name()}
+
+        with django_assert_num_queries(0):
+            values = services.make_diff_values("issues.issue", fdiff)
+        assert values["users"] == {str(user.id): user.get_full_name()}
+
+    with django_assert_num_queries(1):
+        services.make_diff_values("issues.issue", fdiff)
+
+
+def test_values_diff_is_not_computed_on_read():
+    issue = f.IssueFactory.create(description="desc1")
+    services.take_snapshot(issue, user=issue.owner)
+    issue.description = "desc2"
+    issue.save()
+    entry = services.take_snapshot(issue, user=issue.owner)
+
+    values_diff = entry.values_diff
+    assert values_diff["description_diff"][1] == ("<del style=\"background:#ffe6e6;\">desc1</del>"
+                                                  "<ins style=\"background:#e6ffe6;\">desc2</ins>")
+    assert HistoryEntry.objects.get(pk=entry.pk).values_diff_cache is None
+
+
+def test_fill_values_diff_cache():
+    issue = f.IssueFactory.create(description="desc1")
+    services.take_snapshot(issue, user=issue.owner)
+    issue.description = "desc2"
+    issue.save()
+    entry = services.take_snapshot(issue, user=issue.owner)
+
+    assert services.fill_values_diff_cache([entry.pk]) == 1
+    assert services.fill_values_diff_cache([entry.pk]) == 0
+
+    entry = HistoryEntry.objects.get(pk=entry.pk)
+    assert entry.values_diff_cache["description_diff"][1] == ("<span>desc</span>"
+                                                              "<del style=\"background:#ffe6e6;\">1</del>"
+                                                              "<ins style=\"background:#e6ffe6;\">2</ins>")
+    assert entry.values_diff == entry.values_diff_cache
+
+
+def test_fill_values_diff_cache_on_commit(settings):
+    settings.CELERY_ENABLED = True
+    issue = f.IssueFactory.create()
+    services.take_snapshot(issue, user=issue.owner)
+    issue.subject = "new subject"
+    issue.save()
+
+    with patch("taiga.projects.history.services.connection") as connection_mock, \
+            patch("taiga.projects.history.tasks.fill_values_diff_cache") as task_mock:
+        entry = services.take_snapshot(issue, user=issue.owner)
+        assert connection_mock.on_commit.call_count == 1
+        connection_mock.on_commit.call_args[0][0]()
+        task_mock.delay.assert_called_once_with([entry.pk])
+
+
+def test_warm_history_values_diff_cache_command():
+    issue = f.IssueFactory.create(subject="old subject")
+    services.take_snapshot(issue, user=issue.owner)
+    issue.subject = "new subject"
+    issue.save()
+    entry = services.take_snapshot(issue, user=issue.owner)
+
+    call_command("warm_history_values_diff_cache", batch_size=1)
+
+    entry = HistoryEntry.objects.get(pk=entry.pk)
+    assert entry.values_diff_cache == {"subject": ["old subject", "new subject"]}
+
+
+def _create_history_entries(project, key, entries_data):
+    created_at = timezone.now() - timedelta(days=100)
+    entries = []
+    for num, data in enumerate(entries_data):
+        entries.append(f.HistoryEntryFactory.create(project=project, key=key, user={"pk": None},
+                                                    created_at=created_at + timedelta(minutes=num),
+                                                    **data))
+    return entries
+
+
+def test_compact_history_keys():
+    project = f.ProjectFactory.create()
+    key = "userstories.userstory:1"
+    entries = _create_history_entries(project, key, [
+        {"type": HistoryType.create, "is_snapshot": True, "snapshot": {"kanban_order": 1}, "diff": {}},
+        {"is_hidden": True, "diff": {"kanban_order": [1, 2]}, "values": {"users": {"1": "a"}}},
+        {"is_hidden": True, "diff": {"kanban_order": [2, 3]}, "values": {"users": {"2": "b"}},
+         "is_snapshot": True, "snapshot": {"kanban_order": 3}},
+        {"diff": {"subject": ["a", "b"]}},
+        {"is_hidden": True, "diff": {"kanban_order": [3, 4]}},
+        {"is_hidden": True, "diff": {"kanban_order": [4, 3]}},
+        {"is_hidden": True, "diff": {"kanban_order": [3, 5]}, "is_snapshot": True,
+         "snapshot": {"kanban_order": 5}},
+    ])
+
+    with transaction.atomic():
+        stats = compaction.compact_history_keys([key], older_than=timedelta(days=30))
+
+    assert stats.merged_entries == 3
+    assert stats.dropped_snapshots == 1
+    assert stats.bytes_reclaimed > 0
+
+    ids = list(HistoryEntry.objects.filter(key=key).order_by("created_at").values_list("id", flat=True))
+    assert ids == [entries[0].id, entries[2].id, entries[3].id, entries[6].id]
+
+    merged = HistoryEntry.objects.get(id=entries[2].id)
+    assert merged.diff == {"kanban_order": [1, 3]}
+    assert merged.values == {"users": {"1": "a", "2": "b"}}
+    assert not merged.is_snapshot and merged.snapshot is None
+
+    # The visible entries and the last snapshot are not touched
+    assert HistoryEntry.objects.get(id=entries[3].id).diff == {"subject": ["a", "b"]}
+    assert HistoryEntry.objects.get(id=entries[6].id).is_snapshot
+
+
+def test_compact_history_ignores_recent_and_notified_entries():
+    project = f.ProjectFactory.create()
+    key = "userstories.userstory:1"
+    entries = _create_history_entries(project, key, [
+        {"is_hidden": True, "diff": {"kanban_order": [1, 2]}},
+        {"is_hidden": True, "diff": {"kanban_order": [2, 3]}},
+        {"is_hidden": True, "diff": {"kanban_order": [3, 4]}},
+    ])
+    notification = HistoryChangeNotification.objects.create(project=project, key=key, owner=project.owner,
+                                                            history_type=HistoryType.change)
+    notification.history_entries.add(entries[1])
+    HistoryEntry.objects.filter(id=entries[2].id).update(created_at=timezone.now())
+
+    with transaction.atomic():
+        stats = compaction.compact_history_keys([key], older_than=timedelta(days=30))
+
+    assert stats.merged_entries == 0
+    assert HistoryEntry.objects.filter(key=key).count() == 3
+
+
+def test_compact_history_command_is_resumable():
+    project = f.ProjectFactory.create()
+    for key in ["tasks.task:1", "tasks.task:2"]:
+        _create_history_entries(project, key, [
+            {"is_hidden": True, "diff": {"us_order": [1, 2]}},
+            {"is_hidden": True, "diff": {"us_order": [2, 3]}},
+        ])
+
+    call_command("compact_history", older_than=30, start_key="tasks.task:1")
+
+    assert HistoryEntry.objects.filter(key="tasks.task:1").count() == 2
+    assert HistoryEntry.objects.filter(key="tasks.task:2").count() == 1
+
+
+def test_compact_history_from_last_key_persists_the_cursor(settings):
+    settings.HISTORY_COMPACTION_MIN_AGE = 30
+    settings.HISTORY_COMPACTION_BATCH_SIZE = 1
+    settings.HISTORY_COMPACTION_MAX_BATCHES = 1
+    project = f.ProjectFactory.create()
+    for key in ["tasks.task:1", "tasks.task:2"]:
+        _create_history_entries(project, key, [
+            {"is_hidden": True, "diff": {"us_order": [1, 2]}},
+            {"is_hidden": True, "diff": {"us_order": [2, 3]}},
+        ])
+
+    compaction.compact_history_from_last_key()
+    assert HistoryCompactionCursor.objects.get().last_key == "tasks.task:1"
+    assert HistoryEntry.objects.filter(key="tasks.task:2").count() == 2
+
+    compaction.compact_history_from_last_key()
+    assert HistoryCompactionCursor.objects.get().last_key == "tasks.task:2"
+    assert HistoryEntry.objects.filter(key="tasks.task:2").count() == 1
+
+    compaction.compact_history_from_last_key()
+    assert HistoryCompactionCursor.objects.get().last_key == ""
+
+
+def test_history_cold_storage():
+    project = f.ProjectFactory.create(blocked_code="blocked-by-staff")
+    entries = _create_history_entries(project, "issues.issue:1", [
+        {"type": HistoryType.create, "is_snapshot": True, "snapshot": {"subject": "a"}, "diff": {}},
+        {"diff": {"subject": ["a", "b"]}, "comment": "comment"},
+        {"is_hidden": True, "diff": {"kanban_order": [1, 2]}},
+        {"is_hidden": True, "diff": {"kanban_order": [2, 3]}},
+    ])
+
+    # Only the hidden entries, the history API does not read them
+    assert compaction.move_blocked_projects_history_to_cold_storage() == 2
+    assert set(HistoryEntry.objects.filter(project=project).values_list("id", flat=True)) == {
+        entries[0].id, entries[1].id}
+    assert ColdHistoryEntry.objects.filter(project=project).count() == 2
+
+    assert compaction.restore_project_history_from_cold_storage(project.id) == 2
+    assert not ColdHistoryEntry.objects.filter(project=project).exists()
+    restored = HistoryEntry.objects.get(id=entries[3].id)
+    assert restored.is_hidden
+    assert restored.diff == {"kanban_order": [2, 3]}
+
+
+def test_history_comments_of_a_cold_stored_project(client):
+    project = f.create_project(blocked_code="blocked-by-staff")
+    us = f.create_userstory(project=project)
+    f.MembershipFactory.create(project=project, user=project.owner, is_admin=True)
+    key = make_key_from_model_object(us)
+    now = timezone.now()
+    entries = [f.HistoryEntryFactory.create(type=HistoryType.change, project=project, key=key,
+                                            user={"pk": project.owner.id}, created_at=now - timedelta(minutes=3 - i),
+                                            **data)
+               for i, data in enumerate([{"comment": "first comment", "diff": {}},
+                                         {"is_hidden": True, "diff": {"kanban_order": [1, 2]}},
+                                         {"comment": "second comment", "diff": {}}])]
+
+    assert compaction.move_blocked_projects_history_to_cold_storage() == 1
+
+    client.login(project.owner)
+    url = "{}?type=comment".format(reverse("userstory-history-detail", args=(us.id,)))
+    response = client.get(url)
+    assert response.status_code == 200, response.data
+    assert [(entry["id"], entry["comment"]) for entry in response.data] == [
+        (entries[2].id, "second comment"),
+        (entries[0].id, "first comment"),
+    ]
+
+
+def test_history_cold_storage_is_restored_when_the_project_is_unblocked():
+    project = f.ProjectFactory.create(blocked_code="blocked-by-staff")
+    _create_history_entries(project, "issues.issue:1", [
+        {"is_hidden": True, "diff": {"kanban_order": [1, 2]}},
+        {"is_hidden": True, "diff": {"kanban_order": [2, 3]}},
+    ])
+    assert compaction.move_blocked_projects_history_to_cold_storage() == 2
+    assert compaction.restore_unblocked_projects_history_from_cold_storage() == 0
+
+    Project.objects.filter(id=project.id).update(blocked_code=None)
+    assert ColdHistoryEntry.objects.filter(project=project).count() == 2
+
+    assert compaction.restore_unblocked_projects_history_from_cold_storage() == 2
+    assert not ColdHistoryEntry.objects.filter(project=project).exists()
+    assert HistoryEntry.objects.filter(project=project).count() == 2
+
+
+def test_freeze_model_instance_num_queries(django_assert_num_queries):
+    user_story = f.UserStoryFactory.create()
+    f.RolePointsFactory.create(user_story=user_story)
+    user_story.assigned_users.add(user_story.owner)
+    fobj = services.freeze_model_instance(user_story)
+
+    # The user story with its project and custom attributes values
+    # and the role points, assigned users, attachments and project
+    # custom attributes
+    with django_assert_num_queries(5):
+        assert services.freeze_model_instance(user_story) == fobj
+
+    qs = services.prepare_queryset_for_freeze(UserStory.objects.filter(pk=user_story.pk))
+    user_story = qs.get()
+    with django_assert_num_queries(0):
+        assert services.freeze_model_instance(user_story, refetch=False) == fobj
+
+
 def test_issue_resource_history_test(client):
     user = f.UserFactory.create()
     project = f.ProjectFactory.create(owner=user)
@@ -220,6 +657,56 @@ def test_history_with_only_comment_shouldnot_be_hidden(client):
     assert qs_hidden.count() == 0
 
 
+def test_history_cursor_pagination(client):
+    project = f.create_project()
+    us = f.create_userstory(project=project)
+    f.MembershipFactory.create(project=project, user=project.owner, is_admin=True)
+    key = make_key_from_model_object(us)
+    now = timezone.now()
+    entries = [f.HistoryEntryFactory.create(type=HistoryType.change, project=project, comment="comment",
+                                            key=key, diff={}, user={"pk": project.owner.id},
+                                            created_at=now - timedelta(minutes=i // 2))
+               for i in range(5)]
+    expected_ids = [e.id for e in sorted(entries, key=lambda e: (e.created_at, e.id), reverse=True)]
+
+    client.login(project.owner)
+    url = "{}?page_size=2".format(reverse("userstory-history-detail", args=(us.id,)))
+
+    ids = []
+    next_urls = []
+    while url:
+        response = client.get(url, HTTP_X_CURSOR_PAGINATION="true")
+        assert response.status_code == 200, response.data
+        assert "x-pagination-count" not in response
+        assert "x-pagination-current" not in response
+        ids += [entry["id"] for entry in response.data]
+        url = response.get("x-pagination-next", None)
+        if url:
+            next_urls.append(url)
+
+    assert ids == expected_ids
+    assert len(next_urls) == 2
+
+    response = client.get(next_urls[-1])
+    assert [entry["id"] for entry in response.data] == expected_ids[4:]
+    response = client.get(response["x-pagination-prev"])
+    assert [entry["id"] for entry in response.data] == expected_ids[2:4]
+    response = client.get(response["x-pagination-prev"])
+    assert [entry["id"] for entry in response.data] == expected_ids[:2]
+    assert "x-pagination-prev" not in response
+
+
+def test_history_cursor_pagination_invalid_cursor(client):
+    project = f.create_project()
+    us = f.create_userstory(project=project)
+    f.MembershipFactory.create(project=project, user=project.owner, is_admin=True)
+
+    client.login(project.owner)
+    url = "{}?cursor=invalid".format(reverse("userstory-history-detail", args=(us.id,)))
+    response = client.get(url)
+    assert response.status_code == 404
+
+
 def test_delete_comment_by_project_owner(client):
     project = f.create_project()
     us = f.create_userstory(project=project)
@@ -32,6 +32,7 @@ from taiga.projects.userstories.models import UserStory
 from taiga.projects.occ import OCCResourceMixin
 
 from .. import factories as f
+from ..utils import filters_data_counts
 
 import pytest
 pytestmark = pytest.mark.django_db
@@ -622,6 +623,47 @@ def test_api_filters_data(client):
     assert next(filter(lambda i: i['name'] == tag3, response.data["tags"]))["count"] == 3
 
 
+def test_api_filters_data_with_null_exclude_and_role_filters(client):
+    data = create_filter_issues_context()
+    project = data["project"]
+    (user1, user2, user3, ) = data["users"]
+    (status0, status1, status2, status3, ) = data["statuses"]
+    (type1, type2, ) = data["types"]
+    (severity0, severity1, severity2, severity3, ) = data["severities"]
+    (priority0, priority1, priority2, priority3, ) = data["priorities"]
+    (tag0, tag1, tag2, tag3, ) = data["tags"]
+    role = data["roles"][0]
+
+    url = reverse("issues-filters-data") + "?project={}".format(project.id)
+    client.login(user1)
+
+    ## Filter (priority2 and unassigned)
+    response = client.get(url + "&priority={}&assigned_to=null".format(priority2.id))
+    assert response.status_code == 200
+
+    counts = filters_data_counts(response.data)
+    assert counts["types"] == {type1.id: 1, type2.id: 1}
+    assert counts["statuses"] == {status0.id: 0, status1.id: 0, status2.id: 0, status3.id: 2}
+    assert counts["priorities"] == {priority0.id: 0, priority1.id: 0, priority2.id: 2, priority3.id: 2}
+    assert counts["severities"] == {severity0.id: 0, severity1.id: 2, severity2.id: 0, severity3.id: 0}
+    assert counts["assigned_to"] == {user1.id: 2, user2.id: 0, user3.id: 0, None: 2}
+    assert counts["owners"] == {user1.id: 1, user2.id: 1}
+    assert counts["tags"] == {tag0: 0, tag1: 1, tag2: 1, tag3: 0}
+
+    ## Filter (not status3 and assigned to a member with the role of user1)
+    response = client.get(url + "&exclude_status={}&role={}".format(status3.id, role.id))
+    assert response.status_code == 200
+
+    counts = filters_data_counts(response.data)
+    assert counts["types"] == {type1.id: 1, type2.id: 1}
+    assert counts["statuses"] == {status0.id: 1, status1.id: 0, status2.id: 1, status3.id: 1}
+    assert counts["priorities"] == {priority0.id: 0, priority1.id: 0, priority2.id: 1, priority3.id: 1}
+    assert counts["severities"] == {severity0.id: 0, severity1.id: 0, severity2.id: 1, severity3.id: 1}
+    assert counts["assigned_to"] == {user1.id: 2, user2.id: 0, user3.id: 0, None: 0}
+    assert counts["owners"] == {user1.id: 1, user3.id: 1}
+    assert counts["tags"] == {tag0: 0, tag1: 1, tag2: 1, tag3: 2}
+
+
 def test_get_invalid_csv(client):
     url = reverse("issues-csv")
 
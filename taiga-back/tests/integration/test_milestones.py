@@ -17,13 +17,17 @@
 import pytest
 import pytz
 
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
 from urllib.parse import quote
 
+from django.core.management import call_command
 from django.urls import reverse
 
 from taiga.base.utils import json
 
+from taiga.projects.milestones.burndown import get_milestone_stats, refresh_burndown_items
+from taiga.projects.milestones.models import Milestone, MilestoneBurndown, MilestoneBurndownItem
+
 from .. import factories as f
 
 
@@ -384,3 +388,180 @@ def test_api_move_issues_to_another_sprint_close_previous(client):
     assert project.milestones.get(id=milestone1.id).issues.count() == 1
     assert project.milestones.get(id=milestone2.id).issues.count() == 1
     assert project.milestones.get(id=milestone1.id).closed
+
+
+def _create_burndown_data():
+    project = f.create_project()
+    f.MembershipFactory.create(project=project, user=project.owner, is_admin=True)
+    role = f.RoleFactory.create(project=project)
+    points = f.PointsFactory.create(project=project, value=8)
+    open_status = f.TaskStatusFactory.create(project=project, is_closed=False)
+    closed_status = f.TaskStatusFactory.create(project=project, is_closed=True)
+    milestone = f.MilestoneFactory.create(project=project)
+
+    us = f.create_userstory(project=project, milestone=milestone)
+    role_points = us.role_points.get(role=role)
+    role_points.points = points
+    role_points.save()
+    task1 = f.create_task(project=project, milestone=milestone, user_story=us, status=open_status)
+    task2 = f.create_task(project=project, milestone=milestone, user_story=us, status=open_status)
+    return project, milestone, role, closed_status, task1, task2
+
+
+def _finish_task(task, status, date):
+    task.status = status
+    task.finished_date = datetime.combine(date, time(12), tzinfo=pytz.utc)
+    task.save()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_api_milestone_stats_from_burndown(client):
+    project, milestone, role, closed_status, task1, task2 = _create_burndown_data()
+    modified_date = MilestoneBurndown.objects.get(milestone=milestone).modified_date
+
+    url = reverse("milestones-stats", kwargs={"pk": milestone.pk})
+    client.login(project.owner)
+    response = client.get(url)
+
+    assert response.status_code == 200, response.data
+    assert response.data["total_points"] == {role.id: 8}
+    assert response.data["completed_points"] == []
+    assert response.data["total_userstories"] == 1
+    assert response.data["completed_userstories"] == 0
+    assert response.data["total_tasks"] == 2
+    assert response.data["completed_tasks"] == 0
+    assert response.data["iocaine_doses"] == 0
+    assert [day["open_points"] for day in response.data["days"]] == [8] * 8
+    assert response.data["days"][0]["optimal_points"] == 8
+    assert response.data["days"][-1]["optimal_points"] == pytest.approx(0)
+    # Read only
+    assert MilestoneBurndown.objects.get(milestone=milestone).modified_date == modified_date
+
+
+@pytest.mark.django_db(transaction=True)
+def test_milestone_stats_without_burndown_are_computed_in_memory():
+    project, milestone, role, closed_status, task1, task2 = _create_burndown_data()
+    MilestoneBurndown.objects.all().delete()
+
+    milestone_stats = get_milestone_stats(Milestone.objects.get(id=milestone.id))
+
+    assert milestone_stats["total_points"] == {role.id: 8}
+    assert milestone_stats["total_tasks"] == 2
+    assert [day["open_points"] for day in milestone_stats["days"]] == [8] * 8
+    assert not MilestoneBurndown.objects.filter(milestone=milestone).exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_milestone_burndown_is_updated_when_the_tasks_are_closed():
+    project, milestone, role, closed_status, task1, task2 = _create_burndown_data()
+
+    _finish_task(task1, closed_status, milestone.estimated_start - timedelta(days=3))
+    burndown = MilestoneBurndown.objects.get(milestone=milestone)
+    assert burndown.closed_points_by_day == [4] * 8
+    assert burndown.completed_tasks == 1
+    assert burndown.completed_userstories == 0
+    assert burndown.closed_points == []
+
+    _finish_task(task2, closed_status, milestone.estimated_start + timedelta(days=2))
+    burndown = MilestoneBurndown.objects.get(milestone=milestone)
+    assert burndown.closed_points_by_day == [4, 4, 8, 8, 8, 8, 8, 8]
+    assert burndown.completed_tasks == 2
+    assert burndown.completed_userstories == 1
+    assert burndown.closed_points == [[role.id, 8]]
+
+    milestone_stats = get_milestone_stats(Milestone.objects.get(id=milestone.id))
+    assert milestone_stats["completed_points"] == [8]
+    assert [day["open_points"] for day in milestone_stats["days"]] == [4, 4, 0, 0, 0, 0, 0, 0]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_milestone_burndown_is_updated_when_the_points_change():
+    project, milestone, role, closed_status, task1, task2 = _create_burndown_data()
+    _finish_task(task1, closed_status, milestone.estimated_start)
+
+    role_points = task1.user_story.role_points.get(role=role)
+    role_points.points = f.PointsFactory.create(project=project, value=3)
+    role_points.save()
+
+    burndown = MilestoneBurndown.objects.get(milestone=milestone)
+    assert burndown.total_points == [[role.id, 3]]
+    assert burndown.closed_points_by_day == [1.5] * 8
+
+
+@pytest.mark.django_db(transaction=True)
+def test_milestone_burndown_is_updated_when_the_user_stories_are_moved(client):
+    project, milestone1, role, closed_status, task1, task2 = _create_burndown_data()
+    milestone2 = f.MilestoneFactory.create(project=project)
+    _finish_task(task1, closed_status, milestone1.estimated_start)
+
+    url = reverse("milestones-move-userstories-to-sprint", kwargs={"pk": milestone1.pk})
+    data = {
+        "project_id": project.id,
+        "milestone_id": milestone2.id,
+        "bulk_stories": [{"us_id": task1.user_story_id, "order": 1}]
+    }
+    client.login(project.owner)
+    response = client.json.post(url, json.dumps(data))
+
+    assert response.status_code == 204, response.data
+    burndown1 = MilestoneBurndown.objects.get(milestone=milestone1)
+    assert burndown1.total_points == []
+    assert burndown1.total_userstories == 0
+    assert burndown1.total_tasks == 0
+    assert burndown1.completed_tasks == 0
+    assert burndown1.closed_points_by_day == [0] * 8
+    burndown2 = MilestoneBurndown.objects.get(milestone=milestone2)
+    assert burndown2.total_points == [[role.id, 8]]
+    assert burndown2.total_userstories == 1
+    assert burndown2.total_tasks == 2
+    assert burndown2.completed_tasks == 1
+    assert burndown2.closed_points_by_day == [4] * 8
+    assert set(MilestoneBurndownItem.objects.filter(milestone=milestone2).values_list("key", flat=True)) == {
+        "userstories.userstory:{}".format(task1.user_story_id),
+        "tasks.task:{}".format(task1.id),
+        "tasks.task:{}".format(task2.id),
+    }
+
+
+@pytest.mark.django_db(transaction=True)
+def test_milestone_burndown_is_computed_again_when_its_dates_change():
+    project, milestone, role, closed_status, task1, task2 = _create_burndown_data()
+    _finish_task(task1, closed_status, milestone.estimated_start + timedelta(days=1))
+
+    milestone = Milestone.objects.get(id=milestone.id)
+    milestone.estimated_start -= timedelta(days=2)
+    milestone.save()
+
+    burndown = MilestoneBurndown.objects.get(milestone=milestone)
+    assert burndown.estimated_start == milestone.estimated_start
+    assert burndown.closed_points_by_day == [0, 0, 0, 4, 4, 4, 4, 4, 4, 4]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_refresh_burndown_items_is_idempotent():
+    project, milestone, role, closed_status, task1, task2 = _create_burndown_data()
+    _finish_task(task1, closed_status, milestone.estimated_start)
+    values = MilestoneBurndown.objects.filter(milestone=milestone).values().get()
+
+    refresh_burndown_items([task1.user_story_id], [task1.id, task2.id])
+    refresh_burndown_items([task1.user_story_id], [task1.id, task2.id])
+
+    values.pop("modified_date")
+    new_values = MilestoneBurndown.objects.filter(milestone=milestone).values().get()
+    new_values.pop("modified_date")
+    assert new_values == values
+
+
+@pytest.mark.django_db(transaction=True)
+def test_rebuild_milestones_burndown_command():
+    project, milestone, role, closed_status, task1, task2 = _create_burndown_data()
+    other_milestone = f.MilestoneFactory.create()
+    MilestoneBurndown.objects.all().delete()
+
+    call_command("rebuild_milestones_burndown", project=project.id)
+
+    burndown = MilestoneBurndown.objects.get(milestone=milestone)
+    assert burndown.total_points == [[role.id, 8]]
+    assert burndown.total_tasks == 2
+    assert MilestoneBurndownItem.objects.filter(milestone=milestone).count() == 3
+    assert not MilestoneBurndown.objects.filter(milestone=other_milestone).exists()
@@ -30,10 +30,13 @@ from django.urls import reverse
 from django.utils import timezone
 
 from django.apps import apps
+from django.db import connection
+from markupsafe import escape
 from .. import factories as f
 
 from taiga.base.api.settings import api_settings
 from taiga.base.utils import json
+from taiga.projects.notifications import metrics
 from taiga.projects.notifications import services
 from taiga.projects.notifications import models
 from taiga.projects.notifications.choices import NotifyLevel
@@ -243,6 +246,43 @@ def test_users_to_notify():
     assert users == {member1.user, issue.get_owner()}
 
 
+def test_notification_audiences_email_and_live():
+    project = f.ProjectFactory.create()
+    role = f.RoleFactory.create(project=project, permissions=["view_issues"])
+    role_without_perms = f.RoleFactory.create(project=project, permissions=[])
+    email_member = f.MembershipFactory.create(project=project, role=role)
+    live_member = f.MembershipFactory.create(project=project, role=role)
+    admin_member = f.MembershipFactory.create(project=project, role=role_without_perms, is_admin=True)
+    member_without_perms = f.MembershipFactory.create(project=project, role=role_without_perms)
+    issue = f.IssueFactory.create(project=project, owner=email_member.user)
+
+    for membership, notify_level, live_notify_level in ((email_member, NotifyLevel.all, NotifyLevel.none),
+                                                        (live_member, NotifyLevel.none, NotifyLevel.all),
+                                                        (admin_member, NotifyLevel.all, NotifyLevel.all),
+                                                        (member_without_perms, NotifyLevel.all, NotifyLevel.all)):
+        policy = membership.user.notify_policies.get(project=project)
+        policy.notify_level = notify_level
+        policy.live_notify_level = live_notify_level
+        policy.save()
+
+    email_users, live_users = services.get_notification_audiences(issue)
+    assert email_users == {email_member.user, admin_member.user}
+    assert live_users == {live_member.user, admin_member.user}
+    assert services.get_users_to_notify(issue) == email_users
+    assert services.get_users_to_notify(issue, live=True) == live_users
+
+
+def test_notification_audiences_permissions_num_queries(django_assert_num_queries):
+    project = f.ProjectFactory.create()
+    role = f.RoleFactory.create(project=project, permissions=["view_issues"])
+    users = {f.MembershipFactory.create(project=project, role=role).user for i in range(10)}
+    issue = f.IssueFactory.create(project=project)
+
+    # One query for the memberships, whatever the number of users
+    with django_assert_num_queries(1):
+        assert services._filter_by_permissions(issue, users) == users
+
+
 def test_watching_users_to_notify_on_issue_modification_1():
     # If:
     # - the user is watching the issue
@@ -1458,6 +1498,194 @@ def test_new_member_generates_web_notifications(client):
     assert notifications[1].read is None
 
 
+def test_send_sync_notifications_renders_once_by_language(settings, mail):
+    settings.CHANGE_NOTIFICATIONS_MIN_INTERVAL = 0
+
+    project = f.ProjectFactory.create()
+    role = f.RoleFactory.create(project=project, permissions=['view_us'])
+    changer = f.MembershipFactory.create(project=project, role=role).user
+    users = [f.MembershipFactory.create(project=project, role=role,
+                                        user=f.UserFactory.create(full_name=name, lang=lang)).user
+             for name, lang in (("Ann O'Neil", "en"), ("Bob <Smith>", "en"), ("Carmen", "es"))]
+    for user in users:
+        policy = user.notify_policies.get(project=project)
+        policy.notify_level = NotifyLevel.all
+        policy.save()
+
+    us = f.UserStoryFactory.create(project=project, owner=changer)
+    take_snapshot(us, user=changer)
+    history = f.HistoryEntryFactory.create(project=project, user={"pk": changer.id}, comment="test:change",
+                                           type=HistoryType.change, key="userstories.userstory:{}".format(us.id),
+                                           is_hidden=False, diff=[])
+
+    metrics.reset_notifications_metrics()
+    with patch("taiga.base.mails.premailer.transform", side_effect=lambda html: html) as transform_mock:
+        services.send_notifications(us, history=history)
+
+    # The html body is rendered (and its CSS inlined) once by language
+    assert transform_mock.call_count == 2
+
+    assert len(mail.outbox) == 3
+    for user in users:
+        msg = next(msg for msg in mail.outbox if msg.to == [user.email])
+        name = str(escape(user.get_full_name()))
+        assert name in msg.body
+        assert name in msg.alternatives[0][0]
+        assert "TAIGARECIPIENT" not in msg.body + msg.subject + msg.alternatives[0][0]
+
+    stats = metrics.get_notifications_metrics()
+    assert stats["email_batches"] == 1
+    assert stats["email_messages"] == 3
+
+
+def test_send_sync_notifications_isolates_the_errors_of_every_recipient(settings, mail):
+    settings.CHANGE_NOTIFICATIONS_MIN_INTERVAL = 0
+
+    project = f.ProjectFactory.create()
+    role = f.RoleFactory.create(project=project, permissions=['view_us'])
+    changer = f.MembershipFactory.create(project=project, role=role).user
+    users = [f.MembershipFactory.create(project=project, role=role).user for i in range(3)]
+    for user in users:
+        policy = user.notify_policies.get(project=project)
+        policy.notify_level = NotifyLevel.all
+        policy.save()
+
+    us = f.UserStoryFactory.create(project=project, owner=changer)
+    take_snapshot(us, user=changer)
+    history = f.HistoryEntryFactory.create(project=project, user={"pk": changer.id}, comment="test:change",
+                                           type=HistoryType.change, key="userstories.userstory:{}".format(us.id),
+                                           is_hidden=False, diff=[])
+
+    sent = []
+
+    def send_messages(messages):
+        if messages[0].to == [users[0].email]:
+            raise smtplib.SMTPRecipientsRefused({users[0].email: (550, b"No such user")})
+        sent.extend(messages)
+
+    metrics.reset_notifications_metrics()
+    with patch("taiga.projects.notifications.services.mail.get_connection") as get_connection_mock, \
+            patch("taiga.projects.notifications.services.logger") as logger_mock:
+        connection_mock = Mock()
+        connection_mock.send_messages.side_effect = send_messages
+        get_connection_mock.return_value = connection_mock
+
+        services.send_notifications(us, history=history)
+
+    assert connection_mock.send_messages.call_count == 3
+    assert sorted(msg.to[0] for msg in sent) == sorted([users[1].email, users[2].email])
+    assert logger_mock.exception.call_count == 1
+    assert connection_mock.open.call_count == 1
+    assert connection_mock.close.call_count == 1
+    assert metrics.get_notifications_metrics()["email_errors"] == 1
+
+
+def test_send_bulk_email_claims_only_ready_notifications(settings, mail):
+    settings.CHANGE_NOTIFICATIONS_MIN_INTERVAL = 60
+
+    project = f.ProjectFactory.create()
+    role = f.RoleFactory.create(project=project, permissions=['view_issues', 'view_us', 'view_tasks'])
+    member1 = f.MembershipFactory.create(project=project, role=role)
+    member2 = f.MembershipFactory.create(project=project, role=role)
+
+    for task in f.TaskFactory.create_batch(3, project=project, owner=member2.user):
+        take_snapshot(task, user=task.owner)
+        history = f.HistoryEntryFactory.create(project=project, user={"pk": member1.user.id},
+                                               comment="test:change", type=HistoryType.change,
+                                               key="tasks.task:{}".format(task.id), is_hidden=False, diff=[])
+        services.send_notifications(task, history=history)
+
+    # Two of them were modified before the min interval (one a long time ago)
+    old_ids = list(models.HistoryChangeNotification.objects.order_by("id").values_list("id", flat=True)[:2])
+    now = timezone.now()
+    models.HistoryChangeNotification.objects.filter(id=old_ids[0]).update(
+        created_datetime=now - datetime.timedelta(days=2), updated_datetime=now - datetime.timedelta(days=2))
+    models.HistoryChangeNotification.objects.filter(id=old_ids[1]).update(
+        created_datetime=now - datetime.timedelta(seconds=120), updated_datetime=now - datetime.timedelta(seconds=120))
+
+    stats = metrics.get_notifications_queue_stats(now)
+    assert stats["pending"] == 3
+    assert stats["ready"] == 2
+    assert stats["oldest_age"] == 2 * 24 * 3600
+
+    assert services.send_bulk_email(batch_size=1) == 2
+    assert len(mail.outbox) == 2
+    assert not models.HistoryChangeNotification.objects.filter(id__in=old_ids).exists()
+
+    stats = metrics.get_notifications_queue_stats()
+    assert stats["pending"] == 1
+    assert stats["ready"] == 0
+
+
+def test_send_bulk_email_skips_the_notifications_that_fail(settings, mail):
+    settings.CHANGE_NOTIFICATIONS_MIN_INTERVAL = 60
+
+    project = f.ProjectFactory.create()
+    role = f.RoleFactory.create(project=project, permissions=['view_issues', 'view_us', 'view_tasks'])
+    member1 = f.MembershipFactory.create(project=project, role=role)
+    member2 = f.MembershipFactory.create(project=project, role=role)
+
+    tasks = f.TaskFactory.create_batch(3, project=project, owner=member2.user)
+    for task in tasks:
+        take_snapshot(task, user=task.owner)
+        history = f.HistoryEntryFactory.create(project=project, user={"pk": member1.user.id},
+                                               comment="test:change", type=HistoryType.change,
+                                               key="tasks.task:{}".format(task.id), is_hidden=False, diff=[])
+        services.send_notifications(task, history=history)
+
+    past = timezone.now() - datetime.timedelta(days=1)
+    models.HistoryChangeNotification.objects.update(created_datetime=past, updated_datetime=past)
+
+    # The oldest notification can not be sent
+    poison_key = "tasks.task:{}".format(tasks[0].id)
+    get_current_snapshot_for_key = services.get_current_snapshot_for_key
+
+    def get_snapshot(key):
+        return (None, None) if key == poison_key else get_current_snapshot_for_key(key)
+
+    with patch("taiga.projects.notifications.services.get_current_snapshot_for_key",
+               side_effect=get_snapshot), \
+            patch("taiga.projects.notifications.services.logger") as logger_mock:
+        assert services.send_bulk_email(batch_size=1) == 3
+
+    assert logger_mock.exception.call_count == 1
+    assert len(mail.outbox) == 2
+    assert list(models.HistoryChangeNotification.objects.values_list("key", flat=True)) == [poison_key]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_send_notifications_batch_sends_every_notification_in_its_own_transaction(settings):
+    settings.CHANGE_NOTIFICATIONS_MIN_INTERVAL = 60
+
+    project = f.ProjectFactory.create()
+    for task in f.TaskFactory.create_batch(2, project=project):
+        models.HistoryChangeNotification.objects.create(project=project, key="tasks.task:{}".format(task.id),
+                                                        owner=project.owner, history_type=HistoryType.change)
+    past = timezone.now() - datetime.timedelta(days=1)
+    models.HistoryChangeNotification.objects.update(created_datetime=past, updated_datetime=past)
+
+    # The transaction of every notification is committed (not a savepoint
+    # of a transaction of the whole batch) before the next one is sent
+    transactions = []
+
+    def send(notification_id):
+        transactions.append((connection.in_atomic_block, list(connection.savepoint_ids)))
+        models.HistoryChangeNotification.objects.filter(id=notification_id).delete()
+
+    with patch("taiga.projects.notifications.services.send_sync_notifications", side_effect=send):
+        assert services.send_notifications_batch() == 2
+
+    assert transactions == [(True, []), (True, [])]
+    assert not models.HistoryChangeNotification.objects.exists()
+
+
+def test_send_notifications_batch_with_an_empty_queue(settings):
+    settings.CHANGE_NOTIFICATIONS_MIN_INTERVAL = 60
+
+    assert services.send_notifications_batch() == 0
+    assert metrics.get_notifications_queue_stats() == {"pending": 0, "ready": 0, "oldest_age": 0}
+
+
 def test_smtp_error_sending_notifications(settings, mail):
     settings.CHANGE_NOTIFICATIONS_MIN_INTERVAL = 1
 
@@ -1508,11 +1736,11 @@ def test_smtp_error_sending_notifications(settings, mail):
                                 history=history_delete)
 
 
-    with (patch("taiga.projects.notifications.services._make_template_mail") as make_template_email_mock,
-          patch("taiga.projects.notifications.services.logger") as logger_mock):
-        email_mock = Mock()
-        email_mock.send.side_effect = smtplib.SMTPDataError(msg="error smtp", code=123)
-        make_template_email_mock.return_value = email_mock
+    with patch("taiga.projects.notifications.services.mail.get_connection") as get_connection_mock, \
+            patch("taiga.projects.notifications.services.logger") as logger_mock:
+        connection_mock = Mock()
+        connection_mock.send_messages.side_effect = smtplib.SMTPDataError(msg="error smtp", code=123)
+        get_connection_mock.return_value = connection_mock
 
         assert models.HistoryChangeNotification.objects.count() == 3
         assert len(mail.outbox) == 0
@@ -1521,3 +1749,4 @@ def test_smtp_error_sending_notifications(settings, mail):
         assert len(mail.outbox) == 0
 
         assert logger_mock.exception.call_count == 3
+        assert connection_mock.send_messages.call_count == 3
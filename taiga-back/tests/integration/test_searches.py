@@ -16,11 +16,13 @@
 
 import pytest
 
+from django.db import connection
 from django.urls import reverse
 
 from .. import factories as f
 
 from taiga.permissions.choices import MEMBERS_PERMISSIONS
+from taiga.searches import services
 from tests.utils import disconnect_signals, reconnect_signals
 
 
@@ -149,3 +151,137 @@ def test_search_text_query_with_an_invalid_project_id(client, searches_initial_d
 
     response = client.get(reverse("search-list"), {"project": "new", "text": "future"})
     assert response.status_code == 404
+
+
+def test_search_text_query_after_updating_the_objects(client, searches_initial_data):
+    data = searches_initial_data
+
+    client.login(data.member1.user)
+
+    data.us14.subject = "Future of the past"
+    data.us14.save()
+    data.us11.subject = "Forward to the present"
+    data.us11.save()
+    data.wikipage11.content = "The future is black"
+    data.wikipage11.save()
+
+    response = client.get(reverse("search-list"), {"project": data.project1.id, "text": "future"})
+    assert response.status_code == 200
+    assert set([obj["id"] for obj in response.data["userstories"]]) == set([data.us12.id, data.us13.id, data.us14.id])
+    assert set([obj["id"] for obj in response.data["wikipages"]]) == set([data.wikipage11.id])
+
+
+def test_backfill_search_vectors(client, searches_initial_data):
+    data = searches_initial_data
+
+    client.login(data.member1.user)
+
+    with connection.cursor() as cursor:
+        cursor.execute("UPDATE tasks_task SET search_vector = NULL WHERE project_id = %s", [data.project1.id])
+
+    response = client.get(reverse("search-list"), {"project": data.project1.id, "text": "future"})
+    assert len(response.data["tasks"]) == 0
+
+    batches = list(services.backfill_search_vectors("tasks_task", project_id=data.project1.id, batch_size=3))
+    assert len(batches) == 2
+    assert sum(updated for last_id, updated in batches) == 4
+    assert batches[-1][0] == data.task14.id
+
+    response = client.get(reverse("search-list"), {"project": data.project1.id, "text": "future"})
+    assert set([obj["id"] for obj in response.data["tasks"]]) == set([data.task11.id, data.task12.id, data.task14.id])
+
+    batches = list(services.backfill_search_vectors("tasks_task", project_id=data.project1.id))
+    assert sum(updated for last_id, updated in batches) == 0
+
+
+def test_search_text_query_by_pages(client, searches_initial_data):
+    data = searches_initial_data
+
+    client.login(data.member1.user)
+
+    response = client.get(reverse("search-list"), {"project": data.project1.id, "text": "future", "page_size": 2})
+    assert response.status_code == 200
+    assert response.data["count"] == 8
+    assert set(response.data["timings"].keys()) == set(["epics", "userstories", "tasks", "issues", "wikipages"])
+    assert response.data["cursors"]["wikipages"] is None
+    first_page_ids = [obj["id"] for obj in response.data["epics"]]
+    assert len(first_page_ids) == 2
+
+    response = client.get(reverse("search-list"), {"project": data.project1.id, "text": "future", "page_size": 2,
+                                                   "type": "epics", "cursor": response.data["cursors"]["epics"]})
+    assert response.status_code == 200
+    assert response.data["count"] == 1
+    assert set(response.data.keys()) == set(["epics", "count", "cursors", "timings"])
+    assert response.data["cursors"]["epics"] is None
+    second_page_ids = [obj["id"] for obj in response.data["epics"]]
+    assert set(first_page_ids + second_page_ids) == set([data.epic11.id, data.epic12.id, data.epic14.id])
+
+
+def test_search_text_query_with_invalid_pages(client, searches_initial_data):
+    data = searches_initial_data
+
+    client.login(data.member1.user)
+
+    response = client.get(reverse("search-list"), {"project": data.project1.id, "text": "future",
+                                                   "type": "epics", "cursor": "invalid"})
+    assert response.status_code == 400
+
+    response = client.get(reverse("search-list"), {"project": data.project1.id, "text": "future",
+                                                   "type": "invalid"})
+    assert response.status_code == 400
+
+    response = client.get(reverse("search-list"), {"project": data.project1.id, "text": "future",
+                                                   "page_size": "invalid"})
+    assert response.status_code == 400
+
+
+def test_typeahead_in_my_project(client, searches_initial_data):
+    data = searches_initial_data
+
+    us = f.UserStoryFactory(project=data.project1, ref=88120, subject="Login page")
+    task = f.TaskFactory(project=data.project1, ref=8812, subject="Logout")
+    issue = f.IssueFactory(project=data.project1, ref=8813, subject="8812 login errors")
+    f.EpicFactory(project=data.project2, ref=8814, subject="Login")
+
+    client.login(data.member1.user)
+
+    url = reverse("search-typeahead")
+
+    response = client.get(url, {"project": data.project1.id, "text": "8812"})
+    assert response.status_code == 200
+    assert [(item["type"], item["id"]) for item in response.data] == [("tasks", task.id),
+                                                                      ("userstories", us.id),
+                                                                      ("issues", issue.id)]
+
+    response = client.get(url, {"project": data.project1.id, "text": "#8812"})
+    assert response.status_code == 200
+    assert [(item["type"], item["id"]) for item in response.data] == [("tasks", task.id),
+                                                                      ("userstories", us.id)]
+
+    response = client.get(url, {"project": data.project1.id, "text": "LOG"})
+    assert response.status_code == 200
+    assert [(item["type"], item["id"], item["ref"], item["subject"]) for item in response.data] == [
+        ("userstories", us.id, us.ref, us.subject),
+        ("tasks", task.id, task.ref, task.subject),
+    ]
+
+    response = client.get(url, {"project": data.project1.id, "text": "8812", "page_size": 1})
+    assert response.status_code == 200
+    assert [(item["type"], item["id"]) for item in response.data] == [("tasks", task.id)]
+
+    response = client.get(url, {"project": data.project1.id, "text": ""})
+    assert response.status_code == 200
+    assert response.data == []
+
+
+@pytest.mark.parametrize("text", ["#", "#abc", "#1234567890123"])
+def test_typeahead_with_a_hash_that_is_not_a_ref(client, searches_initial_data, text):
+    data = searches_initial_data
+
+    f.UserStoryFactory(project=data.project1, ref=1234, subject="#abc")
+
+    client.login(data.member1.user)
+
+    response = client.get(reverse("search-typeahead"), {"project": data.project1.id, "text": text})
+    assert response.status_code == 200
+    assert response.data == []
@@ -16,10 +16,15 @@
 
 import pytest
 
+from datetime import timedelta
+
+from django.utils import timezone
+
 from .. import factories as f
 from tests.utils import disconnect_signals, reconnect_signals
 
 from taiga.projects.services.stats import get_stats_for_project
+from taiga.projects.userstories.models import UserStory
 
 
 pytestmark = pytest.mark.django_db
@@ -157,3 +162,49 @@ def test_project_assigned_points(client, data):
     data.user_story4.save()
     project_stats = get_stats_for_project(data.project)
     assert project_stats["assigned_points_per_role"] == {data.role1.pk: 63, data.role2.pk: 0}
+
+
+def test_project_stats_with_milestones_and_extra_requirements(client, data):
+    data.user_story5.milestone.estimated_start = timezone.now().date() - timedelta(days=20)
+    data.user_story5.milestone.estimated_finish = timezone.now().date() + timedelta(days=1)
+    data.user_story5.milestone.save()
+    milestone = f.MilestoneFactory(project=data.project, estimated_start=timezone.now().date() - timedelta(days=5))
+
+    data.user_story1.role_points.filter(role=data.role2).update(points=data.points3)
+    data.user_story2.is_closed = True
+    data.user_story2.save()
+    data.user_story6.is_closed = True
+    data.user_story6.save()
+    UserStory.objects.filter(id=data.user_story1.id).update(team_requirement=True, client_requirement=True)
+    UserStory.objects.filter(id=data.user_story2.id).update(team_requirement=True)
+    UserStory.objects.filter(id=data.user_story3.id).update(client_requirement=True,
+                                                           created_date=timezone.now() - timedelta(days=10))
+    UserStory.objects.filter(id=data.user_story4.id).update(team_requirement=True,
+                                                           created_date=timezone.now() - timedelta(days=100))
+
+    project_stats = get_stats_for_project(data.project)
+    milestones_stats = project_stats.pop("milestones")
+    assert project_stats == {
+        "name": data.project.name,
+        "total_milestones": None,
+        "total_points": None,
+        "closed_points": 34,
+        "closed_points_per_role": {data.role1.pk: 34, data.role2.pk: 0},
+        "defined_points": 67,
+        "defined_points_per_role": {data.role1.pk: 63, data.role2.pk: 4},
+        "assigned_points": 48,
+        "assigned_points_per_role": {data.role1.pk: 48, data.role2.pk: 0},
+        "speed": 24,
+    }
+
+    # The milestones are sorted by their estimated start and the user stories
+    # 1, 2 and 3 were created during the first one, the user story 4 before all
+    # of them
+    assert [m["name"] for m in milestones_stats] == [data.user_story5.milestone.name,
+                                                     milestone.name,
+                                                     data.user_story6.milestone.name,
+                                                     "Project End"]
+    assert [m["optimal"] for m in milestones_stats] == pytest.approx([67, 67 * 2 / 3, 67 / 3, 0])
+    assert [m["evolution"] for m in milestones_stats] == [67, 67, 67, 35]
+    assert [m["team-increment"] for m in milestones_stats] == [0, 4.5, 4.5, 4.5]
+    assert [m["client-increment"] for m in milestones_stats] == [0, 6.5, 6.5, 6.5]
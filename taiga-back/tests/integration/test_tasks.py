@@ -34,6 +34,7 @@ from taiga.projects.userstories.models import UserStory
 from taiga.projects.votes.services import add_vote
 
 from .. import factories as f
+from ..utils import filters_data_counts
 
 import pytest
 pytestmark = pytest.mark.django_db
@@ -975,6 +976,38 @@ def test_api_filters_data(client):
     assert next(filter(lambda i: i['name'] == tag3, response.data["tags"]))["count"] == 3
 
 
+def test_api_filters_data_with_null_exclude_and_role_filters(client):
+    data = create_tasks_fixtures()
+    project = data["project"]
+    (user1, user2, user3, ) = data["users"]
+    (status0, status1, status2, status3, ) = data["statuses"]
+    (tag0, tag1, tag2, tag3, ) = data["tags"]
+    role = data["roles"][0]
+
+    url = reverse("tasks-filters-data") + "?project={}".format(project.id)
+    client.login(user1)
+
+    ## Filter (user1 or unassigned)
+    response = client.get(url + "&assigned_to={},null".format(user1.id))
+    assert response.status_code == 200
+
+    counts = filters_data_counts(response.data)
+    assert counts["statuses"] == {status0.id: 2, status1.id: 1, status2.id: 1, status3.id: 3}
+    assert counts["assigned_to"] == {user1.id: 3, user2.id: 2, user3.id: 1, None: 4}
+    assert counts["owners"] == {user1.id: 2, user2.id: 3, user3.id: 2}
+    assert counts["tags"] == {tag0: 0, tag1: 4, tag2: 4, tag3: 3}
+
+    ## Filter (not status3 and assigned to a member with the role of user1)
+    response = client.get(url + "&exclude_status={}&role={}".format(status3.id, role.id))
+    assert response.status_code == 200
+
+    counts = filters_data_counts(response.data)
+    assert counts["statuses"] == {status0.id: 1, status1.id: 0, status2.id: 1, status3.id: 1}
+    assert counts["assigned_to"] == {user1.id: 2, user2.id: 0, user3.id: 0, None: 0}
+    assert counts["owners"] == {user1.id: 1, user3.id: 1}
+    assert counts["tags"] == {tag0: 0, tag1: 1, tag2: 1, tag3: 2}
+
+
 def test_api_validator_assigned_to_when_update_tasks(client):
     project = f.create_project(anon_permissions=list(map(lambda x: x[0], ANON_PERMISSIONS)),
                                public_permissions=list(map(lambda x: x[0], ANON_PERMISSIONS)))
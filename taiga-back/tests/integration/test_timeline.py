@@ -19,10 +19,16 @@ import pytz
 from datetime import datetime, timedelta
 import pytest
 
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+
 from .. import factories
 
 from taiga.projects.history import services as history_services
+from taiga.timeline import rebuilder
 from taiga.timeline import service
+from taiga.timeline import visibility
 from taiga.timeline.models import Timeline
 from taiga.timeline.serializers import TimelineSerializer
 
@@ -165,6 +171,141 @@ def test_filter_timeline_private_project_member_superuser():
     assert timeline.count() == 2
 
 
+def test_filter_timeline_visibility_updated_on_role_change():
+    Timeline.objects.all().delete()
+    user1 = factories.UserFactory()
+    user2 = factories.UserFactory()
+    project = factories.ProjectFactory.create(is_private=True)
+    membership = factories.MembershipFactory.create(user=user2, project=project)
+    membership.role.permissions = []
+    membership.role.save()
+    task = factories.TaskFactory.create(project=project)
+
+    service.register_timeline_implementation("tasks.task", "test", lambda x, extra_data=None: id(x))
+    service._add_to_object_timeline(user1, task, "test", task.created_date)
+    timeline = Timeline.objects.exclude(event_type="users.user.create").filter(data_content_type__model="task")
+    assert service.filter_timeline_for_user(timeline, user2).count() == 0
+
+    membership.role.permissions = ["view_tasks"]
+    membership.role.save()
+    assert service.filter_timeline_for_user(timeline, user2).count() == 1
+
+    membership.delete()
+    assert service.filter_timeline_for_user(timeline, user2).count() == 0
+
+
+def test_filter_timeline_visibility_updated_on_anon_permissions_change():
+    Timeline.objects.all().delete()
+    user1 = factories.UserFactory()
+    user2 = factories.UserFactory()
+    project = factories.ProjectFactory.create(is_private=True, anon_permissions=[])
+    task = factories.TaskFactory.create(project=project)
+
+    service.register_timeline_implementation("tasks.task", "test", lambda x, extra_data=None: id(x))
+    service._add_to_object_timeline(user1, task, "test", task.created_date)
+    timeline = Timeline.objects.exclude(event_type="users.user.create")
+    assert service.filter_timeline_for_user(timeline, user2).count() == 0
+
+    project.anon_permissions = ["view_tasks"]
+    project.save()
+    assert service.filter_timeline_for_user(timeline, user2).count() == 1
+
+
+def test_filter_timeline_visibility_is_cached(django_assert_num_queries, shared_cache):
+    user = factories.UserFactory()
+    for i in range(3):
+        factories.MembershipFactory.create(user=user, project=factories.ProjectFactory.create(is_private=True))
+
+    service.filter_timeline_for_user(Timeline.objects.all(), user)
+    with django_assert_num_queries(0):
+        service.filter_timeline_for_user(Timeline.objects.all(), user)
+
+
+def test_filter_timeline_visibility_is_not_cached_in_local_cache(django_assert_num_queries):
+    user = factories.UserFactory()
+    factories.MembershipFactory.create(user=user, project=factories.ProjectFactory.create(is_private=True))
+
+    service.filter_timeline_for_user(Timeline.objects.all(), user)
+    # The anon visibility and the memberships of the user
+    with django_assert_num_queries(2):
+        service.filter_timeline_for_user(Timeline.objects.all(), user)
+
+
+def test_filter_timeline_anon_visibility_is_kept_when_a_project_save_does_not_change_it(shared_cache):
+    project = factories.ProjectFactory.create(is_private=True, anon_permissions=["view_tasks"])
+    visibility.get_anon_visibility()
+    generation = cache.get(visibility.ANON_GENERATION_KEY)
+
+    project.name = "New name"
+    project.save()
+    assert cache.get(visibility.ANON_GENERATION_KEY) == generation
+
+    project.anon_permissions = ["view_tasks", "view_issues"]
+    project.save()
+    assert cache.get(visibility.ANON_GENERATION_KEY) != generation
+
+
+def test_project_timeline_cursor_pagination(client):
+    project = factories.ProjectFactory.create(is_private=False)
+    Timeline.objects.all().delete()
+    for i in range(5):
+        factories.TaskFactory.create(project=project)
+    for task in project.tasks.all():
+        history_services.take_snapshot(task, user=project.owner)
+    expected_ids = list(service.get_project_timeline(project).order_by("-created", "-id")
+                                                            .values_list("id", flat=True))
+    assert len(expected_ids) == 5
+
+    url = "{}?page_size=2".format(reverse("project-timeline-detail", args=(project.id,)))
+    ids = []
+    while url:
+        response = client.get(url, HTTP_X_CURSOR_PAGINATION="true")
+        assert response.status_code == 200, response.data
+        assert "x-pagination-count" not in response
+        ids += [entry["id"] for entry in response.data]
+        url = response.get("x-pagination-next", None)
+
+    assert ids == expected_ids
+
+
+def test_rebuild_project_timeline_is_idempotent():
+    project = factories.ProjectFactory.create()
+    factories.MembershipFactory.create(project=project)
+    task = factories.TaskFactory.create(project=project)
+    history_services.take_snapshot(task, user=task.owner)
+    other_task = factories.TaskFactory.create()
+    history_services.take_snapshot(other_task, user=other_task.owner)
+
+    project_timeline = Timeline.objects.filter(project=project)
+    other_count = Timeline.objects.exclude(project=project).count()
+
+    results = rebuilder.rebuild_timeline(None, None, project.id)
+    assert len(results) == 1
+    assert results[0].project_id == project.id
+    assert results[0].rows == project_timeline.count()
+    count = project_timeline.count()
+    assert project_timeline.filter(event_type="tasks.task.create").exists()
+    assert project_timeline.filter(event_type="projects.membership.create").exists()
+
+    rebuilder.rebuild_timeline(None, None, project.id)
+    assert project_timeline.count() == count
+    assert Timeline.objects.exclude(project=project).count() == other_count
+
+
+def test_rebuild_timeline_command_resumes_from_checkpoint(tmpdir):
+    project1 = factories.ProjectFactory.create()
+    project2 = factories.ProjectFactory.create()
+    checkpoint = tmpdir.join("rebuild.checkpoint")
+    checkpoint.write("{}\n".format(project1.id))
+    Timeline.objects.all().delete()
+
+    call_command("rebuild_timeline", checkpoint=str(checkpoint))
+
+    assert not Timeline.objects.filter(project=project1).exists()
+    assert Timeline.objects.filter(project=project2, event_type="projects.project.create").exists()
+    assert str(project2.id) in checkpoint.read().split()
+
+
 def test_create_project_timeline():
     project = factories.ProjectFactory.create(name="test project timeline")
     history_services.take_snapshot(project, user=project.owner)
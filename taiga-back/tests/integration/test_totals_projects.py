@@ -20,8 +20,12 @@ import datetime
 from .. import factories as f
 
 from taiga.projects.history.choices import HistoryType
-from taiga.projects.models import Project
+from taiga.projects.likes import services as likes_services
+from taiga.projects.models import Project, ProjectTotalsBucket
+from taiga.projects.services import totals as totals_services
+from taiga.timeline.models import Timeline
 
+from django.contrib.contenttypes.models import ContentType
 from django.urls import reverse
 from django.utils import timezone
 
@@ -156,3 +160,111 @@ def test_project_totals_updated_on_like(client):
     assert project.total_fans_last_month == 2
     assert project.total_fans_last_year == 3
     assert project.totals_updated_datetime > totals_updated_datetime
+
+
+def test_project_totals_incremented_by_day_bucket():
+    project = f.create_project()
+    now = timezone.now()
+
+    project.increment_totals(activity=1, date=now)
+    project.increment_totals(activity=1, date=now)
+    project.increment_totals(activity=1, date=now - datetime.timedelta(days=20))
+    project.increment_totals(fans=1, date=now - datetime.timedelta(days=400))
+
+    assert ProjectTotalsBucket.objects.filter(project=project).count() == 3
+    assert project.total_activity == 3
+    assert project.total_activity_last_week == 2
+    assert project.total_activity_last_month == 3
+    assert project.total_activity_last_year == 3
+    assert project.total_fans == 1
+    assert project.total_fans_last_year == 0
+
+    project = Project.objects.get(id=project.id)
+    assert project.total_activity == 3
+    assert project.total_activity_last_week == 2
+
+
+def test_project_totals_increment_num_queries(django_assert_num_queries):
+    project = f.create_project()
+
+    # The bucket upsert and the update of the project
+    with django_assert_num_queries(2):
+        totals_services.increment_project_totals(project, activity=1)
+
+
+def test_project_totals_fans_on_like_and_unlike():
+    project = f.create_project()
+    user = f.UserFactory.create()
+
+    likes_services.add_like(project, user)
+    likes_services.add_like(project, user)
+    project = Project.objects.get(id=project.id)
+    assert project.total_fans == 1
+    assert project.total_fans_last_week == 1
+
+    likes_services.remove_like(project, user)
+    project = Project.objects.get(id=project.id)
+    assert project.total_fans == 0
+    assert project.total_fans_last_week == 0
+
+
+def test_project_totals_not_changed_by_likes_of_other_objects():
+    project = f.create_project()
+    us = f.UserStoryFactory.create(project=project, owner=project.owner)
+
+    likes_services.add_like(us, project.owner)
+
+    project = Project.objects.get(id=project.id)
+    assert project.total_fans == 0
+
+
+def test_reconcile_projects_totals_fixes_drift():
+    project = f.create_project()
+    other_project = f.create_project()
+    now = timezone.now()
+    Timeline.objects.all().delete()
+
+    Timeline.objects.create(content_object=project, namespace="project:{}".format(project.id),
+                            event_type="projects.project.create", project=project, data={},
+                            data_content_type=ContentType.objects.get_for_model(project),
+                            created=now - datetime.timedelta(days=40))
+    like = f.LikeFactory.create(content_object=project)
+    like.created_date = now - datetime.timedelta(days=2)
+    like.save()
+    Project.objects.filter(id=project.id).update(total_activity=10, total_fans=10,
+                                                 total_activity_last_week=10)
+    ProjectTotalsBucket.objects.create(project=project, date=now.date(), activity=10, fans=10)
+
+    totals_services.reconcile_projects_totals([project.id, other_project.id])
+
+    project = Project.objects.get(id=project.id)
+    assert project.total_activity == 1
+    assert project.total_activity_last_week == 0
+    assert project.total_activity_last_month == 0
+    assert project.total_activity_last_year == 1
+    assert project.total_fans == 1
+    assert project.total_fans_last_week == 1
+    assert ProjectTotalsBucket.objects.filter(project=project).count() == 2
+
+    other_project = Project.objects.get(id=other_project.id)
+    assert other_project.total_activity == 0
+    assert other_project.total_fans == 0
+
+
+def test_refresh_projects_totals_windows_rolls_the_old_buckets():
+    project = f.create_project()
+    old_date = timezone.now() - datetime.timedelta(days=10)
+    ProjectTotalsBucket.objects.create(project=project, date=old_date.date(), activity=2, fans=1)
+    Project.objects.filter(id=project.id).update(total_activity=2, total_activity_last_week=2,
+                                                 total_activity_last_month=2, total_activity_last_year=2,
+                                                 total_fans=1, total_fans_last_week=1,
+                                                 total_fans_last_month=1, total_fans_last_year=1)
+
+    totals_services.refresh_projects_totals_windows()
+
+    project = Project.objects.get(id=project.id)
+    assert project.total_activity == 2
+    assert project.total_activity_last_week == 0
+    assert project.total_activity_last_month == 2
+    assert project.total_fans_last_week == 0
+    assert project.total_fans_last_year == 1
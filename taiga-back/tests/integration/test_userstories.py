@@ -30,6 +30,7 @@ from taiga.projects.occ import OCCResourceMixin
 from taiga.projects.userstories import services, models
 
 from .. import factories as f
+from ..utils import filters_data_counts
 
 import pytest
 pytestmark = pytest.mark.django_db(transaction=True)
@@ -1266,6 +1267,52 @@ def test_api_filters_data_roles_with_assigned_users(client):
                        response.data["roles"]))["count"] == 1
 
 
+def test_api_filters_data_with_null_exclude_and_role_filters(client):
+    data = create_uss_fixtures()
+    project = data["project"]
+    (user1, user2, user3, ) = data["users"]
+    (status0, status1, status2, status3, ) = data["statuses"]
+    (epic0, epic1, epic2, ) = data["epics"]
+    (tag0, tag1, tag2, tag3, ) = data["tags"]
+    role = data["roles"][0]
+
+    url = reverse("userstories-filters-data") + "?project={}".format(project.id)
+    client.login(user1)
+
+    ## Filter (without epics)
+    response = client.get(url + "&epic=null")
+    assert response.status_code == 200
+
+    counts = filters_data_counts(response.data)
+    assert counts["statuses"] == {status0.id: 2, status1.id: 1, status2.id: 1, status3.id: 1}
+    assert counts["assigned_to"] == {user1.id: 1, user2.id: 1, user3.id: 1, None: 2}
+    assert counts["owners"] == {user1.id: 2, user2.id: 2, user3.id: 1}
+    assert counts["tags"] == {tag0: 1, tag1: 0, tag2: 1, tag3: 3}
+    assert counts["epics"] == {epic0.id: 3, epic1.id: 1, epic2.id: 2, None: 5}
+
+    ## Filter (user1 or unassigned)
+    response = client.get(url + "&assigned_to={},null".format(user1.id))
+    assert response.status_code == 200
+
+    counts = filters_data_counts(response.data)
+    assert counts["statuses"] == {status0.id: 2, status1.id: 1, status2.id: 1, status3.id: 3}
+    assert counts["assigned_to"] == {user1.id: 3, user2.id: 2, user3.id: 1, None: 4}
+    assert counts["owners"] == {user1.id: 2, user2.id: 3, user3.id: 2}
+    assert counts["tags"] == {tag0: 0, tag1: 4, tag2: 4, tag3: 3}
+    assert counts["epics"] == {epic0.id: 3, epic1.id: 1, epic2.id: 1, None: 3}
+
+    ## Filter (not status3 and assigned to a member with the role of user1)
+    response = client.get(url + "&exclude_status={}&role={}".format(status3.id, role.id))
+    assert response.status_code == 200
+
+    counts = filters_data_counts(response.data)
+    assert counts["statuses"] == {status0.id: 1, status1.id: 1, status2.id: 1, status3.id: 2}
+    assert counts["assigned_to"] == {user1.id: 2, user2.id: 0, user3.id: 1, None: 0}
+    assert counts["owners"] == {user1.id: 1, user2.id: 1, user3.id: 1}
+    assert counts["tags"] == {tag0: 1, tag1: 1, tag2: 1, tag3: 2}
+    assert counts["epics"] == {epic0.id: 1, epic1.id: 0, epic2.id: 0, None: 2}
+
+
 def test_get_invalid_csv(client):
     url = reverse("userstories-csv")
 
@@ -273,6 +273,11 @@ def test_get_diff_of_htmls_modifications():
     assert result == "<span>&lt;p&gt;</span><ins style=\"background:#e6ffe6;\">1</ins><span>test</span><del style=\"background:#ffe6e6;\">1</del><span>&lt;/p&gt;</span>"
 
 
+def test_get_diff_of_htmls_over_max_size():
+    result = get_diff_of_htmls("<p>test1</p>", "<p>1test</p>", max_size=10)
+    assert result == "<del style=\"background:#ffe6e6;\">&lt;p&gt;test1&lt;/p&gt;</del><ins style=\"background:#e6ffe6;\">&lt;p&gt;1test&lt;/p&gt;</ins>"
+
+
 def test_render_and_extract_references():
     with patch("taiga.mdrender.extensions.references.get_instance_by_ref") as mock:
         instance = mock.return_value
@@ -14,7 +14,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from unittest.mock import patch, call
+from unittest.mock import patch, call, MagicMock
 
 from django.contrib.auth import get_user_model
 
@@ -27,36 +27,47 @@ import pytest
 pytestmark = pytest.mark.django_db(transaction=True)
 
 def test_push_to_timeline_many_objects():
-    with patch("taiga.timeline.service._add_to_object_timeline") as mock:
+    with patch("taiga.timeline.service._add_to_objects_timeline") as mock:
         users = [get_user_model(), get_user_model(), get_user_model()]
         owner = get_user_model()
         project = Project()
         service._push_to_timeline(users, project, "test", project.created_date)
-        assert mock.call_count == 3
+        assert mock.call_count == 1
         assert mock.mock_calls == [
-            call(users[0], project, "test", project.created_date, "default", {}),
-            call(users[1], project, "test", project.created_date, "default", {}),
-            call(users[2], project, "test", project.created_date, "default", {}),
+            call(users, project, "test", project.created_date, "default", {}),
         ]
         with pytest.raises(Exception):
             service._push_to_timeline(None, project, "test")
 
 
 def test_add_to_objects_timeline():
-    with patch("taiga.timeline.service._add_to_object_timeline") as mock:
-        users = [get_user_model(), get_user_model(), get_user_model()]
-        project = Project()
+    impl = MagicMock(return_value={"test": "data"})
+    with patch("taiga.timeline.service._create_timeline_entries") as mock, \
+            patch.dict(service._timeline_impl_map, {"projects.project.test": impl}):
+        users = [get_user_model()(id=1), get_user_model()(id=2), get_user_model()(id=3)]
+        project = Project(id=1)
         service._add_to_objects_timeline(users, project, "test", project.created_date)
-        assert mock.call_count == 3
-        assert mock.mock_calls == [
-            call(users[0], project, "test", project.created_date, "default", {}),
-            call(users[1], project, "test", project.created_date, "default", {}),
-            call(users[2], project, "test", project.created_date, "default", {}),
-        ]
+        assert impl.call_count == 1
+        assert mock.call_count == 1
+        entries = mock.call_args[0][0]
+        assert [entry.object_id for entry in entries] == [1, 2, 3]
+        assert [entry.data for entry in entries] == [{"test": "data"}] * 3
         with pytest.raises(Exception):
             service._push_to_timeline(None, project, "test")
 
 
+def test_add_to_objects_timeline_in_chunks():
+    impl = MagicMock(return_value={"test": "data"})
+    with patch("taiga.timeline.service._create_timeline_entries") as mock, \
+            patch("taiga.timeline.service.BULK_CREATE_CHUNK_SIZE", 2), \
+            patch.dict(service._timeline_impl_map, {"projects.project.test": impl}):
+        users = [get_user_model()(id=1), get_user_model()(id=2), get_user_model()(id=3)]
+        project = Project(id=1)
+        service._add_to_objects_timeline(users, project, "test", project.created_date)
+        assert impl.call_count == 1
+        assert [len(c[0][0]) for c in mock.call_args_list] == [2, 1]
+
+
 def test_get_impl_key_from_model():
     assert service._get_impl_key_from_model(Timeline, "test") == "timeline.timeline.test"
     with pytest.raises(Exception):
@@ -14,6 +14,9 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import socket
+import time
+
 from django.db.models import signals
 
 DUMMY_BMP_DATA = b'BM:\x00\x00\x00\x00\x00\x00\x006\x00\x00\x00(\x00\x00\x00\x01\x00\x00\x00\x01\x00\x00\x00\x01\x00\x18\x00\x00\x00\x00\x00\x04\x00\x00\x00\x13\x0b\x00\x00\x13\x0b\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00'
@@ -37,6 +40,15 @@ def signals_switch():
 disconnect_signals, reconnect_signals = signals_switch()
 
 
+def filters_data_counts(filters_data):
+    """
+    Get the counts of the filters data of a list, by facet and by id (or by
+    name for the tags).
+    """
+    return {facet: {item.get("id", item.get("name")): item["count"] for item in items}
+            for facet, items in filters_data.items()}
+
+
 def _helper_test_http_method_responses(client, method, url, data, users, after_each_request=None,
                                        content_type="application/json"):
     results = []
@@ -75,3 +87,81 @@ def helper_test_http_method_and_count(client, method, url, data, users, after_ea
 def helper_test_http_method_and_keys(client, method, url, data, users, after_each_request=None):
     responses = _helper_test_http_method_responses(client, method, url, data, users, after_each_request)
     return list(map(lambda r: (r.status_code, set(r.data.keys() if isinstance(r.data, dict) and 200 <= r.status_code < 300 else [])), responses))
+
+
+class FakeAmqpBroker:
+    """
+    A stand-in of an AMQP connection (with a single channel) for the events
+    backend, that sleeps `round_trip` seconds in every synchronous method
+    and keeps the published messages.
+    """
+    def __init__(self, *, round_trip=0):
+        self.round_trip = round_trip
+        self.connections = 0
+        self.declared = []
+        self.published = []
+
+    def make_connection(self, url):
+        return _FakeAmqpConnection(self)
+
+
+class _FakeAmqpChannel:
+    def __init__(self, connection):
+        self.connection = connection
+        self.events = {"basic_ack": set(), "basic_nack": set()}
+        self.confirm_selected = False
+        self.delivery_tag = 0
+
+    def confirm_select(self):
+        self.connection.round_trip()
+        self.confirm_selected = True
+
+    def exchange_declare(self, exchange, type, auto_delete):
+        self.connection.round_trip()
+        self.connection.broker.declared.append(exchange)
+
+    def basic_publish(self, message, routing_key, exchange):
+        if self.connection.closed:
+            raise ConnectionResetError("Connection closed")
+        self.connection.broker.published.append((message.body, routing_key, exchange))
+        self.delivery_tag += 1
+
+
+class _FakeAmqpConnection:
+    def __init__(self, broker):
+        self.broker = broker
+        self.closed = False
+        self.sock, self._peer = socket.socketpair()
+        self._channel = _FakeAmqpChannel(self)
+
+    def round_trip(self):
+        if self.broker.round_trip:
+            time.sleep(self.broker.round_trip)
+
+    def connect(self):
+        # TCP + AMQP handshake (protocol header, start, tune, open)
+        for i in range(4):
+            self.round_trip()
+        self.broker.connections += 1
+
+    def channel(self):
+        self.round_trip()
+        return self._channel
+
+    def drain_events(self, timeout=None):
+        self.round_trip()
+        if self.closed:
+            raise ConnectionResetError("Connection closed")
+        for callback in self._channel.events["basic_ack"]:
+            callback(self._channel.delivery_tag, True)
+
+    def close_by_broker(self):
+        # The broker sends a connection close frame
+        self.closed = True
+        self._peer.send(b"\x01")
+
+    def close(self):
+        self.round_trip()
+        self.closed = True
+        self.sock.close()
+        self._peer.close()